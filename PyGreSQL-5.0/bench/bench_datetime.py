@@ -0,0 +1,87 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Benchmark the typecasting of date and time values.
+
+This is not a unit test, run it manually to compare the time needed for
+fetching timestamp-heavy results with the native typecast functions of
+the C module and with typecast functions based on strptime().
+
+This benchmark needs a database to test against.
+"""
+
+from __future__ import print_function
+
+import sys
+
+from datetime import datetime
+from time import time
+
+import pg  # the module under test
+
+# We need a database to test against.  If LOCAL_PyGreSQL.py exists we will
+# get our information from that.  Otherwise we use the defaults.
+dbname = 'unittest'
+dbhost = None
+dbport = 5432
+
+try:
+    from .LOCAL_PyGreSQL import *
+except (ImportError, ValueError):
+    try:
+        from LOCAL_PyGreSQL import *
+    except ImportError:
+        pass
+
+
+def connect():
+    """Create a DB wrapper connection to the test database."""
+    db = pg.DB(dbname, dbhost, dbport)
+    db.query("set client_min_messages=warning")
+    db.query("set datestyle='ISO, YMD'")
+    return db
+
+
+def python_date(value):
+    """Cast a date value using strptime()."""
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def python_timestamp(value):
+    """Cast a timestamp value using strptime()."""
+    fmt = '%Y-%m-%d %H:%M:%S.%f' if len(value) > 19 else '%Y-%m-%d %H:%M:%S'
+    return datetime.strptime(value, fmt)
+
+
+casts = [
+    ('native', None),
+    ('strptime', dict(date=python_date, timestamp=python_timestamp))]
+
+
+def bench(num_rows=100000, repeat=3):
+    """Run the benchmark with the given number of rows."""
+    db = connect()
+    sql = ("select d::date, d, d + interval '1.5 seconds'"
+        " from generate_series(now()::timestamp,"
+        " now()::timestamp + interval '%d seconds',"
+        " interval '1 second') as d" % (num_rows - 1))
+    try:
+        for name, typecasts in casts:
+            db.dbtypes.reset_typecast()
+            if typecasts:
+                for typ, cast in typecasts.items():
+                    db.dbtypes.set_typecast(typ, cast)
+            times = []
+            for _i in range(repeat):
+                q = db.query(sql)
+                t = time()
+                q.getresult()
+                times.append(time() - t)
+            print('%-8s %d rows in %.3f seconds (%.0f rows/s)' % (
+                name, num_rows, min(times), num_rows / min(times)))
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    bench(*map(int, sys.argv[1:]))
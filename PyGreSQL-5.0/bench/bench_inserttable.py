@@ -0,0 +1,76 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Benchmark the text and binary formats of the inserttable() method.
+
+This is not a unit test, run it manually to compare the time needed
+for bulk loading numeric and time-series data in both formats.
+
+This benchmark needs a database to test against.
+"""
+
+from __future__ import print_function
+
+import sys
+
+from datetime import datetime, timedelta
+from time import time
+
+import pg  # the module under test
+
+# We need a database to test against.  If LOCAL_PyGreSQL.py exists we will
+# get our information from that.  Otherwise we use the defaults.
+dbname = 'unittest'
+dbhost = None
+dbport = 5432
+
+try:
+    from .LOCAL_PyGreSQL import *
+except (ImportError, ValueError):
+    try:
+        from LOCAL_PyGreSQL import *
+    except ImportError:
+        pass
+
+
+def connect():
+    """Create a basic pg connection to the test database."""
+    connection = pg.connect(dbname, dbhost, dbport)
+    connection.query("set client_min_messages=warning")
+    return connection
+
+
+def rows(num_rows):
+    """Generate rows for a time-series table."""
+    start = datetime(2016, 1, 1)
+    step = timedelta(seconds=1)
+    for i in range(num_rows):
+        yield i, i * 1.5, i % 2 == 0, start + i * step, 'sensor %d' % (i % 10)
+
+
+def bench(num_rows=100000, repeat=3):
+    """Run the benchmark with the given number of rows."""
+    c = connect()
+    query = c.query
+    query("drop table if exists bench_inserttable")
+    query("create table bench_inserttable (i int8, f float8, b bool,"
+        " t timestamp, s text)")
+    try:
+        for binary in (False, True):
+            times = []
+            for _i in range(repeat):
+                query("truncate table bench_inserttable")
+                t = time()
+                c.inserttable('bench_inserttable', rows(num_rows),
+                    binary=binary)
+                times.append(time() - t)
+            print('%s format: %d rows in %.3f seconds (%.0f rows/s)' % (
+                'binary' if binary else 'text', num_rows,
+                min(times), num_rows / min(times)))
+    finally:
+        query("drop table bench_inserttable")
+        c.close()
+
+
+if __name__ == '__main__':
+    bench(*map(int, sys.argv[1:]))
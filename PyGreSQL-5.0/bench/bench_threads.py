@@ -0,0 +1,130 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Benchmark blocking operations of the classic module in multiple threads.
+
+Every thread uses its own connection and runs large object transfers,
+COPY commands via putline/getline and queries for a fixed time.  Since
+the C module releases the GIL while waiting for the server, the
+aggregate throughput should scale with the number of threads.
+
+This is not a unit test, run it manually.  It needs a database to test
+against.
+"""
+
+from __future__ import print_function
+
+import sys
+
+from threading import Thread
+from time import time
+
+import pg  # the module under test
+
+# We need a database to test against.  If LOCAL_PyGreSQL.py exists we will
+# get our information from that.  Otherwise we use the defaults.
+dbname = 'unittest'
+dbhost = None
+dbport = 5432
+
+try:
+    from .LOCAL_PyGreSQL import *
+except (ImportError, ValueError):
+    try:
+        from LOCAL_PyGreSQL import *
+    except ImportError:
+        pass
+
+
+def connect():
+    """Create a basic pg connection to the test database."""
+    connection = pg.connect(dbname, dbhost, dbport)
+    connection.query("set client_min_messages=warning")
+    return connection
+
+
+def large_objects(c, chunk=b'x' * 1024 * 256, num_chunks=8):
+    """Write and read back a large object."""
+    c.query('begin')
+    try:
+        lo = c.locreate(pg.INV_READ | pg.INV_WRITE)
+        lo.open(pg.INV_WRITE)
+        for _i in range(num_chunks):
+            lo.write(chunk)
+        lo.close()
+        lo.open(pg.INV_READ)
+        while lo.read(len(chunk)):
+            pass
+        lo.close()
+        lo.unlink()
+    finally:
+        c.query('end')
+    return 2 * num_chunks * len(chunk)
+
+
+def copy_lines(c, num_lines=2000):
+    """Copy lines from and to a temporary table."""
+    c.query("create temporary table if not exists bench_threads"
+        " (i int, t text)")
+    c.query("truncate table bench_threads")
+    line = '%d\t' + 'y' * 100 + '\n'
+    c.query("copy bench_threads from stdin")
+    for i in range(num_lines):
+        c.putline(line % i)
+    c.putline('\\.\n')
+    c.endcopy()
+    c.query("copy bench_threads to stdout")
+    size = 0
+    while True:
+        line = c.getline()
+        if line is None or line == '\\.':
+            break
+        size += len(line)
+    c.endcopy()
+    return 2 * size
+
+
+def sleep_queries(c, num_queries=10):
+    """Run queries that mostly wait for the server."""
+    for _i in range(num_queries):
+        c.query("select pg_sleep(0.01)")
+    return num_queries
+
+
+tasks = dict(lo=large_objects, copy=copy_lines, sleep=sleep_queries)
+
+
+def worker(task, duration, results):
+    """Run the given task repeatedly for the given time."""
+    c = connect()
+    try:
+        total = 0
+        stop = time() + duration
+        while time() < stop:
+            total += task(c)
+        results.append(total)
+    finally:
+        c.close()
+
+
+def bench(duration=3.0, max_threads=8):
+    """Run all tasks with increasing number of threads."""
+    for name in sorted(tasks):
+        task = tasks[name]
+        num_threads = 1
+        while num_threads <= max_threads:
+            results = []
+            threads = [Thread(target=worker, args=(task, duration, results))
+                for _i in range(num_threads)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            print('%-5s %2d threads: %14.0f units/s' % (
+                name, num_threads, sum(results) / duration))
+            num_threads *= 2
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    bench(*[f(a) for f, a in zip((float, int), args)])
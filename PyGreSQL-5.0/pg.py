@@ -42,9 +42,11 @@ from math import isnan, isinf
 from collections import namedtuple
 from operator import itemgetter
 from functools import partial
+from io import RawIOBase, BufferedReader, BufferedWriter, BufferedRandom
 from re import compile as regex
 from json import loads as jsondecode, dumps as jsonencode
 from uuid import UUID
+from weakref import WeakValueDictionary
 
 try:
     long
@@ -658,218 +660,60 @@ def cast_json(value):
     return cast(value)
 
 
-def cast_num(value):
-    """Cast a numeric value."""
-    return (get_decimal() or float)(value)
-
-
-def cast_money(value):
-    """Cast a money value."""
-    point = get_decimal_point()
-    if not point:
-        return value
-    if point != '.':
-        value = value.replace(point, '.')
-    value = value.replace('(', '-')
-    value = ''.join(c for c in value if c.isdigit() or c in '.-')
-    return (get_decimal() or float)(value)
-
-
 def cast_int2vector(value):
     """Cast an int2vector value."""
     return [int(v) for v in value.split()]
 
 
-def cast_date(value, connection):
-    """Cast a date value."""
-    # The output format depends on the server setting DateStyle.  The default
-    # setting ISO and the setting for German are actually unambiguous.  The
-    # order of days and months in the other two settings is however ambiguous,
-    # so at least here we need to consult the setting to properly parse values.
-    if value == '-infinity':
-        return date.min
-    if value == 'infinity':
-        return date.max
-    value = value.split()
-    if value[-1] == 'BC':
-        return date.min
-    value = value[0]
-    if len(value) > 10:
-        return date.max
-    fmt = connection.date_format()
-    return datetime.strptime(value, fmt).date()
-
-
-def cast_time(value):
-    """Cast a time value."""
-    fmt = '%H:%M:%S.%f' if len(value) > 8 else '%H:%M:%S'
-    return datetime.strptime(value, fmt).time()
-
-
-_re_timezone = regex('(.*)([+-].*)')
-
-
-def cast_timetz(value):
-    """Cast a timetz value."""
-    tz = _re_timezone.match(value)
-    if tz:
-        value, tz = tz.groups()
-    else:
-        tz = '+0000'
-    fmt = '%H:%M:%S.%f' if len(value) > 8 else '%H:%M:%S'
-    if _has_timezone:
-        value += _timezone_as_offset(tz)
-        fmt += '%z'
-        return datetime.strptime(value, fmt).timetz()
-    return datetime.strptime(value, fmt).timetz().replace(
-        tzinfo=_get_timezone(tz))
-
-
-def cast_timestamp(value, connection):
-    """Cast a timestamp value."""
-    if value == '-infinity':
-        return datetime.min
-    if value == 'infinity':
-        return datetime.max
-    value = value.split()
-    if value[-1] == 'BC':
-        return datetime.min
-    fmt = connection.date_format()
-    if fmt.endswith('-%Y') and len(value) > 2:
-        value = value[1:5]
-        if len(value[3]) > 4:
-            return datetime.max
-        fmt = ['%d %b' if fmt.startswith('%d') else '%b %d',
-            '%H:%M:%S.%f' if len(value[2]) > 8 else '%H:%M:%S', '%Y']
-    else:
-        if len(value[0]) > 10:
-            return datetime.max
-        fmt = [fmt, '%H:%M:%S.%f' if len(value[1]) > 8 else '%H:%M:%S']
-    return datetime.strptime(' '.join(value), ' '.join(fmt))
-
-
-def cast_timestamptz(value, connection):
-    """Cast a timestamptz value."""
-    if value == '-infinity':
-        return datetime.min
-    if value == 'infinity':
-        return datetime.max
-    value = value.split()
-    if value[-1] == 'BC':
-        return datetime.min
-    fmt = connection.date_format()
-    if fmt.endswith('-%Y') and len(value) > 2:
-        value = value[1:]
-        if len(value[3]) > 4:
-            return datetime.max
-        fmt = ['%d %b' if fmt.startswith('%d') else '%b %d',
-            '%H:%M:%S.%f' if len(value[2]) > 8 else '%H:%M:%S', '%Y']
-        value, tz = value[:-1], value[-1]
-    else:
-        if fmt.startswith('%Y-'):
-            tz = _re_timezone.match(value[1])
-            if tz:
-                value[1], tz = tz.groups()
-            else:
-                tz = '+0000'
+if not _has_timezone:  # Python < 3.2
+
+    # The native cast functions for values with time zones need the timezone
+    # type of the datetime module, so we fall back to these implementations.
+
+    _re_timezone = regex('(.*)([+-].*)')
+
+    def cast_timetz(value):
+        """Cast a timetz value."""
+        tz = _re_timezone.match(value)
+        if tz:
+            value, tz = tz.groups()
         else:
-            value, tz = value[:-1], value[-1]
-        if len(value[0]) > 10:
+            tz = '+0000'
+        fmt = '%H:%M:%S.%f' if len(value) > 8 else '%H:%M:%S'
+        return datetime.strptime(value, fmt).timetz().replace(
+            tzinfo=_get_timezone(tz))
+
+    def cast_timestamptz(value, connection):
+        """Cast a timestamptz value."""
+        if value == '-infinity':
+            return datetime.min
+        if value == 'infinity':
             return datetime.max
-        fmt = [fmt, '%H:%M:%S.%f' if len(value[1]) > 8 else '%H:%M:%S']
-    if _has_timezone:
-        value.append(_timezone_as_offset(tz))
-        fmt.append('%z')
-        return datetime.strptime(' '.join(value), ' '.join(fmt))
-    return datetime.strptime(' '.join(value), ' '.join(fmt)).replace(
-        tzinfo=_get_timezone(tz))
-
-
-_re_interval_sql_standard = regex(
-    '(?:([+-])?([0-9]+)-([0-9]+) ?)?'
-    '(?:([+-]?[0-9]+)(?!:) ?)?'
-    '(?:([+-])?([0-9]+):([0-9]+):([0-9]+)(?:\\.([0-9]+))?)?')
-
-_re_interval_postgres = regex(
-    '(?:([+-]?[0-9]+) ?years? ?)?'
-    '(?:([+-]?[0-9]+) ?mons? ?)?'
-    '(?:([+-]?[0-9]+) ?days? ?)?'
-    '(?:([+-])?([0-9]+):([0-9]+):([0-9]+)(?:\\.([0-9]+))?)?')
-
-_re_interval_postgres_verbose = regex(
-    '@ ?(?:([+-]?[0-9]+) ?years? ?)?'
-    '(?:([+-]?[0-9]+) ?mons? ?)?'
-    '(?:([+-]?[0-9]+) ?days? ?)?'
-    '(?:([+-]?[0-9]+) ?hours? ?)?'
-    '(?:([+-]?[0-9]+) ?mins? ?)?'
-    '(?:([+-])?([0-9]+)(?:\\.([0-9]+))? ?secs?)? ?(ago)?')
-
-_re_interval_iso_8601 = regex(
-    'P(?:([+-]?[0-9]+)Y)?'
-    '(?:([+-]?[0-9]+)M)?'
-    '(?:([+-]?[0-9]+)D)?'
-    '(?:T(?:([+-]?[0-9]+)H)?'
-    '(?:([+-]?[0-9]+)M)?'
-    '(?:([+-])?([0-9]+)(?:\\.([0-9]+))?S)?)?')
-
-
-def cast_interval(value):
-    """Cast an interval value."""
-    # The output format depends on the server setting IntervalStyle, but it's
-    # not necessary to consult this setting to parse it.  It's faster to just
-    # check all possible formats, and there is no ambiguity here.
-    m = _re_interval_iso_8601.match(value)
-    if m:
-        m = [d or '0' for d in m.groups()]
-        secs_ago = m.pop(5) == '-'
-        m = [int(d) for d in m]
-        years, mons, days, hours, mins, secs, usecs = m
-        if secs_ago:
-            secs = -secs
-            usecs = -usecs
-    else:
-        m = _re_interval_postgres_verbose.match(value)
-        if m:
-            m, ago = [d or '0' for d in m.groups()[:8]], m.group(9)
-            secs_ago = m.pop(5) == '-'
-            m = [-int(d) for d in m] if ago else [int(d) for d in m]
-            years, mons, days, hours, mins, secs, usecs = m
-            if secs_ago:
-                secs = - secs
-                usecs = -usecs
+        value = value.split()
+        if value[-1] == 'BC':
+            return datetime.min
+        fmt = connection.date_format()
+        if fmt.endswith('-%Y') and len(value) > 2:
+            value = value[1:]
+            if len(value[3]) > 4:
+                return datetime.max
+            fmt = ['%d %b' if fmt.startswith('%d') else '%b %d',
+                '%H:%M:%S.%f' if len(value[2]) > 8 else '%H:%M:%S', '%Y']
+            value, tz = value[:-1], value[-1]
         else:
-            m = _re_interval_postgres.match(value)
-            if m and any(m.groups()):
-                m = [d or '0' for d in m.groups()]
-                hours_ago = m.pop(3) == '-'
-                m = [int(d) for d in m]
-                years, mons, days, hours, mins, secs, usecs = m
-                if hours_ago:
-                    hours = -hours
-                    mins = -mins
-                    secs = -secs
-                    usecs = -usecs
-            else:
-                m = _re_interval_sql_standard.match(value)
-                if m and any(m.groups()):
-                    m = [d or '0' for d in m.groups()]
-                    years_ago = m.pop(0) == '-'
-                    hours_ago = m.pop(3) == '-'
-                    m = [int(d) for d in m]
-                    years, mons, days, hours, mins, secs, usecs = m
-                    if years_ago:
-                        years = -years
-                        mons = -mons
-                    if hours_ago:
-                        hours = -hours
-                        mins = -mins
-                        secs = -secs
-                        usecs = -usecs
+            if fmt.startswith('%Y-'):
+                tz = _re_timezone.match(value[1])
+                if tz:
+                    value[1], tz = tz.groups()
                 else:
-                    raise ValueError('Cannot parse interval: %s' % value)
-    days += 365 * years + 30 * mons
-    return timedelta(days=days, hours=hours, minutes=mins,
-        seconds=secs, microseconds=usecs)
+                    tz = '+0000'
+            else:
+                value, tz = value[:-1], value[-1]
+            if len(value[0]) > 10:
+                return datetime.max
+            fmt = [fmt, '%H:%M:%S.%f' if len(value[1]) > 8 else '%H:%M:%S']
+        return datetime.strptime(' '.join(value), ' '.join(fmt)).replace(
+            tzinfo=_get_timezone(tz))
 
 
 class Typecasts(dict):
@@ -933,7 +777,8 @@ class Typecasts(dict):
         try:
             args = get_args(func)
         except (TypeError, ValueError):
-            return False
+            # signatures of builtin functions are not available in Python 2
+            return func in (cast_date, cast_timestamp, cast_timestamptz)
         else:
             return 'connection' in args[1:]
 
@@ -1037,6 +882,7 @@ def set_typecast(typ, cast):
     is picked up by a running connection, call db.db_types.reset_typecast().
     """
     Typecasts.set_default(typ, cast)
+    DbTypes._clear_oid_casts()
 
 
 class DbType(str):
@@ -1071,6 +917,8 @@ class DbTypes(dict):
     _num_types = frozenset('int float num money'
         ' int2 int4 int8 float4 float8 numeric money'.split())
 
+    _instances = WeakValueDictionary()  # all type caches by id
+
     def __init__(self, db):
         """Initialize type cache for connection."""
         super(DbTypes, self).__init__()
@@ -1079,6 +927,9 @@ class DbTypes(dict):
         self._typecasts = Typecasts()
         self._typecasts.get_attnames = self.get_attnames
         self._typecasts.connection = db
+        # typecast functions by type oid, used by the connection directly
+        self._oid_casts = {}
+        DbTypes._instances[id(self)] = self
         db = db.db
         self.query = db.query
         self.escape_string = db.escape_string
@@ -1134,6 +985,16 @@ class DbTypes(dict):
             return None
         return self._get_attnames(typ.relid, with_oid=False)
 
+    @classmethod
+    def _clear_oid_casts(cls):
+        """Clear the typecast functions by oid of all type caches.
+
+        This must be done when the global typecasts have been changed,
+        since the type oids may be registered without a typecast function.
+        """
+        for dbtypes in list(cls._instances.values()):
+            dbtypes._oid_casts.clear()
+
     def get_typecast(self, typ):
         """Get the typecast function for the given database type."""
         return self._typecasts.get(typ)
@@ -1141,16 +1002,24 @@ class DbTypes(dict):
     def set_typecast(self, typ, cast):
         """Set a typecast function for the specified database type(s)."""
         self._typecasts.set(typ, cast)
+        self._oid_casts.clear()
 
     def reset_typecast(self, typ=None):
         """Reset the typecast function for the specified database type(s)."""
         self._typecasts.reset(typ)
+        self._oid_casts.clear()
 
     def typecast(self, value, typ):
-        """Cast the given value according to the given database type."""
+        """Cast the given value according to the given database type.
+
+        When the type is passed as an oid, the typecast function will be
+        registered for this oid, so that the connection can use it directly
+        for all other values of this type without calling this method.
+        """
         if value is None:
             # for NULL values, no typecast is necessary
             return None
+        oid = typ if isinstance(typ, (int, long)) else None
         if not isinstance(typ, DbType):
             typ = self.get(typ)
             if typ:
@@ -1158,14 +1027,25 @@ class DbTypes(dict):
         cast = self.get_typecast(typ) if typ else None
         if not cast or cast is str:
             # no typecast is necessary
-            return value
-        return cast(value)
+            cast = None
+        if oid is not None:
+            self._oid_casts[oid] = cast
+        return cast(value) if cast else value
 
 
 def _namedresult(q):
-    """Get query result as named tuples."""
-    row = namedtuple('Row', q.listfields())
-    return [row(*r) for r in q.getresult()]
+    """Get query result as named tuples.
+
+    The rows are created as instances of the row types that are provided
+    by the C module and cached for the same field names, so that no new
+    class needs to be created for each query.
+    """
+    try:
+        rowresult = q.rowresult
+    except AttributeError:  # a query in memory
+        row = get_row_type(q.listfields())
+        return [row(r) for r in q.getresult()]
+    return rowresult()
 
 
 class _MemoryQuery:
@@ -1311,11 +1191,7 @@ class NotificationHandler(object):
             rlist = [self.db.fileno()]
         while self.listening:
             if poll or select.select(rlist, [], [], self.timeout)[0]:
-                while self.listening:
-                    notice = self.db.getnotify()
-                    if not notice:  # no more messages
-                        break
-                    event, pid, extra = notice
+                for event, pid, extra in self.db.getnotifies():
                     if event not in (self.event, self.stop_event):
                         self.unlisten()
                         raise _db_error(
@@ -1325,6 +1201,8 @@ class NotificationHandler(object):
                         self.unlisten()
                     self.arg_dict.update(pid=pid, event=event, extra=extra)
                     self.callback(self.arg_dict)
+                    if not self.listening:
+                        break
                 if poll:
                     break
             else:   # we timed out
@@ -1339,6 +1217,226 @@ def pgnotify(*args, **kw):
     return NotificationHandler(*args, **kw)
 
 
+# Streams for large objects
+
+class LargeObjectIO(RawIOBase):
+    """A raw binary stream for reading and writing a large object.
+
+    The given large object is opened with the given mode, which can be
+    'r' for reading, 'w' for writing or 'r+' for reading and writing, and
+    closed again when the stream is closed.  Data is read directly into
+    the buffers passed to readinto(), so the stream can be wrapped into
+    buffered readers and writers as done by open_large_object().
+    """
+
+    chunk_size = 262144  # size of the chunks read by readall()
+
+    def __init__(self, large, mode='r'):
+        """Open a stream for the given large object."""
+        RawIOBase.__init__(self)
+        self.large = None
+        modes = {'r': INV_READ, 'w': INV_WRITE, 'r+': INV_READ | INV_WRITE}
+        try:
+            open_mode = modes[mode.replace('b', '')]
+        except KeyError:
+            raise ValueError('Invalid mode for large object: %r' % mode)
+        large.open(open_mode)
+        self.large = large
+        self.mode = mode
+        self._readable = bool(open_mode & INV_READ)
+        self._writable = bool(open_mode & INV_WRITE)
+
+    @property
+    def name(self):
+        """The OID of the large object."""
+        return self.large.oid
+
+    def _check_open(self):
+        if self.closed:
+            raise ValueError('I/O operation on closed large object stream')
+
+    def readable(self):
+        """Return whether the stream can be read."""
+        self._check_open()
+        return self._readable
+
+    def writable(self):
+        """Return whether the stream can be written."""
+        self._check_open()
+        return self._writable
+
+    def seekable(self):
+        """Return whether the stream supports random access."""
+        self._check_open()
+        return True
+
+    def readinto(self, b):
+        """Read bytes into the given buffer and return their number."""
+        self._check_open()
+        return self.large.readinto(b)
+
+    def readall(self):
+        """Read all bytes until the end of the large object."""
+        self._check_open()
+        read, chunks = self.large.read, []
+        chunk = read(self.chunk_size)
+        while chunk:
+            chunks.append(chunk)
+            chunk = read(self.chunk_size)
+        return b''.join(chunks)
+
+    def write(self, b):
+        """Write the given bytes and return their number."""
+        self._check_open()
+        self.large.write(b)
+        return len(b)
+
+    def seek(self, offset, whence=SEEK_SET):
+        """Change the stream position and return the new position."""
+        self._check_open()
+        return self.large.seek(offset, whence)
+
+    def tell(self):
+        """Return the current stream position."""
+        self._check_open()
+        return self.large.tell()
+
+    def close(self):
+        """Close the stream and the large object."""
+        if not self.closed:
+            try:
+                if self.large is not None:
+                    self.large.close()
+            finally:
+                RawIOBase.close(self)
+
+
+def open_large_object(large, mode='rb', buffer_size=LargeObjectIO.chunk_size):
+    """Open a buffered binary stream for the given large object.
+
+    The mode can be 'rb' for reading, 'wb' for writing or 'r+b' for reading
+    and writing.  Reading will fetch data ahead in chunks of the given buffer
+    size, and small writes will be coalesced into chunks of the same size.
+    If the buffer size is zero, the raw unbuffered stream is returned.
+    """
+    raw = LargeObjectIO(large, mode)
+    if not buffer_size:
+        return raw
+    if raw.readable():
+        cls = BufferedRandom if raw.writable() else BufferedReader
+    else:
+        cls = BufferedWriter
+    return cls(raw, buffer_size)
+
+
+# Cache for server side prepared statements:
+
+class _StatementCache(object):
+    """LRU cache of prepared statements for frequently used queries.
+
+    Queries with parameters are prepared on the server after they have
+    been used the given number of times and are then executed as prepared
+    statements.  The least recently used statements are deallocated when
+    the maximum number of prepared statements is exceeded.
+    """
+
+    def __init__(self, db, size, uses=2):
+        self.db = db  # the DB wrapper instance
+        self.size = size  # maximum number of prepared statements
+        self.uses = uses  # number of uses after which queries are prepared
+        self.hits = 0  # number of queries using a prepared statement
+        self.misses = 0  # number of queries without a prepared statement
+        self._names = OrderedDict()  # statement names in LRU order
+        self._uses = OrderedDict()  # uses of commands not yet prepared
+        self._number = 0  # number of the last prepared statement
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, command):
+        return command in self._names
+
+    def _prepare(self, command):
+        """Prepare a statement for the given command and return its name."""
+        self.shrink(self.size - 1)
+        self._number += 1
+        name = '_pg_cached_%d' % self._number
+        self.db.db.prepare(name, command)
+        self._names[command] = name
+        return name
+
+    def _deallocate(self, name):
+        """Deallocate the prepared statement with the given name.
+
+        If this is not possible at the moment, e.g. because the transaction
+        has been aborted, the statement will be deallocated later.
+        """
+        self.db._stale_statements.append(name)
+        self.db._deallocate_stale()
+
+    def shrink(self, size):
+        """Deallocate the least recently used statements down to size."""
+        names = self._names
+        while len(names) > size:
+            self._deallocate(names.pop(next(iter(names))))
+
+    def clear(self, deallocate=True):
+        """Forget all prepared statements.
+
+        If deallocate is set, the statements are also removed from the
+        server, otherwise they are assumed to be already gone.
+        """
+        if deallocate:
+            for name in self._names.values():
+                self._deallocate(name)
+        else:
+            del self.db._stale_statements[:]
+        self._names.clear()
+        self._uses.clear()
+
+    def query(self, command, args):
+        """Execute the command with the given arguments.
+
+        Queries that have been used often enough are prepared, prepared
+        statements that do not exist any more or that return a different
+        result type than when they were prepared are prepared again.
+        """
+        db = self.db.db
+        names = self._names
+        name = names.pop(command, None)
+        if name:
+            names[command] = name  # mark as most recently used
+            self.hits += 1
+            try:
+                return db.query_prepared(name, args)
+            except DatabaseError as error:
+                sqlstate = getattr(error, 'sqlstate', None)
+                if sqlstate == '26000':
+                    # the session has been reset, all statements are gone
+                    self.clear(False)
+                elif sqlstate == '0A000':
+                    # the result type has changed, e.g. by altering a table
+                    del names[command]
+                    if db.transaction() == TRANS_INERROR:
+                        # the statement cannot be executed again
+                        # before the transaction has been rolled back
+                        self.db._stale_statements.append(name)
+                        raise
+                    self._deallocate(name)
+                else:
+                    raise
+            return db.query_prepared(self._prepare(command), args)
+        self.misses += 1
+        counts = self._uses
+        count = counts.pop(command, 0) + 1
+        if count < self.uses:
+            while len(counts) >= 4 * self.size:
+                counts.pop(next(iter(counts)))
+            counts[command] = count
+            return db.query(command, args)
+        return db.query_prepared(self._prepare(command), args)
+
+
 # The actual PostGreSQL database connection interface:
 
 class DB:
@@ -1376,10 +1474,13 @@ class DB:
         self._attnames = {}
         self._pkeys = {}
         self._privileges = {}
+        self._statement_cache = None
+        self._stale_statements = []
         self._args = args, kw
         self.adapter = Adapter(self)
         self.dbtypes = DbTypes(self)
         db.set_cast_hook(self.dbtypes.typecast)
+        db.set_type_casts(self.dbtypes._oid_casts)
         self.debug = None  # For debugging scripts, this can be set
             # * to a string format specification (e.g. in CGI set to "%s<BR>"),
             # * to a file object to write debug statements or
@@ -1450,6 +1551,133 @@ class DB:
         """Create a human readable parameter list."""
         return ', '.join('$%d=%r' % (n, v) for n, v in enumerate(params, 1))
 
+    @staticmethod
+    def _check_chunk_size(chunk_size):
+        """Check that the given chunk size is a positive integer."""
+        if not isinstance(chunk_size, int):
+            raise TypeError('The chunk size must be an integer')
+        if chunk_size < 1:
+            raise ValueError('The chunk size must be positive')
+
+    @staticmethod
+    def _chunk_rows(rows, attnames, chunk_size):
+        """Split a list of row dictionaries into chunks of similar rows.
+
+        Consecutive rows with the same set of keys are grouped together
+        into chunks of at most chunk_size rows, which are further limited
+        so that the number of query parameters does not exceed the maximum
+        supported by PostgreSQL.  Yields tuples of the names and types of
+        the columns that appear in the rows and the chunk of rows.
+        """
+        DB._check_chunk_size(chunk_size)
+        for row in rows:
+            if not isinstance(row, dict):
+                raise TypeError('The rows must be passed as dictionaries')
+        plans = {}  # the columns for every set of keys
+        num_rows = len(rows)
+        end = 0
+        while end < num_rows:
+            start = end
+            keys = frozenset(rows[start])
+            try:
+                columns, size = plans[keys]
+            except KeyError:
+                columns = [(n, t) for n, t in attnames.items() if n in keys]
+                size = min(chunk_size, 65535 // (len(columns) or 1))
+                plans[keys] = columns, size
+            end = start + 1
+            stop = min(start + size, num_rows)
+            while end < stop and frozenset(rows[end]) == keys:
+                end += 1
+            yield columns, rows[start:end]
+
+    def _update_rows(self, rows, q, qoid=None):
+        """Update row dictionaries with the result of a query."""
+        names = q.listfields()
+        if qoid:
+            names = [qoid if n == 'oid' else n for n in names]
+        for row, values in zip(rows, q.getresult()):
+            row.update(zip(names, values))
+
+    @staticmethod
+    def _key_tuples(keys, keyname, qoid=None):
+        """Get the key values from a list of keys as a list of tuples.
+
+        The keys can be given as single values, as tuples of values
+        corresponding to the keyname, or as dictionaries with the values.
+        """
+        num_keys = len(keyname)
+        key_list = []
+        for key in keys:
+            if isinstance(key, dict):
+                if qoid and 'oid' in keyname and qoid in key:
+                    key = dict(key, oid=key[qoid])
+                try:
+                    key = tuple(key[k] for k in keyname)
+                except KeyError:
+                    raise KeyError(
+                        'Missing value in row for specified keyname')
+            else:
+                key = tuple(key) if isinstance(key, (tuple, list)) else (key,)
+                if len(key) != num_keys:
+                    raise KeyError(
+                        'Differing number of items in keyname and row')
+            key_list.append(key)
+        return key_list
+
+    @staticmethod
+    def _cast_param(param, typ):
+        """Cast a parameter in an SQL command to the given database type.
+
+        The general types without length are used here, since for instance
+        the type "character" alone would be interpreted as char(1).
+        """
+        try:
+            typ = typ.regtype
+        except AttributeError:  # type information not available
+            return param
+        typ = dict(character='bpchar', bit='varbit').get(typ, typ)
+        return 'CAST(%s AS %s)' % (param, typ)
+
+    def _join_keys(self, keys, keyname, attnames):
+        """Create a list of values for joining a table with a chunk of keys.
+
+        Returns the list of values aliased as "_k", the join condition with
+        the table aliased as "_t" and the parameters.  The list contains the
+        index of every key in the chunk in the additional column _pg_index,
+        so the rows found in the table can be mapped to the keys without
+        comparing the key values in Python.  The values in the first row are
+        cast to the types of the key columns, since the server infers the
+        types of the columns in the list of values from the first row.
+        """
+        col = self.escape_identifier
+        cast = self._cast_param
+        params = self.adapter.parameter_list()
+        add = params.add
+        types = [attnames[k] for k in keyname]
+        values = ['(%s, 0)' % ', '.join([cast(add(v, t), t)
+            for v, t in zip(keys[0], types)])]
+        values.extend('(%s, %d)' % (', '.join([add(v, t)
+            for v, t in zip(key, types)]), i)
+            for i, key in enumerate(keys[1:], 1))
+        values = '(VALUES %s) AS _k (%s, _pg_index)' % (
+            ', '.join(values), ', '.join(col(k) for k in keyname))
+        on = ' AND '.join('_t.%s = _k.%s' % (col(k), col(k))
+            for k in keyname)
+        return values, on, params
+
+    @staticmethod
+    def _rows_by_index(q, qoid=None):
+        """Get the rows in the result of a query by the index of their key.
+
+        The index must be returned in the first column of the result.
+        """
+        names = q.listfields()[1:]
+        if qoid:
+            names = [qoid if n == 'oid' else n for n in names]
+        return dict((values[0], dict(zip(names, values[1:])))
+            for values in q.getresult())
+
     # Public methods
 
     # escape_string and escape_bytea exist as methods,
@@ -1464,6 +1692,22 @@ class DB:
         """Encode a JSON string for use within SQL."""
         return jsonencode(d)
 
+    def quote_list(self, values):
+        """Quote values as a comma separated list of SQL literals.
+
+        The values are adapted like inline parameters in one pass,
+        so the result can be used in an IN clause or in ARRAY[...].
+        """
+        return self.db.quote_list(values, self.adapter.adapt_inline)
+
+    def quote_rows(self, rows):
+        """Quote rows as a comma separated list of SQL row literals.
+
+        The rows are adapted like inline parameters in one pass,
+        so the result can be used in a VALUES clause.
+        """
+        return self.db.quote_rows(rows, self.adapter.adapt_inline)
+
     def close(self):
         """Close the database connection."""
         # Wraps shared library function so we can track state.
@@ -1483,6 +1727,9 @@ class DB:
         """
         if self.db:
             self.db.reset()
+            if self._statement_cache is not None:
+                self._statement_cache.clear(False)
+            del self._stale_statements[:]
         else:
             raise _int_error('Connection already closed')
 
@@ -1499,6 +1746,9 @@ class DB:
             if self.db:
                 self.db.close()
             self.db = db
+            if self._statement_cache is not None:
+                self._statement_cache.clear(False)
+            del self._stale_statements[:]
 
     def begin(self, mode=None):
         """Begin a transaction."""
@@ -1683,8 +1933,12 @@ class DB:
         # Wraps shared library function for debugging.
         if not self.db:
             raise _int_error('Connection is not valid')
+        if self._stale_statements:
+            self._deallocate_stale()
         if args:
             self._do_debug(command, args)
+            if self._statement_cache is not None:
+                return self._statement_cache.query(command, args)
             return self.db.query(command, args)
         self._do_debug(command)
         return self.db.query(command)
@@ -1704,6 +1958,58 @@ class DB:
         return self.query(*self.adapter.format_query(
             command, parameters, types, inline))
 
+    def _deallocate_stale(self):
+        """Deallocate prepared statements that could not be deallocated.
+
+        This is not possible while the transaction is aborted, in this case
+        the statements are kept and deallocated with a later query.
+        """
+        db = self.db
+        names = self._stale_statements
+        while names:
+            if db.transaction() not in (TRANS_IDLE, TRANS_INTRANS):
+                break
+            try:
+                db.query('DEALLOCATE %s' % names[-1])
+            except DatabaseError as error:
+                if getattr(error, 'sqlstate', None) != '26000':
+                    break  # try again later
+            names.pop()
+
+    def get_statement_cache(self):
+        """Get the cache for prepared statements.
+
+        Returns None if no statement cache has been set.  Otherwise the
+        cache has the attributes size, uses, hits and misses, and its
+        length is the number of statements that are currently prepared.
+        """
+        return self._statement_cache
+
+    def set_statement_cache(self, size, uses=2):
+        """Set a cache for automatically prepared statements.
+
+        Queries with parameters that are executed with the given number of
+        uses will be prepared on the server, where at most the given number
+        of most recently used statements will be kept.  If the size is zero
+        or None, the cache will be removed and its statements deallocated.
+        """
+        if size is not None and not isinstance(size, int):
+            raise TypeError('The cache size must be an integer')
+        if not isinstance(uses, int):
+            raise TypeError('The number of uses must be an integer')
+        if size and size < 0 or uses < 1:
+            raise ValueError('The cache size and number of uses'
+                ' must be positive')
+        cache = self._statement_cache
+        if cache is not None:
+            if size:
+                cache.shrink(size)
+                cache.size, cache.uses = size, uses
+                return
+            cache.clear()
+        self._statement_cache = _StatementCache(
+            self, size, uses) if size else None
+
     def pkey(self, table, composite=False, flush=False):
         """Get or set the primary key of a table.
 
@@ -1762,8 +2068,7 @@ class DB:
         """
         where = []
         if kinds:
-            where.append("r.relkind IN (%s)" %
-                ','.join("'%s'" % k for k in kinds))
+            where.append("r.relkind IN (%s)" % self.quote_list(list(kinds)))
         if not system:
             where.append("s.nspname NOT SIMILAR"
                 " TO 'pg/_%|information/_schema' ESCAPE '/'")
@@ -1927,6 +2232,69 @@ class DB:
             row[n] = value
         return row
 
+    def get_many(self, table, keys, keyname=None, as_dict=False,
+                 ignore_missing=False, chunk_size=1000):
+        """Get many rows from a database table or view.
+
+        This method works like the get() method, but fetches the rows for
+        all the given keys with one query per chunk of at most chunk_size
+        keys.  The keyname must be the name of a single column or a tuple
+        of column names.  If it is not specified, then the primary key for
+        the table is used.  The keys can be given as single values or as
+        tuples of values corresponding to the keyname, or as dictionaries
+        from which the values for the keyname are taken.
+
+        The rows are returned as a list of dictionaries in the order of
+        the given keys, or if as_dict is set, as an ordered dictionary
+        with the keys as keys and the rows as values.  If rows for some of
+        the keys do not exist, a DatabaseError listing these keys is raised,
+        unless ignore_missing is set, in which case None is returned in
+        place of the missing rows or the keys are omitted in the dictionary.
+        """
+        if table.endswith('*'):  # hint for descendant tables can be ignored
+            table = table[:-1].rstrip()
+        self._check_chunk_size(chunk_size)
+        attnames = self.get_attnames(table)
+        qoid = _oid_key(table) if 'oid' in attnames else None
+        if keyname and isinstance(keyname, basestring):
+            keyname = (keyname,)
+        if not keyname:
+            try:  # if keyname is not specified, try using the primary key
+                keyname = self.pkey(table, True)
+            except KeyError:  # the table has no primary key
+                raise _prg_error('Table %s has no primary key' % table)
+        num_keys = len(keyname)
+        key_list = self._key_tuples(keys, keyname, qoid)
+        # fetch the rows for the distinct keys in chunks
+        unique_keys = list(OrderedDict.fromkeys(key_list))
+        chunk_size = min(chunk_size, 65535 // num_keys)
+        what = '_t.oid, _t.*' if qoid else '_t.*'
+        table_name = self._escape_qualified_name(table)
+        found = {}
+        for start in range(0, len(unique_keys), chunk_size):
+            chunk = unique_keys[start:start + chunk_size]
+            values, on, params = self._join_keys(chunk, keyname, attnames)
+            q = 'SELECT _k._pg_index, %s FROM %s AS _t JOIN %s ON %s' % (
+                what, table_name, values, on)
+            self._do_debug(q, params)
+            q = self.db.query(q, params)
+            for i, row in self._rows_by_index(q, qoid).items():
+                found[chunk[i]] = row
+        missing = [key for key in unique_keys if key not in found]
+        if missing and not ignore_missing:
+            if num_keys == 1:
+                missing = [key[0] for key in missing]
+            raise _db_error('No such records in %s\nwhere %s\nwith %s' % (
+                table, ', '.join(keyname),
+                ', '.join(repr(key) for key in missing)))
+        if as_dict:
+            if num_keys == 1:
+                return OrderedDict((key[0], found[key])
+                    for key in unique_keys if key in found)
+            return OrderedDict((key, found[key])
+                for key in unique_keys if key in found)
+        return [found.get(key) for key in key_list]
+
     def insert(self, table, row=None, **kw):
         """Insert a row into a database table.
 
@@ -1973,6 +2341,58 @@ class DB:
                 row[n] = value
         return row
 
+    def insert_many(self, table, rows, returning=True, chunk_size=1000):
+        """Insert many rows into a database table.
+
+        This method inserts a list of rows given as dictionaries into a
+        table using multi-row inserts, saving a round trip to the database
+        for every single row.  The rows are inserted in chunks of at most
+        chunk_size consecutive rows with the same set of columns.
+
+        If returning is set, every dictionary is reloaded with the values
+        actually inserted, like with the insert() method.  Otherwise, the
+        rows are inserted even faster using the COPY command.
+
+        Returns the list of rows.
+        """
+        if table.endswith('*'):  # hint for descendant tables can be ignored
+            table = table[:-1].rstrip()
+        if not isinstance(rows, list):
+            rows = list(rows)
+        for row in rows:
+            if isinstance(row, dict) and 'oid' in row:
+                del row['oid']  # do not insert oid
+        attnames = self.get_attnames(table)
+        qoid = _oid_key(table) if 'oid' in attnames else None
+        qtable = self._escape_qualified_name(table)
+        col = self.escape_identifier
+        adapt = self.adapter.adapt
+        ret = ' RETURNING oid, *' if qoid else ' RETURNING *'
+        for columns, chunk in self._chunk_rows(rows, attnames, chunk_size):
+            if not columns:
+                raise _prg_error('No column found that can be inserted')
+            names = [col(n) for n, t in columns]
+            if not returning:
+                values = [[adapt(row[n], t) for n, t in columns]
+                    for row in chunk]
+                if not any(isinstance(v, Literal)
+                        for row in values for v in row):
+                    self._do_debug('COPY %s (%s) FROM STDIN' % (
+                        qtable, ', '.join(names)))
+                    self.db.inserttable(qtable, values, names)
+                    continue
+            params = self.adapter.parameter_list()
+            add = params.add
+            values = ', '.join('(%s)' % ', '.join(
+                [add(row[n], t) for n, t in columns]) for row in chunk)
+            q = 'INSERT INTO %s (%s) VALUES %s%s' % (
+                qtable, ', '.join(names), values, ret if returning else '')
+            self._do_debug(q, params)
+            q = self.db.query(q, params)
+            if returning:
+                self._update_rows(chunk, q, qoid)
+        return rows
+
     def update(self, table, row=None, **kw):
         """Update an existing row in a database table.
 
@@ -2040,6 +2460,81 @@ class DB:
                 row[n] = value
         return row
 
+    def update_many(self, table, rows, returning=True, chunk_size=1000):
+        """Update many existing rows in a database table.
+
+        This method works like the update() method, but for a list of rows
+        given as dictionaries, which must contain the primary key.  The rows
+        are updated with one command per chunk of at most chunk_size
+        consecutive rows with the same set of columns, joining the table
+        with the list of values.  Note that the rows in one chunk should
+        not have the same primary key.
+
+        If returning is set, the dictionaries are modified to reflect any
+        changes caused by the update due to triggers, rules, etc.
+
+        Returns the list of rows.
+        """
+        if table.endswith('*'):
+            table = table[:-1].rstrip()  # need parent table name
+        if not isinstance(rows, list):
+            rows = list(rows)
+        attnames = self.get_attnames(table)
+        qoid = _oid_key(table) if 'oid' in attnames else None
+        try:
+            keyname = self.pkey(table, True)
+        except KeyError:  # the table has no primary key
+            raise _prg_error('Table %s has no primary key' % table)
+        for row in rows:
+            if isinstance(row, dict):
+                if 'oid' in row:
+                    del row['oid']  # the oid cannot be updated
+                if not set(keyname).issubset(row):
+                    raise KeyError('Missing primary key in row')
+        col = self.escape_identifier
+        where = ' AND '.join('_t.%s = _v.%s' % (col(k), col(k))
+            for k in keyname)
+        ret = ' RETURNING _v._pg_index, _t.oid, _t.*' if qoid else (
+            ' RETURNING _v._pg_index, _t.*')
+        table_name = self._escape_qualified_name(table)
+        cast = self._cast_param  # the first row determines the types
+
+        for columns, chunk in self._chunk_rows(rows, attnames, chunk_size):
+            names = [n for n, t in columns]
+            updates = [n for n in names if n not in keyname]
+            if not updates:
+                continue
+            # rows with SQL expressions must be updated one by one
+            plain = []
+            for row in chunk:
+                if any(isinstance(row[n], Literal) for n in updates):
+                    self.update(table, row)
+                else:
+                    plain.append(row)
+            if not plain:
+                continue
+            chunk = plain
+            params = self.adapter.parameter_list()
+            add = params.add
+            values = ['(%s, 0)' % ', '.join([cast(add(chunk[0][n], t), t)
+                for n, t in columns])]
+            values.extend('(%s, %d)' % (', '.join([add(row[n], t)
+                for n, t in columns]), i)
+                for i, row in enumerate(chunk[1:], 1))
+            q = ('UPDATE %s AS _t SET %s FROM (VALUES %s)'
+                ' AS _v (%s, _pg_index) WHERE %s') % (
+                    table_name, ', '.join('%s = _v.%s' % (col(n), col(n))
+                        for n in updates), ', '.join(values),
+                    ', '.join(col(n) for n in names), where)
+            if returning:
+                q += ret
+            self._do_debug(q, params)
+            q = self.db.query(q, params)
+            if returning:  # rows that do not exist are not returned
+                for i, row in self._rows_by_index(q, qoid).items():
+                    chunk[i].update(row)
+        return rows
+
     def upsert(self, table, row=None, **kw):
         """Insert a row into a database table with conflict resolution
 
@@ -2143,6 +2638,145 @@ class DB:
             self.get(table, row)
         return row
 
+    def upsert_many(self, table, rows, returning=True, chunk_size=1000,
+                    **kw):
+        """Insert many rows into a database table with conflict resolution.
+
+        This method works like the upsert() method, but for a list of rows
+        given as dictionaries.  The rows are sent to the database in chunks
+        of at most chunk_size consecutive rows with the same set of columns,
+        using the same statement template for all chunks with these columns.
+        The keyword parameters specify which columns shall be updated in case
+        of a conflict in the same way as for the upsert() method.  Note that
+        the rows in one chunk must not have the same primary key.
+
+        If returning is set, every dictionary is reloaded with the values
+        in the database after the operation has completed.  Otherwise, each
+        chunk of rows is copied into a temporary table using the COPY command
+        and then merged into the table with a single statement.
+
+        Returns the list of rows.
+        """
+        if table.endswith('*'):  # hint for descendant tables can be ignored
+            table = table[:-1].rstrip()
+        if not isinstance(rows, list):
+            rows = list(rows)
+        for row in rows:
+            if isinstance(row, dict) and 'oid' in row:
+                del row['oid']  # do not insert oid
+        if 'oid' in kw:
+            del kw['oid']  # do not update oid
+        attnames = self.get_attnames(table)
+        qoid = _oid_key(table) if 'oid' in attnames else None
+        try:
+            keyname = self.pkey(table, True)
+        except KeyError:
+            raise _prg_error('Table %s has no primary key' % table)
+        qtable = self._escape_qualified_name(table)
+        col = self.escape_identifier
+        adapt = self.adapter.adapt
+        target = ', '.join(col(k) for k in keyname)
+        ret = ' RETURNING oid, *' if qoid else ' RETURNING *'
+        temp = '_pg_upsert_many'  # name of the temporary table for COPY
+        templates = {}  # statement templates for every set of columns
+
+        def execute(q, params=None):
+            self._do_debug(q, params)
+            try:
+                if params is None:
+                    return self.db.query(q)
+                return self.db.query(q, params)
+            except ProgrammingError:
+                if self.server_version < 90500:
+                    raise _prg_error('Upsert operation is not supported'
+                        ' by PostgreSQL version')
+                raise  # re-raise original error
+
+        def drop():
+            try:
+                execute('DROP TABLE %s' % temp)
+            except Error:  # transaction has been aborted
+                pass
+
+        copied = None  # names of the columns in the temp table
+        try:
+            for columns, chunk in self._chunk_rows(
+                    rows, attnames, chunk_size):
+                if not columns:
+                    continue
+                names = tuple(n for n, t in columns)
+                if names not in templates:
+                    update = []
+                    for n in attnames:
+                        if n not in keyname and n != 'oid':
+                            value = kw.get(n, n in names)
+                            if value:
+                                if not isinstance(value, basestring):
+                                    value = 'excluded.%s' % col(n)
+                                update.append('%s = %s' % (col(n), value))
+                    do = 'update set %s' % ', '.join(
+                        update) if update else 'nothing'
+                    templates[names] = (
+                        'INSERT INTO %s AS included (%s) ' % (
+                            qtable, ', '.join(col(n) for n in names)),
+                        ' ON CONFLICT (%s) DO %s' % (target, do))
+                if not returning:
+                    values = [[adapt(row[n], t) for n, t in columns]
+                        for row in chunk]
+                    if not any(isinstance(v, Literal)
+                            for row in values for v in row):
+                        if copied != names:
+                            if copied:
+                                copied = None
+                                drop()
+                            execute('CREATE TEMPORARY TABLE %s AS'
+                                ' SELECT %s FROM %s WITH NO DATA' % (
+                                    temp, ', '.join(col(n) for n in names),
+                                    qtable))
+                            copied = names
+                        self._do_debug('COPY %s FROM STDIN' % temp)
+                        self.db.inserttable(
+                            temp, values, [col(n) for n in names])
+                        # merge every chunk separately, like with VALUES
+                        insert, conflict = templates[names]
+                        execute('%sSELECT %s FROM %s%s' % (insert,
+                            ', '.join(col(n) for n in names), temp, conflict))
+                        execute('TRUNCATE %s' % temp)
+                        continue
+                params = self.adapter.parameter_list()
+                add = params.add
+                values = 'VALUES %s' % ', '.join('(%s)' % ', '.join(
+                    [add(row[n], t) for n, t in columns]) for row in chunk)
+                insert, conflict = templates[names]
+                q = insert + values + conflict
+                if not returning:
+                    execute(q, params)
+                    continue
+                q = execute(q + ret, params)
+                fields = q.listfields()
+                if qoid:
+                    fields = [qoid if n == 'oid' else n for n in fields]
+                res = q.getresult()
+                if len(res) == len(chunk):  # all rows have been returned
+                    for row, values in zip(chunk, res):
+                        row.update(zip(fields, values))
+                    continue
+                # some rows have not been returned because of "do nothing"
+                index = [fields.index(k) for k in keyname]
+                res = dict((tuple(values[i] for i in index), values)
+                    for values in res)
+                for row in chunk:
+                    try:
+                        values = res[tuple(row.get(k) for k in keyname)]
+                    except KeyError:
+                        self.get(table, row)
+                    else:
+                        row.update(zip(fields, values))
+        finally:
+            if copied:
+                drop()
+        return rows
+
     def clear(self, table, row=None):
         """Clear all the attributes to values determined by the types.
 
@@ -2222,6 +2856,65 @@ class DB:
         res = self.db.query(q, params)
         return int(res)
 
+    def delete_many(self, table, rows, returning=False, chunk_size=1000):
+        """Delete many existing rows in a database table.
+
+        This method works like the delete() method, but deletes the rows
+        for all the given primary keys with one command per chunk of at
+        most chunk_size keys.  The keys can be given as single values or
+        as tuples of values, or as dictionaries containing the primary key.
+
+        The return value is the number of deleted rows.  If returning is
+        set, a list with the deleted rows as dictionaries in the order of
+        the given keys is returned instead, where None is returned in place
+        of the rows that did not exist.  If the keys have been given as
+        dictionaries, they are updated with the deleted rows and returned.
+        """
+        if table.endswith('*'):  # hint for descendant tables can be ignored
+            table = table[:-1].rstrip()
+        self._check_chunk_size(chunk_size)
+        if not isinstance(rows, list):
+            rows = list(rows)
+        attnames = self.get_attnames(table)
+        qoid = _oid_key(table) if 'oid' in attnames else None
+        try:
+            keyname = self.pkey(table, True)
+        except KeyError:  # the table has no primary key
+            raise _prg_error('Table %s has no primary key' % table)
+        num_keys = len(keyname)
+        key_list = self._key_tuples(rows, keyname)
+        unique_keys = list(OrderedDict.fromkeys(key_list))
+        chunk_size = min(chunk_size, 65535 // num_keys)
+        ret = ' RETURNING _k._pg_index, _t.oid, _t.*' if qoid else (
+            ' RETURNING _k._pg_index, _t.*')
+        table_name = self._escape_qualified_name(table)
+        num_rows = 0
+        found = {}
+        for start in range(0, len(unique_keys), chunk_size):
+            chunk = unique_keys[start:start + chunk_size]
+            values, on, params = self._join_keys(chunk, keyname, attnames)
+            q = 'DELETE FROM %s AS _t USING %s WHERE %s' % (
+                table_name, values, on)
+            if returning:
+                q += ret
+            self._do_debug(q, params)
+            q = self.db.query(q, params)
+            if returning:
+                for i, row in self._rows_by_index(q, qoid).items():
+                    found[chunk[i]] = row
+            else:
+                num_rows += int(q)
+        if not returning:
+            return num_rows
+        deleted = []
+        for row, key in zip(rows, key_list):
+            res = found.get(key)
+            if res is not None and isinstance(row, dict):
+                row.update(res)
+                res = row
+            deleted.append(res)
+        return deleted
+
     def truncate(self, table, restart=False, cascade=False, only=False):
         """Empty a table or set of tables.
 
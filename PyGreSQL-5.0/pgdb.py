@@ -214,196 +214,55 @@ def cast_int2vector(value):
     return [int(v) for v in value.split()]
 
 
-def cast_date(value, connection):
-    """Cast a date value."""
-    # The output format depends on the server setting DateStyle.  The default
-    # setting ISO and the setting for German are actually unambiguous.  The
-    # order of days and months in the other two settings is however ambiguous,
-    # so at least here we need to consult the setting to properly parse values.
-    if value == '-infinity':
-        return date.min
-    if value == 'infinity':
-        return date.max
-    value = value.split()
-    if value[-1] == 'BC':
-        return date.min
-    value = value[0]
-    if len(value) > 10:
-        return date.max
-    fmt = connection.date_format()
-    return datetime.strptime(value, fmt).date()
-
-
-def cast_time(value):
-    """Cast a time value."""
-    fmt = '%H:%M:%S.%f' if len(value) > 8 else '%H:%M:%S'
-    return datetime.strptime(value, fmt).time()
-
-
-_re_timezone = regex('(.*)([+-].*)')
-
-
-def cast_timetz(value):
-    """Cast a timetz value."""
-    tz = _re_timezone.match(value)
-    if tz:
-        value, tz = tz.groups()
-    else:
-        tz = '+0000'
-    fmt = '%H:%M:%S.%f' if len(value) > 8 else '%H:%M:%S'
-    if _has_timezone:
-        value += _timezone_as_offset(tz)
-        fmt += '%z'
-        return datetime.strptime(value, fmt).timetz()
-    return datetime.strptime(value, fmt).timetz().replace(
-        tzinfo=_get_timezone(tz))
-
-
-def cast_timestamp(value, connection):
-    """Cast a timestamp value."""
-    if value == '-infinity':
-        return datetime.min
-    if value == 'infinity':
-        return datetime.max
-    value = value.split()
-    if value[-1] == 'BC':
-        return datetime.min
-    fmt = connection.date_format()
-    if fmt.endswith('-%Y') and len(value) > 2:
-        value = value[1:5]
-        if len(value[3]) > 4:
-            return datetime.max
-        fmt = ['%d %b' if fmt.startswith('%d') else '%b %d',
-            '%H:%M:%S.%f' if len(value[2]) > 8 else '%H:%M:%S', '%Y']
-    else:
-        if len(value[0]) > 10:
-            return datetime.max
-        fmt = [fmt, '%H:%M:%S.%f' if len(value[1]) > 8 else '%H:%M:%S']
-    return datetime.strptime(' '.join(value), ' '.join(fmt))
-
-
-def cast_timestamptz(value, connection):
-    """Cast a timestamptz value."""
-    if value == '-infinity':
-        return datetime.min
-    if value == 'infinity':
-        return datetime.max
-    value = value.split()
-    if value[-1] == 'BC':
-        return datetime.min
-    fmt = connection.date_format()
-    if fmt.endswith('-%Y') and len(value) > 2:
-        value = value[1:]
-        if len(value[3]) > 4:
-            return datetime.max
-        fmt = ['%d %b' if fmt.startswith('%d') else '%b %d',
-            '%H:%M:%S.%f' if len(value[2]) > 8 else '%H:%M:%S', '%Y']
-        value, tz = value[:-1], value[-1]
-    else:
-        if fmt.startswith('%Y-'):
-            tz = _re_timezone.match(value[1])
-            if tz:
-                value[1], tz = tz.groups()
-            else:
-                tz = '+0000'
+if not _has_timezone:  # Python < 3.2
+
+    # The native cast functions for values with time zones need the timezone
+    # type of the datetime module, so we fall back to these implementations.
+
+    _re_timezone = regex('(.*)([+-].*)')
+
+    def cast_timetz(value):
+        """Cast a timetz value."""
+        tz = _re_timezone.match(value)
+        if tz:
+            value, tz = tz.groups()
         else:
-            value, tz = value[:-1], value[-1]
-        if len(value[0]) > 10:
+            tz = '+0000'
+        fmt = '%H:%M:%S.%f' if len(value) > 8 else '%H:%M:%S'
+        return datetime.strptime(value, fmt).timetz().replace(
+            tzinfo=_get_timezone(tz))
+
+    def cast_timestamptz(value, connection):
+        """Cast a timestamptz value."""
+        if value == '-infinity':
+            return datetime.min
+        if value == 'infinity':
             return datetime.max
-        fmt = [fmt, '%H:%M:%S.%f' if len(value[1]) > 8 else '%H:%M:%S']
-    if _has_timezone:
-        value.append(_timezone_as_offset(tz))
-        fmt.append('%z')
-        return datetime.strptime(' '.join(value), ' '.join(fmt))
-    return datetime.strptime(' '.join(value), ' '.join(fmt)).replace(
-        tzinfo=_get_timezone(tz))
-
-
-_re_interval_sql_standard = regex(
-    '(?:([+-])?([0-9]+)-([0-9]+) ?)?'
-    '(?:([+-]?[0-9]+)(?!:) ?)?'
-    '(?:([+-])?([0-9]+):([0-9]+):([0-9]+)(?:\\.([0-9]+))?)?')
-
-_re_interval_postgres = regex(
-    '(?:([+-]?[0-9]+) ?years? ?)?'
-    '(?:([+-]?[0-9]+) ?mons? ?)?'
-    '(?:([+-]?[0-9]+) ?days? ?)?'
-    '(?:([+-])?([0-9]+):([0-9]+):([0-9]+)(?:\\.([0-9]+))?)?')
-
-_re_interval_postgres_verbose = regex(
-    '@ ?(?:([+-]?[0-9]+) ?years? ?)?'
-    '(?:([+-]?[0-9]+) ?mons? ?)?'
-    '(?:([+-]?[0-9]+) ?days? ?)?'
-    '(?:([+-]?[0-9]+) ?hours? ?)?'
-    '(?:([+-]?[0-9]+) ?mins? ?)?'
-    '(?:([+-])?([0-9]+)(?:\\.([0-9]+))? ?secs?)? ?(ago)?')
-
-_re_interval_iso_8601 = regex(
-    'P(?:([+-]?[0-9]+)Y)?'
-    '(?:([+-]?[0-9]+)M)?'
-    '(?:([+-]?[0-9]+)D)?'
-    '(?:T(?:([+-]?[0-9]+)H)?'
-    '(?:([+-]?[0-9]+)M)?'
-    '(?:([+-])?([0-9]+)(?:\\.([0-9]+))?S)?)?')
-
-
-def cast_interval(value):
-    """Cast an interval value."""
-    # The output format depends on the server setting IntervalStyle, but it's
-    # not necessary to consult this setting to parse it.  It's faster to just
-    # check all possible formats, and there is no ambiguity here.
-    m = _re_interval_iso_8601.match(value)
-    if m:
-        m = [d or '0' for d in m.groups()]
-        secs_ago = m.pop(5) == '-'
-        m = [int(d) for d in m]
-        years, mons, days, hours, mins, secs, usecs = m
-        if secs_ago:
-            secs = -secs
-            usecs = -usecs
-    else:
-        m = _re_interval_postgres_verbose.match(value)
-        if m:
-            m, ago = [d or '0' for d in m.groups()[:8]], m.group(9)
-            secs_ago = m.pop(5) == '-'
-            m = [-int(d) for d in m] if ago else [int(d) for d in m]
-            years, mons, days, hours, mins, secs, usecs = m
-            if secs_ago:
-                secs = - secs
-                usecs = -usecs
+        value = value.split()
+        if value[-1] == 'BC':
+            return datetime.min
+        fmt = connection.date_format()
+        if fmt.endswith('-%Y') and len(value) > 2:
+            value = value[1:]
+            if len(value[3]) > 4:
+                return datetime.max
+            fmt = ['%d %b' if fmt.startswith('%d') else '%b %d',
+                '%H:%M:%S.%f' if len(value[2]) > 8 else '%H:%M:%S', '%Y']
+            value, tz = value[:-1], value[-1]
         else:
-            m = _re_interval_postgres.match(value)
-            if m and any(m.groups()):
-                m = [d or '0' for d in m.groups()]
-                hours_ago = m.pop(3) == '-'
-                m = [int(d) for d in m]
-                years, mons, days, hours, mins, secs, usecs = m
-                if hours_ago:
-                    hours = -hours
-                    mins = -mins
-                    secs = -secs
-                    usecs = -usecs
-            else:
-                m = _re_interval_sql_standard.match(value)
-                if m and any(m.groups()):
-                    m = [d or '0' for d in m.groups()]
-                    years_ago = m.pop(0) == '-'
-                    hours_ago = m.pop(3) == '-'
-                    m = [int(d) for d in m]
-                    years, mons, days, hours, mins, secs, usecs = m
-                    if years_ago:
-                        years = -years
-                        mons = -mons
-                    if hours_ago:
-                        hours = -hours
-                        mins = -mins
-                        secs = -secs
-                        usecs = -usecs
+            if fmt.startswith('%Y-'):
+                tz = _re_timezone.match(value[1])
+                if tz:
+                    value[1], tz = tz.groups()
                 else:
-                    raise ValueError('Cannot parse interval: %s' % value)
-    days += 365 * years + 30 * mons
-    return timedelta(days=days, hours=hours, minutes=mins,
-        seconds=secs, microseconds=usecs)
+                    tz = '+0000'
+            else:
+                value, tz = value[:-1], value[-1]
+            if len(value[0]) > 10:
+                return datetime.max
+            fmt = [fmt, '%H:%M:%S.%f' if len(value[1]) > 8 else '%H:%M:%S']
+        return datetime.strptime(' '.join(value), ' '.join(fmt)).replace(
+            tzinfo=_get_timezone(tz))
 
 
 class Typecasts(dict):
@@ -460,7 +319,8 @@ class Typecasts(dict):
         try:
             args = get_args(func)
         except (TypeError, ValueError):
-            return False
+            # signatures of builtin functions are not available in Python 2
+            return func in (cast_date, cast_timestamp, cast_timestamptz)
         else:
             return 'connection' in args[1:]
 
@@ -1140,8 +1000,8 @@ class Cursor(object):
         # return the cursor object, so you can chain operations
         return self
 
-    def copy_to(self, stream, table,
-            format=None, sep=None, null=None, decode=None, columns=None):
+    def copy_to(self, stream, table, format=None, sep=None, null=None,
+            decode=None, columns=None, size=None):
         """Copy data from the specified table to an output stream.
 
         The output stream can be a file-like object with a write() method or
@@ -1150,6 +1010,11 @@ class Cursor(object):
 
         Output will be returned as byte strings unless you set decode to true.
 
+        If you set the size option, the output will be read into a buffer of
+        this size and returned in chunks of complete rows instead of row by
+        row.  The chunks are written as memoryviews of this buffer to the
+        output stream, but the generator returns them as byte strings.
+
         Note that you can also use a select query instead of the table name.
 
         The format must be text, csv or binary. The sep option sets the
@@ -1198,6 +1063,15 @@ class Cursor(object):
                 raise TypeError("The null option must be a string")
             options.append('null %s')
             params.append(null)
+        if size is not None:
+            if not isinstance(size, int):
+                raise TypeError("The size option must be an integer")
+            if size <= 0:
+                raise ValueError("The size option must be positive")
+            if decode:
+                raise ValueError(
+                    "The decode option is not allowed with size option")
+            decode = False
         if decode is None:
             if format == 'binary':
                 decode = False
@@ -1220,6 +1094,7 @@ class Cursor(object):
         operation = ' '.join(operation)
 
         getdata = self._src.getdata
+        getdata_into = self._src.getdata_into
         self.execute(operation, params)
 
         def copy():
@@ -1233,12 +1108,25 @@ class Cursor(object):
                 self.rowcount += 1
                 yield row
 
+        def copy_chunks():
+            self.rowcount = 0
+            buffer = bytearray(size)
+            view = memoryview(buffer)
+            while True:
+                n = getdata_into(buffer)
+                if not n:
+                    break
+                yield view[:n]
+            self.rowcount = self._src.ntuples
+
         if stream is None:
             # no input stream, return the generator
+            if size:
+                return (chunk.tobytes() for chunk in copy_chunks())
             return copy()
 
         # write the rows to the file-like input stream
-        for row in copy():
+        for row in (copy_chunks() if size else copy()):
             write(row)
 
         # return the cursor object, so you can chain operations
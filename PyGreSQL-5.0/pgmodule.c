@@ -40,6 +40,19 @@
 /* macros for single-source Python 2/3 compatibility */
 #include "py3c.h"
 
+#include <datetime.h>
+
+#ifdef MS_WIN32
+#include <io.h>
+#include <winsock2.h>
+#define write _write
+#define poll WSAPoll
+#else
+#include <unistd.h>
+#include <poll.h>
+#endif
+#include <errno.h>
+
 static PyObject *Error, *Warning, *InterfaceError,
 	*DatabaseError, *InternalError, *OperationalError, *ProgrammingError,
 	*IntegrityError, *DataError, *NotSupportedError;
@@ -75,7 +88,12 @@ static const char *PyPgVersion = TOSTRING(PYGRESQL_VERSION);
 #define QUERY_MOVEPREV		4
 
 #define MAX_BUFFER_SIZE 8192	/* maximum transaction size */
+#define COPY_BUFFER_SIZE 65536	/* size of data chunks sent with copy */
+#define LO_BUFFER_SIZE 262144	/* size of chunks read when exporting */
+#define RESULT_CELL_SIZE (sizeof(char *) + sizeof(int)) /* cell overhead */
+#define OBJECT_CELL_SIZE 48		/* estimated overhead of a Python value */
 #define MAX_ARRAY_DEPTH 16		/* maximum allowed depth of an array */
+#define MAX_ROW_TYPES 1024		/* maximum number of cached row types */
 
 /* MODULE GLOBAL VARIABLES */
 
@@ -90,12 +108,19 @@ static PyObject *pg_default_passwd;	/* default password */
 
 static PyObject *decimal = NULL, /* decimal type */
 				*namedresult = NULL, /* function for getting named results */
-				*jsondecode = NULL; /* function for decoding json strings */
+				*jsondecode = NULL, /* function for decoding json strings */
+				*array_type = NULL, /* the array type from the array module */
+				*row_types = NULL, /* cache of row types by field names */
+				*row_index_key = NULL, /* key of field index in row types */
+				*timezone_type = NULL; /* the timezone type of the datetime module */
 static const char *date_format = NULL; /* date format that is always assumed */
 static char decimal_point = '.'; /* decimal point used in money values */
 static int bool_as_text = 0; /* whether bool shall be returned as text */
 static int array_as_text = 0; /* whether arrays shall be returned as text */
+static int typed_array = 0; /* whether arrays shall be returned typed */
 static int bytea_escaped = 0; /* whether bytea shall be returned escaped */
+static int bytea_view = 0; /* whether bytea shall be returned as memoryview */
+static int numeric_mode = 0; /* how numeric values shall be returned */
 
 static int pg_encoding_utf8 = 0;
 static int pg_encoding_latin1 = 0;
@@ -120,12 +145,18 @@ OBJECTS
    - notice: Notice object returned from pg.notice().
    - large: Large object returned by pg.conn.locreate() and Pg.Conn.loimport().
    - query: Query object returned by pg.conn.Conn.query().
+   - view: Lazy result view returned by pg.Query.lazyresult().
+   - row: Base type of the rows returned by pg.Query.rowresult().
+   - bytea: Buffer holding bytea data exposed via memoryviews.
    - source: Source object returned by pg.conn.source().
 */
 
 /* forward declarations for types */
 static PyTypeObject noticeType;
 static PyTypeObject queryType;
+static PyTypeObject viewType;
+static PyTypeObject rowType;
+static PyTypeObject byteaType;
 static PyTypeObject sourceType;
 static PyTypeObject largeType;
 static PyTypeObject connType;
@@ -143,7 +174,9 @@ typedef struct
 	PGconn	   *cnx;				/* Postgres connection handle */
 	const char *date_format;		/* date format derived from datestyle */
 	PyObject   *cast_hook;			/* external typecast method */
+	PyObject   *type_casts;			/* typecast functions per type oid */
 	PyObject   *notice_receiver;	/* current notice receiver */
+	size_t		memory_limit;		/* memory limit for results, 0 = none */
 }	connObject;
 #define is_connObject(v) (PyType(v) == &connType)
 
@@ -159,6 +192,9 @@ typedef struct
 	int			current_row;	/* current selected row */
 	int			max_row;		/* number of rows in the result */
 	int			num_fields;		/* number of fields in each row */
+	char	   *copy_data;		/* row of copy data not yet returned */
+	int			copy_len;		/* length of the row, -1 if copy is done */
+	int			copy_pos;		/* position of the data not yet returned */
 }	sourceObject;
 #define is_sourceObject(v) (PyType(v) == &sourceType)
 
@@ -176,9 +212,31 @@ typedef struct
 	connObject *pgcnx;			/* parent connection object */
 	PGresult   *result;			/* result content */
 	int			encoding; 		/* client encoding */
+	PyObject   *casts;			/* typecast functions per column */
 }	queryObject;
 #define is_queryObject(v) (PyType(v) == &queryType)
 
+typedef struct
+{
+	PyObject_HEAD
+	queryObject *query;			/* query object, released when all cached */
+	int		   *col_types;		/* PyGreSQL types of the columns */
+	PyObject  **rows;			/* cache of already converted rows */
+	Py_ssize_t	num_rows;		/* number of rows in the result */
+	Py_ssize_t	num_cached;		/* number of rows already converted */
+	int			num_fields;		/* number of fields in each row */
+}	viewObject;
+#define is_viewObject(v) (PyType(v) == &viewType)
+
+typedef struct
+{
+	PyObject_HEAD
+	PyObject   *owner;			/* object owning the data, if not owned */
+	char	   *data;			/* the bytea data */
+	Py_ssize_t	size;			/* size of the bytea data */
+}	byteaObject;
+#define is_byteaObject(v) (PyType(v) == &byteaType)
+
 #ifdef LARGE_OBJECTS
 typedef struct
 {
@@ -207,6 +265,12 @@ typedef struct
 /* array types */
 #define PYGRES_ARRAY 16
 
+/* modes for casting numeric and money values */
+
+#define NUMERIC_DECIMAL 0 /* decimal type, or float if it is not set */
+#define NUMERIC_FLOAT 1 /* always float */
+#define NUMERIC_SCALED 2 /* int scaled by the fractional digits */
+
 /* --------------------------------------------------------------------- */
 /* Internal Functions													 */
 /* --------------------------------------------------------------------- */
@@ -459,6 +523,99 @@ cast_other(char *s, Py_ssize_t size, int encoding, int pgtype,
 	return obj;
 }
 
+/* Cast a numeric value to the decimal type.
+   Returns a float if no decimal type has been set or if numeric values
+   shall always be returned as floats. */
+static PyObject *
+cast_decimal(char *s, Py_ssize_t size)
+{
+	PyObject   *obj, *str_obj = PyStr_FromStringAndSize(s, size);
+
+	if (!str_obj) return NULL;
+	if (decimal && numeric_mode != NUMERIC_FLOAT)
+#if PY_VERSION_HEX >= 0x03090000
+		obj = PyObject_CallOneArg(decimal, str_obj);
+#else
+		obj = PyObject_CallFunctionObjArgs(decimal, str_obj, NULL);
+#endif
+	else
+		obj = PyFloat_FromString(str_obj);
+	Py_DECREF(str_obj);
+	return obj;
+}
+
+/* Cast a numeric or money value to an int scaled by the given number of
+   fractional digits.  For money values, all characters except digits, signs
+   and the decimal point are ignored, and a negative scale means that the
+   fractional digits shall be taken as they are.  Returns NULL without setting
+   an exception if the value cannot be cast this way, e.g. if it is NaN. */
+static PyObject *
+cast_scaled(char *s, Py_ssize_t size, int scale, int money)
+{
+	char		buf[64], *t = buf + 1, *end = s + size,
+				point = money ? decimal_point : '.';
+	int			frac = -1, neg = 0;
+
+	for (; s < end; ++s)
+	{
+		if (*s >= '0' && *s <= '9')
+		{
+			if (t - buf >= 40) return NULL;
+			*t++ = *s;
+			if (frac >= 0) ++frac;
+		}
+		else if (*s == point && frac < 0)
+			frac = 0;
+		else if (*s == '-' || *s == '(')
+			neg = 1;
+		else if (!money)
+			return NULL;
+	}
+	if (t == buf + 1) return NULL;
+	if (frac < 0) frac = 0;
+	if (scale < 0) scale = frac;
+	if (frac > scale || scale - frac > 20) return NULL;
+	while (frac++ < scale) *t++ = '0';
+	if (t - buf <= 19) /* fits into a long long */
+	{
+		PY_LONG_LONG v = 0;
+
+		for (s = buf + 1; s < t; ++s) v = 10 * v + (*s - '0');
+		return PyLong_FromLongLong(neg ? -v : v);
+	}
+	*t = '\0';
+	buf[0] = '-';
+	return PyLong_FromString(neg ? buf : buf + 1, NULL, 10);
+}
+
+/* Cast a money value to the decimal type or a scaled int.
+   This needs a character string representation with a given size. */
+static PyObject *
+cast_money(char *s, Py_ssize_t size)
+{
+	char		buf[64];
+	int			i, j, n;
+
+	/* this type should only be passed when decimal_point is set */
+	if (numeric_mode == NUMERIC_SCALED)
+	{
+		PyObject   *obj = cast_scaled(s, size, -1, 1);
+
+		if (obj || PyErr_Occurred()) return obj;
+	}
+	n = sizeof(buf)/sizeof(buf[0]) - 1;
+	for (i = 0, j = 0; i < size && j < n; ++i, ++s)
+	{
+		if (*s >= '0' && *s <= '9')
+			buf[j++] = *s;
+		else if (*s == decimal_point)
+			buf[j++] = '.';
+		else if (*s == '(' || *s == '-')
+			buf[j++] = '-';
+	}
+	return cast_decimal(buf, j);
+}
+
 /* Cast a simple type to a Python object.
    This needs a character string representation with a given size. */
 static PyObject *
@@ -466,7 +623,7 @@ cast_sized_simple(char *s, Py_ssize_t size, int type)
 {
 	PyObject   *obj, *tmp_obj;
 	char		buf[64], *t;
-	int			i, j, n;
+	int			i, n;
 
 	switch (type) /* this must be the PyGreSQL internal type */
 	{
@@ -493,36 +650,11 @@ cast_sized_simple(char *s, Py_ssize_t size, int type)
 			break;
 
 		case PYGRES_MONEY:
-			/* this type should only be passed when decimal_point is set */
-			n = sizeof(buf)/sizeof(buf[0]) - 1;
-			for (i = 0, j = 0; i < size && j < n; ++i, ++s)
-			{
-				if (*s >= '0' && *s <= '9')
-					buf[j++] = *s;
-				else if (*s == decimal_point)
-					buf[j++] = '.';
-				else if (*s == '(' || *s == '-')
-					buf[j++] = '-';
-			}
-			if (decimal)
-			{
-				buf[j] = '\0';
-				obj = PyObject_CallFunction(decimal, "(s)", buf);
-			}
-			else
-			{
-				tmp_obj = PyStr_FromString(buf);
-				obj = PyFloat_FromString(tmp_obj);
-				Py_DECREF(tmp_obj);
-
-			}
+			obj = cast_money(s, size);
 			break;
 
 		case PYGRES_DECIMAL:
-			tmp_obj = PyStr_FromStringAndSize(s, size);
-			obj = decimal ? PyObject_CallFunctionObjArgs(
-				decimal, tmp_obj, NULL) : PyFloat_FromString(tmp_obj);
-			Py_DECREF(tmp_obj);
+			obj = cast_decimal(s, size);
 			break;
 
 		case PYGRES_BOOL:
@@ -552,8 +684,6 @@ static PyObject *
 cast_unsized_simple(char *s, int type)
 {
 	PyObject   *obj, *tmp_obj;
-	char		buf[64];
-	int			j, n;
 
 	switch (type) /* this must be the PyGreSQL internal type */
 	{
@@ -572,31 +702,11 @@ cast_unsized_simple(char *s, int type)
 			break;
 
 		case PYGRES_MONEY:
-			/* this type should only be passed when decimal_point is set */
-			n = sizeof(buf)/sizeof(buf[0]) - 1;
-			for (j = 0; *s && j < n; ++s)
-			{
-				if (*s >= '0' && *s <= '9')
-					buf[j++] = *s;
-				else if (*s == decimal_point)
-					buf[j++] = '.';
-				else if (*s == '(' || *s == '-')
-					buf[j++] = '-';
-			}
-			buf[j] = '\0'; s = buf;
-			/* FALLTHROUGH */ /* no break here */
+			obj = cast_money(s, (Py_ssize_t) strlen(s));
+			break;
 
 		case PYGRES_DECIMAL:
-			if (decimal)
-			{
-				obj = PyObject_CallFunction(decimal, "(s)", s);
-			}
-			else
-			{
-				tmp_obj = PyStr_FromString(s);
-				obj = PyFloat_FromString(tmp_obj);
-				Py_DECREF(tmp_obj);
-			}
+			obj = cast_decimal(s, (Py_ssize_t) strlen(s));
 			break;
 
 		case PYGRES_BOOL:
@@ -1664,7 +1774,11 @@ static void
 largeDealloc(largeObject *self)
 {
 	if (self->lo_fd >= 0 && self->pgcnx->valid)
+	{
+		Py_BEGIN_ALLOW_THREADS
 		lo_close(self->pgcnx->cnx, self->lo_fd);
+		Py_END_ALLOW_THREADS
+	}
 
 	Py_XDECREF(self->pgcnx);
 	PyObject_Del(self);
@@ -1694,7 +1808,11 @@ largeOpen(largeObject *self, PyObject *args)
 		return NULL;
 
 	/* opens large object */
-	if ((fd = lo_open(self->pgcnx->cnx, self->lo_oid, mode)) < 0)
+	Py_BEGIN_ALLOW_THREADS
+	fd = lo_open(self->pgcnx->cnx, self->lo_oid, mode);
+	Py_END_ALLOW_THREADS
+
+	if (fd < 0)
 	{
 		PyErr_SetString(PyExc_IOError, "Can't open large object");
 		return NULL;
@@ -1713,12 +1831,18 @@ static char largeClose__doc__[] =
 static PyObject *
 largeClose(largeObject *self, PyObject *noargs)
 {
+	int			ret;
+
 	/* checks validity */
 	if (!check_lo_obj(self, CHECK_OPEN))
 		return NULL;
 
 	/* closes large object */
-	if (lo_close(self->pgcnx->cnx, self->lo_fd))
+	Py_BEGIN_ALLOW_THREADS
+	ret = lo_close(self->pgcnx->cnx, self->lo_fd);
+	Py_END_ALLOW_THREADS
+
+	if (ret)
 	{
 		PyErr_SetString(PyExc_IOError, "Error while closing large object fd");
 		return NULL;
@@ -1761,10 +1885,15 @@ largeRead(largeObject *self, PyObject *args)
 		return NULL;
 
 	/* allocate buffer and runs read */
-	buffer = PyBytes_FromStringAndSize((char *) NULL, size);
+	if (!(buffer = PyBytes_FromStringAndSize((char *) NULL, size)))
+		return NULL;
+
+	Py_BEGIN_ALLOW_THREADS
+	size = lo_read(self->pgcnx->cnx, self->lo_fd,
+		PyBytes_AS_STRING((PyBytesObject *)(buffer)), size);
+	Py_END_ALLOW_THREADS
 
-	if ((size = lo_read(self->pgcnx->cnx, self->lo_fd,
-		PyBytes_AS_STRING((PyBytesObject *)(buffer)), size)) < 0)
+	if (size < 0)
 	{
 		PyErr_SetString(PyExc_IOError, "Error while reading");
 		Py_XDECREF(buffer);
@@ -1776,20 +1905,66 @@ largeRead(largeObject *self, PyObject *args)
 	return buffer;
 }
 
+/* reads from large object into a buffer */
+static char largeReadinto__doc__[] =
+"readinto(buffer) -- read from large object into writable buffer\n\n"
+"Object must be opened in read mode before calling this method.\n"
+"Returns the number of bytes read, which is zero at the end.\n";
+
+static PyObject *
+largeReadinto(largeObject *self, PyObject *args)
+{
+	Py_buffer	buffer;
+	int			size;
+
+	/* gets arguments */
+	if (!PyArg_ParseTuple(args, "w*", &buffer))
+	{
+		PyErr_SetString(PyExc_TypeError,
+			"Method readinto() expects a writable buffer as argument");
+		return NULL;
+	}
+
+	/* checks validity */
+	if (!check_lo_obj(self, CHECK_OPEN))
+	{
+		PyBuffer_Release(&buffer);
+		return NULL;
+	}
+
+	/* read directly into the buffer */
+	size = buffer.len > INT_MAX ? INT_MAX : (int) buffer.len;
+	if (size)
+	{
+		Py_BEGIN_ALLOW_THREADS
+		size = lo_read(self->pgcnx->cnx, self->lo_fd, buffer.buf, size);
+		Py_END_ALLOW_THREADS
+	}
+	PyBuffer_Release(&buffer);
+
+	if (size < 0)
+	{
+		PyErr_SetString(PyExc_IOError, "Error while reading");
+		return NULL;
+	}
+
+	/* returns the number of bytes read */
+	return PyInt_FromLong(size);
+}
+
 /* write to large object */
 static char largeWrite__doc__[] =
-"write(string) -- write sized string to large object\n\n"
-"Object must be opened in read mode before calling this method.\n";
+"write(data) -- write bytes or buffer to large object\n\n"
+"Object must be opened in write mode before calling this method.\n";
 
 static PyObject *
 largeWrite(largeObject *self, PyObject *args)
 {
-	char	   *buffer;
-	int			size,
-				bufsize;
+	Py_buffer	buffer;
+	int			size;
 
 	/* gets arguments */
-	if (!PyArg_ParseTuple(args, "s#", &buffer, &bufsize))
+	if (!PyArg_ParseTuple(args, "s*", &buffer))
 	{
 		PyErr_SetString(PyExc_TypeError,
 			"Method write() expects a sized string as argument");
@@ -1798,15 +1973,31 @@ largeWrite(largeObject *self, PyObject *args)
 
 	/* checks validity */
 	if (!check_lo_obj(self, CHECK_OPEN))
+	{
+		PyBuffer_Release(&buffer);
+		return NULL;
+	}
+
+	if (buffer.len > INT_MAX)
+	{
+		PyBuffer_Release(&buffer);
+		PyErr_SetString(PyExc_ValueError,
+			"Method write() cannot write more than 2GB at once");
 		return NULL;
+	}
 
 	/* sends query */
-	if ((size = lo_write(self->pgcnx->cnx, self->lo_fd, buffer,
-						 bufsize)) < bufsize)
+	Py_BEGIN_ALLOW_THREADS
+	size = lo_write(self->pgcnx->cnx, self->lo_fd, buffer.buf, buffer.len);
+	Py_END_ALLOW_THREADS
+
+	if (size < buffer.len)
 	{
+		PyBuffer_Release(&buffer);
 		PyErr_SetString(PyExc_IOError, "Buffer truncated during write");
 		return NULL;
 	}
+	PyBuffer_Release(&buffer);
 
 	/* no error : returns Py_None */
 	Py_INCREF(Py_None);
@@ -1840,7 +2031,11 @@ largeSeek(largeObject *self, PyObject *args)
 		return NULL;
 
 	/* sends query */
-	if ((ret = lo_lseek(self->pgcnx->cnx, self->lo_fd, offset, whence)) == -1)
+	Py_BEGIN_ALLOW_THREADS
+	ret = lo_lseek(self->pgcnx->cnx, self->lo_fd, offset, whence);
+	Py_END_ALLOW_THREADS
+
+	if (ret == -1)
 	{
 		PyErr_SetString(PyExc_IOError, "Error while moving cursor");
 		return NULL;
@@ -1859,33 +2054,39 @@ static PyObject *
 largeSize(largeObject *self, PyObject *noargs)
 {
 	int			start,
-				end;
+				end = -1,
+				step = -1;
 
 	/* checks validity */
 	if (!check_lo_obj(self, CHECK_OPEN))
 		return NULL;
 
-	/* gets current position */
+	/* gets current and end position, then moves back to start position */
+	Py_BEGIN_ALLOW_THREADS
 	if ((start = lo_tell(self->pgcnx->cnx, self->lo_fd)) == -1)
-	{
-		PyErr_SetString(PyExc_IOError, "Error while getting current position");
-		return NULL;
-	}
-
-	/* gets end position */
-	if ((end = lo_lseek(self->pgcnx->cnx, self->lo_fd, 0, SEEK_END)) == -1)
-	{
-		PyErr_SetString(PyExc_IOError, "Error while getting end position");
-		return NULL;
-	}
+		step = 0;
+	else if ((end = lo_lseek(self->pgcnx->cnx, self->lo_fd,
+			0, SEEK_END)) == -1)
+		step = 1;
+	else if (lo_lseek(self->pgcnx->cnx, self->lo_fd,
+			start, SEEK_SET) == -1)
+		step = 2;
+	Py_END_ALLOW_THREADS
 
-	/* move back to start position */
-	if ((start = lo_lseek(
-		self->pgcnx->cnx, self->lo_fd, start, SEEK_SET)) == -1)
+	switch (step)
 	{
-		PyErr_SetString(PyExc_IOError,
-			"Error while moving back to first position");
-		return NULL;
+		case 0:
+			PyErr_SetString(PyExc_IOError,
+				"Error while getting current position");
+			return NULL;
+		case 1:
+			PyErr_SetString(PyExc_IOError,
+				"Error while getting end position");
+			return NULL;
+		case 2:
+			PyErr_SetString(PyExc_IOError,
+				"Error while moving back to first position");
+			return NULL;
 	}
 
 	/* returns size */
@@ -1907,7 +2108,11 @@ largeTell(largeObject *self, PyObject *noargs)
 		return NULL;
 
 	/* gets current position */
-	if ((start = lo_tell(self->pgcnx->cnx, self->lo_fd)) == -1)
+	Py_BEGIN_ALLOW_THREADS
+	start = lo_tell(self->pgcnx->cnx, self->lo_fd);
+	Py_END_ALLOW_THREADS
+
+	if (start == -1)
 	{
 		PyErr_SetString(PyExc_IOError, "Error while getting position");
 		return NULL;
@@ -1917,21 +2122,117 @@ largeTell(largeObject *self, PyObject *noargs)
 	return PyInt_FromLong(start);
 }
 
+/* exports large object to an open file descriptor (internal use only)
+   The data is copied in chunks with the GIL released.  Returns the number
+   of bytes written or -1 if the export failed, with the error message set
+   or errno set if the error happened while writing to the file. */
+static Py_ssize_t
+large_export_fd(largeObject *self, int fd)
+{
+	PGconn	   *cnx = self->pgcnx->cnx;
+	char	   *buffer;
+	const char *msg = NULL;
+	Py_ssize_t	total = 0;
+	int			lo_fd, size, ret;
+
+	if (!(buffer = PyMem_Malloc(LO_BUFFER_SIZE)))
+	{
+		PyErr_NoMemory();
+		return -1;
+	}
+
+	Py_BEGIN_ALLOW_THREADS
+	if ((lo_fd = lo_open(cnx, self->lo_oid, INV_READ)) < 0)
+		msg = "Can't open large object";
+	else
+	{
+		while ((size = lo_read(cnx, lo_fd, buffer, LO_BUFFER_SIZE)) > 0)
+		{
+			char   *s = buffer;
+
+			while (size > 0)
+			{
+				if ((ret = (int) write(fd, s, size)) < 0)
+				{
+					if (errno == EINTR)
+						continue;
+					break;
+				}
+				s += ret; size -= ret; total += ret;
+			}
+			if (size) /* error while writing */
+				break;
+		}
+		if (size < 0)
+			msg = "Error while reading large object";
+		else if (size)
+			msg = ""; /* errno is set */
+		lo_close(cnx, lo_fd);
+	}
+	Py_END_ALLOW_THREADS
+
+	PyMem_Free(buffer);
+
+	if (msg)
+	{
+		if (*msg)
+			PyErr_SetString(PyExc_IOError, msg);
+		else
+			PyErr_SetFromErrno(PyExc_IOError);
+		return -1;
+	}
+	return total;
+}
+
 /* exports large object as unix file */
 static char largeExport__doc__[] =
-"export(filename) -- export large object data to specified file\n\n"
-"The object must be closed when calling this method.\n";
+"export(file) -- export large object data to specified file\n\n"
+"The file can be given as a filename, or as an open file object, in which\n"
+"case the data is copied in chunks to its file descriptor and the number\n"
+"of bytes written is returned.  The object must be closed when calling\n"
+"this method.\n";
 
 static PyObject *
 largeExport(largeObject *self, PyObject *args)
 {
-	char *name;
+	PyObject   *file;
+	char	   *name;
+	int			ret;
 
 	/* checks validity */
 	if (!check_lo_obj(self, CHECK_CLOSE))
 		return NULL;
 
 	/* gets arguments */
+	if (!PyArg_ParseTuple(args, "O", &file))
+		return NULL;
+
+	/* file objects are exported via their file descriptor */
+	if (PyObject_HasAttrString(file, "fileno"))
+	{
+		Py_ssize_t	total;
+		int			fd = PyObject_AsFileDescriptor(file);
+
+		if (fd < 0)
+		{
+			PyErr_SetString(PyExc_TypeError,
+				"The method export() takes a filename or file as argument");
+			return NULL;
+		}
+		/* write out data buffered in the file object before our own */
+		if (PyObject_HasAttrString(file, "flush"))
+		{
+			PyObject   *res = PyObject_CallMethod(file, "flush", NULL);
+
+			if (!res)
+				return NULL;
+			Py_DECREF(res);
+		}
+		if ((total = large_export_fd(self, fd)) < 0)
+			return NULL;
+		return PyInt_FromSsize_t(total);
+	}
+
 	if (!PyArg_ParseTuple(args, "s", &name))
 	{
 		PyErr_SetString(PyExc_TypeError,
@@ -1940,7 +2241,11 @@ largeExport(largeObject *self, PyObject *args)
 	}
 
 	/* runs command */
-	if (!lo_export(self->pgcnx->cnx, self->lo_oid, name))
+	Py_BEGIN_ALLOW_THREADS
+	ret = lo_export(self->pgcnx->cnx, self->lo_oid, name);
+	Py_END_ALLOW_THREADS
+
+	if (!ret)
 	{
 		PyErr_SetString(PyExc_IOError, "Error while exporting large object");
 		return NULL;
@@ -1958,12 +2263,18 @@ static char largeUnlink__doc__[] =
 static PyObject *
 largeUnlink(largeObject *self, PyObject *noargs)
 {
+	int			ret;
+
 	/* checks validity */
 	if (!check_lo_obj(self, CHECK_CLOSE))
 		return NULL;
 
 	/* deletes the object, invalidate it on success */
-	if (!lo_unlink(self->pgcnx->cnx, self->lo_oid))
+	Py_BEGIN_ALLOW_THREADS
+	ret = lo_unlink(self->pgcnx->cnx, self->lo_oid);
+	Py_END_ALLOW_THREADS
+
+	if (!ret)
 	{
 		PyErr_SetString(PyExc_IOError, "Error while unlinking large object");
 		return NULL;
@@ -1993,6 +2304,8 @@ static struct PyMethodDef largeMethods[] = {
 	{"open", (PyCFunction) largeOpen, METH_VARARGS, largeOpen__doc__},
 	{"close", (PyCFunction) largeClose, METH_NOARGS, largeClose__doc__},
 	{"read", (PyCFunction) largeRead, METH_VARARGS, largeRead__doc__},
+	{"readinto", (PyCFunction) largeReadinto, METH_VARARGS,
+		largeReadinto__doc__},
 	{"write", (PyCFunction) largeWrite, METH_VARARGS, largeWrite__doc__},
 	{"seek", (PyCFunction) largeSeek, METH_VARARGS, largeSeek__doc__},
 	{"size", (PyCFunction) largeSize, METH_NOARGS, largeSize__doc__},
@@ -2102,6 +2415,7 @@ connDelete(connObject *self)
 		Py_END_ALLOW_THREADS
 	}
 	Py_XDECREF(self->cast_hook);
+	Py_XDECREF(self->type_casts);
 	Py_XDECREF(self->notice_receiver);
 	PyObject_Del(self);
 }
@@ -2129,56 +2443,259 @@ connSource(connObject *self, PyObject *noargs)
 	npgobj->result = NULL;
 	npgobj->valid = 1;
 	npgobj->arraysize = PG_ARRAYSIZE;
+	npgobj->copy_data = NULL;
+	npgobj->copy_len = npgobj->copy_pos = 0;
 
 	return (PyObject *) npgobj;
 }
 
-/* database query */
-static char connQuery__doc__[] =
-"query(sql, [arg]) -- create a new query object for this connection\n\n"
-"You must pass the SQL (string) request and you can optionally pass\n"
-"a tuple with positional parameters.\n";
-
-static PyObject *
-connQuery(connObject *self, PyObject *args)
+/* get the memory needed for a result row (internal use only) */
+static size_t
+result_row_size(const PGresult *res, int i)
 {
-	PyObject	*query_obj;
-	PyObject	*param_obj = NULL;
-	char		*query;
-	PGresult	*result;
-	queryObject *npgobj;
-	int			encoding,
-				status,
-				nparms = 0;
+	int			j, n = PQnfields(res);
+	size_t		size = sizeof(void *);
 
-	if (!self->cnx)
+	for (j = 0; j < n; ++j)
 	{
-		PyErr_SetString(PyExc_TypeError, "Connection is not valid");
-		return NULL;
+		size += RESULT_CELL_SIZE;
+		if (!PQgetisnull(res, i, j))
+			size += PQgetlength(res, i, j) + 1;
 	}
+	return size;
+}
 
-	/* get query args */
-	if (!PyArg_ParseTuple(args, "O|O", &query_obj, &param_obj))
-	{
-		return NULL;
-	}
+/* get the memory used by a result (internal use only)
+   This is exact with libpq 12 or newer and estimated otherwise. */
+static size_t
+result_memory_size(const PGresult *res)
+{
+#ifdef MEMORY_SIZE
+	return PQresultMemorySize(res);
+#else
+	int			i, m = PQntuples(res), n = PQnfields(res);
+	size_t		size = 0;
 
-	encoding = PQclientEncoding(self->cnx);
+	for (i = 0; i < n; ++i)
+		size += sizeof(PGresAttDesc) + strlen(PQfname(res, i)) + 1;
+	for (i = 0; i < m; ++i)
+		size += result_row_size(res, i);
+	return size;
+#endif
+}
 
-	if (PyBytes_Check(query_obj))
+/* create an empty result with the fields of a given result (internal use only)
+   This does not need the GIL. */
+static PGresult *
+new_fields_result(PGconn *cnx, const PGresult *res)
+{
+	PGresult   *result;
+	PGresAttDesc *attrs;
+	int			j, n = PQnfields(res);
+
+	if (!(result = PQmakeEmptyPGresult(cnx, PGRES_TUPLES_OK)) || !n)
+		return result;
+	if (!(attrs = (PGresAttDesc *) malloc(n * sizeof(PGresAttDesc))))
 	{
-		query = PyBytes_AsString(query_obj);
-		query_obj = NULL;
+		PQclear(result);
+		return NULL;
 	}
-	else if (PyUnicode_Check(query_obj))
+	for (j = 0; j < n; ++j)
 	{
-		query_obj = get_encoded_string(query_obj, encoding);
-		if (!query_obj) return NULL; /* pass the UnicodeEncodeError */
-		query = PyBytes_AsString(query_obj);
+		attrs[j].name = PQfname(res, j);
+		attrs[j].tableid = PQftable(res, j);
+		attrs[j].columnid = PQftablecol(res, j);
+		attrs[j].format = PQfformat(res, j);
+		attrs[j].typid = PQftype(res, j);
+		attrs[j].typlen = PQfsize(res, j);
+		attrs[j].atttypmod = PQfmod(res, j);
+	}
+	if (!PQsetResultAttrs(result, n, attrs))
+	{
+		PQclear(result);
+		result = NULL;
+	}
+	free(attrs);
+	return result;
+}
+
+/* Get the next result of a query sent in single row mode, collecting the
+   rows in one result and checking its memory size against the given limit
+   while the rows arrive (internal use only).  This must be called without
+   the GIL.  Returns NULL if there are no more results or the limit has been
+   exceeded.  In the latter case, exceeded is set to 1 (or -1 if memory ran
+   out), the query is canceled and all remaining results are discarded.
+   If single row mode has not been activated, the results are passed. */
+static PGresult *
+get_limited_result(PGconn *cnx, size_t limit, int *exceeded)
+{
+	PGresult   *rows = NULL, *res;
+	size_t		size = 0;
+
+	*exceeded = 0;
+	while ((res = PQgetResult(cnx)))
+	{
+		if (PQresultStatus(res) == PGRES_SINGLE_TUPLE)
+		{
+			int			j, n = PQnfields(res), row;
+
+			if (!rows)
+			{
+				if ((rows = new_fields_result(cnx, res)))
+					size = result_memory_size(rows);
+				else
+					*exceeded = -1;
+			}
+			if (rows)
+			{
+				row = PQntuples(rows);
+				for (j = 0; j < n; ++j)
+				{
+					int isnull = PQgetisnull(res, 0, j);
+
+					if (!PQsetvalue(rows, row, j,
+							isnull ? NULL : PQgetvalue(res, 0, j),
+							isnull ? -1 : PQgetlength(res, 0, j)))
+					{
+						*exceeded = -1;
+						break;
+					}
+				}
+				if (!*exceeded && (size += result_row_size(res, 0)) > limit)
+					*exceeded = 1;
+			}
+			PQclear(res);
+
+			if (*exceeded)
+			{
+				PGcancel   *cancel = PQgetCancel(cnx);
+				char		errbuf[256];
+
+				if (cancel)
+				{
+					PQcancel(cancel, errbuf, sizeof(errbuf));
+					PQfreeCancel(cancel);
+				}
+				if (rows)
+					PQclear(rows);
+				/* drain remaining results after cancel */
+				while ((res = PQgetResult(cnx)))
+					PQclear(res);
+				return NULL;
+			}
+			continue;
+		}
+
+		/* the final result of a set of rows is replaced by the rows */
+		if (rows)
+		{
+			if (PQresultStatus(res) == PGRES_TUPLES_OK)
+			{
+				PQclear(res);
+				res = rows;
+			}
+			else
+				PQclear(rows);
+		}
+		return res;
+	}
+
+	if (rows) /* should not happen */
+		PQclear(rows);
+	return NULL;
+}
+
+/* Execute a query in single row mode, collecting the rows in one result
+   and checking its memory size against the given limit while the rows
+   arrive (internal use only).  This must be called without the GIL.
+   Returns the result like PQexec() does, or NULL if the query could not
+   be sent or the limit has been exceeded.  In the latter case, exceeded
+   is set to 1 (or -1 if memory ran out) and the query is canceled.
+   If prepared is set, the query is the name of a prepared statement. */
+static PGresult *
+exec_with_memory_limit(PGconn *cnx, const char *query, int prepared,
+	int nparms, const char * const *parms, size_t limit, int *exceeded)
+{
+	PGresult   *result = NULL, *res;
+
+	*exceeded = 0;
+	if (!(prepared ? PQsendQueryPrepared(cnx, query, nparms,
+			parms, NULL, NULL, 0) : nparms ? PQsendQueryParams(cnx, query,
+			nparms, NULL, parms, NULL, NULL, 0) : PQsendQuery(cnx, query)))
+		return NULL;
+	PQsetSingleRowMode(cnx);
+
+	while ((res = get_limited_result(cnx, limit, exceeded)))
+	{
+		int			status = PQresultStatus(res);
+
+		/* like PQexec(), keep the last result, but stop after an error */
+		if (result && PQresultStatus(result) == PGRES_FATAL_ERROR)
+			PQclear(res);
+		else
+		{
+			if (result)
+				PQclear(result);
+			result = res;
+		}
+		if (status == PGRES_COPY_IN || status == PGRES_COPY_OUT ||
+				PQstatus(cnx) == CONNECTION_BAD)
+			break;
+	}
+
+	if (*exceeded && result)
+	{
+		PQclear(result);
+		result = NULL;
+	}
+	return result;
+}
+
+/* execute a query or a prepared statement (internal use only)
+   If prepared is set, the name of the prepared statement is passed
+   instead of the SQL command. */
+static PyObject *
+query_command(connObject *self, PyObject *args, int prepared)
+{
+	PyObject	*query_obj;
+	PyObject	*param_obj = NULL;
+	char		*query;
+	PGresult	*result;
+	queryObject *npgobj;
+	int			encoding,
+				status,
+				exceeded = 0,
+				nparms = 0;
+
+	if (!self->cnx)
+	{
+		PyErr_SetString(PyExc_TypeError, "Connection is not valid");
+		return NULL;
+	}
+
+	/* get query args */
+	if (!PyArg_ParseTuple(args, "O|O", &query_obj, &param_obj))
+	{
+		return NULL;
+	}
+
+	encoding = PQclientEncoding(self->cnx);
+
+	if (PyBytes_Check(query_obj))
+	{
+		query = PyBytes_AsString(query_obj);
+		query_obj = NULL;
+	}
+	else if (PyUnicode_Check(query_obj))
+	{
+		query_obj = get_encoded_string(query_obj, encoding);
+		if (!query_obj) return NULL; /* pass the UnicodeEncodeError */
+		query = PyBytes_AsString(query_obj);
 	}
 	else
 	{
-		PyErr_SetString(PyExc_TypeError,
+		PyErr_SetString(PyExc_TypeError, prepared ?
+			"Method query_prepared() expects a string as first argument" :
 			"Method query() expects a string as first argument");
 		return NULL;
 	}
@@ -2189,7 +2706,8 @@ connQuery(connObject *self, PyObject *args)
 	 * to call PQexec() in that case, which can execute multiple commands. */
 	if (param_obj)
 	{
-		param_obj = PySequence_Fast(param_obj,
+		param_obj = PySequence_Fast(param_obj, prepared ?
+			"Method query_prepared() expects a sequence as second argument" :
 			"Method query() expects a sequence as second argument");
 		if (!param_obj)
 		{
@@ -2213,15 +2731,15 @@ connQuery(connObject *self, PyObject *args)
 	}
 
 	/* gets result */
-	if (nparms)
+	if (nparms || prepared)
 	{
 		/* prepare arguments */
 		PyObject	**str, **s;
 		char		**parms, **p;
 		register int i;
 
-		str = (PyObject **)PyMem_Malloc(nparms * sizeof(*str));
-		parms = (char **)PyMem_Malloc(nparms * sizeof(*parms));
+		str = (PyObject **)PyMem_Malloc((nparms ? nparms : 1) * sizeof(*str));
+		parms = (char **)PyMem_Malloc((nparms ? nparms : 1) * sizeof(*parms));
 		if (!str || !parms)
 		{
 			PyMem_Free(parms); PyMem_Free(str);
@@ -2280,8 +2798,13 @@ connQuery(connObject *self, PyObject *args)
 		}
 
 		Py_BEGIN_ALLOW_THREADS
-		result = PQexecParams(self->cnx, query, nparms,
-			NULL, (const char * const *)parms, NULL, NULL, 0);
+		result = self->memory_limit ? exec_with_memory_limit(self->cnx,
+				query, prepared, nparms, (const char * const *)parms,
+				self->memory_limit, &exceeded) :
+			prepared ? PQexecPrepared(self->cnx, query, nparms,
+				(const char * const *)parms, NULL, NULL, 0) :
+			PQexecParams(self->cnx, query, nparms,
+				NULL, (const char * const *)parms, NULL, NULL, 0);
 		Py_END_ALLOW_THREADS
 
 		PyMem_Free(parms);
@@ -2291,7 +2814,9 @@ connQuery(connObject *self, PyObject *args)
 	else
 	{
 		Py_BEGIN_ALLOW_THREADS
-		result = PQexec(self->cnx, query);
+		result = self->memory_limit ? exec_with_memory_limit(self->cnx,
+				query, 0, 0, NULL, self->memory_limit, &exceeded) :
+			PQexec(self->cnx, query);
 		Py_END_ALLOW_THREADS
 	}
 
@@ -2302,7 +2827,13 @@ connQuery(connObject *self, PyObject *args)
 	/* checks result validity */
 	if (!result)
 	{
-		PyErr_SetString(PyExc_ValueError, PQerrorMessage(self->cnx));
+		if (exceeded > 0)
+			set_error_msg(OperationalError,
+				"Query result exceeds the memory limit");
+		else if (exceeded)
+			PyErr_NoMemory();
+		else
+			PyErr_SetString(PyExc_ValueError, PQerrorMessage(self->cnx));
 		return NULL;
 	}
 
@@ -2364,9 +2895,253 @@ connQuery(connObject *self, PyObject *args)
 	npgobj->pgcnx = self;
 	npgobj->result = result;
 	npgobj->encoding = encoding;
+	npgobj->casts = NULL;
 	return (PyObject *) npgobj;
 }
 
+/* database query */
+static char connQuery__doc__[] =
+"query(sql, [arg]) -- create a new query object for this connection\n\n"
+"You must pass the SQL (string) request and you can optionally pass\n"
+"a tuple with positional parameters.\n";
+
+static PyObject *
+connQuery(connObject *self, PyObject *args)
+{
+	return query_command(self, args, 0);
+}
+
+/* create a prepared statement */
+static char connPrepare__doc__[] =
+"prepare(name, sql) -- create a prepared statement\n\n"
+"The SQL command can contain positional parameters.  The statement is\n"
+"created on the server under the given name, which can be empty for\n"
+"the unnamed statement.\n";
+
+static PyObject *
+connPrepare(connObject *self, PyObject *args)
+{
+	PyObject   *name_obj, *query_obj, *ret = NULL;
+	const char *name, *query;
+	PGresult   *result;
+	int			encoding;
+
+	if (!self->cnx)
+	{
+		PyErr_SetString(PyExc_TypeError, "Connection is not valid");
+		return NULL;
+	}
+
+	if (!PyArg_ParseTuple(args, "OO", &name_obj, &query_obj))
+		return NULL;
+
+	encoding = PQclientEncoding(self->cnx);
+
+	if (PyBytes_Check(name_obj))
+	{
+		Py_INCREF(name_obj);
+	}
+	else if (!PyUnicode_Check(name_obj) ||
+			!(name_obj = get_encoded_string(name_obj, encoding)))
+	{
+		if (!PyErr_Occurred())
+			PyErr_SetString(PyExc_TypeError,
+				"Method prepare() expects a string as first argument");
+		return NULL;
+	}
+	if (PyBytes_Check(query_obj))
+	{
+		Py_INCREF(query_obj);
+	}
+	else if (!PyUnicode_Check(query_obj) ||
+			!(query_obj = get_encoded_string(query_obj, encoding)))
+	{
+		if (!PyErr_Occurred())
+			PyErr_SetString(PyExc_TypeError,
+				"Method prepare() expects a string as second argument");
+		Py_DECREF(name_obj);
+		return NULL;
+	}
+	name = PyBytes_AsString(name_obj);
+	query = PyBytes_AsString(query_obj);
+
+	Py_BEGIN_ALLOW_THREADS
+	result = PQprepare(self->cnx, name, query, 0, NULL);
+	Py_END_ALLOW_THREADS
+
+	Py_DECREF(name_obj);
+	Py_DECREF(query_obj);
+
+	if (!result)
+		PyErr_SetString(PyExc_ValueError, PQerrorMessage(self->cnx));
+	else if (PQresultStatus(result) != PGRES_COMMAND_OK)
+		set_error(ProgrammingError, "Cannot create prepared statement",
+			self->cnx, result);
+	else
+	{
+		Py_INCREF(Py_None);
+		ret = Py_None;
+	}
+	if (result)
+		PQclear(result);
+	return ret;
+}
+
+/* execute a prepared statement */
+static char connQueryPrepared__doc__[] =
+"query_prepared(name, [arg]) -- execute a prepared statement\n\n"
+"You must pass the name of the prepared statement and you can optionally\n"
+"pass a tuple with positional parameters.  The result is the same as\n"
+"for the query() method.\n";
+
+static PyObject *
+connQueryPrepared(connObject *self, PyObject *args)
+{
+	return query_command(self, args, 1);
+}
+
+/* database query returning all results */
+static char connQueries__doc__[] =
+"queries(sql) -- run several SQL commands and return all results\n\n"
+"You must pass the SQL (string) request which can contain several\n"
+"commands separated by semicolons.  A list of query objects, one\n"
+"for each command, is returned.\n";
+
+static PyObject *
+connQueries(connObject *self, PyObject *args)
+{
+	PyObject	*query_obj, *list;
+	char		*query;
+	PGresult	*result;
+	int			encoding,
+				sent,
+				exceeded = 0;
+
+	if (!self->cnx)
+	{
+		PyErr_SetString(PyExc_TypeError, "Connection is not valid");
+		return NULL;
+	}
+
+	/* get query args */
+	if (!PyArg_ParseTuple(args, "O", &query_obj))
+	{
+		return NULL;
+	}
+
+	encoding = PQclientEncoding(self->cnx);
+
+	if (PyBytes_Check(query_obj))
+	{
+		query = PyBytes_AsString(query_obj);
+		query_obj = NULL;
+	}
+	else if (PyUnicode_Check(query_obj))
+	{
+		query_obj = get_encoded_string(query_obj, encoding);
+		if (!query_obj) return NULL; /* pass the UnicodeEncodeError */
+		query = PyBytes_AsString(query_obj);
+	}
+	else
+	{
+		PyErr_SetString(PyExc_TypeError,
+			"Method queries() expects a string as argument");
+		return NULL;
+	}
+
+	Py_BEGIN_ALLOW_THREADS
+	sent = PQsendQuery(self->cnx, query);
+	if (sent && self->memory_limit)
+		PQsetSingleRowMode(self->cnx);
+	Py_END_ALLOW_THREADS
+
+	Py_XDECREF(query_obj);
+
+	if (!sent)
+	{
+		PyErr_SetString(PyExc_ValueError, PQerrorMessage(self->cnx));
+		return NULL;
+	}
+
+	/* this may have changed the datestyle, so we reset the date format
+	   in order to force fetching it newly when next time requested */
+	self->date_format = date_format; /* this is normally NULL */
+
+	if (!(list = PyList_New(0)))
+	{
+		Py_BEGIN_ALLOW_THREADS
+		while ((result = PQgetResult(self->cnx)))
+			PQclear(result);
+		Py_END_ALLOW_THREADS
+		return NULL;
+	}
+
+	for (;;)
+	{
+		queryObject *npgobj;
+		int			status;
+
+		Py_BEGIN_ALLOW_THREADS
+		result = get_limited_result(self->cnx, self->memory_limit, &exceeded);
+		Py_END_ALLOW_THREADS
+
+		if (!result)
+		{
+			if (!exceeded)
+				break;
+			Py_DECREF(list);
+			if (exceeded > 0)
+				set_error_msg(OperationalError,
+					"Query result exceeds the memory limit");
+			else
+				PyErr_NoMemory();
+			return NULL;
+		}
+
+		status = PQresultStatus(result);
+		if (status == PGRES_BAD_RESPONSE || status == PGRES_FATAL_ERROR)
+		{
+			PGresult   *res;
+
+			/* discard the results of the commands that were not run */
+			Py_BEGIN_ALLOW_THREADS
+			while ((res = PQgetResult(self->cnx)))
+				PQclear(res);
+			Py_END_ALLOW_THREADS
+			Py_DECREF(list);
+			set_error(ProgrammingError, "Cannot execute query",
+				self->cnx, result);
+			PQclear(result);
+			return NULL;
+		}
+
+		if (!(npgobj = PyObject_NEW(queryObject, &queryType)))
+		{
+			PQclear(result);
+			Py_DECREF(list);
+			return PyErr_NoMemory();
+		}
+		Py_XINCREF(self);
+		npgobj->pgcnx = self;
+		npgobj->result = result;
+		npgobj->encoding = encoding;
+		npgobj->casts = NULL;
+		if (PyList_Append(list, (PyObject *) npgobj))
+		{
+			Py_DECREF(npgobj);
+			Py_DECREF(list);
+			return NULL;
+		}
+		Py_DECREF(npgobj);
+
+		/* no more results can be fetched while copying data */
+		if (status == PGRES_COPY_IN || status == PGRES_COPY_OUT)
+			break;
+	}
+
+	return list;
+}
+
 #ifdef DIRECT_ACCESS
 static char connPutLine__doc__[] =
 "putline(line) -- send a line directly to the backend";
@@ -2377,6 +3152,7 @@ connPutLine(connObject *self, PyObject *args)
 {
 	char *line;
 	int line_length;
+	int ret;
 
 	if (!self->cnx)
 	{
@@ -2393,7 +3169,11 @@ connPutLine(connObject *self, PyObject *args)
 	}
 
 	/* sends line to backend */
-	if (PQputline(self->cnx, line))
+	Py_BEGIN_ALLOW_THREADS
+	ret = PQputline(self->cnx, line);
+	Py_END_ALLOW_THREADS
+
+	if (ret)
 	{
 		PyErr_SetString(PyExc_IOError, PQerrorMessage(self->cnx));
 		return NULL;
@@ -2410,6 +3190,7 @@ static PyObject *
 connGetLine(connObject *self, PyObject *noargs)
 {
 	char		line[MAX_BUFFER_SIZE];
+	int			ret;
 	PyObject   *str = NULL;		/* GCC */
 
 	if (!self->cnx)
@@ -2419,7 +3200,11 @@ connGetLine(connObject *self, PyObject *noargs)
 	}
 
 	/* gets line */
-	switch (PQgetline(self->cnx, line, MAX_BUFFER_SIZE))
+	Py_BEGIN_ALLOW_THREADS
+	ret = PQgetline(self->cnx, line, MAX_BUFFER_SIZE);
+	Py_END_ALLOW_THREADS
+
+	switch (ret)
 	{
 		case 0:
 			str = PyStr_FromString(line);
@@ -2444,6 +3229,8 @@ static char connEndCopy__doc__[] =
 static PyObject *
 connEndCopy(connObject *self, PyObject *noargs)
 {
+	int			ret;
+
 	if (!self->cnx)
 	{
 		PyErr_SetString(PyExc_TypeError, "Connection is not valid");
@@ -2451,7 +3238,11 @@ connEndCopy(connObject *self, PyObject *noargs)
 	}
 
 	/* ends direct copy */
-	if (PQendcopy(self->cnx))
+	Py_BEGIN_ALLOW_THREADS
+	ret = PQendcopy(self->cnx);
+	Py_END_ALLOW_THREADS
+
+	if (ret)
 	{
 		PyErr_SetString(PyExc_IOError, PQerrorMessage(self->cnx));
 		return NULL;
@@ -2468,266 +3259,924 @@ queryStr(queryObject *self)
 	return format_result(self->result);
 }
 
-/* insert table */
-static char connInsertTable__doc__[] =
-"inserttable(table, data) -- insert list into table\n\n"
-"The fields in the list must be in the same order as in the table.\n";
-
-static PyObject *
-connInsertTable(connObject *self, PyObject *args)
+/* buffer for collecting data sent with copy (internal use only) */
+typedef struct
 {
-	PGresult	*result;
-	char		*table,
-				*buffer,
-				*bufpt;
-	int			encoding;
-	size_t		bufsiz;
-	PyObject	*list,
-				*sublist,
-				*item;
-	PyObject	*(*getitem) (PyObject *, Py_ssize_t);
-	PyObject	*(*getsubitem) (PyObject *, Py_ssize_t);
-	Py_ssize_t	i,
-				j,
-				m,
-				n;
+	char	   *data;			/* the buffered data */
+	size_t		size;			/* allocated size of the buffer */
+	size_t		len;			/* length of the buffered data */
+}	copyBuffer;
 
-	if (!self->cnx)
+/* make sure that n more bytes fit into the copy buffer (internal use only)
+   Returns 0 on success, -1 and sets a MemoryError otherwise. */
+static int
+copy_buffer_reserve(copyBuffer *buf, size_t n)
+{
+	if (buf->len + n > buf->size)
 	{
-		PyErr_SetString(PyExc_TypeError, "Connection is not valid");
-		return NULL;
-	}
+		size_t	size = buf->size ? buf->size : COPY_BUFFER_SIZE;
+		char   *data;
 
-	/* gets arguments */
-	if (!PyArg_ParseTuple(args, "sO:filter", &table, &list))
-	{
-		PyErr_SetString(PyExc_TypeError,
-			"Method inserttable() expects a string and a list as arguments");
-		return NULL;
+		while (buf->len + n > size)
+			size *= 2;
+		if (!(data = PyMem_Realloc(buf->data, size)))
+		{
+			PyErr_NoMemory();
+			return -1;
+		}
+		buf->data = data;
+		buf->size = size;
 	}
+	return 0;
+}
 
-	/* checks list type */
-	if (PyTuple_Check(list))
-	{
-		m = PyTuple_Size(list);
-		getitem = PyTuple_GetItem;
-	}
-	else if (PyList_Check(list))
+/* append text to the copy buffer, escaping it if requested
+   (internal use only) */
+static int
+copy_buffer_put_text(copyBuffer *buf, const char *s, size_t n, int escape)
+{
+	char   *p;
+
+	/* in the worst case, every character needs to be escaped */
+	if (copy_buffer_reserve(buf, escape ? 2 * n : n) < 0)
+		return -1;
+	p = buf->data + buf->len;
+	if (escape)
 	{
-		m = PyList_Size(list);
-		getitem = PyList_GetItem;
+		for (; n; --n, ++s)
+		{
+			switch (*s)
+			{
+				case '\\': *p++ = '\\'; *p++ = '\\'; break;
+				case '\t': *p++ = '\\'; *p++ = 't'; break;
+				case '\n': *p++ = '\\'; *p++ = 'n'; break;
+				case '\r': *p++ = '\\'; *p++ = 'r'; break;
+				default: *p++ = *s;
+			}
+		}
 	}
 	else
 	{
-		PyErr_SetString(PyExc_TypeError,
-			"Method inserttable() expects some kind of array"
-			" as second argument");
-		return NULL;
+		memcpy(p, s, n);
+		p += n;
 	}
+	buf->len = p - buf->data;
+	return 0;
+}
 
-	/* allocate buffer */
-	if (!(buffer = PyMem_Malloc(MAX_BUFFER_SIZE)))
-		return PyErr_NoMemory();
+/* create a string from the buffered data (internal use only)
+   The buffer is freed afterwards. */
+static PyObject *
+get_serial_string(copyBuffer *buf, int encoding)
+{
+	PyObject   *ret;
 
-	/* starts query */
-	sprintf(buffer, "copy %s from stdin", table);
+#if IS_PY3
+	ret = get_decoded_string(buf->data ? buf->data : "",
+		(Py_ssize_t) buf->len, encoding);
+#else
+	ret = PyStr_FromStringAndSize(buf->data ? buf->data : "",
+		(Py_ssize_t) buf->len);
+#endif
+	PyMem_Free(buf->data);
+	return ret;
+}
+
+/* send the content of the copy buffer to the server (internal use only)
+   Returns 0 on success, -1 and sets an IOError otherwise. */
+static int
+copy_buffer_flush(connObject *self, copyBuffer *buf)
+{
+	int		ret;
+
+	if (!buf->len)
+		return 0;
 
 	Py_BEGIN_ALLOW_THREADS
-	result = PQexec(self->cnx, buffer);
+	ret = PQputCopyData(self->cnx, buf->data, (int) buf->len);
 	Py_END_ALLOW_THREADS
 
-	if (!result)
+	if (ret != 1)
 	{
-		PyMem_Free(buffer);
-		PyErr_SetString(PyExc_ValueError, PQerrorMessage(self->cnx));
-		return NULL;
+		PyErr_SetString(PyExc_IOError, PQerrorMessage(self->cnx));
+		return -1;
 	}
+	buf->len = 0;
+	return 0;
+}
 
-	encoding = PQclientEncoding(self->cnx);
+/* end the copy operation and check the result (internal use only)
+   If errormsg is given, the copy operation is aborted and the current
+   Python error is kept.  Returns 0 on success, -1 on error. */
+static int
+copy_end(connObject *self, const char *errormsg)
+{
+	PGresult   *result;
+	int			ret;
 
-	PQclear(result);
+	Py_BEGIN_ALLOW_THREADS
+	ret = PQputCopyEnd(self->cnx, errormsg);
+	Py_END_ALLOW_THREADS
 
-	n = 0; /* not strictly necessary but avoids warning */
+	if (ret != 1)
+	{
+		if (!errormsg)
+			PyErr_SetString(PyExc_IOError, PQerrorMessage(self->cnx));
+		return -1;
+	}
 
-	/* feed table */
-	for (i = 0; i < m; ++i)
+	ret = 0;
+	for (;;)
 	{
-		sublist = getitem(list, i);
-		if (PyTuple_Check(sublist))
-		{
-			j = PyTuple_Size(sublist);
-			getsubitem = PyTuple_GetItem;
-		}
-		else if (PyList_Check(sublist))
+		Py_BEGIN_ALLOW_THREADS
+		result = PQgetResult(self->cnx);
+		Py_END_ALLOW_THREADS
+
+		if (!result)
+			break;
+		if (!ret && !errormsg && PQresultStatus(result) != PGRES_COMMAND_OK)
 		{
-			j = PyList_Size(sublist);
-			getsubitem = PyList_GetItem;
+			set_error(ProgrammingError, "Cannot copy data",
+				self->cnx, result);
+			ret = -1;
 		}
-		else
+		PQclear(result);
+	}
+	return errormsg ? -1 : ret;
+}
+
+/* append a Python value to the copy buffer in text format
+   (internal use only) */
+static int
+copy_buffer_put_value(copyBuffer *buf, PyObject *item, int encoding)
+{
+	PyObject   *s;
+	char	   *t;
+	Py_ssize_t	n;
+	int			ret, escape = 1;
+
+	if (item == Py_None)
+		return copy_buffer_put_text(buf, "\\N", 2, 0);
+
+	if (PyBytes_Check(item))
+	{
+		PyBytes_AsStringAndSize(item, &t, &n);
+		return copy_buffer_put_text(buf, t, (size_t) n, 1);
+	}
+
+	if (PyUnicode_Check(item))
+	{
+		if (!(s = get_encoded_string(item, encoding)))
+			return -1; /* pass the UnicodeEncodeError */
+	}
+	else
+	{
+		/* numbers are passed in their usual string representation,
+		   floats use repr() in order to keep the full precision */
+		if (PyInt_Check(item) || PyLong_Check(item))
+			escape = 0;
+		s = PyFloat_Check(item) ?
+			PyObject_Repr(item) : PyObject_Str(item);
+		if (!s)
+			return -1;
+#if IS_PY3
 		{
-			PyErr_SetString(PyExc_TypeError,
-				"Second arg must contain some kind of arrays");
-			return NULL;
+			PyObject *b = get_encoded_string(s, encoding);
+
+			Py_DECREF(s);
+			if (!(s = b))
+				return -1;
 		}
-		if (i)
+#endif
+	}
+
+	PyBytes_AsStringAndSize(s, &t, &n);
+	ret = copy_buffer_put_text(buf, t, (size_t) n, escape);
+	Py_DECREF(s);
+	return ret;
+}
+
+/* append integers in network byte order to the copy buffer
+   (internal use only) */
+static int
+copy_buffer_put_int(copyBuffer *buf, PY_LONG_LONG v, int size)
+{
+	unsigned char  *p;
+	int				k;
+
+	if (copy_buffer_reserve(buf, size) < 0)
+		return -1;
+	p = (unsigned char *) buf->data + buf->len;
+	for (k = size - 1; k >= 0; --k)
+	{
+		p[k] = (unsigned char) (v & 0xff);
+		v >>= 8;
+	}
+	buf->len += size;
+	return 0;
+}
+
+/* get the number of days since 2000-01-01 for a date (internal use only) */
+static long
+date_to_pg_days(int y, int m, int d)
+{
+	/* this is the days from civil algorithm by Howard Hinnant */
+	long	era, yoe, doy, doe;
+
+	y -= m <= 2;
+	era = (y >= 0 ? y : y - 399) / 400;
+	yoe = y - era * 400;
+	doy = (153 * (m + (m > 2 ? -3 : 9)) + 2) / 5 + d - 1;
+	doe = yoe * 365 + yoe / 4 - yoe / 100 + doy;
+	return era * 146097 + doe - 719468 - 10957; /* 1970 -> 2000 */
+}
+
+/* get the offset of an aware date/time in seconds (internal use only)
+   Naive values are rejected, since the server would interpret them in the
+   session time zone when sent as text, which cannot be done here.
+   Returns 0 and sets an error on failure. */
+static long
+get_utc_offset(PyObject *value)
+{
+	PyObject   *offset;
+	long		seconds = 0;
+
+	if (!(offset = PyObject_CallMethod(value, "utcoffset", NULL)))
+		return 0;
+	if (PyDelta_Check(offset))
+		seconds = PyDateTime_DELTA_GET_DAYS(offset) * 86400L +
+			PyDateTime_DELTA_GET_SECONDS(offset);
+	else
+		PyErr_SetString(PyExc_ValueError,
+			"Naive values cannot be copied to columns with time zone"
+			" in binary format");
+	Py_DECREF(offset);
+	return seconds;
+}
+
+/* append a numeric value given as string in binary format
+   (internal use only) */
+static int
+copy_buffer_put_numeric(copyBuffer *buf, const char *s)
+{
+	char	   *digits, *d;
+	int			sign = 0, ndigits = 0, point = -1, exponent = 0,
+				dscale, weight, ngroups, pad, k;
+	size_t		len = strlen(s);
+
+	while (*s == ' ') ++s;
+	if (*s == '-' || *s == '+')
+		sign = *s++ == '-' ? 0x4000 : 0;
+	if (!strncmp(s, "NaN", 3) || !strncmp(s, "nan", 3) ||
+			!strncmp(s, "Inf", 3) || !strncmp(s, "inf", 3))
+	{
+		/* special values: NaN, +Infinity and -Infinity */
+		sign = *s == 'N' || *s == 'n' ? 0xC000 : sign ? 0xF000 : 0xD000;
+		return copy_buffer_put_int(buf, 8, 4) < 0 ||
+			copy_buffer_put_int(buf, 0, 2) < 0 ||
+			copy_buffer_put_int(buf, 0, 2) < 0 ||
+			copy_buffer_put_int(buf, sign, 2) < 0 ||
+			copy_buffer_put_int(buf, 0, 2) < 0 ? -1 : 0;
+	}
+
+	/* collect the decimal digits with room for padding */
+	if (!(digits = PyMem_Malloc(len + 8)))
+	{
+		PyErr_NoMemory();
+		return -1;
+	}
+	d = digits + 3;
+	for (; *s; ++s)
+	{
+		if (*s >= '0' && *s <= '9')
 		{
-			if (j != n)
-			{
-				PyMem_Free(buffer);
-				PyErr_SetString(PyExc_TypeError,
-					"Arrays contained in second arg must have same size");
-				return NULL;
-			}
+			if (ndigits || *s != '0' || point >= 0)
+				d[ndigits++] = *s - '0';
 		}
+		else if (*s == '.' && point < 0)
+			point = ndigits;
 		else
+			break;
+	}
+	if (*s == 'e' || *s == 'E')
+	{
+		char *e;
+
+		exponent = (int) strtol(s + 1, &e, 10);
+		s = e;
+	}
+	if (*s || exponent > 10000 || exponent < -10000)
+	{
+		PyMem_Free(digits);
+		PyErr_SetString(PyExc_ValueError, "Invalid numeric value");
+		return -1;
+	}
+	if (point < 0)
+		point = ndigits;
+	dscale = ndigits - point - exponent;
+	if (dscale < 0)
+		dscale = 0;
+	point += exponent;
+
+	/* align the decimal point to groups of four digits */
+	pad = ((point % 4) + 4) % 4;
+	pad = pad ? 4 - pad : 0;
+	d -= pad;
+	for (k = 0; k < pad; ++k)
+		d[k] = 0;
+	ndigits += pad;
+	point += pad;
+	while (ndigits % 4)
+		d[ndigits++] = 0;
+	ngroups = ndigits / 4;
+	weight = (point >= 0 ? point : point - 3) / 4 - 1;
+
+	/* strip trailing zero groups */
+	while (ngroups && !(d[4 * ngroups - 4] || d[4 * ngroups - 3] ||
+			d[4 * ngroups - 2] || d[4 * ngroups - 1]))
+		--ngroups;
+
+	if (copy_buffer_put_int(buf, 8 + 2 * ngroups, 4) < 0 ||
+		copy_buffer_put_int(buf, ngroups, 2) < 0 ||
+		copy_buffer_put_int(buf, ngroups ? weight : 0, 2) < 0 ||
+		copy_buffer_put_int(buf, ngroups ? sign : 0, 2) < 0 ||
+		copy_buffer_put_int(buf, dscale, 2) < 0)
+	{
+		PyMem_Free(digits);
+		return -1;
+	}
+	for (k = 0; k < ngroups; ++k, d += 4)
+	{
+		if (copy_buffer_put_int(buf,
+				d[0] * 1000 + d[1] * 100 + d[2] * 10 + d[3], 2) < 0)
 		{
-			n = j; /* never used before this assignment */
+			PyMem_Free(digits);
+			return -1;
 		}
+	}
+	PyMem_Free(digits);
+	return 0;
+}
 
-		/* builds insert line */
-		bufpt = buffer;
-		bufsiz = MAX_BUFFER_SIZE - 1;
+/* append a Python value to the copy buffer in binary format for the
+   given PostgreSQL type, including the length word (internal use only) */
+static int
+copy_buffer_put_binary(copyBuffer *buf, PyObject *item, Oid pgtype,
+	int encoding)
+{
+	PY_LONG_LONG	v;
 
-		for (j = 0; j < n; ++j)
-		{
-			if (j)
+	if (item == Py_None)
+		return copy_buffer_put_int(buf, -1, 4);
+
+	switch (pgtype)
+	{
+		case BOOLOID:
 			{
-				*bufpt++ = '\t'; --bufsiz;
-			}
+				int b = PyObject_IsTrue(item);
 
-			item = getsubitem(sublist, j);
+				if (b < 0)
+					return -1;
+				return copy_buffer_put_int(buf, 1, 4) < 0 ? -1 :
+					copy_buffer_put_int(buf, b, 1);
+			}
 
-			/* convert item to string and append to buffer */
-			if (item == Py_None)
+		case INT2OID:
+		case INT4OID:
+		case INT8OID:
+		case OIDOID:
 			{
-				if (bufsiz > 2)
+				int size = pgtype == INT2OID ? 2 : pgtype == INT8OID ? 8 : 4;
+
+				if (!(PyInt_Check(item) || PyLong_Check(item)))
+					goto bad_type;
+				v = PyLong_AsLongLong(item);
+				if (v == -1 && PyErr_Occurred())
+					return -1;
+				if ((size == 2 && (v < SHRT_MIN || v > SHRT_MAX)) ||
+					(size == 4 && pgtype == OIDOID
+						&& (v < 0 || v > UINT_MAX)) ||
+					(size == 4 && pgtype != OIDOID
+						&& (v < INT_MIN || v > INT_MAX)))
 				{
-					*bufpt++ = '\\'; *bufpt++ = 'N';
-					bufsiz -= 2;
+					PyErr_SetString(PyExc_OverflowError,
+						"Integer value out of range");
+					return -1;
 				}
-				else
-					bufsiz = 0;
+				return copy_buffer_put_int(buf, size, 4) < 0 ? -1 :
+					copy_buffer_put_int(buf, v, size);
 			}
-			else if (PyBytes_Check(item))
+
+		case FLOAT4OID:
+		case FLOAT8OID:
 			{
-				const char* t = PyBytes_AsString(item);
-				while (*t && bufsiz)
+				double	d = PyFloat_AsDouble(item);
+
+				if (d == -1.0 && PyErr_Occurred())
+					return -1;
+				if (pgtype == FLOAT4OID)
 				{
-					if (*t == '\\' || *t == '\t' || *t == '\n')
-					{
-						*bufpt++ = '\\'; --bufsiz;
-						if (!bufsiz) break;
-					}
-					*bufpt++ = *t++; --bufsiz;
+					union { float f; int i; } u;
+
+					u.f = (float) d;
+					return copy_buffer_put_int(buf, 4, 4) < 0 ? -1 :
+						copy_buffer_put_int(buf, u.i, 4);
+				}
+				else
+				{
+					union { double d; PY_LONG_LONG i; } u;
+
+					u.d = d;
+					return copy_buffer_put_int(buf, 8, 4) < 0 ? -1 :
+						copy_buffer_put_int(buf, u.i, 8);
 				}
 			}
-			else if (PyUnicode_Check(item))
+
+		case NUMERICOID:
 			{
-				PyObject *s = get_encoded_string(item, encoding);
-				if (!s)
+				PyObject   *str;
+				int			ret;
+
+				if (PyBytes_Check(item) || PyUnicode_Check(item))
 				{
-					PyMem_Free(buffer);
-					return NULL; /* pass the UnicodeEncodeError */
+					Py_INCREF(item);
+					str = item;
 				}
-				const char* t = PyBytes_AsString(s);
-				while (*t && bufsiz)
+				else if (!(str = PyFloat_Check(item) ?
+						PyObject_Repr(item) : PyObject_Str(item)))
+					return -1;
+				if (PyUnicode_Check(str))
 				{
-					if (*t == '\\' || *t == '\t' || *t == '\n')
-					{
-						*bufpt++ = '\\'; --bufsiz;
-						if (!bufsiz) break;
-					}
-					*bufpt++ = *t++; --bufsiz;
+					PyObject *b = PyUnicode_AsASCIIString(str);
+
+					Py_DECREF(str);
+					if (!(str = b))
+						return -1;
 				}
-				Py_DECREF(s);
+				ret = copy_buffer_put_numeric(buf, PyBytes_AsString(str));
+				Py_DECREF(str);
+				return ret;
 			}
-			else if (PyInt_Check(item) || PyLong_Check(item))
+
+		case DATEOID:
+			if (!PyDate_Check(item) || PyDateTime_Check(item))
+				goto bad_type;
+			return copy_buffer_put_int(buf, 4, 4) < 0 ? -1 :
+				copy_buffer_put_int(buf, date_to_pg_days(
+					PyDateTime_GET_YEAR(item), PyDateTime_GET_MONTH(item),
+					PyDateTime_GET_DAY(item)), 4);
+
+		case TIMEOID:
+		case TIMETZOID:
+			if (!PyTime_Check(item))
+				goto bad_type;
+			v = ((PyDateTime_TIME_GET_HOUR(item) * 60
+				+ PyDateTime_TIME_GET_MINUTE(item)) * 60
+				+ PyDateTime_TIME_GET_SECOND(item)) * 1000000LL
+				+ PyDateTime_TIME_GET_MICROSECOND(item);
+			if (pgtype == TIMEOID)
+				return copy_buffer_put_int(buf, 8, 4) < 0 ? -1 :
+					copy_buffer_put_int(buf, v, 8);
+			else
 			{
-				PyObject* s = PyObject_Str(item);
-				const char* t = PyStr_AsString(s);
-				while (*t && bufsiz)
-				{
-					*bufpt++ = *t++; --bufsiz;
-				}
-				Py_DECREF(s);
+				long offset = get_utc_offset(item);
+
+				if (PyErr_Occurred())
+					return -1;
+				/* the zone is stored in seconds west of UTC */
+				return copy_buffer_put_int(buf, 12, 4) < 0 ||
+					copy_buffer_put_int(buf, v, 8) < 0 ? -1 :
+					copy_buffer_put_int(buf, -offset, 4);
 			}
-			else
+
+		case TIMESTAMPOID:
+		case TIMESTAMPTZOID:
+			if (!PyDateTime_Check(item))
+				goto bad_type;
+			v = ((date_to_pg_days(PyDateTime_GET_YEAR(item),
+				PyDateTime_GET_MONTH(item), PyDateTime_GET_DAY(item)) * 24
+				+ PyDateTime_DATE_GET_HOUR(item)) * 60
+				+ PyDateTime_DATE_GET_MINUTE(item)) * 60
+				+ PyDateTime_DATE_GET_SECOND(item);
+			if (pgtype == TIMESTAMPTZOID)
+			{
+				/* aware values are converted to UTC */
+				v -= get_utc_offset(item);
+				if (PyErr_Occurred())
+					return -1;
+			}
+			v = v * 1000000LL + PyDateTime_DATE_GET_MICROSECOND(item);
+			return copy_buffer_put_int(buf, 8, 4) < 0 ? -1 :
+				copy_buffer_put_int(buf, v, 8);
+
+		case INTERVALOID:
+			if (!PyDelta_Check(item))
+				goto bad_type;
+			v = PyDateTime_DELTA_GET_SECONDS(item) * 1000000LL
+				+ PyDateTime_DELTA_GET_MICROSECONDS(item);
+			return copy_buffer_put_int(buf, 16, 4) < 0 ||
+				copy_buffer_put_int(buf, v, 8) < 0 ||
+				copy_buffer_put_int(buf,
+					PyDateTime_DELTA_GET_DAYS(item), 4) < 0 ? -1 :
+				copy_buffer_put_int(buf, 0, 4); /* months */
+
+		case UUIDOID:
 			{
-				PyObject* s = PyObject_Repr(item);
-				const char* t = PyStr_AsString(s);
-				while (*t && bufsiz)
+				PyObject   *bytes;
+				int			ret;
+
+				if (PyBytes_Check(item) || PyUnicode_Check(item))
+					goto bad_type;
+				if (!(bytes = PyObject_GetAttrString(item, "bytes")))
 				{
-					if (*t == '\\' || *t == '\t' || *t == '\n')
-					{
-						*bufpt++ = '\\'; --bufsiz;
-						if (!bufsiz) break;
-					}
-					*bufpt++ = *t++; --bufsiz;
+					PyErr_Clear();
+					goto bad_type;
 				}
-				Py_DECREF(s);
+				if (!PyBytes_Check(bytes) || PyBytes_GET_SIZE(bytes) != 16)
+				{
+					Py_DECREF(bytes);
+					goto bad_type;
+				}
+				ret = copy_buffer_put_int(buf, 16, 4) < 0 ? -1 :
+					copy_buffer_put_text(buf, PyBytes_AS_STRING(bytes), 16, 0);
+				Py_DECREF(bytes);
+				return ret;
 			}
 
-			if (bufsiz <= 0)
+		case BYTEAOID:
+			if (!PyBytes_Check(item) && !PyByteArray_Check(item)
+					&& PyObject_CheckBuffer(item))
 			{
-				PyMem_Free(buffer); return PyErr_NoMemory();
+				Py_buffer	view;
+				int			ret;
+
+				if (PyObject_GetBuffer(item, &view, PyBUF_SIMPLE) < 0)
+					return -1;
+				ret = copy_buffer_put_int(buf, view.len, 4) < 0 ? -1 :
+					copy_buffer_put_text(buf, view.buf, view.len, 0);
+				PyBuffer_Release(&view);
+				return ret;
 			}
+			if (PyByteArray_Check(item))
+				return copy_buffer_put_int(buf,
+						PyByteArray_GET_SIZE(item), 4) < 0 ? -1 :
+					copy_buffer_put_text(buf, PyByteArray_AS_STRING(item),
+						PyByteArray_GET_SIZE(item), 0);
+			/* bytes and strings are handled like text */
+			/* fall through */
 
-		}
-
-		*bufpt++ = '\n'; *bufpt = '\0';
-
-		/* sends data */
-		if (PQputline(self->cnx, buffer))
-		{
-			PyErr_SetString(PyExc_IOError, PQerrorMessage(self->cnx));
-			PQendcopy(self->cnx);
-			PyMem_Free(buffer);
-			return NULL;
-		}
-	}
+		case TEXTOID:
+		case VARCHAROID:
+		case BPCHAROID:
+		case CHAROID:
+		case NAMEOID:
+		case JSONOID:
+		case JSONBOID:
+			{
+				PyObject   *str;
+				char	   *t;
+				Py_ssize_t	size;
+				int			ret;
 
-	/* ends query */
-	if (PQputline(self->cnx, "\\.\n"))
-	{
-		PyErr_SetString(PyExc_IOError, PQerrorMessage(self->cnx));
-		PQendcopy(self->cnx);
-		PyMem_Free(buffer);
-		return NULL;
-	}
+				if (PyBytes_Check(item))
+				{
+					Py_INCREF(item);
+					str = item;
+				}
+				else if (PyUnicode_Check(item))
+				{
+					if (!(str = get_encoded_string(item, encoding)))
+						return -1;
+				}
+				else
+					goto bad_type;
+				PyBytes_AsStringAndSize(str, &t, &size);
+				if (pgtype == JSONBOID)
+					/* jsonb has a version number as first byte */
+					ret = copy_buffer_put_int(buf, size + 1, 4) < 0 ||
+						copy_buffer_put_int(buf, 1, 1) < 0 ? -1 :
+						copy_buffer_put_text(buf, t, size, 0);
+				else
+					ret = copy_buffer_put_int(buf, size, 4) < 0 ? -1 :
+						copy_buffer_put_text(buf, t, size, 0);
+				Py_DECREF(str);
+				return ret;
+			}
 
-	if (PQendcopy(self->cnx))
-	{
-		PyErr_SetString(PyExc_IOError, PQerrorMessage(self->cnx));
-		PyMem_Free(buffer);
-		return NULL;
+		default:
+			PyErr_Format(PyExc_TypeError,
+				"Binary copy does not support the type with oid %d",
+				(int) pgtype);
+			return -1;
 	}
 
-	PyMem_Free(buffer);
-
-	/* no error : returns nothing */
-	Py_INCREF(Py_None);
-	return Py_None;
+bad_type:
+	PyErr_Format(PyExc_TypeError,
+		"Cannot copy %s value to the column with type oid %d",
+		Py_TYPE(item)->tp_name, (int) pgtype);
+	return -1;
 }
 
-/* get transaction state */
-static char connTransaction__doc__[] =
-"transaction() -- return the current transaction status";
+/* insert table */
+static char connInsertTable__doc__[] =
+"inserttable(table, data, [columns], [binary]) -- insert iterable into table\n\n"
+"The data can be any iterable of rows, and each row must be a sequence\n"
+"of values for the given columns, or for all columns of the table in\n"
+"the same order as in the table.  If binary is set, the data is sent in\n"
+"binary format, encoded according to the types of the table columns.\n"
+"Returns the number of inserted rows.\n";
 
 static PyObject *
-connTransaction(connObject *self, PyObject *noargs)
+connInsertTable(connObject *self, PyObject *args, PyObject *dict)
 {
+	static const char *kwlist[] = {
+		"table", "data", "columns", "binary", NULL};
+	PGresult	*result;
+	PyObject	*rows, *columns = NULL, *iter, *row;
+	copyBuffer	buf = {NULL, 0, 0}, cols = {NULL, 0, 0};
+	char		*table;
+	int			encoding, binary = 0;
+	Oid			*types = NULL;
+	long		num_rows = 0;
+	Py_ssize_t	j, n = -1;
+
 	if (!self->cnx)
 	{
 		PyErr_SetString(PyExc_TypeError, "Connection is not valid");
 		return NULL;
 	}
 
-	return PyInt_FromLong(PQtransactionStatus(self->cnx));
-}
+	/* gets arguments */
+	if (!PyArg_ParseTupleAndKeywords(args, dict, "sO|Oi", (char **) kwlist,
+		&table, &rows, &columns, &binary))
+	{
+		PyErr_SetString(PyExc_TypeError,
+			"Method inserttable() expects a string and an iterable"
+			" as arguments, and optionally a sequence of columns");
+		return NULL;
+	}
 
-/* get parameter setting */
-static char connParameter__doc__[] =
-"parameter(name) -- look up a current parameter setting";
+	if (PyBytes_Check(rows) || PyUnicode_Check(rows) ||
+		!(iter = PyObject_GetIter(rows)))
+	{
+		PyErr_SetString(PyExc_TypeError,
+			"Method inserttable() expects some kind of iterable"
+			" as second argument");
+		return NULL;
+	}
+
+	encoding = PQclientEncoding(self->cnx);
+
+	/* builds the column list */
+	if (columns && columns != Py_None)
+	{
+		PyObject   *seq;
+
+		if (PyBytes_Check(columns) || PyUnicode_Check(columns) ||
+			!(seq = PySequence_Fast(columns, "")))
+		{
+			PyErr_SetString(PyExc_TypeError,
+				"Method inserttable() expects a sequence of columns"
+				" as third argument");
+			goto error;
+		}
+		n = PySequence_Fast_GET_SIZE(seq);
+		for (j = 0; j < n; ++j)
+		{
+			PyObject   *col = PySequence_Fast_GET_ITEM(seq, j);
+			char	   *t;
+			Py_ssize_t	size;
+			int			ret;
+
+			if (PyBytes_Check(col))
+				Py_INCREF(col);
+			else if (PyUnicode_Check(col))
+				col = get_encoded_string(col, encoding);
+			else
+			{
+				PyErr_SetString(PyExc_TypeError,
+					"The columns must be given as strings");
+				col = NULL;
+			}
+			if (!col)
+			{
+				Py_DECREF(seq);
+				goto error;
+			}
+			PyBytes_AsStringAndSize(col, &t, &size);
+			ret = copy_buffer_put_text(&cols, j ? "," : "", j ? 1 : 0, 0);
+			if (!ret)
+				ret = copy_buffer_put_text(&cols, t, (size_t) size, 0);
+			Py_DECREF(col);
+			if (ret < 0)
+			{
+				Py_DECREF(seq);
+				goto error;
+			}
+		}
+		Py_DECREF(seq);
+		if (!n)
+			n = -1;
+	}
+	if (copy_buffer_put_text(&cols, "", 1, 0) < 0) /* terminate string */
+		goto error;
+
+	if (binary)
+	{
+		/* gets the types of the columns */
+		if (copy_buffer_put_text(&buf, "select ", 7, 0) < 0 ||
+			copy_buffer_put_text(&buf, n < 0 ? "*" : cols.data,
+				n < 0 ? 1 : strlen(cols.data), 0) < 0 ||
+			copy_buffer_put_text(&buf, " from ", 6, 0) < 0 ||
+			copy_buffer_put_text(&buf, table, strlen(table), 0) < 0 ||
+			copy_buffer_put_text(&buf, " limit 0", 9, 0) < 0) /* with \0 */
+			goto error;
+
+		Py_BEGIN_ALLOW_THREADS
+		result = PQexec(self->cnx, buf.data);
+		Py_END_ALLOW_THREADS
+
+		buf.len = 0;
+
+		if (!result)
+		{
+			PyErr_SetString(PyExc_ValueError, PQerrorMessage(self->cnx));
+			goto error;
+		}
+		if (PQresultStatus(result) != PGRES_TUPLES_OK)
+		{
+			set_error(ProgrammingError, "Cannot copy data",
+				self->cnx, result);
+			PQclear(result);
+			goto error;
+		}
+		n = PQnfields(result);
+		if (!(types = PyMem_Malloc(sizeof(Oid) * (n ? n : 1))))
+		{
+			PQclear(result);
+			PyErr_NoMemory();
+			goto error;
+		}
+		for (j = 0; j < n; ++j)
+			types[j] = PQftype(result, (int) j);
+		PQclear(result);
+	}
+
+	/* builds the copy command */
+	if (copy_buffer_put_text(&buf, "copy ", 5, 0) < 0 ||
+		copy_buffer_put_text(&buf, table, strlen(table), 0) < 0 ||
+		(*cols.data && (copy_buffer_put_text(&buf, " (", 2, 0) < 0 ||
+		copy_buffer_put_text(&buf, cols.data, strlen(cols.data), 0) < 0 ||
+		copy_buffer_put_text(&buf, ")", 1, 0) < 0)) ||
+		copy_buffer_put_text(&buf, binary ? " from stdin (format binary)" :
+			" from stdin", binary ? 28 : 12, 0) < 0) /* with \0 */
+		goto error;
+
+	/* starts query */
+	Py_BEGIN_ALLOW_THREADS
+	result = PQexec(self->cnx, buf.data);
+	Py_END_ALLOW_THREADS
+
+	buf.len = 0;
+
+	if (!result)
+	{
+		PyErr_SetString(PyExc_ValueError, PQerrorMessage(self->cnx));
+		goto error;
+	}
+	if (PQresultStatus(result) != PGRES_COPY_IN)
+	{
+		set_error(ProgrammingError, "Cannot copy data", self->cnx, result);
+		PQclear(result);
+		goto error;
+	}
+	PQclear(result);
+
+	/* the binary format starts with a signature and two empty words */
+	if (binary && (copy_buffer_put_text(&buf, "PGCOPY\n\377\r\n", 11, 0) < 0
+		|| copy_buffer_put_int(&buf, 0, 4) < 0
+		|| copy_buffer_put_int(&buf, 0, 4) < 0))
+		goto abort;
+
+	/* feed table, sending the data in large chunks */
+	while ((row = PyIter_Next(iter)))
+	{
+		PyObject   *seq;
+		Py_ssize_t	m;
+
+		if (PyBytes_Check(row) || PyUnicode_Check(row) ||
+			!(seq = PySequence_Fast(row, "")))
+		{
+			PyErr_SetString(PyExc_TypeError,
+				"Second arg must contain some kind of arrays");
+			Py_DECREF(row);
+			goto abort;
+		}
+		Py_DECREF(row);
+
+		m = PySequence_Fast_GET_SIZE(seq);
+		if (n < 0)
+			n = m;
+		else if (m != n)
+		{
+			PyErr_SetString(PyExc_TypeError,
+				"Arrays contained in second arg must have same size");
+			Py_DECREF(seq);
+			goto abort;
+		}
+
+		if (binary)
+		{
+			if (copy_buffer_put_int(&buf, m, 2) < 0)
+			{
+				Py_DECREF(seq);
+				goto abort;
+			}
+			for (j = 0; j < m; ++j)
+			{
+				if (copy_buffer_put_binary(&buf,
+						PySequence_Fast_GET_ITEM(seq, j),
+						types[j], encoding) < 0)
+				{
+					Py_DECREF(seq);
+					goto abort;
+				}
+			}
+		}
+		else
+		{
+			for (j = 0; j < m; ++j)
+			{
+				if ((j && copy_buffer_put_text(&buf, "\t", 1, 0) < 0) ||
+					copy_buffer_put_value(&buf,
+						PySequence_Fast_GET_ITEM(seq, j), encoding) < 0)
+				{
+					Py_DECREF(seq);
+					goto abort;
+				}
+			}
+			if (copy_buffer_put_text(&buf, "\n", 1, 0) < 0)
+			{
+				Py_DECREF(seq);
+				goto abort;
+			}
+		}
+		Py_DECREF(seq);
+		++num_rows;
+
+		if (buf.len >= COPY_BUFFER_SIZE && copy_buffer_flush(self, &buf) < 0)
+			goto abort;
+	}
+	if (PyErr_Occurred()) /* error in the iterator */
+		goto abort;
+
+	/* the binary format ends with a field count of -1 */
+	if (binary && copy_buffer_put_int(&buf, -1, 2) < 0)
+		goto abort;
+
+	/* ends query */
+	if (copy_buffer_flush(self, &buf) < 0)
+		goto abort;
+	if (copy_end(self, NULL) < 0)
+		goto error;
+
+	Py_DECREF(iter);
+	PyMem_Free(buf.data);
+	PyMem_Free(cols.data);
+	PyMem_Free(types);
+
+	/* no error : returns number of inserted rows */
+	return PyInt_FromLong(num_rows);
+
+abort:
+	copy_end(self, "Error in inserttable()");
+error:
+	Py_DECREF(iter);
+	PyMem_Free(buf.data);
+	PyMem_Free(cols.data);
+	PyMem_Free(types);
+	return NULL;
+}
+
+/* get transaction state */
+static char connTransaction__doc__[] =
+"transaction() -- return the current transaction status";
+
+static PyObject *
+connTransaction(connObject *self, PyObject *noargs)
+{
+	if (!self->cnx)
+	{
+		PyErr_SetString(PyExc_TypeError, "Connection is not valid");
+		return NULL;
+	}
+
+	return PyInt_FromLong(PQtransactionStatus(self->cnx));
+}
+
+/* get parameter setting */
+static char connParameter__doc__[] =
+"parameter(name) -- look up a current parameter setting";
 
 static PyObject *
 connParameter(connObject *self, PyObject *args)
@@ -2824,6 +4273,21 @@ date_format_to_style(const char *s)
 	}
 }
 
+/* get the date format of a connection (internal use only)
+   The date format is cached in the connection object. */
+static const char *
+get_date_format(connObject *self)
+{
+	const char *fmt = self->date_format;
+
+	if (!fmt && self->cnx)
+	{
+		fmt = date_style_to_format(PQparameterStatus(self->cnx, "DateStyle"));
+		self->date_format = fmt; /* cache the result */
+	}
+	return fmt;
+}
+
 /* get current date format */
 static char connDateFormat__doc__[] =
 "date_format() -- return the current date format";
@@ -2839,131 +4303,679 @@ connDateFormat(connObject *self, PyObject *noargs)
 		return NULL;
 	}
 
-	/* check if the date format is cached in the connection */
-	fmt = self->date_format;
-	if (!fmt)
-	{
-		fmt = date_style_to_format(PQparameterStatus(self->cnx, "DateStyle"));
-		self->date_format = fmt; /* cache the result */
-	}
+	fmt = get_date_format(self);
 
 	return PyStr_FromString(fmt);
 }
 
-#ifdef ESCAPING_FUNCS
+/* kinds of date and time values that can be cast natively */
+#define DATETIME_DATE 1
+#define DATETIME_TIME 2
+#define DATETIME_TIMETZ 3
+#define DATETIME_TIMESTAMP 4
+#define DATETIME_TIMESTAMPTZ 5
+#define DATETIME_INTERVAL 6
 
-/* escape literal */
-static char connEscapeLiteral__doc__[] =
-"escape_literal(str) -- escape a literal constant for use within SQL";
+/* the module functions for these kinds, used for detecting native casts */
+static PyObject *datetime_casts[DATETIME_INTERVAL + 1];
 
-static PyObject *
-connEscapeLiteral(connObject *self, PyObject *string)
+/* time zone abbreviations used in the Postgres output of timestamptz */
+static const struct {
+	const char *name;
+	int			offset; /* offset in hours east of UTC */
+} timezone_names[] = {
+	{"CET", 1}, {"EET", 2}, {"EST", -5}, {"GMT", 0}, {"HST", -10},
+	{"MET", 1}, {"MST", -7}, {"UCT", 0}, {"UTC", 0}, {"WET", 0}};
+
+/* month names used in the Postgres output of timestamps */
+static const char *month_names[] = {"Jan", "Feb", "Mar", "Apr", "May",
+	"Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"};
+
+/* parse an unsigned decimal number (internal use only)
+   Returns the number of digits, or zero if there is no number. */
+static int
+parse_number(const char **s, PY_LONG_LONG *value)
 {
-	PyObject   *tmp_obj = NULL, /* auxiliary string object */
-			   *to_obj; /* string object to return */
-	char 	   *from, /* our string argument as encoded string */
-			   *to; /* the result as encoded string */
-	Py_ssize_t 	from_length; /* length of string */
-	size_t		to_length; /* length of result */
-	int			encoding = -1; /* client encoding */
+	const char *t = *s;
+	PY_LONG_LONG v = 0;
+	int			n;
 
-	if (PyBytes_Check(string))
+	while (isdigit((unsigned char) *t))
 	{
-		PyBytes_AsStringAndSize(string, &from, &from_length);
+		if (t - *s >= 18) return 0; /* too many digits */
+		v = 10 * v + (*t++ - '0');
 	}
-	else if (PyUnicode_Check(string))
+	n = (int) (t - *s);
+	if (n)
 	{
-		encoding = PQclientEncoding(self->cnx);
-		tmp_obj = get_encoded_string(string, encoding);
-		if (!tmp_obj) return NULL; /* pass the UnicodeEncodeError */
-		PyBytes_AsStringAndSize(tmp_obj, &from, &from_length);
+		*value = v;
+		*s = t;
 	}
-	else
+	return n;
+}
+
+/* parse a decimal fraction as microseconds (internal use only) */
+static PY_LONG_LONG
+parse_micro(const char **s)
+{
+	const char *t = *s;
+	PY_LONG_LONG v = 0;
+	int			n = 0;
+
+	if (*t == '.')
 	{
-		PyErr_SetString(PyExc_TypeError,
-			"Method escape_literal() expects a string as argument");
-		return NULL;
+		while (isdigit((unsigned char) *++t))
+		{
+			if (n < 6)
+			{
+				v = 10 * v + (*t - '0');
+				++n;
+			}
+		}
+		while (n++ < 6) v *= 10;
+		*s = t;
 	}
+	return v;
+}
 
-	to = PQescapeLiteral(self->cnx, from, (size_t)from_length);
-	to_length = strlen(to);
+/* skip spaces (internal use only) */
+static const char *
+skip_spaces(const char *s)
+{
+	while (*s == ' ') ++s;
+	return s;
+}
 
-	Py_XDECREF(tmp_obj);
+/* parse a time in the format hh:mm:ss[.ffffff] (internal use only)
+   Returns 0 on success and -1 if the time could not be parsed. */
+static int
+parse_time(const char **s, int *hour, int *min, int *sec, int *usec)
+{
+	const char *t = *s;
+	PY_LONG_LONG v;
+
+	if (!parse_number(&t, &v) || v > 99 || *t++ != ':') return -1;
+	*hour = (int) v;
+	if (!parse_number(&t, &v) || v > 99 || *t++ != ':') return -1;
+	*min = (int) v;
+	if (!parse_number(&t, &v) || v > 99) return -1;
+	*sec = (int) v;
+	*usec = (int) parse_micro(&t);
+	*s = t;
+	return 0;
+}
+
+/* parse a time zone (internal use only)
+   The time zone can be a numeric offset like +hh, +hhmm or +hh:mm[:ss],
+   or one of the abbreviations used by Postgres.  Unknown abbreviations
+   are taken as UTC.  Returns 0 on success and -1 on failure. */
+static int
+parse_timezone(const char **s, int *offset)
+{
+	const char *t = *s;
 
-	if (encoding == -1)
-		to_obj = PyBytes_FromStringAndSize(to, to_length);
+	if (*t == '+' || *t == '-')
+	{
+		int			sign = *t++ == '-' ? -1 : 1, n;
+		PY_LONG_LONG h, m = 0, sec = 0;
+
+		if (!(n = parse_number(&t, &h)) || n > 4) return -1;
+		if (n > 2)
+		{
+			m = h % 100;
+			h /= 100;
+		}
+		else if (*t == ':')
+		{
+			++t;
+			if (parse_number(&t, &m) != 2) return -1;
+			if (*t == ':')
+			{
+				++t;
+				if (parse_number(&t, &sec) != 2) return -1;
+			}
+		}
+		*offset = sign * (int) (3600 * h + 60 * m + sec);
+	}
 	else
-		to_obj = get_decoded_string(to, to_length, encoding);
-	if (to)
-		PQfreemem(to);
-	return to_obj;
-}
+	{
+		const char *name = t;
+		size_t		i, n;
 
-/* escape identifier */
-static char connEscapeIdentifier__doc__[] =
-"escape_identifier(str) -- escape an identifier for use within SQL";
+		while (isalpha((unsigned char) *t)) ++t;
+		n = (size_t) (t - name);
+		if (!n) return -1;
+		*offset = 0;
+		for (i = 0; i < sizeof(timezone_names) / sizeof(*timezone_names); ++i)
+		{
+			if (n == 3 && !strncmp(name, timezone_names[i].name, 3))
+			{
+				*offset = 3600 * timezone_names[i].offset;
+				break;
+			}
+		}
+	}
+	*s = t;
+	return 0;
+}
 
-static PyObject *
-connEscapeIdentifier(connObject *self, PyObject *string)
+/* parse a date in one of the Postgres date styles (internal use only)
+   The ISO and German styles are unambiguous.  The order of month and day
+   in the SQL and Postgres styles is taken from the given date format,
+   assuming MDY if the date format is not known.  Years with more than
+   four digits are returned as 10000.  Returns 0 on success, -1 on failure. */
+static int
+parse_date(const char **s, const char *fmt, int *year, int *month, int *day)
 {
-	PyObject   *tmp_obj = NULL, /* auxiliary string object */
-			   *to_obj; /* string object to return */
-	char 	   *from, /* our string argument as encoded string */
-			   *to; /* the result as encoded string */
-	Py_ssize_t 	from_length; /* length of string */
-	size_t		to_length; /* length of result */
-	int			encoding = -1; /* client encoding */
+	const char *t = *s;
+	PY_LONG_LONG a, b, c, y, m, d;
+	int			n;
+	char		sep;
 
-	if (PyBytes_Check(string))
+	if (!(n = parse_number(&t, &a))) return -1;
+	sep = *t++;
+	if (sep != '-' && sep != '/' && sep != '.') return -1;
+	if (!parse_number(&t, &b) || *t++ != sep || !parse_number(&t, &c))
+		return -1;
+	if (sep == '-' && n > 2) /* ISO, year-month-day */
 	{
-		PyBytes_AsStringAndSize(string, &from, &from_length);
+		y = a; m = b; d = c;
 	}
-	else if (PyUnicode_Check(string))
+	else if (sep == '.' || (fmt && fmt[1] == 'd')) /* day-month-year */
 	{
-		encoding = PQclientEncoding(self->cnx);
-		tmp_obj = get_encoded_string(string, encoding);
-		if (!tmp_obj) return NULL; /* pass the UnicodeEncodeError */
-		PyBytes_AsStringAndSize(tmp_obj, &from, &from_length);
+		y = c; m = b; d = a;
 	}
-	else
+	else /* month-day-year */
 	{
-		PyErr_SetString(PyExc_TypeError,
-			"Method escape_identifier() expects a string as argument");
-		return NULL;
+		y = c; m = a; d = b;
 	}
+	if (m > 99 || d > 99) return -1;
+	*year = y > 9999 ? 10000 : (int) y;
+	*month = (int) m;
+	*day = (int) d;
+	*s = t;
+	return 0;
+}
 
-	to = PQescapeIdentifier(self->cnx, from, (size_t)from_length);
-	to_length = strlen(to);
+/* parse a timestamp in one of the Postgres date styles (internal use only)
+   The values are stored as year, month, day, hour, minute, second and
+   microsecond.  Returns 0 on success and -1 on failure. */
+static int
+parse_timestamp(const char **s, const char *fmt, int *v)
+{
+	const char *t = *s;
+	PY_LONG_LONG n;
 
-	Py_XDECREF(tmp_obj);
+	if (isalpha((unsigned char) *t)) /* Postgres style with week day */
+	{
+		int			day_first, k;
 
-	if (encoding == -1)
-		to_obj = PyBytes_FromStringAndSize(to, to_length);
+		while (isalpha((unsigned char) *t)) ++t;
+		t = skip_spaces(t);
+		day_first = !isalpha((unsigned char) *t);
+		for (k = 0; k < 2; ++k)
+		{
+			if (k == day_first) /* month name */
+			{
+				for (v[1] = 0; v[1] < 12; ++v[1])
+					if (!strncmp(t, month_names[v[1]], 3)) break;
+				if (v[1]++ == 12 || isalpha((unsigned char) t[3]))
+					return -1;
+				t += 3;
+			}
+			else /* day number */
+			{
+				if (!parse_number(&t, &n) || n > 99) return -1;
+				v[2] = (int) n;
+			}
+			t = skip_spaces(t);
+		}
+		if (parse_time(&t, v + 3, v + 4, v + 5, v + 6) < 0) return -1;
+		t = skip_spaces(t);
+		if (!parse_number(&t, &n)) return -1;
+		v[0] = n > 9999 ? 10000 : (int) n;
+	}
 	else
-		to_obj = get_decoded_string(to, to_length, encoding);
-	if (to)
-		PQfreemem(to);
-	return to_obj;
+	{
+		if (parse_date(&t, fmt, v, v + 1, v + 2) < 0) return -1;
+		if (*t == ' ')
+		{
+			t = skip_spaces(t);
+			if (parse_time(&t, v + 3, v + 4, v + 5, v + 6) < 0) return -1;
+		}
+		else
+			v[3] = v[4] = v[5] = v[6] = 0;
+	}
+	*s = t;
+	return 0;
 }
 
-#endif	/* ESCAPING_FUNCS */
-
-/* escape string */
-static char connEscapeString__doc__[] =
-"escape_string(str) -- escape a string for use within SQL";
-
+/* get a time zone with the given offset in seconds (internal use only)
+   The last time zone is cached since usually all values of a result
+   have the same time zone. */
 static PyObject *
-connEscapeString(connObject *self, PyObject *string)
+get_timezone(int offset)
 {
-	PyObject   *tmp_obj = NULL, /* auxiliary string object */
-			   *to_obj; /* string object to return */
-	char 	   *from, /* our string argument as encoded string */
-			   *to; /* the result as encoded string */
-	Py_ssize_t 	from_length; /* length of string */
-	size_t		to_length; /* length of result */
-	int			encoding = -1; /* client encoding */
+	static PyObject *last_timezone = NULL;
+	static int	last_offset = 0;
+	PyObject   *delta, *tz;
 
-	if (PyBytes_Check(string))
+	if (!timezone_type)
+	{
+		PyErr_SetString(NotSupportedError,
+			"Time zones are not supported by this Python version");
+		return NULL;
+	}
+	if (last_timezone && offset == last_offset)
+	{
+		Py_INCREF(last_timezone);
+		return last_timezone;
+	}
+	if (!(delta = PyDelta_FromDSU(0, offset, 0)))
+		return NULL;
+	tz = PyObject_CallFunctionObjArgs(timezone_type, delta, NULL);
+	Py_DECREF(delta);
+	if (tz)
+	{
+		Py_XDECREF(last_timezone);
+		Py_INCREF(tz);
+		last_timezone = tz;
+		last_offset = offset;
+	}
+	return tz;
+}
+
+/* limits of the interval fields, these are larger than allowed by Postgres,
+   but small enough to prevent overflows when adding up the fields */
+#define MAX_INTERVAL_FIELD 10000000000000LL
+
+/* cast an interval in one of the Postgres interval styles (internal use only)
+   The interval styles can be distinguished by their syntax, so there is
+   no need to consult the IntervalStyle setting of the connection. */
+static PyObject *
+cast_interval(const char *s)
+{
+	static const char *units[] = {
+		"year", "mon", "day", "hour", "min", "sec"};
+	PY_LONG_LONG v[7] = {0, 0, 0, 0, 0, 0, 0}, /* years ... usecs */
+				n, m, f;
+	const char *t = s;
+	int			k, sign;
+
+	if (*t == 'P') /* ISO 8601 */
+	{
+		int			time_part = 0;
+
+		while (*++t)
+		{
+			if (*t == 'T' && !time_part)
+			{
+				time_part = 1;
+				continue;
+			}
+			sign = *t == '-' ? -1 : 1;
+			if (*t == '+' || *t == '-') ++t;
+			if (!parse_number(&t, &n)) goto invalid;
+			f = sign * parse_micro(&t);
+			n *= sign;
+			switch (*t)
+			{
+				case 'Y':
+					k = time_part ? -1 : 0; break;
+				case 'M':
+					k = time_part ? 4 : 1; break;
+				case 'W':
+					n *= 7; /* fall through */
+				case 'D':
+					k = time_part ? -1 : 2; break;
+				case 'H':
+					k = time_part ? 3 : -1; break;
+				case 'S':
+					k = time_part ? 5 : -1; break;
+				default:
+					k = -1;
+			}
+			if (k < 0 || (f && k != 5)) goto invalid;
+			v[k] += n;
+			v[6] += f;
+		}
+	}
+	else /* SQL standard, Postgres or Postgres verbose */
+	{
+		int			found = 0, ago = 0;
+
+		if (*t == '@') ++t; /* verbose */
+		for (;;)
+		{
+			t = skip_spaces(t);
+			if (!*t) break;
+			if (ago) goto invalid;
+			if (!strncmp(t, "ago", 3) && !isalpha((unsigned char) t[3]))
+			{
+				ago = 1;
+				t += 3;
+				continue;
+			}
+			sign = *t == '-' ? -1 : 1;
+			if (*t == '+' || *t == '-') ++t;
+			if (!parse_number(&t, &n)) goto invalid;
+			if (*t == ':') /* time as hh:mm:ss[.ffffff] */
+			{
+				++t;
+				if (!parse_number(&t, &m) || *t++ != ':') goto invalid;
+				v[3] += sign * n;
+				v[4] += sign * m;
+				if (!parse_number(&t, &n)) goto invalid;
+				v[5] += sign * n;
+				v[6] += sign * parse_micro(&t);
+			}
+			else if (*t == '-') /* years and months as y-m */
+			{
+				++t;
+				if (!parse_number(&t, &m)) goto invalid;
+				v[0] += sign * n;
+				v[1] += sign * m;
+			}
+			else /* number with unit, or days without unit */
+			{
+				f = sign * parse_micro(&t);
+				n *= sign;
+				t = skip_spaces(t);
+				if (isalpha((unsigned char) *t)
+					&& strncmp(t, "ago", 3)) /* unit */
+				{
+					const char *u = t;
+					size_t		len, ulen;
+
+					while (isalpha((unsigned char) *t)) ++t;
+					len = (size_t) (t - u);
+					for (k = 0; k < 6; ++k)
+					{
+						ulen = strlen(units[k]);
+						if ((len == ulen || (len == ulen + 1 && u[ulen] == 's'))
+								&& !strncmp(u, units[k], ulen))
+							break;
+					}
+					if (k == 6 || (f && k != 5)) goto invalid;
+				}
+				else /* days */
+				{
+					if (f) goto invalid;
+					k = 2;
+				}
+				v[k] += n;
+				v[6] += f;
+			}
+			found = 1;
+		}
+		if (!found) goto invalid;
+		if (ago)
+			for (k = 0; k < 7; ++k) v[k] = -v[k];
+	}
+
+	for (k = 0; k < 7; ++k)
+	{
+		if (v[k] > MAX_INTERVAL_FIELD || v[k] < -MAX_INTERVAL_FIELD)
+			goto overflow;
+	}
+	/* compute days, seconds and microseconds */
+	v[2] += 365 * v[0] + 30 * v[1];
+	v[5] += 3600 * v[3] + 60 * v[4] + v[6] / 1000000;
+	v[6] %= 1000000;
+	if (v[6] < 0)
+	{
+		v[6] += 1000000;
+		--v[5];
+	}
+	v[2] += v[5] / 86400;
+	v[5] %= 86400;
+	if (v[5] < 0)
+	{
+		v[5] += 86400;
+		--v[2];
+	}
+	if (v[2] > 999999999 || v[2] < -999999999)
+		goto overflow;
+	return PyDelta_FromDSU((int) v[2], (int) v[5], (int) v[6]);
+
+invalid:
+	PyErr_Format(PyExc_ValueError, "Cannot parse interval: %s", s);
+	return NULL;
+
+overflow:
+	PyErr_Format(PyExc_OverflowError, "Interval out of range: %s", s);
+	return NULL;
+}
+
+/* cast a date, time or timestamp value of the given kind (internal use only)
+   The date format is used for dates and timestamps only.  If it is not
+   known, the order of day and month is guessed from the value.  The special
+   values infinity and -infinity and dates before Christ are cast to the
+   maximum and minimum values of the corresponding Python types. */
+static PyObject *
+cast_datetime(const char *s, int kind, const char *fmt)
+{
+	static const char *names[] = {NULL,
+		"date", "time", "time", "timestamp", "timestamp", "interval"};
+	PyObject   *tz, *ret;
+	PyTypeObject *type;
+	const char *t = s;
+	int			v[7], offset = 0;
+
+	switch (kind)
+	{
+		case DATETIME_INTERVAL:
+			return cast_interval(s);
+		case DATETIME_TIME:
+		case DATETIME_TIMETZ:
+			if (parse_time(&t, v + 3, v + 4, v + 5, v + 6) < 0)
+				goto invalid;
+			if (kind == DATETIME_TIME)
+			{
+				if (*t) goto invalid;
+				return PyTime_FromTime(v[3], v[4], v[5], v[6]);
+			}
+			if (*t && (parse_timezone(&t, &offset) < 0 || *t))
+				goto invalid;
+			if (!(tz = get_timezone(offset)))
+				return NULL;
+			ret = PyDateTimeAPI->Time_FromTime(v[3], v[4], v[5], v[6],
+				tz, PyDateTimeAPI->TimeType);
+			Py_DECREF(tz);
+			return ret;
+	}
+
+	type = kind == DATETIME_DATE ?
+		PyDateTimeAPI->DateType : PyDateTimeAPI->DateTimeType;
+	if (!strcmp(s, "infinity"))
+		return PyObject_GetAttrString((PyObject *) type, "max");
+	t = s + strlen(s);
+	if (!strcmp(s, "-infinity") || (t - s > 3 && !strcmp(t - 3, " BC")))
+		return PyObject_GetAttrString((PyObject *) type, "min");
+	t = s;
+	if (kind == DATETIME_DATE)
+	{
+		if (parse_date(&t, fmt, v, v + 1, v + 2) < 0 || *t)
+			goto invalid;
+		if (v[0] > 9999)
+			return PyObject_GetAttrString((PyObject *) type, "max");
+		return PyDate_FromDate(v[0], v[1], v[2]);
+	}
+	if (parse_timestamp(&t, fmt, v) < 0)
+		goto invalid;
+	if (v[0] > 9999)
+		return PyObject_GetAttrString((PyObject *) type, "max");
+	t = skip_spaces(t);
+	if (kind == DATETIME_TIMESTAMP)
+	{
+		if (*t) goto invalid;
+		return PyDateTime_FromDateAndTime(
+			v[0], v[1], v[2], v[3], v[4], v[5], v[6]);
+	}
+	if (*t && (parse_timezone(&t, &offset) < 0 || *t))
+		goto invalid;
+	if (!(tz = get_timezone(offset)))
+		return NULL;
+	ret = PyDateTimeAPI->DateTime_FromDateAndTime(
+		v[0], v[1], v[2], v[3], v[4], v[5], v[6],
+		tz, PyDateTimeAPI->DateTimeType);
+	Py_DECREF(tz);
+	return ret;
+
+invalid:
+	PyErr_Format(PyExc_ValueError, "Cannot parse %s: %s", names[kind], s);
+	return NULL;
+}
+
+/* get the kind of a native date/time cast function (internal use only)
+   The cast function can also be a partial function that binds the
+   connection argument.  Returns zero if this is not a native cast. */
+static int
+get_native_cast(PyObject *cast)
+{
+	PyObject   *func = cast;
+	int			kind;
+
+	if (!PyCFunction_Check(cast))
+	{
+		PyObject   *args;
+		int			ok;
+
+		if (strcmp(Py_TYPE(cast)->tp_name, "functools.partial"))
+			return 0;
+		if (!(args = PyObject_GetAttrString(cast, "args")))
+		{
+			PyErr_Clear();
+			return 0;
+		}
+		ok = PyTuple_Check(args) && !PyTuple_GET_SIZE(args);
+		Py_DECREF(args);
+		if (!ok || !(func = PyObject_GetAttrString(cast, "func")))
+		{
+			PyErr_Clear();
+			return 0;
+		}
+		Py_DECREF(func); /* still referenced by the partial function */
+	}
+	for (kind = DATETIME_DATE; kind <= DATETIME_INTERVAL; ++kind)
+		if (func == datetime_casts[kind]) return kind;
+	return 0;
+}
+
+#ifdef ESCAPING_FUNCS
+
+/* escape literal */
+static char connEscapeLiteral__doc__[] =
+"escape_literal(str) -- escape a literal constant for use within SQL";
+
+static PyObject *
+connEscapeLiteral(connObject *self, PyObject *string)
+{
+	PyObject   *tmp_obj = NULL, /* auxiliary string object */
+			   *to_obj; /* string object to return */
+	char 	   *from, /* our string argument as encoded string */
+			   *to; /* the result as encoded string */
+	Py_ssize_t 	from_length; /* length of string */
+	size_t		to_length; /* length of result */
+	int			encoding = -1; /* client encoding */
+
+	if (PyBytes_Check(string))
+	{
+		PyBytes_AsStringAndSize(string, &from, &from_length);
+	}
+	else if (PyUnicode_Check(string))
+	{
+		encoding = PQclientEncoding(self->cnx);
+		tmp_obj = get_encoded_string(string, encoding);
+		if (!tmp_obj) return NULL; /* pass the UnicodeEncodeError */
+		PyBytes_AsStringAndSize(tmp_obj, &from, &from_length);
+	}
+	else
+	{
+		PyErr_SetString(PyExc_TypeError,
+			"Method escape_literal() expects a string as argument");
+		return NULL;
+	}
+
+	to = PQescapeLiteral(self->cnx, from, (size_t)from_length);
+	to_length = strlen(to);
+
+	Py_XDECREF(tmp_obj);
+
+	if (encoding == -1)
+		to_obj = PyBytes_FromStringAndSize(to, to_length);
+	else
+		to_obj = get_decoded_string(to, to_length, encoding);
+	if (to)
+		PQfreemem(to);
+	return to_obj;
+}
+
+/* escape identifier */
+static char connEscapeIdentifier__doc__[] =
+"escape_identifier(str) -- escape an identifier for use within SQL";
+
+static PyObject *
+connEscapeIdentifier(connObject *self, PyObject *string)
+{
+	PyObject   *tmp_obj = NULL, /* auxiliary string object */
+			   *to_obj; /* string object to return */
+	char 	   *from, /* our string argument as encoded string */
+			   *to; /* the result as encoded string */
+	Py_ssize_t 	from_length; /* length of string */
+	size_t		to_length; /* length of result */
+	int			encoding = -1; /* client encoding */
+
+	if (PyBytes_Check(string))
+	{
+		PyBytes_AsStringAndSize(string, &from, &from_length);
+	}
+	else if (PyUnicode_Check(string))
+	{
+		encoding = PQclientEncoding(self->cnx);
+		tmp_obj = get_encoded_string(string, encoding);
+		if (!tmp_obj) return NULL; /* pass the UnicodeEncodeError */
+		PyBytes_AsStringAndSize(tmp_obj, &from, &from_length);
+	}
+	else
+	{
+		PyErr_SetString(PyExc_TypeError,
+			"Method escape_identifier() expects a string as argument");
+		return NULL;
+	}
+
+	to = PQescapeIdentifier(self->cnx, from, (size_t)from_length);
+	to_length = strlen(to);
+
+	Py_XDECREF(tmp_obj);
+
+	if (encoding == -1)
+		to_obj = PyBytes_FromStringAndSize(to, to_length);
+	else
+		to_obj = get_decoded_string(to, to_length, encoding);
+	if (to)
+		PQfreemem(to);
+	return to_obj;
+}
+
+#endif	/* ESCAPING_FUNCS */
+
+/* escape string */
+static char connEscapeString__doc__[] =
+"escape_string(str) -- escape a string for use within SQL";
+
+static PyObject *
+connEscapeString(connObject *self, PyObject *string)
+{
+	PyObject   *tmp_obj = NULL, /* auxiliary string object */
+			   *to_obj; /* string object to return */
+	char 	   *from, /* our string argument as encoded string */
+			   *to; /* the result as encoded string */
+	Py_ssize_t 	from_length; /* length of string */
+	size_t		to_length; /* length of result */
+	int			encoding = -1; /* client encoding */
+
+	if (PyBytes_Check(string))
 	{
 		PyBytes_AsStringAndSize(string, &from, &from_length);
 	}
@@ -3048,55 +5060,269 @@ connEscapeBytea(connObject *self, PyObject *data)
 	return to_obj;
 }
 
-#ifdef LARGE_OBJECTS
-/* creates large object */
-static char connCreateLO__doc__[] =
-"locreate(mode) -- create a new large object in the database";
-
-static PyObject *
-connCreateLO(connObject *self, PyObject *args)
-{
-	int			mode;
-	Oid			lo_oid;
-
-	/* checks validity */
-	if (!check_cnx_obj(self))
-		return NULL;
+/* append a value quoted as an SQL literal to the buffer (internal use only)
+   Values of types that are not adapted natively are passed to the adapt
+   function, the string representation of its result is used unquoted. */
+static int
+quote_put_value(connObject *self, copyBuffer *buf, PyObject *value,
+	PyObject *adapt, int encoding)
+{
+	PyObject   *tmp_obj = NULL, *str_obj = NULL;
+	char	   *s;
+	Py_ssize_t	n;
+	int			ret = -1;
+
+	if (value == Py_None)
+		return copy_buffer_put_text(buf, "NULL", 4, 0);
+	if (PyBool_Check(value))
+		return value == Py_True ? copy_buffer_put_text(buf, "true", 4, 0) :
+			copy_buffer_put_text(buf, "false", 5, 0);
+	if (PyBytes_CheckExact(value) || PyUnicode_CheckExact(value))
+	{
+		if (PyUnicode_Check(value))
+		{
+			if (!(tmp_obj = get_encoded_string(value, encoding)))
+				return -1;
+			PyBytes_AsStringAndSize(tmp_obj, &s, &n);
+		}
+		else
+			PyBytes_AsStringAndSize(value, &s, &n);
+		/* in the worst case, every character needs to be escaped */
+		if (copy_buffer_reserve(buf, 2 * (size_t) n + 3) == 0)
+		{
+			buf->data[buf->len++] = '\'';
+			buf->len += PQescapeStringConn(self->cnx,
+				buf->data + buf->len, s, (size_t) n, NULL);
+			buf->data[buf->len++] = '\'';
+			ret = 0;
+		}
+		Py_XDECREF(tmp_obj);
+		return ret;
+	}
+	if (PyFloat_CheckExact(value))
+	{
+		double		d = PyFloat_AS_DOUBLE(value);
 
-	/* gets arguments */
-	if (!PyArg_ParseTuple(args, "i", &mode))
+		if (Py_IS_INFINITY(d))
+			return d < 0 ? copy_buffer_put_text(buf, "'-Infinity'", 11, 0) :
+				copy_buffer_put_text(buf, "'Infinity'", 10, 0);
+		if (Py_IS_NAN(d))
+			return copy_buffer_put_text(buf, "'NaN'", 5, 0);
+		str_obj = PyObject_Str(value);
+	}
+	else if (PyInt_CheckExact(value) || PyLong_CheckExact(value) ||
+			(decimal && (PyObject *) Py_TYPE(value) == decimal))
+		str_obj = PyObject_Str(value);
+	else if (adapt)
 	{
-		PyErr_SetString(PyExc_TypeError,
-			"Method locreate() takes an integer argument");
-		return NULL;
+		if (!(tmp_obj = PyObject_CallFunctionObjArgs(adapt, value, NULL)))
+			return -1;
+		str_obj = PyObject_Str(tmp_obj);
+		Py_DECREF(tmp_obj);
 	}
-
-	/* creates large object */
-	lo_oid = lo_creat(self->cnx, mode);
-	if (lo_oid == 0)
+	else
 	{
-		set_error_msg(OperationalError, "Can't create large object");
-		return NULL;
+		PyErr_Format(InterfaceError,
+			"Do not know how to adapt type %s", Py_TYPE(value)->tp_name);
+		return -1;
 	}
+	if (!str_obj)
+		return -1;
 
-	return (PyObject *) largeNew(self, lo_oid);
+	if (PyUnicode_Check(str_obj))
+	{
+		tmp_obj = get_encoded_string(str_obj, encoding);
+		Py_DECREF(str_obj);
+		if (!(str_obj = tmp_obj))
+			return -1;
+	}
+	PyBytes_AsStringAndSize(str_obj, &s, &n);
+	ret = copy_buffer_put_text(buf, s, (size_t) n, 0);
+	Py_DECREF(str_obj);
+	return ret;
 }
 
-/* init from already known oid */
-static char connGetLO__doc__[] =
-"getlo(oid) -- create a large object instance for the specified oid";
-
-static PyObject *
-connGetLO(connObject *self, PyObject *args)
+/* append the comma separated quoted values to the buffer (internal use only)
+   The method name and the kind of items are used in error messages. */
+static int
+quote_put_list(connObject *self, copyBuffer *buf, PyObject *values,
+	PyObject *adapt, int encoding, const char *name, const char *what)
 {
-	int			lo_oid;
-
-	/* checks validity */
-	if (!check_cnx_obj(self))
-		return NULL;
+	PyObject   *seq;
+	Py_ssize_t	n, k;
+	int			ret = 0;
+	char		msg[64];
 
-	/* gets arguments */
-	if (!PyArg_ParseTuple(args, "i", &lo_oid))
+	PyOS_snprintf(msg, sizeof(msg),
+		"Method %s() expects a sequence of %s", name, what);
+	if (PyBytes_Check(values) || PyUnicode_Check(values))
+	{
+		PyErr_SetString(PyExc_TypeError, msg);
+		return -1;
+	}
+	if (!(seq = PySequence_Fast(values, msg)))
+		return -1;
+	n = PySequence_Fast_GET_SIZE(seq);
+	for (k = 0; k < n && !ret; ++k)
+	{
+		if (k && copy_buffer_put_text(buf, ",", 1, 0) < 0)
+			ret = -1;
+		else
+			ret = quote_put_value(self, buf,
+				PySequence_Fast_GET_ITEM(seq, k), adapt, encoding);
+	}
+	Py_DECREF(seq);
+	return ret;
+}
+
+/* get the adapt function for quoting values (internal use only) */
+static int
+get_quote_adapt(PyObject *args, PyObject **values, PyObject **adapt)
+{
+	*adapt = NULL;
+	if (!PyArg_ParseTuple(args, "O|O", values, adapt))
+		return -1;
+	if (*adapt == Py_None)
+		*adapt = NULL;
+	if (*adapt && !PyCallable_Check(*adapt))
+	{
+		PyErr_SetString(PyExc_TypeError,
+			"The adapt function must be callable");
+		return -1;
+	}
+	return 0;
+}
+
+/* quote a list of values */
+static char connQuoteList__doc__[] =
+"quote_list(values, [adapt]) -- quote values as a list of SQL literals\n\n"
+"The values are quoted and joined with commas in one pass.  Values of\n"
+"other types than None, bool, str, bytes, int, float and Decimal are\n"
+"passed to the adapt function if given, otherwise an error is raised.\n";
+
+static PyObject *
+connQuoteList(connObject *self, PyObject *args)
+{
+	PyObject   *values, *adapt;
+	copyBuffer	buf = {NULL, 0, 0};
+	int			encoding;
+
+	if (!check_cnx_obj(self))
+		return NULL;
+	if (get_quote_adapt(args, &values, &adapt) < 0)
+		return NULL;
+
+	encoding = PQclientEncoding(self->cnx);
+	if (quote_put_list(self, &buf, values, adapt, encoding,
+			"quote_list", "values") < 0)
+	{
+		PyMem_Free(buf.data);
+		return NULL;
+	}
+	return get_serial_string(&buf, encoding);
+}
+
+/* quote a list of rows */
+static char connQuoteRows__doc__[] =
+"quote_rows(rows, [adapt]) -- quote rows as a list of SQL row literals\n\n"
+"Every row is quoted like with quote_list() and put into parentheses,\n"
+"the rows are joined with commas, as needed in a VALUES clause.\n";
+
+static PyObject *
+connQuoteRows(connObject *self, PyObject *args)
+{
+	PyObject   *rows, *adapt, *seq;
+	copyBuffer	buf = {NULL, 0, 0};
+	Py_ssize_t	n, k;
+	int			encoding, ret = 0;
+
+	if (!check_cnx_obj(self))
+		return NULL;
+	if (get_quote_adapt(args, &rows, &adapt) < 0)
+		return NULL;
+	if (PyBytes_Check(rows) || PyUnicode_Check(rows))
+	{
+		PyErr_SetString(PyExc_TypeError,
+			"Method quote_rows() expects a sequence of rows");
+		return NULL;
+	}
+	if (!(seq = PySequence_Fast(rows,
+			"Method quote_rows() expects a sequence of rows")))
+		return NULL;
+
+	encoding = PQclientEncoding(self->cnx);
+	n = PySequence_Fast_GET_SIZE(seq);
+	for (k = 0; k < n && !ret; ++k)
+	{
+		if ((ret = copy_buffer_put_text(&buf,
+				k ? ",(" : "(", k ? 2 : 1, 0)) < 0)
+			break;
+		if ((ret = quote_put_list(self, &buf, PySequence_Fast_GET_ITEM(seq, k),
+				adapt, encoding, "quote_rows", "rows")) < 0)
+			break;
+		ret = copy_buffer_put_text(&buf, ")", 1, 0);
+	}
+	Py_DECREF(seq);
+	if (ret < 0)
+	{
+		PyMem_Free(buf.data);
+		return NULL;
+	}
+	return get_serial_string(&buf, encoding);
+}
+
+#ifdef LARGE_OBJECTS
+/* creates large object */
+static char connCreateLO__doc__[] =
+"locreate(mode) -- create a new large object in the database";
+
+static PyObject *
+connCreateLO(connObject *self, PyObject *args)
+{
+	int			mode;
+	Oid			lo_oid;
+
+	/* checks validity */
+	if (!check_cnx_obj(self))
+		return NULL;
+
+	/* gets arguments */
+	if (!PyArg_ParseTuple(args, "i", &mode))
+	{
+		PyErr_SetString(PyExc_TypeError,
+			"Method locreate() takes an integer argument");
+		return NULL;
+	}
+
+	/* creates large object */
+	Py_BEGIN_ALLOW_THREADS
+	lo_oid = lo_creat(self->cnx, mode);
+	Py_END_ALLOW_THREADS
+
+	if (lo_oid == 0)
+	{
+		set_error_msg(OperationalError, "Can't create large object");
+		return NULL;
+	}
+
+	return (PyObject *) largeNew(self, lo_oid);
+}
+
+/* init from already known oid */
+static char connGetLO__doc__[] =
+"getlo(oid) -- create a large object instance for the specified oid";
+
+static PyObject *
+connGetLO(connObject *self, PyObject *args)
+{
+	int			lo_oid;
+
+	/* checks validity */
+	if (!check_cnx_obj(self))
+		return NULL;
+
+	/* gets arguments */
+	if (!PyArg_ParseTuple(args, "i", &lo_oid))
 	{
 		PyErr_SetString(PyExc_TypeError,
 			"Method getlo() takes an integer argument");
@@ -3136,7 +5362,10 @@ connImportLO(connObject *self, PyObject *args)
 	}
 
 	/* imports file and checks result */
+	Py_BEGIN_ALLOW_THREADS
 	lo_oid = lo_import(self->cnx, name);
+	Py_END_ALLOW_THREADS
+
 	if (lo_oid == 0)
 	{
 		set_error_msg(OperationalError, "Can't create large object");
@@ -3163,7 +5392,10 @@ connReset(connObject *self, PyObject *noargs)
 	}
 
 	/* resets the connection */
+	Py_BEGIN_ALLOW_THREADS
 	PQreset(self->cnx);
+	Py_END_ALLOW_THREADS
+
 	Py_INCREF(Py_None);
 	return Py_None;
 }
@@ -3175,6 +5407,8 @@ static char connCancel__doc__[] =
 static PyObject *
 connCancel(connObject *self, PyObject *noargs)
 {
+	int			ret;
+
 	if (!self->cnx)
 	{
 		PyErr_SetString(PyExc_TypeError, "Connection is not valid");
@@ -3182,7 +5416,11 @@ connCancel(connObject *self, PyObject *noargs)
 	}
 
 	/* request that the server abandon processing of the current command */
-	return PyInt_FromLong((long) PQrequestCancel(self->cnx));
+	Py_BEGIN_ALLOW_THREADS
+	ret = PQrequestCancel(self->cnx);
+	Py_END_ALLOW_THREADS
+
+	return PyInt_FromLong((long) ret);
 }
 
 /* get connection socket */
@@ -3250,6 +5488,107 @@ connGetCastHook(connObject *self, PyObject *noargs)
 	return ret;
 }
 
+/* set typecast functions per type */
+static char connSetTypeCasts__doc__[] =
+"set_type_casts(casts) -- set the typecast functions for types\n\n"
+"The casts must be a dictionary mapping type oids to typecast functions\n"
+"which get passed the text value, or None if the text value shall be\n"
+"returned unchanged.  Other types are cast with the cast hook.\n";
+
+static PyObject *
+connSetTypeCasts(connObject *self, PyObject *casts)
+{
+	if (casts == Py_None)
+	{
+		Py_XDECREF(self->type_casts);
+		self->type_casts = NULL;
+	}
+	else if (PyDict_Check(casts))
+	{
+		Py_INCREF(casts); Py_XDECREF(self->type_casts);
+		self->type_casts = casts;
+	}
+	else
+	{
+		PyErr_SetString(PyExc_TypeError,
+			"Method set_type_casts() expects"
+			 " a dictionary or None as argument");
+		return NULL;
+	}
+
+	Py_INCREF(Py_None);
+	return Py_None;
+}
+
+/* get typecast functions per type */
+static char connGetTypeCasts__doc__[] =
+"get_type_casts() -- get the typecast functions for types\n\n"
+"The dictionary mapping type oids to typecast functions is returned.\n"
+"It is created if it does not exist yet and can be changed in place.\n";
+
+static PyObject *
+connGetTypeCasts(connObject *self, PyObject *noargs)
+{
+	if (!self->type_casts && !(self->type_casts = PyDict_New()))
+		return NULL;
+	Py_INCREF(self->type_casts);
+	return self->type_casts;
+}
+
+/* set memory limit for query results */
+static char connSetMemoryLimit__doc__[] =
+"set_memory_limit(limit) -- set the memory limit for query results\n\n"
+"Query results whose memory size would exceed the given number of bytes\n"
+"are not retrieved, and results are not converted to Python objects if\n"
+"the estimated memory size of both would exceed the limit.  A limit of\n"
+"zero or None means there is no limit.\n";
+
+static PyObject *
+connSetMemoryLimit(connObject *self, PyObject *limit)
+{
+	if (limit == Py_None)
+		self->memory_limit = 0;
+	else if (PyInt_Check(limit) || PyLong_Check(limit))
+	{
+		Py_ssize_t	v = PyNumber_AsSsize_t(limit, PyExc_OverflowError);
+
+		if (v == -1 && PyErr_Occurred())
+			return NULL;
+		if (v < 0)
+		{
+			PyErr_SetString(PyExc_ValueError,
+				"The memory limit must not be negative");
+			return NULL;
+		}
+		self->memory_limit = (size_t) v;
+	}
+	else
+	{
+		PyErr_SetString(PyExc_TypeError,
+			"Method set_memory_limit() expects"
+			 " an integer or None as argument");
+		return NULL;
+	}
+
+	Py_INCREF(Py_None);
+	return Py_None;
+}
+
+/* get memory limit for query results */
+static char connGetMemoryLimit__doc__[] =
+"get_memory_limit() -- get the memory limit for query results";
+
+static PyObject *
+connGetMemoryLimit(connObject *self, PyObject *noargs)
+{
+	if (!self->memory_limit)
+	{
+		Py_INCREF(Py_None);
+		return Py_None;
+	}
+	return PyLong_FromSize_t(self->memory_limit);
+}
+
 /* set notice receiver callback function */
 static char connSetNoticeReceiver__doc__[] =
 "set_notice_receiver(func) -- set the current notice receiver";
@@ -3321,6 +5660,96 @@ connClose(connObject *self, PyObject *noargs)
 	return Py_None;
 }
 
+/* get a size argument that may be None (internal use only)
+   Returns 0 on success, -1 and sets an error otherwise. */
+static int
+get_size_arg(PyObject *obj, const char *name, size_t *size)
+{
+	Py_ssize_t	v;
+
+	*size = 0;
+	if (!obj || obj == Py_None)
+		return 0;
+	if (!PyInt_Check(obj) && !PyLong_Check(obj))
+	{
+		PyErr_Format(PyExc_TypeError,
+			"The %s must be an integer or None", name);
+		return -1;
+	}
+	v = PyNumber_AsSsize_t(obj, PyExc_OverflowError);
+	if (v == -1 && PyErr_Occurred())
+		return -1;
+	if (v < 1)
+	{
+		PyErr_Format(PyExc_ValueError, "The %s must be positive", name);
+		return -1;
+	}
+	*size = (size_t) v;
+	return 0;
+}
+
+/* get a notify as a tuple (relname, be_pid, extra) (internal use only)
+   The notify is freed in any case. */
+static PyObject *
+get_notify_tuple(PGnotify *notify)
+{
+	PyObject   *notify_result, *temp;
+
+	if (!(notify_result = PyTuple_New(3)))
+		goto error;
+
+	if (!(temp = PyStr_FromString(notify->relname)))
+		goto error;
+
+	PyTuple_SET_ITEM(notify_result, 0, temp);
+
+	if (!(temp = PyInt_FromLong(notify->be_pid)))
+		goto error;
+
+	PyTuple_SET_ITEM(notify_result, 1, temp);
+
+	/* extra exists even in old versions that did not support it */
+	if (!(temp = PyStr_FromString(notify->extra)))
+		goto error;
+
+	PyTuple_SET_ITEM(notify_result, 2, temp);
+
+	PQfreemem(notify);
+
+	return notify_result;
+
+error:
+	Py_XDECREF(notify_result);
+	PQfreemem(notify);
+	return NULL;
+}
+
+/* append the pending notifies of a connection to a list (internal use only)
+   At most max notifies are appended if max is not zero.  Returns the number
+   of appended notifies or -1 on error.  The input is not consumed here. */
+static Py_ssize_t
+append_notifies(PGconn *cnx, PyObject *list, size_t max)
+{
+	PGnotify   *notify;
+	PyObject   *notify_result;
+	Py_ssize_t	n = 0;
+
+	while ((!max || (size_t) PyList_GET_SIZE(list) < max)
+			&& (notify = PQnotifies(cnx)))
+	{
+		if (!(notify_result = get_notify_tuple(notify)))
+			return -1;
+		if (PyList_Append(list, notify_result))
+		{
+			Py_DECREF(notify_result);
+			return -1;
+		}
+		Py_DECREF(notify_result);
+		++n;
+	}
+	return n;
+}
+
 /* gets asynchronous notify */
 static char connGetNotify__doc__[] =
 "getnotify() -- get database notify for this connection";
@@ -3337,47 +5766,58 @@ connGetNotify(connObject *self, PyObject *noargs)
 	}
 
 	/* checks for NOTIFY messages */
+	Py_BEGIN_ALLOW_THREADS
 	PQconsumeInput(self->cnx);
+	Py_END_ALLOW_THREADS
 
 	if (!(notify = PQnotifies(self->cnx)))
 	{
 		Py_INCREF(Py_None);
 		return Py_None;
 	}
-	else
-	{
-		PyObject   *notify_result,
-				   *temp;
-
-		if (!(temp = PyStr_FromString(notify->relname)))
-			return NULL;
-
-		if (!(notify_result = PyTuple_New(3)))
-			return NULL;
 
-		PyTuple_SET_ITEM(notify_result, 0, temp);
+	return get_notify_tuple(notify);
+}
 
-		if (!(temp = PyInt_FromLong(notify->be_pid)))
-		{
-			Py_DECREF(notify_result);
-			return NULL;
-		}
+/* gets all pending asynchronous notifies */
+static char connGetNotifies__doc__[] =
+"getnotifies([max]) -- get all pending notifies for this connection\n\n"
+"The notifies are returned as a list of (relname, be_pid, extra) tuples.\n"
+"If max is given, at most this number of notifies is returned, the\n"
+"remaining notifies can be retrieved with the next call.\n";
 
-		PyTuple_SET_ITEM(notify_result, 1, temp);
+static PyObject *
+connGetNotifies(connObject *self, PyObject *args, PyObject *dict)
+{
+	static const char *kwlist[] = {"max", NULL};
+	PyObject   *max_obj = NULL, *notifies;
+	size_t		max;
 
-		/* extra exists even in old versions that did not support it */
-		if (!(temp = PyStr_FromString(notify->extra)))
-		{
-			Py_DECREF(notify_result);
-			return NULL;
-		}
+	if (!PyArg_ParseTupleAndKeywords(args, dict, "|O", (char **) kwlist,
+			&max_obj))
+		return NULL;
+	if (get_size_arg(max_obj, "maximum number of notifies", &max) < 0)
+		return NULL;
 
-		PyTuple_SET_ITEM(notify_result, 2, temp);
+	if (!self->cnx)
+	{
+		PyErr_SetString(PyExc_TypeError, "Connection is not valid");
+		return NULL;
+	}
 
-		PQfreemem(notify);
+	/* checks for NOTIFY messages */
+	Py_BEGIN_ALLOW_THREADS
+	PQconsumeInput(self->cnx);
+	Py_END_ALLOW_THREADS
 
-		return notify_result;
+	if (!(notifies = PyList_New(0)))
+		return NULL;
+	if (append_notifies(self->cnx, notifies, max) < 0)
+	{
+		Py_DECREF(notifies);
+		return NULL;
 	}
+	return notifies;
 }
 
 /* get the list of connection attributes */
@@ -3400,6 +5840,12 @@ static struct PyMethodDef connMethods[] = {
 
 	{"source", (PyCFunction) connSource, METH_NOARGS, connSource__doc__},
 	{"query", (PyCFunction) connQuery, METH_VARARGS, connQuery__doc__},
+	{"prepare", (PyCFunction) connPrepare, METH_VARARGS,
+			connPrepare__doc__},
+	{"query_prepared", (PyCFunction) connQueryPrepared, METH_VARARGS,
+			connQueryPrepared__doc__},
+	{"queries", (PyCFunction) connQueries, METH_VARARGS,
+			connQueries__doc__},
 	{"reset", (PyCFunction) connReset, METH_NOARGS, connReset__doc__},
 	{"cancel", (PyCFunction) connCancel, METH_NOARGS, connCancel__doc__},
 	{"close", (PyCFunction) connClose, METH_NOARGS, connClose__doc__},
@@ -3408,13 +5854,24 @@ static struct PyMethodDef connMethods[] = {
 			connGetCastHook__doc__},
 	{"set_cast_hook", (PyCFunction) connSetCastHook, METH_O,
 			connSetCastHook__doc__},
+	{"get_type_casts", (PyCFunction) connGetTypeCasts, METH_NOARGS,
+			connGetTypeCasts__doc__},
+	{"set_type_casts", (PyCFunction) connSetTypeCasts, METH_O,
+			connSetTypeCasts__doc__},
+	{"get_memory_limit", (PyCFunction) connGetMemoryLimit, METH_NOARGS,
+			connGetMemoryLimit__doc__},
+	{"set_memory_limit", (PyCFunction) connSetMemoryLimit, METH_O,
+			connSetMemoryLimit__doc__},
 	{"get_notice_receiver", (PyCFunction) connGetNoticeReceiver, METH_NOARGS,
 			connGetNoticeReceiver__doc__},
 	{"set_notice_receiver", (PyCFunction) connSetNoticeReceiver, METH_O,
 			connSetNoticeReceiver__doc__},
 	{"getnotify", (PyCFunction) connGetNotify, METH_NOARGS,
 			connGetNotify__doc__},
-	{"inserttable", (PyCFunction) connInsertTable, METH_VARARGS,
+	{"getnotifies", (PyCFunction) connGetNotifies, METH_VARARGS|METH_KEYWORDS,
+			connGetNotifies__doc__},
+	{"inserttable", (PyCFunction) connInsertTable,
+			METH_VARARGS | METH_KEYWORDS,
 			connInsertTable__doc__},
 	{"transaction", (PyCFunction) connTransaction, METH_NOARGS,
 			connTransaction__doc__},
@@ -3433,6 +5890,10 @@ static struct PyMethodDef connMethods[] = {
 			connEscapeString__doc__},
 	{"escape_bytea", (PyCFunction) connEscapeBytea, METH_O,
 			connEscapeBytea__doc__},
+	{"quote_list", (PyCFunction) connQuoteList, METH_VARARGS,
+			connQuoteList__doc__},
+	{"quote_rows", (PyCFunction) connQuoteRows, METH_VARARGS,
+			connQuoteRows__doc__},
 
 #ifdef DIRECT_ACCESS
 	{"putline", (PyCFunction) connPutLine, METH_VARARGS, connPutLine__doc__},
@@ -3577,12 +6038,25 @@ check_source_obj(sourceObject *self, int level)
 	return 1;
 }
 
+/* discard copy data not yet returned by getdata_into() (internal use only) */
+static void
+clear_copy_data(sourceObject *self)
+{
+	if (self->copy_data)
+	{
+		PQfreemem(self->copy_data);
+		self->copy_data = NULL;
+	}
+	self->copy_len = self->copy_pos = 0;
+}
+
 /* destructor */
 static void
 sourceDealloc(sourceObject *self)
 {
 	if (self->result)
 		PQclear(self->result);
+	clear_copy_data(self);
 
 	Py_XDECREF(self->pgcnx);
 	PyObject_Del(self);
@@ -3603,6 +6077,7 @@ sourceClose(sourceObject *self, PyObject *noargs)
 		self->result_type = RESULT_EMPTY;
 		self->result = NULL;
 	}
+	clear_copy_data(self);
 
 	self->valid = 0;
 
@@ -3654,6 +6129,7 @@ sourceExecute(sourceObject *self, PyObject *sql)
 		PQclear(self->result);
 		self->result = NULL;
 	}
+	clear_copy_data(self);
 	self->max_row = 0;
 	self->current_row = 0;
 	self->num_fields = 0;
@@ -3984,6 +6460,7 @@ sourcePutData(sourceObject *self, PyObject *buffer)
 		return NULL;
 	}
 
+	Py_BEGIN_ALLOW_THREADS
 	if (buf)
 	{
 		res = nbytes ? PQputCopyData(self->pgcnx->cnx, buf, (int)nbytes) : 1;
@@ -3992,6 +6469,7 @@ sourcePutData(sourceObject *self, PyObject *buffer)
 	{
 		res = PQputCopyEnd(self->pgcnx->cnx, errormsg);
 	}
+	Py_END_ALLOW_THREADS
 
 	Py_XDECREF(tmp_obj);
 
@@ -4038,10 +6516,44 @@ sourcePutData(sourceObject *self, PyObject *buffer)
 	return ret; /* None or number of rows */
 }
 
-/* get copy data */
-static char sourceGetData__doc__[] =
-"getdata(decode) -- receive data to server during copy to stdout";
-
+/* finish copy to stdout after all data has been received
+   (internal use only)  Returns 0 and the number of rows on success,
+   -1 and sets an IOError otherwise. */
+static int
+finish_copy_out(sourceObject *self, long *num_rows)
+{
+	PGresult   *result; /* final result of the operation */
+	int			ret = 0;
+
+	Py_BEGIN_ALLOW_THREADS;
+	result = PQgetResult(self->pgcnx->cnx);
+	Py_END_ALLOW_THREADS;
+
+	if (PQresultStatus(result) == PGRES_COMMAND_OK)
+	{
+		char   *temp;
+
+		temp = PQcmdTuples(result);
+		*num_rows = temp[0] ? atol(temp) : -1;
+	}
+	else
+	{
+		PyErr_SetString(PyExc_IOError, PQerrorMessage(self->pgcnx->cnx));
+		ret = -1;
+	}
+	PQclear(result);
+
+	PQclear(self->result);
+	self->result = NULL;
+	self->result_type = RESULT_EMPTY;
+	clear_copy_data(self);
+	return ret;
+}
+
+/* get copy data */
+static char sourceGetData__doc__[] =
+"getdata(decode) -- receive data to server during copy to stdout";
+
 static PyObject *
 sourceGetData(sourceObject *self, PyObject *args)
 {
@@ -4070,7 +6582,9 @@ sourceGetData(sourceObject *self, PyObject *args)
 		return NULL;
 	}
 
+	Py_BEGIN_ALLOW_THREADS
 	nbytes = PQgetCopyData(self->pgcnx->cnx, &buffer, 0);
+	Py_END_ALLOW_THREADS
 
 	if (!nbytes || nbytes < -1) /* an error occurred */
 	{
@@ -4080,30 +6594,10 @@ sourceGetData(sourceObject *self, PyObject *args)
 
 	if (nbytes == -1) /* copy is done */
 	{
-		PGresult   *result; /* final result of the operation */
-
-		Py_BEGIN_ALLOW_THREADS;
-		result = PQgetResult(self->pgcnx->cnx);
-		Py_END_ALLOW_THREADS;
-
-		if (PQresultStatus(result) == PGRES_COMMAND_OK)
-		{
-			char   *temp;
-			long	num_rows;
-
-			temp = PQcmdTuples(result);
-			num_rows = temp[0] ? atol(temp) : -1;
-			ret = PyInt_FromLong(num_rows);
-		}
-		else
-		{
-			PyErr_SetString(PyExc_IOError, PQerrorMessage(self->pgcnx->cnx));
-			ret = NULL;
-		}
+		long		num_rows;
 
-		PQclear(self->result);
-		self->result = NULL;
-		self->result_type = RESULT_EMPTY;
+		ret = finish_copy_out(self, &num_rows) < 0 ?
+			NULL : PyInt_FromLong(num_rows);
 	}
 	else /* a row has been returned */
 	{
@@ -4116,6 +6610,135 @@ sourceGetData(sourceObject *self, PyObject *args)
 	return ret; /* buffer or number of rows */
 }
 
+/* get copy data into a buffer */
+static char sourceGetDataInto__doc__[] =
+"getdata_into(buffer, [nowait]) -- receive copy data into a buffer\n\n"
+"The writable buffer is filled with as many complete rows as fit, and\n"
+"the number of bytes is returned, or 0 when the copy is done.  If nowait\n"
+"is set, None is returned when no data has been received yet.\n";
+
+static PyObject *
+sourceGetDataInto(sourceObject *self, PyObject *args)
+{
+	PyObject   *buffer_obj; /* the buffer argument */
+	Py_buffer	view; /* the buffer to be filled */
+	PGconn	   *cnx;
+	char	   *buffer, *row;
+	Py_ssize_t	size, filled = 0, n;
+	int			nowait = 0, nbytes = 0, consumed = 0, done = 0;
+
+	/* checks validity */
+	if (!check_source_obj(self, CHECK_CNX))
+		return NULL;
+
+	if (!PyArg_ParseTuple(args, "O|i", &buffer_obj, &nowait))
+		return NULL;
+
+	/* checks validity */
+	if (!check_source_obj(self, CHECK_CNX | CHECK_RESULT) ||
+			PQresultStatus(self->result) != PGRES_COPY_OUT)
+	{
+		PyErr_SetString(PyExc_IOError,
+			"Connection is invalid or not in copy_out state");
+		return NULL;
+	}
+
+	if (PyObject_GetBuffer(buffer_obj, &view, PyBUF_WRITABLE) < 0)
+		return NULL;
+	if (!view.len)
+	{
+		PyBuffer_Release(&view);
+		PyErr_SetString(PyExc_ValueError, "The buffer must not be empty");
+		return NULL;
+	}
+	cnx = self->pgcnx->cnx;
+	buffer = (char *) view.buf;
+	size = view.len;
+
+	/* the data is copied without the GIL, libpq buffers the received rows */
+	Py_BEGIN_ALLOW_THREADS
+	if (self->copy_len < 0) /* copy was done in the last call */
+		done = 1;
+	else if (self->copy_data) /* first return the pending row */
+	{
+		n = self->copy_len - self->copy_pos;
+		if (n > size)
+			n = size;
+		memcpy(buffer, self->copy_data + self->copy_pos, (size_t) n);
+		filled = n;
+		if ((self->copy_pos += (int) n) == self->copy_len)
+		{
+			PQfreemem(self->copy_data);
+			self->copy_data = NULL;
+			self->copy_len = self->copy_pos = 0;
+		}
+	}
+	while (!done && !self->copy_data && filled < size)
+	{
+		/* block only as long as no data has been returned */
+		nbytes = PQgetCopyData(cnx, &row, nowait || filled);
+		if (!nbytes) /* no complete row received yet */
+		{
+			if (consumed)
+				break;
+			consumed = 1; /* read what is available once */
+			if (PQconsumeInput(cnx))
+				continue;
+			nbytes = -2;
+		}
+		if (nbytes < 0)
+		{
+			if (nbytes == -1) /* copy is done */
+			{
+				if (filled)
+					self->copy_len = -1;
+				else
+					done = 1;
+			}
+			break;
+		}
+		n = size - filled;
+		if (nbytes > n && filled) /* keep the row for the next call */
+			n = 0;
+		else if (nbytes < n)
+			n = nbytes;
+		memcpy(buffer + filled, row, (size_t) n);
+		filled += n;
+		if (n < nbytes)
+		{
+			self->copy_data = row;
+			self->copy_len = nbytes;
+			self->copy_pos = (int) n;
+		}
+		else
+			PQfreemem(row);
+	}
+	Py_END_ALLOW_THREADS
+
+	PyBuffer_Release(&view);
+
+	if (nbytes < -1) /* an error occurred */
+	{
+		PyErr_SetString(PyExc_IOError, PQerrorMessage(cnx));
+		return NULL;
+	}
+	if (done)
+	{
+		long		num_rows;
+
+		if (finish_copy_out(self, &num_rows) < 0)
+			return NULL;
+		self->max_row = (int) num_rows;
+		return PyInt_FromLong(0);
+	}
+	if (!filled && nowait)
+	{
+		Py_INCREF(Py_None);
+		return Py_None;
+	}
+	return PyInt_FromSsize_t(filled);
+}
+
 /* finds field number from string/integer (internal use only) */
 static int
 sourceFieldindex(sourceObject *self, PyObject *param, const char *usage)
@@ -4275,6 +6898,8 @@ static PyMethodDef sourceMethods[] = {
 	{"putdata", (PyCFunction) sourcePutData, METH_O, sourcePutData__doc__},
 	{"getdata", (PyCFunction) sourceGetData, METH_VARARGS,
 			sourceGetData__doc__},
+	{"getdata_into", (PyCFunction) sourceGetDataInto, METH_VARARGS,
+			sourceGetDataInto__doc__},
 	{"field", (PyCFunction) sourceField, METH_O,
 			sourceField__doc__},
 	{"fieldinfo", (PyCFunction) sourceFieldInfo, METH_O,
@@ -4396,6 +7021,29 @@ static PyTypeObject sourceType = {
 	sourceMethods,					/* tp_methods */
 };
 
+/* create a new connection object without connection (internal use only) */
+static connObject *
+new_conn_obj(void)
+{
+	connObject *npgobj;
+
+	if (!(npgobj = PyObject_NEW(connObject, &connType)))
+	{
+		set_error_msg(InternalError, "Can't create new connection object");
+		return NULL;
+	}
+
+	npgobj->valid = 1;
+	npgobj->cnx = NULL;
+	npgobj->date_format = date_format;
+	npgobj->cast_hook = NULL;
+	npgobj->type_casts = NULL;
+	npgobj->notice_receiver = NULL;
+	npgobj->memory_limit = 0;
+
+	return npgobj;
+}
+
 /* connects to a database */
 static char pgConnect__doc__[] =
 "connect(dbname, host, port, opt) -- connect to a PostgreSQL database\n\n"
@@ -4450,17 +7098,8 @@ pgConnect(PyObject *self, PyObject *args, PyObject *dict)
 		pgpasswd = PyBytes_AsString(pg_default_passwd);
 #endif /* DEFAULT_VARS */
 
-	if (!(npgobj = PyObject_NEW(connObject, &connType)))
-	{
-		set_error_msg(InternalError, "Can't create new connection object");
+	if (!(npgobj = new_conn_obj()))
 		return NULL;
-	}
-
-	npgobj->valid = 1;
-	npgobj->cnx = NULL;
-	npgobj->date_format = date_format;
-	npgobj->cast_hook = NULL;
-	npgobj->notice_receiver = NULL;
 
 	if (pgport != -1)
 	{
@@ -4468,326 +7107,2831 @@ pgConnect(PyObject *self, PyObject *args, PyObject *dict)
 		sprintf(port_buffer, "%d", pgport);
 	}
 
-	Py_BEGIN_ALLOW_THREADS
-	npgobj->cnx = PQsetdbLogin(pghost, pgport == -1 ? NULL : port_buffer,
-		pgopt, NULL, pgdbname, pguser, pgpasswd);
-	Py_END_ALLOW_THREADS
+	Py_BEGIN_ALLOW_THREADS
+	npgobj->cnx = PQsetdbLogin(pghost, pgport == -1 ? NULL : port_buffer,
+		pgopt, NULL, pgdbname, pguser, pgpasswd);
+	Py_END_ALLOW_THREADS
+
+	if (PQstatus(npgobj->cnx) == CONNECTION_BAD)
+	{
+		set_error(InternalError, "Cannot connect", npgobj->cnx, NULL);
+		Py_XDECREF(npgobj);
+		return NULL;
+	}
+
+	return (PyObject *) npgobj;
+}
+
+/* get the current time in milliseconds for timeouts (internal use only) */
+static PY_LONG_LONG
+get_clock_ms(void)
+{
+#ifdef MS_WIN32
+	return (PY_LONG_LONG) GetTickCount64();
+#else
+	struct timespec ts;
+
+	clock_gettime(CLOCK_MONOTONIC, &ts);
+	return (PY_LONG_LONG) ts.tv_sec * 1000 + ts.tv_nsec / 1000000;
+#endif
+}
+
+/* get a connection parameter as a C string (internal use only)
+   The string is kept alive by appending it to the given list. */
+static const char *
+get_conn_param(PyObject *obj, PyObject *tmp_list)
+{
+	PyObject   *str_obj;
+
+	if (PyBytes_Check(obj))
+		return PyBytes_AsString(obj);
+	if (PyUnicode_Check(obj))
+		str_obj = PyUnicode_AsUTF8String(obj);
+	else
+	{
+		if (!(str_obj = PyObject_Str(obj)))
+			return NULL;
+		if (PyUnicode_Check(str_obj))
+		{
+			PyObject   *tmp_obj = str_obj;
+
+			str_obj = PyUnicode_AsUTF8String(tmp_obj);
+			Py_DECREF(tmp_obj);
+		}
+	}
+	if (!str_obj)
+		return NULL;
+	if (PyList_Append(tmp_list, str_obj))
+	{
+		Py_DECREF(str_obj);
+		return NULL;
+	}
+	Py_DECREF(str_obj);
+	return PyBytes_AsString(str_obj);
+}
+
+/* start a non-blocking connection for the given target (internal use only)
+   The target can be a connection string or URI or a dict of parameters. */
+static PGconn *
+start_connection(PyObject *target, PyObject *tmp_list)
+{
+	const char **keys = NULL, **values = NULL;
+	PyObject   *items = NULL;
+	PGconn	   *cnx = NULL;
+	Py_ssize_t	n = 0, k, size = 1;
+	int			expand = 0;
+
+	if (PyDict_Check(target))
+	{
+		if (!(items = PyDict_Items(target)))
+			return NULL;
+		size = PyList_GET_SIZE(items);
+	}
+	else if (!PyBytes_Check(target) && !PyUnicode_Check(target))
+	{
+		PyErr_SetString(PyExc_TypeError,
+			"Function connect_many() expects strings or dicts as targets");
+		return NULL;
+	}
+	keys = PyMem_Malloc((size_t) (size + 1) * sizeof(*keys));
+	values = PyMem_Malloc((size_t) (size + 1) * sizeof(*values));
+	if (!keys || !values)
+	{
+		PyErr_NoMemory();
+		goto done;
+	}
+
+	if (items)
+	{
+		for (k = 0; k < size; ++k)
+		{
+			PyObject   *item = PyList_GET_ITEM(items, k),
+					   *key = PyTuple_GET_ITEM(item, 0),
+					   *value = PyTuple_GET_ITEM(item, 1);
+
+			if (value == Py_None)
+				continue;
+			if (!PyBytes_Check(key) && !PyUnicode_Check(key))
+			{
+				PyErr_SetString(PyExc_TypeError,
+					"The connection parameter names must be strings");
+				goto done;
+			}
+			if (!(keys[n] = get_conn_param(key, tmp_list)) ||
+					!(values[n] = get_conn_param(value, tmp_list)))
+				goto done;
+			++n;
+		}
+	}
+	else
+	{
+		/* let libpq expand the connection string or URI */
+		keys[n] = "dbname";
+		if (!(values[n] = get_conn_param(target, tmp_list)))
+			goto done;
+		++n; expand = 1;
+	}
+	keys[n] = values[n] = NULL;
+
+	Py_BEGIN_ALLOW_THREADS
+	cnx = PQconnectStartParams(keys, values, expand);
+	Py_END_ALLOW_THREADS
+
+	if (!cnx)
+		PyErr_NoMemory();
+
+done:
+	PyMem_Free(keys);
+	PyMem_Free(values);
+	Py_XDECREF(items);
+	return cnx;
+}
+
+/* connects to several databases concurrently */
+static char pgConnectMany__doc__[] =
+"connect_many(targets, [timeout]) -- open several connections concurrently\n\n"
+"The targets can be connection strings or URIs, or dicts with connection\n"
+"keywords.  All connections are established in parallel and returned as\n"
+"a list of connection objects in the same order as the targets.\n";
+
+static PyObject *
+pgConnectMany(PyObject *self, PyObject *args, PyObject *dict)
+{
+	static const char *kwlist[] = {"targets", "timeout", NULL};
+	PyObject   *targets, *timeout_obj = NULL,
+			   *seq = NULL, *tmp_list = NULL, *ret = NULL;
+	PGconn	  **cnxs = NULL;
+	PostgresPollingStatusType *states = NULL;
+	struct pollfd *fds = NULL;
+	Py_ssize_t *fd_index = NULL;
+	Py_ssize_t	n, k, m, pending = 0;
+	PY_LONG_LONG deadline = 0;
+	int			timeout = -1, timed_out = 0, rc;
+
+	if (!PyArg_ParseTupleAndKeywords(args, dict, "O|O", (char **) kwlist,
+			&targets, &timeout_obj))
+		return NULL;
+
+	if (timeout_obj && timeout_obj != Py_None)
+	{
+		double		t = PyFloat_AsDouble(timeout_obj);
+
+		if (t == -1.0 && PyErr_Occurred())
+			return NULL;
+		if (t < 0)
+		{
+			PyErr_SetString(PyExc_ValueError,
+				"The timeout must not be negative");
+			return NULL;
+		}
+		timeout = t < 2000000.0 ? (int) (1000.0 * t + 0.999) : 2000000000;
+	}
+	if (PyBytes_Check(targets) || PyUnicode_Check(targets) ||
+			PyDict_Check(targets))
+	{
+		PyErr_SetString(PyExc_TypeError,
+			"Function connect_many() expects a list of targets");
+		return NULL;
+	}
+	if (!(seq = PySequence_Fast(targets,
+			"Function connect_many() expects a list of targets")))
+		return NULL;
+
+	n = PySequence_Fast_GET_SIZE(seq);
+	cnxs = PyMem_Malloc((size_t) (n ? n : 1) * sizeof(*cnxs));
+	states = PyMem_Malloc((size_t) (n ? n : 1) * sizeof(*states));
+	fds = PyMem_Malloc((size_t) (n ? n : 1) * sizeof(*fds));
+	fd_index = PyMem_Malloc((size_t) (n ? n : 1) * sizeof(*fd_index));
+	if (!cnxs || !states || !fds || !fd_index)
+	{
+		PyErr_NoMemory();
+		goto done;
+	}
+	memset(cnxs, 0, (size_t) (n ? n : 1) * sizeof(*cnxs));
+	if (!(tmp_list = PyList_New(0)))
+		goto done;
+
+	/* start all connections before waiting for any of them */
+	for (k = 0; k < n; ++k)
+	{
+		if (!(cnxs[k] = start_connection(
+				PySequence_Fast_GET_ITEM(seq, k), tmp_list)))
+			goto done;
+		if (PQstatus(cnxs[k]) == CONNECTION_BAD)
+			states[k] = PGRES_POLLING_FAILED;
+		else
+		{
+			/* libpq wants us to start as if writing had been requested */
+			states[k] = PGRES_POLLING_WRITING;
+			++pending;
+		}
+	}
+	Py_CLEAR(tmp_list);
+
+	if (timeout >= 0)
+		deadline = get_clock_ms() + timeout;
+
+	/* drive all pending connections until they are ready or failed */
+	while (pending)
+	{
+		int			wait = -1;
+
+		for (k = m = 0; k < n; ++k)
+		{
+			if (states[k] == PGRES_POLLING_OK ||
+					states[k] == PGRES_POLLING_FAILED)
+				continue;
+			/* the socket can change when trying multiple hosts */
+			fds[m].fd = PQsocket(cnxs[k]);
+			fds[m].events = states[k] == PGRES_POLLING_READING ?
+				POLLIN : POLLOUT;
+			fds[m].revents = 0;
+			fd_index[m++] = k;
+		}
+		if (timeout >= 0)
+		{
+			PY_LONG_LONG left = deadline - get_clock_ms();
+
+			wait = left > 0 ? (int) left : 0;
+		}
+
+		Py_BEGIN_ALLOW_THREADS
+		rc = poll(fds, (unsigned long) m, wait);
+		for (k = 0; rc > 0 && k < m; ++k)
+		{
+			if (fds[k].revents)
+			{
+				Py_ssize_t	i = fd_index[k];
+
+				states[i] = PQconnectPoll(cnxs[i]);
+				if (states[i] == PGRES_POLLING_OK ||
+						states[i] == PGRES_POLLING_FAILED)
+					--pending;
+			}
+		}
+		Py_END_ALLOW_THREADS
+
+		if (rc < 0)
+		{
+			if (errno != EINTR)
+			{
+				PyErr_SetFromErrno(PyExc_OSError);
+				goto done;
+			}
+			if (PyErr_CheckSignals())
+				goto done;
+		}
+		else if (!rc && timeout >= 0)
+		{
+			timed_out = 1;
+			break;
+		}
+	}
+
+	/* report the first target that could not be connected */
+	for (k = 0; k < n; ++k)
+	{
+		if (states[k] == PGRES_POLLING_FAILED)
+		{
+			set_error(InternalError, "Cannot connect", cnxs[k], NULL);
+			goto done;
+		}
+	}
+	if (timed_out)
+	{
+		set_error_msg(InternalError, "Cannot connect: timeout expired");
+		goto done;
+	}
+
+	if (!(ret = PyList_New(n)))
+		goto done;
+	for (k = 0; k < n; ++k)
+	{
+		connObject *npgobj;
+
+		if (!(npgobj = new_conn_obj()))
+		{
+			Py_CLEAR(ret);
+			goto done;
+		}
+		npgobj->cnx = cnxs[k];
+		cnxs[k] = NULL;
+		PyList_SET_ITEM(ret, k, (PyObject *) npgobj);
+	}
+
+done:
+	if (cnxs)
+	{
+		for (k = 0; k < n; ++k)
+			if (cnxs[k]) PQfinish(cnxs[k]);
+		PyMem_Free(cnxs);
+	}
+	PyMem_Free(states);
+	PyMem_Free(fds);
+	PyMem_Free(fd_index);
+	Py_XDECREF(tmp_list);
+	Py_DECREF(seq);
+	return ret;
+}
+
+static void
+queryDealloc(queryObject *self)
+{
+	Py_XDECREF(self->pgcnx);
+	Py_XDECREF(self->casts);
+	if (self->result)
+		PQclear(self->result);
+
+	PyObject_Del(self);
+}
+
+/* get number of rows */
+static char queryNTuples__doc__[] =
+"ntuples() -- return number of tuples returned by query";
+
+static PyObject *
+queryNTuples(queryObject *self, PyObject *noargs)
+{
+	return PyInt_FromLong((long) PQntuples(self->result));
+}
+
+/* get command status */
+static char queryCmdStatus__doc__[] =
+"cmdstatus() -- return the command status tag of the query";
+
+static PyObject *
+queryCmdStatus(queryObject *self, PyObject *noargs)
+{
+	char	   *ret = PQcmdStatus(self->result);
+
+	if (!ret || !*ret)
+	{
+		Py_INCREF(Py_None);
+		return Py_None;
+	}
+	return PyStr_FromString(ret);
+}
+
+/* get number of rows affected */
+static char queryCmdTuples__doc__[] =
+"cmdtuples() -- return number of rows affected or returned by query";
+
+static PyObject *
+queryCmdTuples(queryObject *self, PyObject *noargs)
+{
+	char	   *ret;
+
+	if (PQresultStatus(self->result) == PGRES_TUPLES_OK)
+		return PyInt_FromLong((long) PQntuples(self->result));
+	ret = PQcmdTuples(self->result);
+	if (!ret || !*ret)
+	{
+		Py_INCREF(Py_None);
+		return Py_None;
+	}
+	return PyInt_FromString(ret, NULL, 10);
+}
+
+/* list fields names from query result */
+static char queryListFields__doc__[] =
+"listfields() -- List field names from result";
+
+static PyObject *
+queryListFields(queryObject *self, PyObject *noargs)
+{
+	int			i,
+				n;
+	char	   *name;
+	PyObject   *fieldstuple,
+			   *str;
+
+	/* builds tuple */
+	n = PQnfields(self->result);
+	fieldstuple = PyTuple_New(n);
+
+	for (i = 0; i < n; ++i)
+	{
+		name = PQfname(self->result, i);
+		str = PyStr_FromString(name);
+		PyTuple_SET_ITEM(fieldstuple, i, str);
+	}
+
+	return fieldstuple;
+}
+
+/* get field name from last result */
+static char queryFieldName__doc__[] =
+"fieldname(num) -- return name of field from result from its position";
+
+static PyObject *
+queryFieldName(queryObject *self, PyObject *args)
+{
+	int		i;
+	char   *name;
+
+	/* gets args */
+	if (!PyArg_ParseTuple(args, "i", &i))
+	{
+		PyErr_SetString(PyExc_TypeError,
+			"Method fieldname() takes an integer as argument");
+		return NULL;
+	}
+
+	/* checks number validity */
+	if (i >= PQnfields(self->result))
+	{
+		PyErr_SetString(PyExc_ValueError, "Invalid field number");
+		return NULL;
+	}
+
+	/* gets fields name and builds object */
+	name = PQfname(self->result, i);
+	return PyStr_FromString(name);
+}
+
+/* gets fields number from name in last result */
+static char queryFieldNumber__doc__[] =
+"fieldnum(name) -- return position in query for field from its name";
+
+static PyObject *
+queryFieldNumber(queryObject *self, PyObject *args)
+{
+	int		num;
+	char   *name;
+
+	/* gets args */
+	if (!PyArg_ParseTuple(args, "s", &name))
+	{
+		PyErr_SetString(PyExc_TypeError,
+			"Method fieldnum() takes a string as argument");
+		return NULL;
+	}
+
+	/* gets field number */
+	if ((num = PQfnumber(self->result, name)) == -1)
+	{
+		PyErr_SetString(PyExc_ValueError, "Unknown field");
+		return NULL;
+	}
+
+	return PyInt_FromLong(num);
+}
+
+/* get the array type from the array module (internal use only) */
+static PyObject *
+get_array_type(void)
+{
+	if (!array_type)
+	{
+		PyObject *array_module = PyImport_ImportModule("array");
+
+		if (!array_module)
+			return NULL;
+		array_type = PyObject_GetAttrString(array_module, "array");
+		Py_DECREF(array_module);
+	}
+	return array_type;
+}
+
+/* create a zero-filled array of the given type and size (internal use only) */
+static PyObject *
+new_typed_array(const char *typecode, Py_ssize_t size)
+{
+	PyObject   *type, *arr, *ret;
+
+	if (!(type = get_array_type()))
+		return NULL;
+	if (!(arr = PyObject_CallFunction(type, "s[i]", typecode, 0)))
+		return NULL;
+	/* repeating a single item allocates the buffer in one go */
+	ret = PySequence_Repeat(arr, size);
+	Py_DECREF(arr);
+	return ret;
+}
+
+/* store an integer in a typed buffer at the given index (internal use only)
+   Returns 0 if the value fits into the array type, -1 and sets an error
+   otherwise. */
+static int
+store_typed_int(char *buf, Py_ssize_t i, char typecode, PY_LONG_LONG v)
+{
+	int			overflow;
+
+	switch (typecode)
+	{
+		case 'b':
+			overflow = v < SCHAR_MIN || v > SCHAR_MAX;
+			((signed char *) buf)[i] = (signed char) v; break;
+		case 'B':
+			overflow = v < 0 || v > UCHAR_MAX;
+			((unsigned char *) buf)[i] = (unsigned char) v; break;
+		case 'h':
+			overflow = v < SHRT_MIN || v > SHRT_MAX;
+			((short *) buf)[i] = (short) v; break;
+		case 'H':
+			overflow = v < 0 || v > USHRT_MAX;
+			((unsigned short *) buf)[i] = (unsigned short) v; break;
+		case 'i':
+			overflow = v < INT_MIN || v > INT_MAX;
+			((int *) buf)[i] = (int) v; break;
+		case 'I':
+			overflow = v < 0 || v > UINT_MAX;
+			((unsigned int *) buf)[i] = (unsigned int) v; break;
+		case 'l':
+			overflow = v < LONG_MIN || v > LONG_MAX;
+			((long *) buf)[i] = (long) v; break;
+		case 'L':
+			overflow = v < 0 ||
+				(unsigned PY_LONG_LONG) v > ULONG_MAX;
+			((unsigned long *) buf)[i] = (unsigned long) v; break;
+		case 'q':
+			overflow = 0;
+			((PY_LONG_LONG *) buf)[i] = v; break;
+		default: /* 'Q' */
+			overflow = v < 0;
+			((unsigned PY_LONG_LONG *) buf)[i] =
+				(unsigned PY_LONG_LONG) v;
+	}
+	if (overflow)
+	{
+		PyErr_SetString(PyExc_OverflowError,
+			"Value does not fit into the array type");
+		return -1;
+	}
+	return 0;
+}
+
+/* store a text value in a typed buffer at the given index (internal use only)
+   Returns 0 if the value could be stored, -1 and sets an error otherwise. */
+static int
+store_typed_value(char *buf, Py_ssize_t i, char typecode, char *s, int type)
+{
+	if (typecode == 'f' || typecode == 'd')
+	{
+		double		v;
+
+		if (type == PYGRES_BOOL)
+			v = *s == 't' ? 1.0 : 0.0;
+		else
+		{
+			char *e;
+
+			errno = 0;
+			v = strtod(s, &e);
+			if (e == s || *e)
+			{
+				PyErr_SetString(PyExc_ValueError, "Invalid numeric value");
+				return -1;
+			}
+		}
+		if (typecode == 'f')
+			((float *) buf)[i] = (float) v;
+		else
+			((double *) buf)[i] = v;
+	}
+	else
+	{
+		PY_LONG_LONG	v;
+
+		if (type == PYGRES_BOOL)
+			v = *s == 't' ? 1 : 0;
+		else
+		{
+			char *e;
+
+			errno = 0;
+			v = strtoll(s, &e, 10);
+			if (e == s || *e)
+			{
+				PyErr_SetString(PyExc_ValueError, "Invalid integer value");
+				return -1;
+			}
+			if (errno == ERANGE)
+			{
+				PyErr_SetString(PyExc_OverflowError,
+					"Value does not fit into the array type");
+				return -1;
+			}
+		}
+		return store_typed_int(buf, i, typecode, v);
+	}
+	return 0;
+}
+
+/* get the array module typecode for a numeric type or numeric array type
+   (internal use only), returns NULL if there is no matching typecode */
+static const char *
+get_typed_array_code(Oid pgtype)
+{
+	switch (pgtype)
+	{
+		case INT2OID:
+		case INT2ARRAYOID:
+			return "h";
+		case INT4OID:
+		case INT4ARRAYOID:
+			return "i";
+		case INT8OID:
+		case INT8ARRAYOID:
+			return "q";
+		case OIDOID:
+		case XIDOID:
+		case CIDOID:
+		case OIDARRAYOID:
+		case XIDARRAYOID:
+		case CIDARRAYOID:
+			return "I";
+		case FLOAT4OID:
+		case FLOAT4ARRAYOID:
+			return "f";
+		case FLOAT8OID:
+		case FLOAT8ARRAYOID:
+			return "d";
+		default:
+			return NULL;
+	}
+}
+
+/* Cast a one-dimensional numeric array in text format to a typed array.
+   Returns NULL without setting an error if the array has more than one
+   dimension, explicit bounds or null values, so that the caller can cast
+   it to a list instead. */
+static PyObject *
+cast_typed_array(char *s, Py_ssize_t size, const char *typecode)
+{
+	PyObject   *arr;
+	Py_buffer	view;
+	char	   *end = s + size, *t, *e;
+	Py_ssize_t	n, i;
+	int			is_float = *typecode == 'f' || *typecode == 'd';
+
+	if (size < 2 || *s != '{' || end[-1] != '}')
+		return NULL;
+	/* count the elements, the array is null-terminated */
+	for (n = size > 2 ? 1 : 0, t = s + 1; t < end - 1; ++t)
+	{
+		if (*t == ',')
+			++n;
+		else if (*t == '{' || *t == '"')
+			return NULL;
+	}
+
+	if (!(arr = new_typed_array(typecode, n)))
+		return NULL;
+	if (PyObject_GetBuffer(arr, &view, PyBUF_WRITABLE) < 0)
+	{
+		Py_DECREF(arr);
+		return NULL;
+	}
+
+	for (i = 0, t = s + 1; i < n; ++i, t = e + 1)
+	{
+		if (is_float)
+		{
+			double		v = strtod(t, &e);
+
+			if (e == t || (*e != ',' && *e != '}'))
+				break;
+			if (*typecode == 'f')
+				((float *) view.buf)[i] = (float) v;
+			else
+				((double *) view.buf)[i] = v;
+		}
+		else
+		{
+			PY_LONG_LONG	v;
+
+			errno = 0;
+			v = strtoll(t, &e, 10);
+			if (e == t || (*e != ',' && *e != '}') || errno == ERANGE)
+				break;
+			if (store_typed_int(view.buf, i, *typecode, v) < 0)
+			{
+				PyErr_Clear();
+				break;
+			}
+		}
+	}
+
+	PyBuffer_Release(&view);
+	if (i < n) /* e.g. null values */
+	{
+		Py_DECREF(arr);
+		return NULL;
+	}
+	return arr;
+}
+
+/* read an unsigned big-endian integer of the given size (internal use only) */
+static unsigned PY_LONG_LONG
+get_be_uint(const char *s, int size)
+{
+	const unsigned char *p = (const unsigned char *) s;
+	unsigned PY_LONG_LONG v = 0;
+
+	while (size--)
+		v = (v << 8) | *p++;
+	return v;
+}
+
+/* get the item size of a numeric array typecode (internal use only) */
+static int
+get_typed_array_itemsize(char typecode)
+{
+	return typecode == 'h' ? 2 : (typecode == 'q' || typecode == 'd') ? 8 : 4;
+}
+
+/* store a numeric value in binary format in a typed buffer (internal use only)
+   The size of the value must match the item size of the typecode. */
+static void
+store_binary_value(char *buf, Py_ssize_t i, char typecode, const char *s)
+{
+	switch (typecode)
+	{
+		case 'h':
+			((short *) buf)[i] = (short) get_be_uint(s, 2); break;
+		case 'i':
+			((int *) buf)[i] = (int) get_be_uint(s, 4); break;
+		case 'I':
+			((unsigned int *) buf)[i] = (unsigned int) get_be_uint(s, 4);
+			break;
+		case 'q':
+			((PY_LONG_LONG *) buf)[i] = (PY_LONG_LONG) get_be_uint(s, 8);
+			break;
+		case 'f':
+		{
+			PY_UINT32_T	u = (PY_UINT32_T) get_be_uint(s, 4);
+
+			memcpy((float *) buf + i, &u, 4);
+			break;
+		}
+		default: /* 'd' */
+		{
+			PY_UINT64_T	u = (PY_UINT64_T) get_be_uint(s, 8);
+
+			memcpy((double *) buf + i, &u, 8);
+		}
+	}
+}
+
+/* cast a numeric value in binary format to a Python object (internal use only)
+   The size of the value must match the item size of the typecode. */
+static PyObject *
+cast_binary_value(char typecode, const char *s)
+{
+	switch (typecode)
+	{
+		case 'h':
+			return PyInt_FromLong((short) get_be_uint(s, 2));
+		case 'i':
+			return PyInt_FromLong((int) get_be_uint(s, 4));
+		case 'I':
+			return PyInt_FromLong((long) get_be_uint(s, 4));
+		case 'q':
+			return PyLong_FromLongLong((PY_LONG_LONG) get_be_uint(s, 8));
+		case 'f':
+		{
+			PY_UINT32_T	u = (PY_UINT32_T) get_be_uint(s, 4);
+			float		v;
+
+			memcpy(&v, &u, 4);
+			return PyFloat_FromDouble(v);
+		}
+		default: /* 'd' */
+		{
+			PY_UINT64_T	u = (PY_UINT64_T) get_be_uint(s, 8);
+			double		v;
+
+			memcpy(&v, &u, 8);
+			return PyFloat_FromDouble(v);
+		}
+	}
+}
+
+/* Cast the elements of a numeric array in binary format to a nested list.
+   The position s is advanced over the elements that have been cast. */
+static PyObject *
+cast_binary_elements(const char **s, const char *end,
+	const int *dims, int ndim, char typecode)
+{
+	PyObject   *list;
+	int			i, len, itemsize = get_typed_array_itemsize(typecode);
+
+	if (!(list = PyList_New(dims[0])))
+		return NULL;
+
+	for (i = 0; i < dims[0]; ++i)
+	{
+		PyObject   *item;
+
+		if (ndim > 1)
+			item = cast_binary_elements(s, end, dims + 1, ndim - 1, typecode);
+		else if (end - *s < 4)
+			item = NULL;
+		else
+		{
+			len = (int) get_be_uint(*s, 4);
+			*s += 4;
+			if (len == -1)
+			{
+				Py_INCREF(Py_None);
+				item = Py_None;
+			}
+			else if (len != itemsize || end - *s < len)
+				item = NULL;
+			else
+			{
+				item = cast_binary_value(typecode, *s);
+				*s += len;
+			}
+		}
+		if (!item)
+		{
+			if (!PyErr_Occurred())
+				PyErr_SetString(PyExc_ValueError,
+					"Invalid array in binary format");
+			Py_DECREF(list);
+			return NULL;
+		}
+		PyList_SET_ITEM(list, i, item);
+	}
+	return list;
+}
+
+/* Cast a numeric array in binary format to a typed array if it has only one
+   dimension and no null values and typed is set, otherwise to a list.
+   Arrays with other element types are returned as bytes. */
+static PyObject *
+cast_binary_array(const char *s, Py_ssize_t size, int typed)
+{
+	const char *end = s + size, *typecode;
+	int			ndim, has_null, dims[MAX_ARRAY_DEPTH], k, itemsize;
+	Py_ssize_t	n, i;
+
+	if (size < 12 || !(typecode = get_typed_array_code(
+			(Oid) get_be_uint(s + 8, 4))))
+		return PyBytes_FromStringAndSize(s, size);
+
+	ndim = (int) get_be_uint(s, 4);
+	has_null = (int) get_be_uint(s + 4, 4);
+	if (ndim < 0 || ndim > MAX_ARRAY_DEPTH || size < 12 + 8 * ndim)
+		goto invalid;
+	for (s += 12, n = ndim ? 1 : 0, k = 0; k < ndim; ++k, s += 8)
+	{
+		if ((dims[k] = (int) get_be_uint(s, 4)) < 0)
+			goto invalid;
+		n *= dims[k];
+	}
+
+	if (typed && ndim <= 1 && !has_null)
+	{
+		PyObject   *arr;
+		Py_buffer	view;
+
+		itemsize = get_typed_array_itemsize(*typecode);
+		if (end - s < n * (4 + itemsize))
+			goto invalid;
+		if (!(arr = new_typed_array(typecode, n)))
+			return NULL;
+		if (PyObject_GetBuffer(arr, &view, PyBUF_WRITABLE) < 0)
+		{
+			Py_DECREF(arr);
+			return NULL;
+		}
+		for (i = 0; i < n; ++i, s += 4 + itemsize)
+		{
+			if ((int) get_be_uint(s, 4) != itemsize)
+				break;
+			store_binary_value(view.buf, i, *typecode, s + 4);
+		}
+		PyBuffer_Release(&view);
+		if (i < n)
+		{
+			Py_DECREF(arr);
+			goto invalid;
+		}
+		return arr;
+	}
+
+	if (!ndim)
+		return PyList_New(0);
+	return cast_binary_elements(&s, end, dims, ndim, *typecode);
+
+invalid:
+	PyErr_SetString(PyExc_ValueError, "Invalid array in binary format");
+	return NULL;
+}
+
+/* get a memoryview of a bytea value (internal use only)
+   In binary format, the view points directly into the result which is kept
+   alive by a reference, otherwise it points to the unescaped data. */
+static PyObject *
+query_bytea_view(queryObject *self, int i, int j)
+{
+	byteaObject *bytea;
+	PyObject   *view;
+
+	if (!(bytea = PyObject_NEW(byteaObject, &byteaType)))
+		return NULL;
+
+	if (PQfformat(self->result, j)) /* binary format */
+	{
+		bytea->data = PQgetvalue(self->result, i, j);
+		bytea->size = PQgetlength(self->result, i, j);
+		Py_INCREF(self);
+		bytea->owner = (PyObject *) self;
+	}
+	else
+	{
+		size_t		size;
+
+		bytea->owner = NULL;
+		bytea->size = 0;
+		bytea->data = (char *) PQunescapeBytea(
+			(unsigned char *) PQgetvalue(self->result, i, j), &size);
+		if (!bytea->data)
+		{
+			Py_DECREF(bytea);
+			return PyErr_NoMemory();
+		}
+		bytea->size = (Py_ssize_t) size;
+	}
+
+	view = PyMemoryView_FromObject((PyObject *) bytea);
+	Py_DECREF(bytea);
+	return view;
+}
+
+/* cast an array value of the query result (internal use only)
+   Numeric arrays in binary format are always cast directly, numeric arrays
+   in text format are cast to typed arrays only if this has been enabled. */
+static PyObject *
+query_cast_array(queryObject *self, int i, int j, int type)
+{
+	char	   *s = PQgetvalue(self->result, i, j);
+	Py_ssize_t	size = PQgetlength(self->result, i, j);
+
+	if (PQfformat(self->result, j)) /* binary format */
+		return cast_binary_array(s, size, typed_array);
+
+	if (typed_array)
+	{
+		const char *typecode = get_typed_array_code(
+			PQftype(self->result, j));
+
+		if (typecode)
+		{
+			PyObject   *ret = cast_typed_array(s, size, typecode);
+
+			if (ret || PyErr_Occurred())
+				return ret;
+		}
+	}
+
+	return cast_array(s, size, self->encoding, type, NULL, 0);
+}
+
+/* get the typecast function for a column of the query result
+   (internal use only)  The functions are resolved once per column from
+   the type casts of the connection.  Returns a borrowed reference to the
+   function, to None if no cast is needed, or to False if the cast hook
+   shall be used since the type has not been registered.  The native
+   date/time cast functions are replaced with an int for their kind. */
+static PyObject *
+query_get_cast(queryObject *self, int j)
+{
+	PyObject   *type_casts = self->pgcnx ? self->pgcnx->type_casts : NULL,
+			   *cast = NULL;
+	int			kind;
+
+	if (!self->casts)
+	{
+		int			k, n = PQnfields(self->result);
+
+		if (!(self->casts = PyTuple_New(n)))
+			return NULL;
+		for (k = 0; k < n; ++k)
+		{
+			Py_INCREF(Py_False);
+			PyTuple_SET_ITEM(self->casts, k, Py_False);
+		}
+	}
+	cast = PyTuple_GET_ITEM(self->casts, j);
+
+	/* the type may have been registered by the cast hook in the meantime */
+	if (cast == Py_False && type_casts)
+	{
+		PyObject   *key = PyInt_FromLong((long) PQftype(self->result, j));
+
+		if (!key)
+			return NULL;
+		cast = PyDict_GetItem(type_casts, key);
+		Py_DECREF(key);
+		if (!cast)
+			return Py_False;
+		if (cast != Py_None && !PyCallable_Check(cast))
+		{
+			PyErr_Format(PyExc_TypeError,
+				"The type cast for type %d is not callable",
+				(int) PQftype(self->result, j));
+			return NULL;
+		}
+		if ((kind = get_native_cast(cast)))
+		{
+			if (!(cast = PyInt_FromLong(kind)))
+				return NULL;
+		}
+		else
+			Py_INCREF(cast);
+		PyTuple_SetItem(self->casts, j, cast);
+	}
+	return cast;
+}
+
+/* cast a field of a type not handled natively (internal use only) */
+static PyObject *
+query_cast_other(queryObject *self, int i, int j)
+{
+	PyObject   *cast = query_get_cast(self, j), *obj, *tmp_obj;
+	char	   *s = PQgetvalue(self->result, i, j);
+	Py_ssize_t	size = PQgetlength(self->result, i, j);
+
+	if (!cast)
+		return NULL;
+	if (cast == Py_False)
+		return cast_other(s, size, self->encoding,
+			PQftype(self->result, j), self->pgcnx->cast_hook);
+	if (PyInt_CheckExact(cast)) /* native date/time cast */
+		return cast_datetime(s, (int) PyInt_AsLong(cast),
+			get_date_format(self->pgcnx));
+	obj = cast_sized_text(s, size, self->encoding, PYGRES_TEXT);
+	if (cast == Py_None || !obj)
+		return obj;
+	tmp_obj = obj;
+	obj = PyObject_CallFunctionObjArgs(cast, obj, NULL);
+	Py_DECREF(tmp_obj);
+	return obj;
+}
+
+/* cast a numeric or money field to a scaled int (internal use only)
+   The scale of numeric fields is taken from the type modifier, money values
+   are scaled by their fractional digits.  Values that cannot be cast this
+   way, like numbers without a fixed scale or NaN, are cast as usual. */
+static PyObject *
+query_cast_scaled(queryObject *self, int i, int j, int type)
+{
+	char	   *s = PQgetvalue(self->result, i, j);
+	PyObject   *obj;
+	int			scale = -1;
+
+	if (type == PYGRES_DECIMAL)
+	{
+		int			mod = PQfmod(self->result, j);
+
+		/* the type modifier is ((precision << 16) | scale) + VARHDRSZ */
+		if (mod < 4 || (scale = (mod - 4) & 0xffff) > 1000)
+			return cast_unsized_simple(s, type);
+	}
+	obj = cast_scaled(s, PQgetlength(self->result, i, j), scale,
+		type == PYGRES_MONEY);
+	if (obj || PyErr_Occurred())
+		return obj;
+	return cast_unsized_simple(s, type);
+}
+
+/* cast the value of a single field of the query result (internal use only) */
+static PyObject *
+query_cast_value(queryObject *self, int i, int j, int type)
+{
+	/* get the string representation of the value */
+	/* note: this is always null-terminated text format */
+	char   *s;
+
+	if (PQgetisnull(self->result, i, j))
+	{
+		Py_INCREF(Py_None);
+		return Py_None;
+	}
+
+	s = PQgetvalue(self->result, i, j);
+
+	if (type & PYGRES_ARRAY)
+		return query_cast_array(self, i, j, type);
+	if (type == PYGRES_BYTEA)
+	{
+		if (bytea_view)
+			return query_bytea_view(self, i, j);
+		if (PQfformat(self->result, j)) /* binary format, not escaped */
+			return PyBytes_FromStringAndSize(s,
+				PQgetlength(self->result, i, j));
+		return cast_bytea_text(s);
+	}
+	if (type == PYGRES_OTHER)
+		return query_cast_other(self, i, j);
+	if (type & PYGRES_TEXT)
+		return cast_sized_text(s, PQgetlength(self->result, i, j),
+			self->encoding, type);
+	if (numeric_mode == NUMERIC_SCALED
+			&& (type == PYGRES_DECIMAL || type == PYGRES_MONEY))
+		return query_cast_scaled(self, i, j, type);
+	return cast_unsized_simple(s, type);
+}
+
+/* finds field number from string/integer (internal use only) */
+static int
+query_field_index(queryObject *self, PyObject *param)
+{
+	int			num;
+
+	if (PyBytes_Check(param))
+		num = PQfnumber(self->result, PyBytes_AsString(param));
+	else if (PyUnicode_Check(param))
+	{
+		PyObject   *tmp = get_encoded_string(param, self->encoding);
+		if (!tmp)
+			return -1;
+		num = PQfnumber(self->result, PyBytes_AsString(tmp));
+		Py_DECREF(tmp);
+	}
+	else if (PyInt_Check(param))
+		num = (int) PyInt_AsLong(param);
+	else
+	{
+		PyErr_SetString(PyExc_TypeError,
+			"Field must be given by name or number");
+		return -1;
+	}
+
+	if (num < 0 || num >= PQnfields(self->result))
+	{
+		PyErr_SetString(PyExc_ValueError, "Unknown field");
+		return -1;
+	}
+
+	return num;
+}
+
+/* check whether converting a query result to Python objects would exceed
+   the memory limit of the connection (internal use only)
+   Returns 0 if it is within the limit, -1 and sets an error otherwise. */
+static int
+query_check_memory_limit(queryObject *self)
+{
+	size_t		limit = self->pgcnx ? self->pgcnx->memory_limit : 0;
+
+	if (limit)
+	{
+		size_t	size = result_memory_size(self->result),
+				m = (size_t) PQntuples(self->result),
+				n = (size_t) PQnfields(self->result);
+
+		/* the converted rows need at least as much memory as the data,
+		   plus the overhead of the Python objects and the row tuples */
+		size = 2 * size + m * (sizeof(PyTupleObject) +
+			n * (sizeof(PyObject *) + OBJECT_CELL_SIZE));
+		if (size > limit)
+		{
+			set_error_msg(OperationalError,
+				"Query result is too large to be converted"
+				" within the memory limit");
+			return -1;
+		}
+	}
+	return 0;
+}
+
+/* get the memory size of the result */
+static char queryMemSize__doc__[] =
+"memsize() -- return the memory size of the query result in bytes\n\n"
+"The size is exact if libpq supports PQresultMemorySize() (libpq 12 or\n"
+"newer) and estimated from the size of the data otherwise.\n";
+
+static PyObject *
+queryMemSize(queryObject *self, PyObject *noargs)
+{
+	return PyLong_FromSize_t(result_memory_size(self->result));
+}
+
+/* get the kind of values of a column for serialization (internal use only)
+   Returns 'n' for numbers, 'm' for money, 'b' for booleans, 'j' for JSON,
+   'x' for binary values and 's' for all other values. */
+static char
+get_serial_kind(const PGresult *res, int j)
+{
+	if (PQfformat(res, j))
+		return 'x';
+	switch (PQftype(res, j))
+	{
+		case INT2OID:
+		case INT4OID:
+		case INT8OID:
+		case OIDOID:
+		case XIDOID:
+		case CIDOID:
+		case FLOAT4OID:
+		case FLOAT8OID:
+		case NUMERICOID:
+			return 'n';
+		case CASHOID:
+			return 'm';
+		case BOOLOID:
+			return 'b';
+		case JSONOID:
+		case JSONBOID:
+			return 'j';
+		default:
+			return 's';
+	}
+}
+
+/* append binary data as hex encoded bytea to the buffer (internal use only)
+   The backslash is doubled if requested, as needed in JSON strings. */
+static int
+serial_put_hex(copyBuffer *buf, const char *s, size_t n, int double_escape)
+{
+	static const char hex[] = "0123456789abcdef";
+	char	   *p;
+
+	if (copy_buffer_reserve(buf, 2 * n + 3) < 0)
+		return -1;
+	p = buf->data + buf->len;
+	*p++ = '\\';
+	if (double_escape)
+		*p++ = '\\';
+	*p++ = 'x';
+	for (; n; --n, ++s)
+	{
+		*p++ = hex[(*s >> 4) & 0x0f];
+		*p++ = hex[*s & 0x0f];
+	}
+	buf->len = p - buf->data;
+	return 0;
+}
+
+/* append a string literal in JSON format to the buffer (internal use only) */
+static int
+json_put_string(copyBuffer *buf, const char *s, size_t n)
+{
+	char	   *p;
+
+	/* in the worst case, every character needs a unicode escape */
+	if (copy_buffer_reserve(buf, 6 * n + 2) < 0)
+		return -1;
+	p = buf->data + buf->len;
+	*p++ = '"';
+	for (; n; --n, ++s)
+	{
+		switch (*s)
+		{
+			case '"': *p++ = '\\'; *p++ = '"'; break;
+			case '\\': *p++ = '\\'; *p++ = '\\'; break;
+			case '\b': *p++ = '\\'; *p++ = 'b'; break;
+			case '\f': *p++ = '\\'; *p++ = 'f'; break;
+			case '\n': *p++ = '\\'; *p++ = 'n'; break;
+			case '\r': *p++ = '\\'; *p++ = 'r'; break;
+			case '\t': *p++ = '\\'; *p++ = 't'; break;
+			default:
+				if ((unsigned char) *s < 0x20)
+				{
+					sprintf(p, "\\u%04x", (unsigned char) *s);
+					p += 6;
+				}
+				else
+					*p++ = *s;
+		}
+	}
+	*p++ = '"';
+	buf->len = p - buf->data;
+	return 0;
+}
+
+/* append a value of the given kind in JSON format to the buffer
+   (internal use only) */
+static int
+json_put_value(copyBuffer *buf, const char *s, size_t n, char kind)
+{
+	switch (kind)
+	{
+		case 'n':
+			/* NaN and Infinity are not valid JSON numbers */
+			if (n && (isdigit(s[0]) || (s[0] == '-' && isdigit(s[1]))))
+				return copy_buffer_put_text(buf, s, n, 0);
+			break;
+		case 'b':
+			return *s == 't' ? copy_buffer_put_text(buf, "true", 4, 0) :
+				copy_buffer_put_text(buf, "false", 5, 0);
+		case 'j':
+			return copy_buffer_put_text(buf, s, n, 0);
+		case 'x':
+			if (copy_buffer_put_text(buf, "\"", 1, 0) < 0 ||
+					serial_put_hex(buf, s, n, 1) < 0)
+				return -1;
+			return copy_buffer_put_text(buf, "\"", 1, 0);
+	}
+	return json_put_string(buf, s, n);
+}
+
+/* serialize the result as JSON */
+static char queryToJson__doc__[] =
+"to_json() -- return the result as a JSON string\n\n"
+"The result is serialized as an array of objects, one for each row,\n"
+"with the field names as keys.  Numbers and booleans are not quoted,\n"
+"and JSON values are embedded as they are.\n";
+
+static PyObject *
+queryToJson(queryObject *self, PyObject *noargs)
+{
+	const PGresult *res = self->result;
+	copyBuffer	buf = {NULL, 0, 0}, keys = {NULL, 0, 0};
+	size_t	   *offsets = NULL;
+	char	   *kinds = NULL;
+	int			i, j, m = PQntuples(res), n = PQnfields(res);
+
+	if (n)
+	{
+		kinds = (char *) PyMem_Malloc(n);
+		offsets = (size_t *) PyMem_Malloc((n + 1) * sizeof(size_t));
+		if (!kinds || !offsets)
+		{
+			PyErr_NoMemory();
+			goto error;
+		}
+	}
+
+	/* the keys of the objects are only escaped once */
+	for (j = 0; j < n; ++j)
+	{
+		const char *name = PQfname(res, j);
+
+		kinds[j] = get_serial_kind(res, j);
+		offsets[j] = keys.len;
+		if (json_put_string(&keys, name, strlen(name)) < 0 ||
+				copy_buffer_put_text(&keys, ":", 1, 0) < 0)
+			goto error;
+	}
+	if (n)
+		offsets[n] = keys.len;
+
+	if (copy_buffer_put_text(&buf, "[", 1, 0) < 0)
+		goto error;
+	for (i = 0; i < m; ++i)
+	{
+		if (copy_buffer_put_text(&buf, i ? ",{" : "{", i ? 2 : 1, 0) < 0)
+			goto error;
+		for (j = 0; j < n; ++j)
+		{
+			if ((j && copy_buffer_put_text(&buf, ",", 1, 0) < 0) ||
+					copy_buffer_put_text(&buf, keys.data + offsets[j],
+						offsets[j + 1] - offsets[j], 0) < 0)
+				goto error;
+			if (PQgetisnull(res, i, j))
+			{
+				if (copy_buffer_put_text(&buf, "null", 4, 0) < 0)
+					goto error;
+			}
+			else if (json_put_value(&buf, PQgetvalue(res, i, j),
+					PQgetlength(res, i, j), kinds[j]) < 0)
+				goto error;
+		}
+		if (copy_buffer_put_text(&buf, "}", 1, 0) < 0)
+			goto error;
+	}
+	if (copy_buffer_put_text(&buf, "]", 1, 0) < 0)
+		goto error;
+
+	PyMem_Free(keys.data);
+	PyMem_Free(offsets);
+	PyMem_Free(kinds);
+	return get_serial_string(&buf, self->encoding);
+
+error:
+	PyMem_Free(buf.data);
+	PyMem_Free(keys.data);
+	PyMem_Free(offsets);
+	PyMem_Free(kinds);
+	return NULL;
+}
+
+/* append a value in CSV format to the buffer (internal use only)
+   The value is quoted if it contains special characters or is empty,
+   since unquoted empty values represent nulls. */
+static int
+csv_put_value(copyBuffer *buf, const char *s, size_t n, char kind)
+{
+	const char *t;
+	size_t		k;
+	char	   *p;
+
+	if (kind == 'x')
+		return serial_put_hex(buf, s, n, 0);
+	for (t = s, k = n; k; --k, ++t)
+		if (*t == ',' || *t == '"' || *t == '\n' || *t == '\r')
+			break;
+	if (n && !k)
+		return copy_buffer_put_text(buf, s, n, 0);
+
+	/* in the worst case, every character is a quote that is doubled */
+	if (copy_buffer_reserve(buf, 2 * n + 2) < 0)
+		return -1;
+	p = buf->data + buf->len;
+	*p++ = '"';
+	for (; n; --n, ++s)
+	{
+		if (*s == '"')
+			*p++ = '"';
+		*p++ = *s;
+	}
+	*p++ = '"';
+	buf->len = p - buf->data;
+	return 0;
+}
+
+/* serialize the result as CSV */
+static char queryToCsv__doc__[] =
+"to_csv([header]) -- return the result as a CSV string\n\n"
+"The rows are separated by CRLF and the values by commas.  Values are\n"
+"quoted when necessary, and nulls are represented by empty values.\n"
+"A header line with the field names is included unless header is false.\n";
+
+static PyObject *
+queryToCsv(queryObject *self, PyObject *args, PyObject *dict)
+{
+	static const char *kwlist[] = {"header", NULL};
+	const PGresult *res = self->result;
+	copyBuffer	buf = {NULL, 0, 0};
+	char	   *kinds = NULL;
+	int			i, j, m = PQntuples(res), n = PQnfields(res), header = 1;
+
+	if (!PyArg_ParseTupleAndKeywords(args, dict, "|i", (char **) kwlist,
+			&header))
+		return NULL;
+
+	if (n && !(kinds = (char *) PyMem_Malloc(n)))
+		return PyErr_NoMemory();
+	for (j = 0; j < n; ++j)
+		kinds[j] = get_serial_kind(res, j);
+
+	if (header && n)
+	{
+		for (j = 0; j < n; ++j)
+		{
+			const char *name = PQfname(res, j);
+
+			if ((j && copy_buffer_put_text(&buf, ",", 1, 0) < 0) ||
+					csv_put_value(&buf, name, strlen(name), 's') < 0)
+				goto error;
+		}
+		if (copy_buffer_put_text(&buf, "\r\n", 2, 0) < 0)
+			goto error;
+	}
+	for (i = 0; i < m; ++i)
+	{
+		for (j = 0; j < n; ++j)
+		{
+			if ((j && copy_buffer_put_text(&buf, ",", 1, 0) < 0) ||
+					(!PQgetisnull(res, i, j) && csv_put_value(&buf,
+						PQgetvalue(res, i, j), PQgetlength(res, i, j),
+						kinds[j]) < 0))
+				goto error;
+		}
+		if (copy_buffer_put_text(&buf, "\r\n", 2, 0) < 0)
+			goto error;
+	}
+
+	PyMem_Free(kinds);
+	return get_serial_string(&buf, self->encoding);
+
+error:
+	PyMem_Free(buf.data);
+	PyMem_Free(kinds);
+	return NULL;
+}
+
+/* get the width of a value in a markdown table (internal use only)
+   With UTF-8, the width is the number of characters, otherwise the number
+   of bytes.  Pipe characters will be escaped and count twice. */
+static size_t
+markdown_width(const char *s, size_t n, int utf8)
+{
+	size_t		w = 0;
+
+	for (; n; --n, ++s)
+	{
+		if (utf8 && (*s & 0xc0) == 0x80)
+			continue;
+		w += *s == '|' ? 2 : 1;
+	}
+	return w;
+}
+
+/* append a cell of the given width to a markdown table (internal use only)
+   Values wider than max_width are truncated and end with an ellipsis. */
+static int
+markdown_put_cell(copyBuffer *buf, const char *s, size_t n,
+	size_t width, size_t max_width, int right, int utf8)
+{
+	size_t		w = markdown_width(s, n, utf8), k = 0;
+	int			truncate = max_width && w > max_width;
+	char	   *p;
+
+	if (truncate)
+	{
+		w = max_width;
+		k = max_width - 1; /* leave room for the ellipsis */
+	}
+	/* escaped values need at most two bytes per byte */
+	if (copy_buffer_reserve(buf, 2 * n + width + 6) < 0)
+		return -1;
+	p = buf->data + buf->len;
+	*p++ = ' ';
+	if (right)
+	{
+		memset(p, ' ', width - w);
+		p += width - w;
+	}
+	for (; n; --n, ++s)
+	{
+		if (utf8 && (*s & 0xc0) == 0x80)
+		{
+			*p++ = *s; /* continuation of a character */
+			continue;
+		}
+		if (truncate)
+		{
+			size_t		cw = *s == '|' ? 2 : 1;
+
+			if (cw > k)
+				break;
+			k -= cw;
+		}
+		switch (*s)
+		{
+			case '|': *p++ = '\\'; *p++ = '|'; break;
+			case '\n': case '\r': *p++ = ' '; break;
+			default: *p++ = *s;
+		}
+	}
+	if (truncate)
+	{
+		memset(p, ' ', k);
+		p += k;
+		if (utf8)
+		{
+			memcpy(p, "\xe2\x80\xa6", 3);
+			p += 3;
+		}
+		else
+			*p++ = '~';
+	}
+	if (!right)
+	{
+		memset(p, ' ', width - w);
+		p += width - w;
+	}
+	*p++ = ' ';
+	*p++ = '|';
+	buf->len = p - buf->data;
+	return 0;
+}
+
+/* serialize the result as a markdown table */
+static char queryToMarkdown__doc__[] =
+"to_markdown([max_width], [max_bytes]) -- return the result as markdown\n\n"
+"The result is formatted as a markdown table with aligned columns.\n"
+"Values wider than max_width characters are truncated.  If max_bytes\n"
+"is given, the table is cut after the last row that fits into this\n"
+"size, and a line with the number of omitted rows is added.\n";
+
+static PyObject *
+queryToMarkdown(queryObject *self, PyObject *args, PyObject *dict)
+{
+	static const char *kwlist[] = {"max_width", "max_bytes", NULL};
+	const PGresult *res = self->result;
+	PyObject   *max_width_obj = NULL, *max_bytes_obj = NULL;
+	copyBuffer	buf = {NULL, 0, 0};
+	size_t		max_width, max_bytes, *widths = NULL, *offsets = NULL;
+	char	   *kinds = NULL;
+	int			i, j, m = PQntuples(res), n = PQnfields(res),
+				utf8 = self->encoding == pg_encoding_utf8;
+
+	if (!PyArg_ParseTupleAndKeywords(args, dict, "|OO", (char **) kwlist,
+			&max_width_obj, &max_bytes_obj))
+		return NULL;
+	if (get_size_arg(max_width_obj, "maximum width", &max_width) < 0 ||
+			get_size_arg(max_bytes_obj, "maximum size", &max_bytes) < 0)
+		return NULL;
+
+	if (!n)
+		return get_serial_string(&buf, self->encoding);
+
+	kinds = (char *) PyMem_Malloc(n);
+	widths = (size_t *) PyMem_Malloc(n * sizeof(size_t));
+	offsets = (size_t *) PyMem_Malloc((m + 1) * sizeof(size_t));
+	if (!kinds || !widths || !offsets)
+	{
+		PyErr_NoMemory();
+		goto error;
+	}
+
+	/* calculate the widths of the columns */
+	for (j = 0; j < n; ++j)
+	{
+		const char *name = PQfname(res, j);
+
+		kinds[j] = get_serial_kind(res, j);
+		widths[j] = markdown_width(name, strlen(name), utf8);
+		if (widths[j] < 3)
+			widths[j] = 3; /* the delimiter row needs three dashes */
+	}
+	for (i = 0; i < m; ++i)
+	{
+		for (j = 0; j < n; ++j)
+		{
+			size_t		w;
+
+			if (PQgetisnull(res, i, j))
+				continue;
+			w = kinds[j] == 'x' ? 8 : markdown_width(PQgetvalue(res, i, j),
+				PQgetlength(res, i, j), utf8);
+			if (widths[j] < w)
+				widths[j] = w;
+		}
+	}
+	if (max_width)
+	{
+		for (j = 0; j < n; ++j)
+			if (widths[j] > max_width)
+				widths[j] = max_width < 3 ? 3 : max_width;
+	}
+
+	/* create the header and the delimiter row */
+	if (copy_buffer_put_text(&buf, "|", 1, 0) < 0)
+		goto error;
+	for (j = 0; j < n; ++j)
+	{
+		const char *name = PQfname(res, j);
+
+		if (markdown_put_cell(&buf, name, strlen(name),
+				widths[j], max_width, 0, utf8) < 0)
+			goto error;
+	}
+	if (copy_buffer_put_text(&buf, "\n|", 2, 0) < 0)
+		goto error;
+	for (j = 0; j < n; ++j)
+	{
+		int			right = kinds[j] == 'n' || kinds[j] == 'm';
+		size_t		k = widths[j] + 2;
+
+		if (copy_buffer_reserve(&buf, k + 1) < 0)
+			goto error;
+		memset(buf.data + buf.len, '-', k);
+		if (right)
+			buf.data[buf.len + k - 1] = ':';
+		buf.data[buf.len + k] = '|';
+		buf.len += k + 1;
+	}
+	if (copy_buffer_put_text(&buf, "\n", 1, 0) < 0)
+		goto error;
+	if (max_bytes && buf.len > max_bytes)
+	{
+		PyErr_SetString(PyExc_ValueError,
+			"The table header exceeds the maximum size");
+		goto error;
+	}
+
+	/* create the body */
+	for (i = 0; i < m; ++i)
+	{
+		offsets[i] = buf.len;
+		if (copy_buffer_put_text(&buf, "|", 1, 0) < 0)
+			goto error;
+		for (j = 0; j < n; ++j)
+		{
+			int			isnull = PQgetisnull(res, i, j);
+			const char *s = isnull ? "" : kinds[j] == 'x' ? "<binary>" :
+				PQgetvalue(res, i, j);
+			size_t		k = isnull ? 0 : kinds[j] == 'x' ? 8 :
+				(size_t) PQgetlength(res, i, j);
+
+			if (markdown_put_cell(&buf, s, k, widths[j], max_width,
+					kinds[j] == 'n' || kinds[j] == 'm', utf8) < 0)
+				goto error;
+		}
+		if (copy_buffer_put_text(&buf, "\n", 1, 0) < 0)
+			goto error;
+		if (max_bytes && buf.len > max_bytes)
+		{
+			buf.len = offsets[i];
+			break;
+		}
+	}
+
+	/* add the number of omitted rows, removing more rows if needed */
+	if (i < m)
+	{
+		char		footer[40];
+		size_t		k;
+
+		for (;;)
+		{
+			k = (size_t) sprintf(footer, "(%d more row%s)\n",
+				m - i, m - i == 1 ? "" : "s");
+			if (buf.len + k <= max_bytes || !i)
+				break;
+			buf.len = offsets[--i];
+		}
+		if (buf.len + k > max_bytes)
+		{
+			PyErr_SetString(PyExc_ValueError,
+				"The table header exceeds the maximum size");
+			goto error;
+		}
+		if (copy_buffer_put_text(&buf, footer, k, 0) < 0)
+			goto error;
+	}
+
+	PyMem_Free(offsets);
+	PyMem_Free(widths);
+	PyMem_Free(kinds);
+	return get_serial_string(&buf, self->encoding);
+
+error:
+	PyMem_Free(buf.data);
+	PyMem_Free(offsets);
+	PyMem_Free(widths);
+	PyMem_Free(kinds);
+	return NULL;
+}
+
+/* retrieves last result */
+static char queryGetResult__doc__[] =
+"getresult() -- Get the result of a query\n\n"
+"The result is returned as a list of rows, each one a tuple of fields\n"
+"in the order returned by the server.\n";
+
+static PyObject *
+queryGetResult(queryObject *self, PyObject *noargs)
+{
+	PyObject   *reslist;
+	int			i, m, n, *col_types;
+
+	if (query_check_memory_limit(self) < 0)
+		return NULL;
+
+	/* stores result in tuple */
+	m = PQntuples(self->result);
+	n = PQnfields(self->result);
+	if (!(reslist = PyList_New(m))) return NULL;
+
+	if (!(col_types = get_col_types(self->result, n))) return NULL;
+
+	for (i = 0; i < m; ++i)
+	{
+		PyObject   *rowtuple;
+		int			j;
+
+		if (!(rowtuple = PyTuple_New(n)))
+		{
+			Py_DECREF(reslist);
+			reslist = NULL;
+			goto exit;
+		}
+
+		for (j = 0; j < n; ++j)
+		{
+			PyObject * val = query_cast_value(self, i, j, col_types[j]);
+
+			if (!val)
+			{
+				Py_DECREF(reslist);
+				Py_DECREF(rowtuple);
+				reslist = NULL;
+				goto exit;
+			}
+
+			PyTuple_SET_ITEM(rowtuple, j, val);
+		}
+
+		PyList_SET_ITEM(reslist, i, rowtuple);
+	}
+
+exit:
+	PyMem_Free(col_types);
+
+	/* returns list */
+	return reslist;
+}
+
+/* retrieves last result as a list of dictionaries*/
+static char queryDictResult__doc__[] =
+"dictresult() -- Get the result of a query\n\n"
+"The result is returned as a list of rows, each one a dictionary with\n"
+"the field names used as the labels.\n";
+
+static PyObject *
+queryDictResult(queryObject *self, PyObject *noargs)
+{
+	PyObject   *reslist;
+	int			i,
+				m,
+				n,
+			   *col_types;
+
+	if (query_check_memory_limit(self) < 0)
+		return NULL;
+
+	/* stores result in list */
+	m = PQntuples(self->result);
+	n = PQnfields(self->result);
+	if (!(reslist = PyList_New(m))) return NULL;
+
+	if (!(col_types = get_col_types(self->result, n))) return NULL;
+
+	for (i = 0; i < m; ++i)
+	{
+		PyObject   *dict;
+		int			j;
+
+		if (!(dict = PyDict_New()))
+		{
+			Py_DECREF(reslist);
+			reslist = NULL;
+			goto exit;
+		}
+
+		for (j = 0; j < n; ++j)
+		{
+			PyObject * val = query_cast_value(self, i, j, col_types[j]);
+
+			if (!val)
+			{
+				Py_DECREF(dict);
+				Py_DECREF(reslist);
+				reslist = NULL;
+				goto exit;
+			}
+
+			PyDict_SetItemString(dict, PQfname(self->result, j), val);
+			Py_DECREF(val);
+		}
+
+		PyList_SET_ITEM(reslist, i, dict);
+	}
+
+exit:
+	PyMem_Free(col_types);
+
+	/* returns list */
+	return reslist;
+}
+
+/* retrieves last result as a list of columns */
+static char queryGetColumns__doc__[] =
+"getcolumns([fields]) -- Get the result of a query by columns\n\n"
+"The result is returned as a list of columns, each one a list of the\n"
+"values of that field in all rows.  If a sequence of field names or\n"
+"numbers is passed, only these columns are returned, in that order.\n";
+
+static PyObject *
+queryGetColumns(queryObject *self, PyObject *args)
+{
+	PyObject   *fields = NULL, *reslist = NULL;
+	int			i, j, k, m, n, *col_nums = NULL, *col_types = NULL;
+
+	if (!PyArg_ParseTuple(args, "|O", &fields))
+	{
+		PyErr_SetString(PyExc_TypeError,
+			"Method getcolumns() takes an optional sequence as argument");
+		return NULL;
+	}
+
+	if (query_check_memory_limit(self) < 0)
+		return NULL;
+
+	m = PQntuples(self->result);
+
+	if (fields && fields != Py_None)
+	{
+		PyObject   *seq;
+
+		if (PyBytes_Check(fields) || PyUnicode_Check(fields) ||
+			!(seq = PySequence_Fast(fields, "")))
+		{
+			PyErr_SetString(PyExc_TypeError,
+				"Method getcolumns() expects a sequence of fields");
+			return NULL;
+		}
+		n = (int) PySequence_Fast_GET_SIZE(seq);
+		if (!(col_nums = PyMem_Malloc(sizeof(int) * (n ? n : 1))))
+		{
+			Py_DECREF(seq);
+			return PyErr_NoMemory();
+		}
+		for (k = 0; k < n; ++k)
+		{
+			if ((col_nums[k] = query_field_index(self,
+					PySequence_Fast_GET_ITEM(seq, k))) < 0)
+			{
+				Py_DECREF(seq);
+				goto exit;
+			}
+		}
+		Py_DECREF(seq);
+	}
+	else
+	{
+		n = PQnfields(self->result);
+		if (!(col_nums = PyMem_Malloc(sizeof(int) * (n ? n : 1))))
+			return PyErr_NoMemory();
+		for (k = 0; k < n; ++k)
+			col_nums[k] = k;
+	}
+
+	if (!(col_types = PyMem_Malloc(sizeof(int) * (n ? n : 1))))
+	{
+		PyErr_NoMemory();
+		goto exit;
+	}
+	for (k = 0; k < n; ++k)
+		col_types[k] = get_type(PQftype(self->result, col_nums[k]));
+
+	if (!(reslist = PyList_New(n))) goto exit;
+
+	/* fill the columns one after the other */
+	for (k = 0; k < n; ++k)
+	{
+		PyObject   *collist;
+
+		if (!(collist = PyList_New(m)))
+		{
+			Py_DECREF(reslist);
+			reslist = NULL;
+			goto exit;
+		}
+		PyList_SET_ITEM(reslist, k, collist);
+
+		j = col_nums[k];
+		for (i = 0; i < m; ++i)
+		{
+			PyObject * val = query_cast_value(self, i, j, col_types[k]);
+
+			if (!val)
+			{
+				Py_DECREF(reslist);
+				reslist = NULL;
+				goto exit;
+			}
+
+			PyList_SET_ITEM(collist, i, val);
+		}
+	}
+
+exit:
+	PyMem_Free(col_nums);
+	PyMem_Free(col_types);
+
+	/* returns list */
+	return reslist;
+}
+
+/* retrieves a numeric column of the last result as a typed array */
+static char queryTypedColumn__doc__[] =
+"typedcolumn(field, [typecode], [nullmask]) -- get a numeric column\n\n"
+"The values of the given numeric or bool field are returned as an array\n"
+"of the given array module typecode, without creating a Python object\n"
+"for every value.  By default, 'q' is used for integer and bool columns\n"
+"and 'd' for float and numeric columns.  If nullmask is set, a tuple is\n"
+"returned, with an array of type 'B' flagging null values as second item.\n"
+"Otherwise nulls are returned as NaN in float arrays and not allowed in\n"
+"integer arrays.\n";
+
+static PyObject *
+queryTypedColumn(queryObject *self, PyObject *args, PyObject *dict)
+{
+	static const char *kwlist[] = {"field", "typecode", "nullmask", NULL};
+	PyObject   *field, *values, *nulls = NULL;
+	char	   *typecode = NULL;
+	int			nullmask = 0, j, type, is_float;
+	Py_ssize_t	i, m;
+	Py_buffer	values_view, nulls_view;
+
+	if (!PyArg_ParseTupleAndKeywords(args, dict, "O|zi", (char **) kwlist,
+			&field, &typecode, &nullmask))
+		return NULL;
+
+	if ((j = query_field_index(self, field)) < 0)
+		return NULL;
+
+	type = get_type(PQftype(self->result, j));
+	switch (type)
+	{
+		case PYGRES_INT:
+		case PYGRES_LONG:
+		case PYGRES_BOOL:
+			is_float = 0;
+			break;
+		case PYGRES_FLOAT:
+		case PYGRES_DECIMAL:
+			is_float = 1;
+			break;
+		default:
+			PyErr_SetString(PyExc_TypeError,
+				"Method typedcolumn() needs a numeric or bool field");
+			return NULL;
+	}
+
+	if (!typecode)
+		typecode = is_float ? "d" : "q";
+	else if (!*typecode || typecode[1] || !strchr("bBhHiIlLqQfd", *typecode))
+	{
+		PyErr_SetString(PyExc_ValueError, "Invalid array typecode");
+		return NULL;
+	}
+	else if (is_float && !strchr("fd", *typecode))
+	{
+		PyErr_SetString(PyExc_TypeError,
+			"Float values need a float array typecode");
+		return NULL;
+	}
+
+	m = PQntuples(self->result);
+	if (!(values = new_typed_array(typecode, m)))
+		return NULL;
+	if (PyObject_GetBuffer(values, &values_view, PyBUF_WRITABLE) < 0)
+	{
+		Py_DECREF(values);
+		return NULL;
+	}
+	if (nullmask)
+	{
+		if (!(nulls = new_typed_array("B", m)) ||
+			PyObject_GetBuffer(nulls, &nulls_view, PyBUF_WRITABLE) < 0)
+		{
+			Py_XDECREF(nulls);
+			PyBuffer_Release(&values_view);
+			Py_DECREF(values);
+			return NULL;
+		}
+	}
+
+	for (i = 0; i < m; ++i)
+	{
+		if (PQgetisnull(self->result, (int) i, j))
+		{
+			if (nullmask)
+				((unsigned char *) nulls_view.buf)[i] = 1;
+			else if (*typecode == 'd')
+				((double *) values_view.buf)[i] = Py_NAN;
+			else if (*typecode == 'f')
+				((float *) values_view.buf)[i] = (float) Py_NAN;
+			else
+			{
+				PyErr_SetString(PyExc_ValueError,
+					"Integer column contains null values");
+				break;
+			}
+		}
+		else if (store_typed_value(values_view.buf, i, *typecode,
+				PQgetvalue(self->result, (int) i, j), type) < 0)
+			break;
+	}
+
+	PyBuffer_Release(&values_view);
+	if (nullmask)
+		PyBuffer_Release(&nulls_view);
+
+	if (i < m)
+	{
+		Py_DECREF(values);
+		Py_XDECREF(nulls);
+		return NULL;
+	}
+
+	if (nullmask)
+	{
+		PyObject *ret = PyTuple_Pack(2, values, nulls);
+
+		Py_DECREF(values);
+		Py_DECREF(nulls);
+		return ret;
+	}
+	return values;
+}
+
+/* retrieves last result as named tuples */
+static char queryNamedResult__doc__[] =
+"namedresult() -- Get the result of a query\n\n"
+"The result is returned as a list of rows, each one a tuple of fields\n"
+"in the order returned by the server.\n";
+
+static PyObject *
+queryNamedResult(queryObject *self, PyObject *noargs)
+{
+	PyObject   *ret;
+
+	if (namedresult)
+	{
+		ret = PyObject_CallFunction(namedresult, "(O)", self);
+
+		if (ret == NULL)
+			return NULL;
+		}
+	else
+	{
+		ret = queryGetResult(self, NULL);
+	}
+
+	return ret;
+}
+
+/* retrieves last result as a lazy view */
+static char queryLazyResult__doc__[] =
+"lazyresult() -- Get the result of a query as a lazy view\n\n"
+"The result is returned as a read-only sequence of rows, each one a tuple\n"
+"of fields in the order returned by the server.  The rows are only\n"
+"converted to Python objects when they are accessed for the first time.\n";
+
+static PyObject *
+queryLazyResult(queryObject *self, PyObject *noargs)
+{
+	viewObject *view;
+	Py_ssize_t	m;
+
+	if (!(view = PyObject_NEW(viewObject, &viewType)))
+		return NULL;
+
+	view->num_rows = m = PQntuples(self->result);
+	view->num_fields = PQnfields(self->result);
+	view->num_cached = 0;
+	view->query = NULL;
+	view->col_types = NULL;
+
+	if (!(view->rows = PyMem_Malloc(sizeof(PyObject *) * (m ? m : 1))))
+	{
+		Py_DECREF(view);
+		return PyErr_NoMemory();
+	}
+	memset(view->rows, 0, sizeof(PyObject *) * m);
+
+	if (m)
+	{
+		if (!(view->col_types = get_col_types(
+				self->result, view->num_fields)))
+		{
+			Py_DECREF(view);
+			return NULL;
+		}
+		Py_INCREF(self);
+		view->query = self;
+	}
+
+	return (PyObject *) view;
+}
+
+/* LAZY RESULT VIEW OBJECTS */
+
+/* destructor */
+static void
+viewDealloc(viewObject *self)
+{
+	if (self->rows)
+	{
+		Py_ssize_t i;
+
+		for (i = 0; i < self->num_rows; ++i)
+			Py_XDECREF(self->rows[i]);
+		PyMem_Free(self->rows);
+	}
+	if (self->col_types)
+		PyMem_Free(self->col_types);
+	Py_XDECREF(self->query);
+
+	PyObject_Del(self);
+}
+
+/* get number of rows */
+static Py_ssize_t
+viewLength(viewObject *self)
+{
+	return self->num_rows;
+}
+
+/* get row with the given index, converting it if necessary */
+static PyObject *
+viewItem(viewObject *self, Py_ssize_t i)
+{
+	PyObject   *row;
+
+	if (i < 0 || i >= self->num_rows)
+	{
+		PyErr_SetString(PyExc_IndexError, "Row index out of range");
+		return NULL;
+	}
+
+	if (!(row = self->rows[i]))
+	{
+		int			j, n = self->num_fields;
+
+		if (!(row = PyTuple_New(n)))
+			return NULL;
+
+		for (j = 0; j < n; ++j)
+		{
+			PyObject * val = query_cast_value(
+				self->query, (int) i, j, self->col_types[j]);
+
+			if (!val)
+			{
+				Py_DECREF(row);
+				return NULL;
+			}
+
+			PyTuple_SET_ITEM(row, j, val);
+		}
+
+		self->rows[i] = row;
+
+		/* the result is not needed any more when all rows are cached */
+		if (++self->num_cached == self->num_rows)
+		{
+			PyMem_Free(self->col_types);
+			self->col_types = NULL;
+			Py_DECREF(self->query);
+			self->query = NULL;
+		}
+	}
+
+	Py_INCREF(row);
+	return row;
+}
+
+/* get row or list of rows with the given index or slice */
+static PyObject *
+viewSubscript(viewObject *self, PyObject *key)
+{
+	if (PyIndex_Check(key))
+	{
+		Py_ssize_t i = PyNumber_AsSsize_t(key, PyExc_IndexError);
+
+		if (i == -1 && PyErr_Occurred())
+			return NULL;
+		if (i < 0)
+			i += self->num_rows;
+		return viewItem(self, i);
+	}
+
+	if (PySlice_Check(key))
+	{
+		Py_ssize_t	start, stop, step, len, i, k;
+		PyObject   *list;
+
+#if IS_PY3
+		if (PySlice_GetIndicesEx(key, self->num_rows,
+				&start, &stop, &step, &len) < 0)
+#else
+		if (PySlice_GetIndicesEx((PySliceObject *) key, self->num_rows,
+				&start, &stop, &step, &len) < 0)
+#endif
+			return NULL;
+
+		if (!(list = PyList_New(len)))
+			return NULL;
+
+		for (i = start, k = 0; k < len; i += step, ++k)
+		{
+			PyObject *row = viewItem(self, i);
+
+			if (!row)
+			{
+				Py_DECREF(list);
+				return NULL;
+			}
+			PyList_SET_ITEM(list, k, row);
+		}
+
+		return list;
+	}
+
+	PyErr_SetString(PyExc_TypeError,
+		"Result rows must be accessed with integers or slices");
+	return NULL;
+}
+
+/* lazy result view sequence methods */
+static PySequenceMethods viewSequenceMethods = {
+	(lenfunc) viewLength,			/* sq_length */
+	0,								/* sq_concat */
+	0,								/* sq_repeat */
+	(ssizeargfunc) viewItem,		/* sq_item */
+};
+
+/* lazy result view mapping methods */
+static PyMappingMethods viewMappingMethods = {
+	(lenfunc) viewLength,			/* mp_length */
+	(binaryfunc) viewSubscript,		/* mp_subscript */
+	0,								/* mp_ass_subscript */
+};
+
+/* lazy result view type definition */
+static PyTypeObject viewType = {
+	PyVarObject_HEAD_INIT(NULL, 0)
+	"pg.ResultView",				/* tp_name */
+	sizeof(viewObject),				/* tp_basicsize */
+	0,								/* tp_itemsize */
+	/* methods */
+	(destructor) viewDealloc,		/* tp_dealloc */
+	0,								/* tp_print */
+	0,								/* tp_getattr */
+	0,								/* tp_setattr */
+	0,								/* tp_compare */
+	0,								/* tp_repr */
+	0,								/* tp_as_number */
+	&viewSequenceMethods,			/* tp_as_sequence */
+	&viewMappingMethods,			/* tp_as_mapping */
+	0,								/* tp_hash */
+	0,								/* tp_call */
+	0,								/* tp_str */
+	PyObject_GenericGetAttr,		/* tp_getattro */
+	0,								/* tp_setattro */
+	0,								/* tp_as_buffer */
+	Py_TPFLAGS_DEFAULT,				/* tp_flags */
+};
+
+/* BYTEA OBJECTS */
+
+/* destructor */
+static void
+byteaDealloc(byteaObject *self)
+{
+	if (self->owner)
+		Py_DECREF(self->owner);
+	else if (self->data)
+		PQfreemem(self->data);
+
+	PyObject_Del(self);
+}
+
+/* export the bytea data as a read-only buffer */
+static int
+byteaGetBuffer(byteaObject *self, Py_buffer *view, int flags)
+{
+	return PyBuffer_FillInfo(view, (PyObject *) self,
+		self->data, self->size, 1, flags);
+}
+
+/* bytea buffer methods */
+static PyBufferProcs byteaBufferMethods = {
+#if !IS_PY3
+	0,								/* bf_getreadbuffer */
+	0,								/* bf_getwritebuffer */
+	0,								/* bf_getsegcount */
+	0,								/* bf_getcharbuffer */
+#endif
+	(getbufferproc) byteaGetBuffer,	/* bf_getbuffer */
+	0,								/* bf_releasebuffer */
+};
+
+/* bytea type definition */
+static PyTypeObject byteaType = {
+	PyVarObject_HEAD_INIT(NULL, 0)
+	"pg.ByteaBuffer",				/* tp_name */
+	sizeof(byteaObject),			/* tp_basicsize */
+	0,								/* tp_itemsize */
+	/* methods */
+	(destructor) byteaDealloc,		/* tp_dealloc */
+	0,								/* tp_print */
+	0,								/* tp_getattr */
+	0,								/* tp_setattr */
+	0,								/* tp_compare */
+	0,								/* tp_repr */
+	0,								/* tp_as_number */
+	0,								/* tp_as_sequence */
+	0,								/* tp_as_mapping */
+	0,								/* tp_hash */
+	0,								/* tp_call */
+	0,								/* tp_str */
+	0,								/* tp_getattro */
+	0,								/* tp_setattro */
+	&byteaBufferMethods,			/* tp_as_buffer */
+#if IS_PY3
+	Py_TPFLAGS_DEFAULT,				/* tp_flags */
+#else
+	Py_TPFLAGS_DEFAULT | Py_TPFLAGS_HAVE_NEWBUFFER,	/* tp_flags */
+#endif
+};
+
+/* ROW OBJECTS */
 
-	if (PQstatus(npgobj->cnx) == CONNECTION_BAD)
-	{
-		set_error(InternalError, "Cannot connect", npgobj->cnx, NULL);
-		Py_XDECREF(npgobj);
-		return NULL;
-	}
+/* get index of field with given name in a row type (internal use only)
+   Returns a borrowed reference or NULL if there is no such field. */
+static PyObject *
+row_field_index(PyTypeObject *type, PyObject *name)
+{
+	PyObject   *index;
 
-	return (PyObject *) npgobj;
+	if (!type->tp_dict ||
+			!(index = PyDict_GetItem(type->tp_dict, row_index_key)) ||
+			!PyDict_Check(index))
+		return NULL;
+	return PyDict_GetItem(index, name);
 }
 
-static void
-queryDealloc(queryObject *self)
+/* get attribute of a row, trying the field names first */
+static PyObject *
+rowGetAttr(PyObject *self, PyObject *name)
 {
-	Py_XDECREF(self->pgcnx);
-	if (self->result)
-		PQclear(self->result);
+	PyObject   *num = row_field_index(Py_TYPE(self), name);
 
-	PyObject_Del(self);
-}
+	if (num)
+	{
+		PyObject *val = PyTuple_GET_ITEM(self, PyInt_AsSsize_t(num));
 
-/* get number of rows */
-static char queryNTuples__doc__[] =
-"ntuples() -- return number of tuples returned by query";
+		Py_INCREF(val);
+		return val;
+	}
+
+	return PyObject_GenericGetAttr(self, name);
+}
 
+/* get field of a row by name, index or slice */
 static PyObject *
-queryNTuples(queryObject *self, PyObject *noargs)
+rowSubscript(PyObject *self, PyObject *key)
 {
-	return PyInt_FromLong((long) PQntuples(self->result));
+	if (PyStr_Check(key))
+	{
+		PyObject   *num = row_field_index(Py_TYPE(self), key);
+		PyObject   *val;
+
+		if (!num)
+		{
+			PyErr_SetObject(PyExc_KeyError, key);
+			return NULL;
+		}
+		val = PyTuple_GET_ITEM(self, PyInt_AsSsize_t(num));
+		Py_INCREF(val);
+		return val;
+	}
+
+	return PyTuple_Type.tp_as_mapping->mp_subscript(self, key);
 }
 
-/* list fields names from query result */
-static char queryListFields__doc__[] =
-"listfields() -- List field names from result";
+/* get row as a dictionary */
+static char rowAsDict__doc__[] =
+"_asdict() -- return a new dictionary mapping field names to values";
 
 static PyObject *
-queryListFields(queryObject *self, PyObject *noargs)
+rowAsDict(PyObject *self, PyObject *noargs)
 {
-	int			i,
-				n;
-	char	   *name;
-	PyObject   *fieldstuple,
-			   *str;
+	PyObject   *fields, *dict;
+	Py_ssize_t	i, n;
 
-	/* builds tuple */
-	n = PQnfields(self->result);
-	fieldstuple = PyTuple_New(n);
+	if (!(fields = PyObject_GetAttrString(self, "_fields")))
+		return NULL;
+	if (!(dict = PyDict_New()))
+	{
+		Py_DECREF(fields);
+		return NULL;
+	}
 
+	n = PyTuple_GET_SIZE(self);
+	if (PyTuple_Size(fields) < n)
+		n = PyTuple_Size(fields);
 	for (i = 0; i < n; ++i)
 	{
-		name = PQfname(self->result, i);
-		str = PyStr_FromString(name);
-		PyTuple_SET_ITEM(fieldstuple, i, str);
+		PyObject   *name = PyTuple_GET_ITEM(fields, i);
+
+		/* the first field with a given name takes precedence */
+		if (PyDict_GetItem(dict, name))
+			continue;
+		if (PyDict_SetItem(dict, name, PyTuple_GET_ITEM(self, i)) < 0)
+		{
+			Py_DECREF(dict);
+			dict = NULL;
+			break;
+		}
 	}
 
-	return fieldstuple;
+	Py_DECREF(fields);
+	return dict;
 }
 
-/* get field name from last result */
-static char queryFieldName__doc__[] =
-"fieldname(num) -- return name of field from result from its position";
+/* make a new row from a sequence or iterable */
+static char rowMake__doc__[] =
+"_make(iterable) -- make a new row from a sequence or iterable";
 
 static PyObject *
-queryFieldName(queryObject *self, PyObject *args)
+rowMake(PyObject *cls, PyObject *iterable)
 {
-	int		i;
-	char   *name;
+	PyObject   *fields, *row;
 
-	/* gets args */
-	if (!PyArg_ParseTuple(args, "i", &i))
-	{
-		PyErr_SetString(PyExc_TypeError,
-			"Method fieldname() takes an integer as argument");
+	if (!(fields = PyObject_GetAttrString(cls, "_fields")))
 		return NULL;
-	}
-
-	/* checks number validity */
-	if (i >= PQnfields(self->result))
+	row = PyObject_CallFunctionObjArgs(cls, iterable, NULL);
+	if (row && PyTuple_Size(row) != PyTuple_Size(fields))
 	{
-		PyErr_SetString(PyExc_ValueError, "Invalid field number");
-		return NULL;
+		PyErr_Format(PyExc_TypeError, "Expected %zd arguments, got %zd",
+			PyTuple_Size(fields), PyTuple_Size(row));
+		Py_DECREF(row);
+		row = NULL;
 	}
-
-	/* gets fields name and builds object */
-	name = PQfname(self->result, i);
-	return PyStr_FromString(name);
+	Py_DECREF(fields);
+	return row;
 }
 
-/* gets fields number from name in last result */
-static char queryFieldNumber__doc__[] =
-"fieldnum(name) -- return position in query for field from its name";
+/* return a new row replacing the values of the given fields */
+static char rowReplace__doc__[] =
+"_replace(**kwds) -- return a new row replacing specified fields";
 
 static PyObject *
-queryFieldNumber(queryObject *self, PyObject *args)
+rowReplace(PyObject *self, PyObject *args, PyObject *kwds)
 {
-	int		num;
-	char   *name;
+	PyObject   *list, *key, *value, *row;
+	Py_ssize_t	pos = 0;
 
-	/* gets args */
-	if (!PyArg_ParseTuple(args, "s", &name))
+	if (PyTuple_GET_SIZE(args))
 	{
 		PyErr_SetString(PyExc_TypeError,
-			"Method fieldnum() takes a string as argument");
+			"Method _replace() takes only keyword arguments");
 		return NULL;
 	}
-
-	/* gets field number */
-	if ((num = PQfnumber(self->result, name)) == -1)
-	{
-		PyErr_SetString(PyExc_ValueError, "Unknown field");
+	if (!(list = PySequence_List(self)))
 		return NULL;
-	}
+	if (kwds)
+	{
+		while (PyDict_Next(kwds, &pos, &key, &value))
+		{
+			PyObject   *num = row_field_index(Py_TYPE(self), key);
+			Py_ssize_t	i;
 
-	return PyInt_FromLong(num);
+			if (!num || (i = PyInt_AsSsize_t(num)) >= PyList_GET_SIZE(list))
+			{
+				PyErr_Format(PyExc_ValueError,
+					"Got unexpected field name: %s", PyStr_AsString(key));
+				Py_DECREF(list);
+				return NULL;
+			}
+			Py_INCREF(value);
+			PyList_SetItem(list, i, value);
+		}
+	}
+	row = PyObject_CallFunctionObjArgs(
+		(PyObject *) Py_TYPE(self), list, NULL);
+	Py_DECREF(list);
+	return row;
 }
 
-/* retrieves last result */
-static char queryGetResult__doc__[] =
-"getresult() -- Get the result of a query\n\n"
-"The result is returned as a list of rows, each one a tuple of fields\n"
-"in the order returned by the server.\n";
+/* row object methods */
+static struct PyMethodDef rowMethods[] = {
+	{"_asdict", (PyCFunction) rowAsDict, METH_NOARGS, rowAsDict__doc__},
+	{"_make", (PyCFunction) rowMake, METH_O | METH_CLASS, rowMake__doc__},
+	{"_replace", (PyCFunction) rowReplace, METH_VARARGS | METH_KEYWORDS,
+			rowReplace__doc__},
+	{NULL, NULL}
+};
 
+/* return row as string like the repr of a named tuple */
 static PyObject *
-queryGetResult(queryObject *self, PyObject *noargs)
+rowRepr(PyObject *self)
 {
-	PyObject   *reslist;
-	int			i, m, n, *col_types;
-	int			encoding = self->encoding;
-
-	/* stores result in tuple */
-	m = PQntuples(self->result);
-	n = PQnfields(self->result);
-	if (!(reslist = PyList_New(m))) return NULL;
+	PyObject   *fields, *repr = NULL, *part = NULL, *tmp;
+	Py_ssize_t	i, n, m;
+	int			ret;
 
-	if (!(col_types = get_col_types(self->result, n))) return NULL;
+	if ((ret = Py_ReprEnter(self)))
+		return ret > 0 ? PyStr_FromString("...") : NULL;
+	if (!(fields = PyObject_GetAttrString(self, "_fields")))
+		goto error;
+	if (!(repr = PyStr_FromFormat("%s(", Py_TYPE(self)->tp_name)))
+		goto error;
 
-	for (i = 0; i < m; ++i)
+	n = PyTuple_GET_SIZE(self);
+	m = PyTuple_Size(fields);
+	for (i = 0; i <= n; ++i)
 	{
-		PyObject   *rowtuple;
-		int			j;
-
-		if (!(rowtuple = PyTuple_New(n)))
+		if (i == n)
+			part = PyStr_FromString(")");
+		else
 		{
-			Py_DECREF(reslist);
-			reslist = NULL;
-			goto exit;
+			/* values without a field name are shown as in a tuple */
+			PyObject   *args = i < m ? PyTuple_Pack(2,
+				PyTuple_GET_ITEM(fields, i), PyTuple_GET_ITEM(self, i)) :
+				PyTuple_Pack(1, PyTuple_GET_ITEM(self, i));
+
+			if (!args)
+				goto error;
+			if (!(tmp = PyStr_FromString(i < m ?
+					(i ? ", %s=%r" : "%s=%r") : (i ? ", %r" : "%r"))))
+			{
+				Py_DECREF(args);
+				goto error;
+			}
+			part = PyStr_Format(tmp, args);
+			Py_DECREF(tmp);
+			Py_DECREF(args);
 		}
+		if (!part)
+			goto error;
+		tmp = PyStr_Concat(repr, part);
+		Py_DECREF(part);
+		Py_DECREF(repr);
+		if (!(repr = tmp))
+			goto error;
+	}
+
+	Py_DECREF(fields);
+	Py_ReprLeave(self);
+	return repr;
+
+error:
+	Py_XDECREF(repr);
+	Py_XDECREF(fields);
+	Py_ReprLeave(self);
+	return NULL;
+}
 
-		for (j = 0; j < n; ++j)
-		{
-			PyObject * val;
+/* row mapping methods */
+static PyMappingMethods rowMappingMethods = {
+	0,								/* mp_length */
+	(binaryfunc) rowSubscript,		/* mp_subscript */
+	0,								/* mp_ass_subscript */
+};
 
-			if (PQgetisnull(self->result, i, j))
-			{
-				Py_INCREF(Py_None);
-				val = Py_None;
-			}
-			else /* not null */
-			{
-				/* get the string representation of the value */
-				/* note: this is always null-terminated text format */
-				char   *s = PQgetvalue(self->result, i, j);
-				/* get the PyGreSQL type of the column */
-				int		type = col_types[j];
-
-				if (type & PYGRES_ARRAY)
-					val = cast_array(s, PQgetlength(self->result, i, j),
-						encoding, type, NULL, 0);
-				else if (type == PYGRES_BYTEA)
-					val = cast_bytea_text(s);
-				else if (type == PYGRES_OTHER)
-					val = cast_other(s,
-						PQgetlength(self->result, i, j), encoding,
-						PQftype(self->result, j), self->pgcnx->cast_hook);
-				else if (type & PYGRES_TEXT)
-					val = cast_sized_text(s, PQgetlength(self->result, i, j),
-						encoding, type);
-				else
-					val = cast_unsized_simple(s, type);
-			}
+/* row type definition */
+static PyTypeObject rowType = {
+	PyVarObject_HEAD_INIT(NULL, 0)
+	"pg.Row",						/* tp_name */
+	0,								/* tp_basicsize */
+	0,								/* tp_itemsize */
+	/* methods */
+	0,								/* tp_dealloc */
+	0,								/* tp_print */
+	0,								/* tp_getattr */
+	0,								/* tp_setattr */
+	0,								/* tp_compare */
+	(reprfunc) rowRepr,				/* tp_repr */
+	0,								/* tp_as_number */
+	0,								/* tp_as_sequence */
+	&rowMappingMethods,				/* tp_as_mapping */
+	0,								/* tp_hash */
+	0,								/* tp_call */
+	0,								/* tp_str */
+	(getattrofunc) rowGetAttr,		/* tp_getattro */
+	0,								/* tp_setattro */
+	0,								/* tp_as_buffer */
+	Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE, /* tp_flags */
+	0,								/* tp_doc */
+	0,								/* tp_traverse */
+	0,								/* tp_clear */
+	0,								/* tp_richcompare */
+	0,								/* tp_weaklistoffset */
+	0,								/* tp_iter */
+	0,								/* tp_iternext */
+	rowMethods,						/* tp_methods */
+};
 
-			if (!val)
-			{
-				Py_DECREF(reslist);
-				Py_DECREF(rowtuple);
-				reslist = NULL;
-				goto exit;
-			}
+/* get the row type for the given field names (internal use only)
+   The row types are cached, so that rows with the same field names
+   share the same type and field index.  Returns a borrowed reference. */
+static PyTypeObject *
+get_row_type(PyObject *fields)
+{
+	PyObject   *type, *dict, *index, *slots;
+	Py_ssize_t	i, n;
 
-			PyTuple_SET_ITEM(rowtuple, j, val);
-		}
+	if (!(fields = PySequence_Tuple(fields)))
+		return NULL;
 
-		PyList_SET_ITEM(reslist, i, rowtuple);
+	if ((type = PyDict_GetItem(row_types, fields)))
+	{
+		Py_DECREF(fields);
+		return (PyTypeObject *) type;
 	}
 
-exit:
-	PyMem_Free(col_types);
+	n = PyTuple_GET_SIZE(fields);
+	if (!(index = PyDict_New()))
+	{
+		Py_DECREF(fields);
+		return NULL;
+	}
+	for (i = 0; i < n; ++i)
+	{
+		PyObject   *name = PyTuple_GET_ITEM(fields, i), *num;
 
-	/* returns list */
-	return reslist;
+		if (!PyStr_Check(name))
+		{
+			PyErr_SetString(PyExc_TypeError, "Field names must be strings");
+			goto error;
+		}
+		/* the first field with a given name takes precedence */
+		if (PyDict_GetItem(index, name))
+			continue;
+		if (!(num = PyInt_FromSsize_t(i)))
+			goto error;
+		if (PyDict_SetItem(index, name, num) < 0)
+		{
+			Py_DECREF(num);
+			goto error;
+		}
+		Py_DECREF(num);
+	}
+
+	if (!(slots = PyTuple_New(0)))
+		goto error;
+	dict = Py_BuildValue("{sNsOsOss}", "__slots__", slots,
+		"_fields", fields, "_index", index, "__module__", "pg");
+	if (!dict)
+		goto error;
+	type = PyObject_CallFunction((PyObject *) &PyType_Type, "s(O)N",
+		"Row", (PyObject *) &rowType, dict);
+	if (!type)
+		goto error;
+	/* keep the cache bounded when there are many different field names */
+	if (PyDict_Size(row_types) >= MAX_ROW_TYPES)
+		PyDict_Clear(row_types);
+	if (PyDict_SetItem(row_types, fields, type) < 0)
+	{
+		Py_DECREF(type);
+		goto error;
+	}
+	Py_DECREF(type); /* the cache keeps it alive */
+	Py_DECREF(index);
+	Py_DECREF(fields);
+	return (PyTypeObject *) type;
+
+error:
+	Py_DECREF(index);
+	Py_DECREF(fields);
+	return NULL;
 }
 
-/* retrieves last result as a list of dictionaries*/
-static char queryDictResult__doc__[] =
-"dictresult() -- Get the result of a query\n\n"
-"The result is returned as a list of rows, each one a dictionary with\n"
-"the field names used as the labels.\n";
+/* retrieves last result as rows */
+static char queryRowResult__doc__[] =
+"rowresult() -- Get the result of a query\n\n"
+"The result is returned as a list of rows, each one a tuple of fields\n"
+"in the order returned by the server that also allows accessing the\n"
+"fields as attributes or by name.  All rows with the same field names\n"
+"share the same row type.\n";
 
 static PyObject *
-queryDictResult(queryObject *self, PyObject *noargs)
+queryRowResult(queryObject *self, PyObject *noargs)
 {
-	PyObject   *reslist;
-	int			i,
-				m,
-				n,
-			   *col_types;
-	int			encoding = self->encoding;
+	PyObject	 *reslist, *fields;
+	PyTypeObject *type;
+	int			  i, m, n, *col_types;
+
+	if (query_check_memory_limit(self) < 0)
+		return NULL;
+
+	if (!(fields = queryListFields(self, NULL)))
+		return NULL;
+	type = get_row_type(fields);
+	Py_DECREF(fields);
+	if (!type)
+		return NULL;
 
-	/* stores result in list */
 	m = PQntuples(self->result);
 	n = PQnfields(self->result);
 	if (!(reslist = PyList_New(m))) return NULL;
 
-	if (!(col_types = get_col_types(self->result, n))) return NULL;
+	if (!(col_types = get_col_types(self->result, n)))
+	{
+		Py_DECREF(reslist);
+		return NULL;
+	}
 
 	for (i = 0; i < m; ++i)
 	{
-		PyObject   *dict;
+		PyObject   *row;
 		int			j;
 
-		if (!(dict = PyDict_New()))
+		if (!(row = type->tp_alloc(type, n)))
 		{
 			Py_DECREF(reslist);
 			reslist = NULL;
 			goto exit;
 		}
+		PyList_SET_ITEM(reslist, i, row);
 
 		for (j = 0; j < n; ++j)
 		{
-			PyObject * val;
-
-			if (PQgetisnull(self->result, i, j))
-			{
-				Py_INCREF(Py_None);
-				val = Py_None;
-			}
-			else /* not null */
-			{
-				/* get the string representation of the value */
-				/* note: this is always null-terminated text format */
-				char   *s = PQgetvalue(self->result, i, j);
-				/* get the PyGreSQL type of the column */
-				int		type = col_types[j];
-
-				if (type & PYGRES_ARRAY)
-					val = cast_array(s, PQgetlength(self->result, i, j),
-						encoding, type, NULL, 0);
-				else if (type == PYGRES_BYTEA)
-					val = cast_bytea_text(s);
-				else if (type == PYGRES_OTHER)
-					val = cast_other(s,
-						PQgetlength(self->result, i, j), encoding,
-						PQftype(self->result, j), self->pgcnx->cast_hook);
-				else if (type & PYGRES_TEXT)
-					val = cast_sized_text(s, PQgetlength(self->result, i, j),
-						encoding, type);
-				else
-					val = cast_unsized_simple(s, type);
-			}
+			PyObject * val = query_cast_value(self, i, j, col_types[j]);
 
 			if (!val)
 			{
-				Py_DECREF(dict);
 				Py_DECREF(reslist);
 				reslist = NULL;
-				goto exit;
-			}
-
-			PyDict_SetItemString(dict, PQfname(self->result, j), val);
-			Py_DECREF(val);
-		}
-
-		PyList_SET_ITEM(reslist, i, dict);
-	}
-
-exit:
-	PyMem_Free(col_types);
-
-	/* returns list */
-	return reslist;
-}
-
-/* retrieves last result as named tuples */
-static char queryNamedResult__doc__[] =
-"namedresult() -- Get the result of a query\n\n"
-"The result is returned as a list of rows, each one a tuple of fields\n"
-"in the order returned by the server.\n";
-
-static PyObject *
-queryNamedResult(queryObject *self, PyObject *noargs)
-{
-	PyObject   *ret;
-
-	if (namedresult)
-	{
-		ret = PyObject_CallFunction(namedresult, "(O)", self);
+				goto exit;
+			}
 
-		if (ret == NULL)
-			return NULL;
+			PyTuple_SET_ITEM(row, j, val);
 		}
-	else
-	{
-		ret = queryGetResult(self, NULL);
 	}
 
-	return ret;
+exit:
+	PyMem_Free(col_types);
+
+	/* returns list */
+	return reslist;
 }
 
 /* gets notice object attributes */
@@ -4914,6 +10058,14 @@ static struct PyMethodDef queryMethods[] = {
 			queryDictResult__doc__},
 	{"namedresult", (PyCFunction) queryNamedResult, METH_NOARGS,
 			queryNamedResult__doc__},
+	{"rowresult", (PyCFunction) queryRowResult, METH_NOARGS,
+			queryRowResult__doc__},
+	{"lazyresult", (PyCFunction) queryLazyResult, METH_NOARGS,
+			queryLazyResult__doc__},
+	{"getcolumns", (PyCFunction) queryGetColumns, METH_VARARGS,
+			queryGetColumns__doc__},
+	{"typedcolumn", (PyCFunction) queryTypedColumn,
+			METH_VARARGS | METH_KEYWORDS, queryTypedColumn__doc__},
 	{"fieldname", (PyCFunction) queryFieldName, METH_VARARGS,
 			 queryFieldName__doc__},
 	{"fieldnum", (PyCFunction) queryFieldNumber, METH_VARARGS,
@@ -4922,6 +10074,18 @@ static struct PyMethodDef queryMethods[] = {
 			queryListFields__doc__},
 	{"ntuples", (PyCFunction) queryNTuples, METH_NOARGS,
 			queryNTuples__doc__},
+	{"cmdstatus", (PyCFunction) queryCmdStatus, METH_NOARGS,
+			queryCmdStatus__doc__},
+	{"cmdtuples", (PyCFunction) queryCmdTuples, METH_NOARGS,
+			queryCmdTuples__doc__},
+	{"memsize", (PyCFunction) queryMemSize, METH_NOARGS,
+			queryMemSize__doc__},
+	{"to_json", (PyCFunction) queryToJson, METH_NOARGS,
+			queryToJson__doc__},
+	{"to_csv", (PyCFunction) queryToCsv, METH_VARARGS | METH_KEYWORDS,
+			queryToCsv__doc__},
+	{"to_markdown", (PyCFunction) queryToMarkdown,
+			METH_VARARGS | METH_KEYWORDS, queryToMarkdown__doc__},
 	{NULL, NULL}
 };
 
@@ -5240,6 +10404,51 @@ pgSetDecimal(PyObject *self, PyObject *cls)
 	return ret;
 }
 
+/* get numeric mode */
+static char pgGetNumericMode__doc__[] =
+"get_numeric_mode() -- get the mode for casting numeric and money values";
+
+static PyObject *
+pgGetNumericMode(PyObject *self, PyObject *noargs)
+{
+	return PyStr_FromString(numeric_mode == NUMERIC_SCALED ? "scaled" :
+		numeric_mode == NUMERIC_FLOAT ? "float" : "decimal");
+}
+
+/* set numeric mode */
+static char pgSetNumericMode__doc__[] =
+"set_numeric_mode(mode) -- set the mode for casting numeric and money values\n\n"
+"The mode can be 'decimal' for using the decimal type (the default),\n"
+"'float' for always using floats, or 'scaled' for using ints scaled\n"
+"by the number of fractional digits given in the column type.\n";
+
+static PyObject *
+pgSetNumericMode(PyObject *self, PyObject *mode)
+{
+	const char *s;
+
+	if (!PyStr_Check(mode) || !(s = PyStr_AsString(mode)))
+	{
+		PyErr_SetString(PyExc_TypeError,
+			"Function set_numeric_mode() expects a string as argument");
+		return NULL;
+	}
+	if (!strcmp(s, "decimal"))
+		numeric_mode = NUMERIC_DECIMAL;
+	else if (!strcmp(s, "float"))
+		numeric_mode = NUMERIC_FLOAT;
+	else if (!strcmp(s, "scaled"))
+		numeric_mode = NUMERIC_SCALED;
+	else
+	{
+		PyErr_SetString(PyExc_ValueError, "Invalid numeric mode");
+		return NULL;
+	}
+
+	Py_INCREF(Py_None);
+	return Py_None;
+}
+
 /* get usage of bool values */
 static char pgGetBool__doc__[] =
 "get_bool() -- check whether boolean values are converted to bool";
@@ -5316,6 +10525,44 @@ pgSetArray(PyObject *self, PyObject *args)
 	return ret;
 }
 
+/* get conversion of numeric arrays to typed arrays */
+static char pgGetTypedArray__doc__[] =
+"get_typed_array() -- check whether numeric arrays are returned typed";
+
+static PyObject *
+pgGetTypedArray(PyObject *self, PyObject *noargs)
+{
+	PyObject *ret;
+
+	ret = typed_array ? Py_True : Py_False;
+	Py_INCREF(ret);
+
+	return ret;
+}
+
+/* set conversion of numeric arrays to typed arrays */
+static char pgSetTypedArray__doc__[] =
+"set_typed_array(on) -- set whether numeric arrays should be returned typed";
+
+static PyObject *
+pgSetTypedArray(PyObject *self, PyObject *args)
+{
+	PyObject *ret = NULL;
+	int			i;
+
+	/* gets arguments */
+	if (PyArg_ParseTuple(args, "i", &i))
+	{
+		typed_array = i ? 1 : 0;
+		Py_INCREF(Py_None); ret = Py_None;
+	}
+	else
+		PyErr_SetString(PyExc_TypeError,
+			"Function set_typed_array() expects a boolean value as argument");
+
+	return ret;
+}
+
 /* check whether bytea values are unescaped */
 static char pgGetByteaEscaped__doc__[] =
 "get_bytea_escaped() -- check whether bytea will be returned escaped";
@@ -5354,6 +10601,44 @@ pgSetByteaEscaped(PyObject *self, PyObject *args)
 	return ret;
 }
 
+/* check whether bytea values are returned as memoryviews */
+static char pgGetByteaView__doc__[] =
+"get_bytea_view() -- check whether bytea will be returned as memoryview";
+
+static PyObject *
+pgGetByteaView(PyObject *self, PyObject *noargs)
+{
+	PyObject *ret;
+
+	ret = bytea_view ? Py_True : Py_False;
+	Py_INCREF(ret);
+
+	return ret;
+}
+
+/* set whether bytea values are returned as memoryviews */
+static char pgSetByteaView__doc__[] =
+"set_bytea_view(on) -- set whether bytea will be returned as memoryview";
+
+static PyObject *
+pgSetByteaView(PyObject *self, PyObject *args)
+{
+	PyObject *ret = NULL;
+	int			i;
+
+	/* gets arguments */
+	if (PyArg_ParseTuple(args, "i", &i))
+	{
+		bytea_view = i ? 1 : 0;
+		Py_INCREF(Py_None); ret = Py_None;
+	}
+	else
+		PyErr_SetString(PyExc_TypeError,
+			"Function set_bytea_view() expects a boolean value as argument");
+
+	return ret;
+}
+
 /* get named result factory */
 static char pgGetNamedresult__doc__[] =
 "get_namedresult() -- get the function used for getting named results";
@@ -5853,11 +11138,417 @@ pgCastHStore(PyObject *self, PyObject *string)
 	return ret;
 }
 
+/* get a character string from a bytes or unicode argument
+   (internal use only)  A temporary object that needs to be released
+   by the caller may be returned in tmp_obj. */
+static const char *
+get_cast_string(PyObject *string, PyObject **tmp_obj, const char *func)
+{
+	*tmp_obj = NULL;
+	if (PyBytes_Check(string))
+		return PyBytes_AsString(string);
+	if (PyUnicode_Check(string))
+	{
+		*tmp_obj = PyUnicode_AsUTF8String(string);
+		return *tmp_obj ? PyBytes_AsString(*tmp_obj) : NULL;
+	}
+	PyErr_Format(PyExc_TypeError,
+		"Function %s() expects a string as first argument", func);
+	return NULL;
+}
+
+/* get the date format from the connection argument of a cast function
+   (internal use only)  The connection can be a connection object, any
+   object with a date_format() method like the DB wrapper, or the date
+   format itself.  Returns NULL if the date format is not known, with
+   an exception set if an error occurred. */
+static const char *
+get_cast_date_format(PyObject *connection)
+{
+	PyObject   *fmt_obj;
+	const char *fmt = NULL;
+
+	if (!connection || connection == Py_None)
+		return date_format;
+	if (Py_TYPE(connection) == &connType)
+		return get_date_format((connObject *) connection);
+	if (PyStr_Check(connection))
+	{
+		Py_INCREF(connection);
+		fmt_obj = connection;
+	}
+	else if (!(fmt_obj = PyObject_CallMethod(
+			connection, "date_format", NULL)))
+		return NULL;
+	if (PyStr_Check(fmt_obj))
+	{
+		fmt = PyStr_AsString(fmt_obj);
+		/* get the corresponding static date format */
+		if (fmt) fmt = strlen(fmt) > 2 ?
+			date_style_to_format(date_format_to_style(fmt)) : NULL;
+	}
+	else
+		PyErr_SetString(PyExc_TypeError, "The date format must be a string");
+	Py_DECREF(fmt_obj);
+	return fmt;
+}
+
+/* cast a string with a date/time value (internal use only) */
+static PyObject *
+cast_datetime_arg(PyObject *string, PyObject *connection,
+	int kind, const char *func)
+{
+	PyObject   *tmp_obj, *ret;
+	const char *s, *fmt = NULL;
+
+	if (!(s = get_cast_string(string, &tmp_obj, func)))
+		return NULL;
+	if (connection && !(fmt = get_cast_date_format(connection))
+			&& PyErr_Occurred())
+		ret = NULL;
+	else
+		ret = cast_datetime(s, kind, fmt ? fmt : date_format);
+	Py_XDECREF(tmp_obj);
+	return ret;
+}
+
+/* cast a string with a text representation of a numeric value */
+static char pgCastNum__doc__[] =
+"cast_num(string) -- cast a string as a numeric value\n\n"
+"The value is returned as decimal or float, depending on the settings.\n";
+
+static PyObject *
+pgCastNum(PyObject *self, PyObject *string)
+{
+	PyObject   *tmp_obj, *ret;
+	const char *s;
+
+	if (!(s = get_cast_string(string, &tmp_obj, "cast_num")))
+		return NULL;
+	ret = cast_decimal((char *) s, (Py_ssize_t) strlen(s));
+	Py_XDECREF(tmp_obj);
+	return ret;
+}
+
+/* cast a string with a text representation of a money value */
+static char pgCastMoney__doc__[] =
+"cast_money(string) -- cast a string as a money value\n\n"
+"The value is returned as decimal, float or scaled int, depending on\n"
+"the settings, or as it is if no decimal point has been set.\n";
+
+static PyObject *
+pgCastMoney(PyObject *self, PyObject *string)
+{
+	PyObject   *tmp_obj, *ret;
+	const char *s;
+
+	if (!(s = get_cast_string(string, &tmp_obj, "cast_money")))
+		return NULL;
+	if (decimal_point)
+		ret = cast_money((char *) s, (Py_ssize_t) strlen(s));
+	else
+	{
+		Py_INCREF(string);
+		ret = string;
+	}
+	Py_XDECREF(tmp_obj);
+	return ret;
+}
+
+/* cast a string with a text representation of a date */
+static char pgCastDate__doc__[] =
+"cast_date(string, connection=None)\n--\n\n"
+"Cast a string as a date.  The connection or its date format is needed\n"
+"for getting the order of month and day in the SQL and Postgres styles.\n";
+
+static PyObject *
+pgCastDate(PyObject *self, PyObject *args, PyObject *dict)
+{
+	static const char *kwlist[] = {"string", "connection", NULL};
+	PyObject   *string, *connection = NULL;
+
+	if (!PyArg_ParseTupleAndKeywords(args, dict, "O|O", (char **) kwlist,
+			&string, &connection))
+		return NULL;
+
+	return cast_datetime_arg(string, connection, DATETIME_DATE, "cast_date");
+}
+
+/* cast a string with a text representation of a time */
+static char pgCastTime__doc__[] =
+"cast_time(string)\n--\n\n"
+"Cast a string as a time without time zone.\n";
+
+static PyObject *
+pgCastTime(PyObject *self, PyObject *string)
+{
+	return cast_datetime_arg(string, NULL, DATETIME_TIME, "cast_time");
+}
+
+/* cast a string with a text representation of a time with time zone */
+static char pgCastTimetz__doc__[] =
+"cast_timetz(string)\n--\n\n"
+"Cast a string as a time with time zone.\n";
+
+static PyObject *
+pgCastTimetz(PyObject *self, PyObject *string)
+{
+	return cast_datetime_arg(string, NULL, DATETIME_TIMETZ, "cast_timetz");
+}
+
+/* cast a string with a text representation of a timestamp */
+static char pgCastTimestamp__doc__[] =
+"cast_timestamp(string, connection=None)\n--\n\n"
+"Cast a string as a timestamp without time zone.  The connection or\n"
+"its date format is needed for getting the order of month and day\n"
+"in the SQL and Postgres styles.\n";
+
+static PyObject *
+pgCastTimestamp(PyObject *self, PyObject *args, PyObject *dict)
+{
+	static const char *kwlist[] = {"string", "connection", NULL};
+	PyObject   *string, *connection = NULL;
+
+	if (!PyArg_ParseTupleAndKeywords(args, dict, "O|O", (char **) kwlist,
+			&string, &connection))
+		return NULL;
+
+	return cast_datetime_arg(string, connection,
+		DATETIME_TIMESTAMP, "cast_timestamp");
+}
+
+/* cast a string with a text representation of a timestamp with time zone */
+static char pgCastTimestamptz__doc__[] =
+"cast_timestamptz(string, connection=None)\n--\n\n"
+"Cast a string as a timestamp with time zone.  The connection or\n"
+"its date format is needed for getting the order of month and day\n"
+"in the SQL and Postgres styles.\n";
+
+static PyObject *
+pgCastTimestamptz(PyObject *self, PyObject *args, PyObject *dict)
+{
+	static const char *kwlist[] = {"string", "connection", NULL};
+	PyObject   *string, *connection = NULL;
+
+	if (!PyArg_ParseTupleAndKeywords(args, dict, "O|O", (char **) kwlist,
+			&string, &connection))
+		return NULL;
+
+	return cast_datetime_arg(string, connection,
+		DATETIME_TIMESTAMPTZ, "cast_timestamptz");
+}
+
+/* cast a string with a text representation of an interval */
+static char pgCastInterval__doc__[] =
+"cast_interval(string)\n--\n\n"
+"Cast a string as an interval.  All interval styles are supported.\n";
+
+static PyObject *
+pgCastInterval(PyObject *self, PyObject *string)
+{
+	return cast_datetime_arg(string, NULL, DATETIME_INTERVAL, "cast_interval");
+}
+
+/* get the libpq connection of a connection or DB wrapper (internal use only)
+   Sets an exception and returns NULL if this is not a valid connection. */
+static PGconn *
+get_notify_cnx(PyObject *conn)
+{
+	PyObject   *db = NULL;
+	PGconn	   *cnx = NULL;
+
+	if (Py_TYPE(conn) != &connType)
+	{
+		/* the DB wrapper keeps the connection in its db attribute */
+		if (!(db = PyObject_GetAttrString(conn, "db")))
+			PyErr_Clear();
+		conn = db;
+	}
+	if (!conn || Py_TYPE(conn) != &connType)
+		PyErr_SetString(PyExc_TypeError,
+			"Function dispatch_notifies() expects connections as keys");
+	else if (!(cnx = ((connObject *) conn)->cnx))
+		PyErr_SetString(PyExc_TypeError, "Connection is not valid");
+	Py_XDECREF(db); /* still referenced by the DB wrapper */
+	return cnx;
+}
+
+/* wait for notifies on several connections and dispatch them */
+static char pgDispatchNotifies__doc__[] =
+"dispatch_notifies(handlers, [timeout], [max]) -- dispatch notifies\n\n"
+"The handlers must be a dict mapping connections to callbacks.  This waits\n"
+"until notifies are pending on any of the connections or the timeout in\n"
+"seconds has passed, and then calls the callback of every connection with\n"
+"pending notifies once, passing the list of these notifies.  If max is\n"
+"given, at most this number of notifies is passed per connection.\n"
+"Returns the number of dispatched notifies.\n";
+
+static PyObject *
+pgDispatchNotifies(PyObject *self, PyObject *args, PyObject *dict)
+{
+	static const char *kwlist[] = {"handlers", "timeout", "max", NULL};
+	PyObject   *handlers, *timeout_obj = NULL, *max_obj = NULL,
+			   *items = NULL, *lists = NULL, *ret = NULL;
+	struct pollfd *fds = NULL;
+	PGconn	  **cnxs = NULL;
+	Py_ssize_t	n, k, r, total = 0;
+	size_t		max;
+	int			timeout = -1, rc = 0;
+
+	if (!PyArg_ParseTupleAndKeywords(args, dict, "O|OO", (char **) kwlist,
+			&handlers, &timeout_obj, &max_obj))
+		return NULL;
+
+	if (!PyDict_Check(handlers))
+	{
+		PyErr_SetString(PyExc_TypeError,
+			"Function dispatch_notifies() expects a dict as first argument");
+		return NULL;
+	}
+	if (timeout_obj && timeout_obj != Py_None)
+	{
+		double		t = PyFloat_AsDouble(timeout_obj);
+
+		if (t == -1.0 && PyErr_Occurred())
+			return NULL;
+		if (t < 0)
+		{
+			PyErr_SetString(PyExc_ValueError,
+				"The timeout must not be negative");
+			return NULL;
+		}
+		timeout = t < 2000000.0 ? (int) (1000.0 * t + 0.999) : 2000000000;
+	}
+	if (get_size_arg(max_obj, "maximum number of notifies", &max) < 0)
+		return NULL;
+
+	/* the items hold references to the connections and callbacks
+	   even if the dict is changed by the callbacks */
+	if (!(items = PyDict_Items(handlers)))
+		return NULL;
+	n = PyList_GET_SIZE(items);
+	if (!(lists = PyList_New(n)))
+		goto done;
+	fds = PyMem_Malloc((size_t) (n ? n : 1) * sizeof(*fds));
+	cnxs = PyMem_Malloc((size_t) (n ? n : 1) * sizeof(*cnxs));
+	if (!fds || !cnxs)
+	{
+		PyErr_NoMemory();
+		goto done;
+	}
+
+	for (k = 0; k < n; ++k)
+	{
+		PyObject   *item = PyList_GET_ITEM(items, k), *list;
+
+		if (!(cnxs[k] = get_notify_cnx(PyTuple_GET_ITEM(item, 0))))
+			goto done;
+		if (!PyCallable_Check(PyTuple_GET_ITEM(item, 1)))
+		{
+			PyErr_SetString(PyExc_TypeError,
+				"Function dispatch_notifies() expects callables as values");
+			goto done;
+		}
+		if (!(list = PyList_New(0)))
+			goto done;
+		PyList_SET_ITEM(lists, k, list);
+		/* notifies may already have been received together with results */
+		if ((r = append_notifies(cnxs[k], list, max)) < 0)
+			goto done;
+		total += r;
+		fds[k].fd = PQsocket(cnxs[k]);
+		fds[k].events = POLLIN;
+		fds[k].revents = 0;
+	}
+
+	if (n)
+	{
+		Py_BEGIN_ALLOW_THREADS
+		rc = poll(fds, (unsigned long) n, total ? 0 : timeout);
+		if (rc > 0)
+		{
+			for (k = 0; k < n; ++k)
+				if (fds[k].revents) PQconsumeInput(cnxs[k]);
+		}
+		Py_END_ALLOW_THREADS
+
+		if (rc < 0)
+		{
+			if (errno != EINTR)
+			{
+				PyErr_SetFromErrno(PyExc_OSError);
+				goto done;
+			}
+			if (PyErr_CheckSignals())
+				goto done;
+		}
+		for (k = 0; rc > 0 && k < n; ++k)
+		{
+			if (fds[k].revents)
+			{
+				r = append_notifies(cnxs[k], PyList_GET_ITEM(lists, k), max);
+				if (r < 0)
+					goto done;
+				total += r;
+			}
+		}
+	}
+
+	/* hand the notifies to the callbacks in batches */
+	for (k = 0; k < n; ++k)
+	{
+		PyObject   *list = PyList_GET_ITEM(lists, k), *res;
+
+		if (!PyList_GET_SIZE(list))
+			continue;
+		res = PyObject_CallFunctionObjArgs(
+			PyTuple_GET_ITEM(PyList_GET_ITEM(items, k), 1), list, NULL);
+		if (!res)
+			goto done;
+		Py_DECREF(res);
+	}
+
+	ret = PyInt_FromLong((long) total);
+
+done:
+	PyMem_Free(cnxs);
+	PyMem_Free(fds);
+	Py_XDECREF(lists);
+	Py_DECREF(items);
+	return ret;
+}
+
+/* get row type for given field names */
+static char pgGetRowType__doc__[] =
+"get_row_type(fields) -- get the row type for the given field names\n\n"
+"The row types are cached, so the same type is returned for the same\n"
+"field names.  Rows can be created by passing a sequence of values.\n";
+
+static PyObject *
+pgGetRowType(PyObject *self, PyObject *fields)
+{
+	PyObject   *type;
+
+	if (PyStr_Check(fields) || !PySequence_Check(fields))
+	{
+		PyErr_SetString(PyExc_TypeError,
+			"Function get_row_type() expects a sequence of field names");
+		return NULL;
+	}
+
+	if (!(type = (PyObject *) get_row_type(fields)))
+		return NULL;
+	Py_INCREF(type);
+	return type;
+}
+
 /* List of functions defined in the module */
 
 static struct PyMethodDef pgMethods[] = {
 	{"connect", (PyCFunction) pgConnect, METH_VARARGS|METH_KEYWORDS,
 			pgConnect__doc__},
+	{"connect_many", (PyCFunction) pgConnectMany,
+			METH_VARARGS|METH_KEYWORDS, pgConnectMany__doc__},
 	{"escape_string", (PyCFunction) pgEscapeString, METH_O,
 			pgEscapeString__doc__},
 	{"escape_bytea", (PyCFunction) pgEscapeBytea, METH_O,
@@ -5876,14 +11567,26 @@ static struct PyMethodDef pgMethods[] = {
 			pgGetDecimal__doc__},
 	{"set_decimal", (PyCFunction) pgSetDecimal, METH_O,
 			pgSetDecimal__doc__},
+	{"get_numeric_mode", (PyCFunction) pgGetNumericMode, METH_NOARGS,
+			pgGetNumericMode__doc__},
+	{"set_numeric_mode", (PyCFunction) pgSetNumericMode, METH_O,
+			pgSetNumericMode__doc__},
 	{"get_bool", (PyCFunction) pgGetBool, METH_NOARGS, pgGetBool__doc__},
 	{"set_bool", (PyCFunction) pgSetBool, METH_VARARGS, pgSetBool__doc__},
 	{"get_array", (PyCFunction) pgGetArray, METH_NOARGS, pgGetArray__doc__},
 	{"set_array", (PyCFunction) pgSetArray, METH_VARARGS, pgSetArray__doc__},
+	{"get_typed_array", (PyCFunction) pgGetTypedArray, METH_NOARGS,
+		pgGetTypedArray__doc__},
+	{"set_typed_array", (PyCFunction) pgSetTypedArray, METH_VARARGS,
+		pgSetTypedArray__doc__},
 	{"get_bytea_escaped", (PyCFunction) pgGetByteaEscaped, METH_NOARGS,
 		pgGetByteaEscaped__doc__},
 	{"set_bytea_escaped", (PyCFunction) pgSetByteaEscaped, METH_VARARGS,
 		pgSetByteaEscaped__doc__},
+	{"get_bytea_view", (PyCFunction) pgGetByteaView, METH_NOARGS,
+		pgGetByteaView__doc__},
+	{"set_bytea_view", (PyCFunction) pgSetByteaView, METH_VARARGS,
+		pgSetByteaView__doc__},
 	{"get_namedresult", (PyCFunction) pgGetNamedresult, METH_NOARGS,
 			pgGetNamedresult__doc__},
 	{"set_namedresult", (PyCFunction) pgSetNamedresult, METH_O,
@@ -5897,6 +11600,22 @@ static struct PyMethodDef pgMethods[] = {
 	{"cast_record", (PyCFunction) pgCastRecord, METH_VARARGS|METH_KEYWORDS,
 			pgCastRecord__doc__},
 	{"cast_hstore", (PyCFunction) pgCastHStore, METH_O, pgCastHStore__doc__},
+	{"cast_num", (PyCFunction) pgCastNum, METH_O, pgCastNum__doc__},
+	{"cast_money", (PyCFunction) pgCastMoney, METH_O, pgCastMoney__doc__},
+	{"cast_date", (PyCFunction) pgCastDate, METH_VARARGS|METH_KEYWORDS,
+			pgCastDate__doc__},
+	{"cast_time", (PyCFunction) pgCastTime, METH_O, pgCastTime__doc__},
+	{"cast_timetz", (PyCFunction) pgCastTimetz, METH_O, pgCastTimetz__doc__},
+	{"cast_timestamp", (PyCFunction) pgCastTimestamp,
+			METH_VARARGS|METH_KEYWORDS, pgCastTimestamp__doc__},
+	{"cast_timestamptz", (PyCFunction) pgCastTimestamptz,
+			METH_VARARGS|METH_KEYWORDS, pgCastTimestamptz__doc__},
+	{"cast_interval", (PyCFunction) pgCastInterval, METH_O,
+			pgCastInterval__doc__},
+	{"get_row_type", (PyCFunction) pgGetRowType, METH_O,
+			pgGetRowType__doc__},
+	{"dispatch_notifies", (PyCFunction) pgDispatchNotifies,
+			METH_VARARGS|METH_KEYWORDS, pgDispatchNotifies__doc__},
 
 #ifdef DEFAULT_VARS
 	{"get_defhost", pgGetDefHost, METH_NOARGS, pgGetDefHost__doc__},
@@ -5935,14 +11654,17 @@ MODULE_INIT_FUNC(_pg)
 
 	/* Initialize here because some Windows platforms get confused otherwise */
 #if IS_PY3
-	connType.tp_base = noticeType.tp_base =
-		queryType.tp_base = sourceType.tp_base = &PyBaseObject_Type;
+	rowType.tp_base = &PyTuple_Type;
+	connType.tp_base = noticeType.tp_base = queryType.tp_base =
+		viewType.tp_base = sourceType.tp_base = &PyBaseObject_Type;
 #ifdef LARGE_OBJECTS
 	largeType.tp_base = &PyBaseObject_Type;
 #endif
 #else
-	connType.ob_type = noticeType.ob_type =
-		queryType.ob_type = sourceType.ob_type = &PyType_Type;
+	rowType.ob_type = &PyType_Type;
+	rowType.tp_base = &PyTuple_Type;
+	connType.ob_type = noticeType.ob_type = queryType.ob_type =
+		viewType.ob_type = sourceType.ob_type = &PyType_Type;
 #ifdef LARGE_OBJECTS
 	largeType.ob_type = &PyType_Type;
 #endif
@@ -5951,14 +11673,49 @@ MODULE_INIT_FUNC(_pg)
 	if (PyType_Ready(&connType)
 		|| PyType_Ready(&noticeType)
 		|| PyType_Ready(&queryType)
+		|| PyType_Ready(&viewType)
+		|| PyType_Ready(&rowType)
+		|| PyType_Ready(&byteaType)
 		|| PyType_Ready(&sourceType)
 #ifdef LARGE_OBJECTS
 		|| PyType_Ready(&largeType)
 #endif
 		) return NULL;
 
+	/* Import the C API of the datetime module */
+	PyDateTime_IMPORT;
+	if (!PyDateTimeAPI) return NULL;
+
+	/* The timezone type is only available since Python 3.2 */
+	if ((s = PyImport_ImportModule("datetime")))
+	{
+		timezone_type = PyObject_GetAttrString(s, "timezone");
+		Py_DECREF(s);
+	}
+	if (!timezone_type) PyErr_Clear();
+
+	/* Cache for the row types with the same field names */
+	if (!(row_types = PyDict_New())
+		|| !(row_index_key = PyStr_FromString("_index"))) return NULL;
+
 	dict = PyModule_GetDict(mod);
 
+	/* Remember the date/time cast functions for detecting native casts */
+	datetime_casts[DATETIME_DATE] = PyDict_GetItemString(dict, "cast_date");
+	datetime_casts[DATETIME_TIME] = PyDict_GetItemString(dict, "cast_time");
+	datetime_casts[DATETIME_TIMETZ] =
+		PyDict_GetItemString(dict, "cast_timetz");
+	datetime_casts[DATETIME_TIMESTAMP] =
+		PyDict_GetItemString(dict, "cast_timestamp");
+	datetime_casts[DATETIME_TIMESTAMPTZ] =
+		PyDict_GetItemString(dict, "cast_timestamptz");
+	datetime_casts[DATETIME_INTERVAL] =
+		PyDict_GetItemString(dict, "cast_interval");
+
+	/* Base type of all row types */
+	Py_INCREF(&rowType);
+	PyDict_SetItemString(dict, "Row", (PyObject *) &rowType);
+
 	/* Exceptions as defined by DB-API 2.0 */
 	Error = PyErr_NewException("pg.Error", PyExc_Exception, NULL);
 	PyDict_SetItemString(dict, "Error", Error);
@@ -139,6 +139,8 @@ class build_pg_ext(build_ext):
             define_macros.append(('DEFAULT_VARS', None))
         if self.escaping_funcs and pg_version[0] >= 9:
             define_macros.append(('ESCAPING_FUNCS', None))
+        if pg_version[0] >= 12:
+            define_macros.append(('MEMORY_SIZE', None))
         if sys.platform == 'win32':
             bits = platform.architecture()[0]
             if bits == '64bit':  # we need to find libpq64
@@ -14,13 +14,19 @@ try:
     import unittest2 as unittest  # for Python < 2.7
 except ImportError:
     import unittest
+import csv
+import json
 import threading
 import time
 import os
 
 import pg  # the module under test
 
+from array import array
+from datetime import date, datetime, timedelta, time as Time
 from decimal import Decimal
+from math import isnan
+from uuid import UUID
 
 # We need a database to test against.  If LOCAL_PyGreSQL.py exists we will
 # get our information from that.  Otherwise we use the defaults.
@@ -79,6 +85,29 @@ class TestCanConnect(unittest.TestCase):
         except pg.Error:
             self.fail('Cannot close the database connection')
 
+    def testCanConnectMany(self):
+        params = dict(dbname=dbname, host=dbhost, port=dbport)
+        conninfo = ' '.join('%s=%s' % (key, value)
+            for key, value in sorted(params.items()) if value is not None)
+        try:
+            connections = pg.connect_many([conninfo, params] * 3, timeout=60)
+        except pg.Error as error:
+            self.fail('Cannot connect to database %s:\n%s' % (dbname, error))
+        self.assertIsInstance(connections, list)
+        self.assertEqual(len(connections), 6)
+        for connection in connections:
+            self.assertTrue(repr(connection).startswith(
+                '<pg.Connection object'))
+            self.assertEqual(connection.db, dbname)
+            self.assertEqual(connection.query("select 1").getresult(), [(1,)])
+            connection.close()
+
+    def testCannotConnectMany(self):
+        params = dict(dbname=dbname, host=dbhost, port=dbport)
+        bad_params = dict(params, dbname='does-not-exist-' + dbname)
+        self.assertRaises(pg.InternalError,
+            pg.connect_many, [params, bad_params, params])
+
 
 class TestConnectObject(unittest.TestCase):
     """Test existence of basic pg connection methods."""
@@ -122,9 +151,12 @@ class TestConnectObject(unittest.TestCase):
     def testAllConnectMethods(self):
         methods = '''cancel close date_format endcopy
             escape_bytea escape_identifier escape_literal escape_string
-            fileno get_cast_hook get_notice_receiver getline getlo getnotify
-            inserttable locreate loimport parameter putline query reset
-            set_cast_hook set_notice_receiver source transaction'''.split()
+            fileno get_cast_hook get_memory_limit get_notice_receiver
+            get_type_casts getline getlo getnotifies getnotify inserttable
+            locreate loimport parameter prepare putline queries query
+            query_prepared quote_list quote_rows reset set_cast_hook
+            set_memory_limit set_notice_receiver set_type_casts source
+            transaction'''.split()
         connection_methods = [a for a in dir(self.connection)
             if not a.startswith('__') and self.is_method(a)]
         self.assertEqual(methods, connection_methods)
@@ -406,6 +438,141 @@ class TestSimpleQueries(unittest.TestCase):
         self.assertEqual(v._fields, ('alias0',))
         self.assertEqual(v.alias0, 0)
 
+    def testRowresult(self):
+        q = "select 1 as a, 'x' as b union select 2, null order by 1"
+        r = self.c.query(q).rowresult()
+        self.assertIsInstance(r, list)
+        self.assertEqual(r, [(1, 'x'), (2, None)])
+        v = r[0]
+        self.assertIsInstance(v, tuple)
+        self.assertIsInstance(v, pg.Row)
+        self.assertEqual(v.__class__.__name__, 'Row')
+        self.assertIs(type(r[1]), type(v))
+        self.assertEqual(v._fields, ('a', 'b'))
+        self.assertEqual(v._asdict(), {'a': 1, 'b': 'x'})
+        self.assertEqual(v.a, 1)
+        self.assertEqual(v.b, 'x')
+        self.assertEqual(v['a'], 1)
+        self.assertEqual(v['b'], 'x')
+        self.assertEqual(v[1], 'x')
+        self.assertEqual(v[-2:], (1, 'x'))
+        self.assertRaises(AttributeError, getattr, v, 'c')
+        self.assertRaises(KeyError, v.__getitem__, 'c')
+        self.assertRaises(IndexError, v.__getitem__, 2)
+        a, b = v
+        self.assertEqual((a, b), (1, 'x'))
+
+    def testRowresultSharesRowType(self):
+        q = "select 1 as a, 2 as b"
+        r = self.c.query(q).rowresult()[0]
+        s = self.c.query(q).rowresult()[0]
+        self.assertIs(type(r), type(s))
+        self.assertIs(type(r), pg.get_row_type(('a', 'b')))
+        self.assertIs(type(r), pg.get_row_type(['a', 'b']))
+        s = self.c.query("select 1 as b, 2 as a").rowresult()[0]
+        self.assertIsNot(type(r), type(s))
+
+    def testRowresultNames(self):
+        q = ('select 1 as "with blank", 2 as count,'
+            ' 3 as a, 4 as a')
+        v = self.c.query(q).rowresult()[0]
+        self.assertEqual(v._fields, ('with blank', 'count', 'a', 'a'))
+        self.assertEqual(v['with blank'], 1)
+        self.assertEqual(v.count, 2)
+        self.assertEqual(v['count'], 2)
+        self.assertEqual(v.a, 3)
+        self.assertEqual(v._asdict(), {'with blank': 1, 'count': 2, 'a': 3})
+
+    def testLazyresult(self):
+        q = "select generate_series(1, 5) as n, 'x' as s"
+        r = self.c.query(q).lazyresult()
+        self.assertEqual(r.__class__.__name__, 'ResultView')
+        self.assertEqual(len(r), 5)
+        v = r[0]
+        self.assertIsInstance(v, tuple)
+        self.assertEqual(v, (1, 'x'))
+        self.assertIs(r[0], v)
+        self.assertEqual(r[-1], (5, 'x'))
+        self.assertEqual(r[1:3], [(2, 'x'), (3, 'x')])
+        self.assertEqual(r[::-2], [(5, 'x'), (3, 'x'), (1, 'x')])
+        self.assertEqual(list(r), self.c.query(q).getresult())
+        self.assertRaises(IndexError, r.__getitem__, 5)
+        self.assertRaises(IndexError, r.__getitem__, -6)
+        self.assertRaises(TypeError, r.__getitem__, 'n')
+        r = self.c.query("select 1 where false").lazyresult()
+        self.assertEqual(len(r), 0)
+        self.assertEqual(list(r), [])
+
+    def testGetcolumns(self):
+        q = "select 1 as a, 'x' as b union select 2, null order by 1"
+        r = self.c.query(q).getcolumns()
+        self.assertIsInstance(r, list)
+        self.assertEqual(r, [[1, 2], ['x', None]])
+        r = self.c.query(q).getcolumns(('b',))
+        self.assertEqual(r, [['x', None]])
+        r = self.c.query(q).getcolumns(['b', 0])
+        self.assertEqual(r, [['x', None], [1, 2]])
+        r = self.c.query(q).getcolumns([])
+        self.assertEqual(r, [])
+        r = self.c.query("select 1 as a where false").getcolumns()
+        self.assertEqual(r, [[]])
+
+    def testGetcolumnsWithInvalidFields(self):
+        r = self.c.query("select 1 as a")
+        self.assertRaises(TypeError, r.getcolumns, 'a')
+        self.assertRaises(TypeError, r.getcolumns, [1.5])
+        self.assertRaises(ValueError, r.getcolumns, ['b'])
+        self.assertRaises(ValueError, r.getcolumns, [1])
+
+    def testTypedcolumn(self):
+        q = ("select 1::int as i, 2.5::float8 as f, true as b"
+            " union select 2, -1.5, false order by 1")
+        r = self.c.query(q)
+        v = r.typedcolumn('i')
+        self.assertIsInstance(v, array)
+        self.assertEqual(v.typecode, 'q')
+        self.assertEqual(v.tolist(), [1, 2])
+        v = r.typedcolumn(1)
+        self.assertEqual(v.typecode, 'd')
+        self.assertEqual(v.tolist(), [2.5, -1.5])
+        v = r.typedcolumn('b', 'B')
+        self.assertEqual(v.typecode, 'B')
+        self.assertEqual(v.tolist(), [1, 0])
+        v = r.typedcolumn('i', typecode='f')
+        self.assertEqual(v.typecode, 'f')
+        self.assertEqual(v.tolist(), [1.0, 2.0])
+        v = r.typedcolumn('i', 'h')
+        self.assertEqual(v.itemsize, array('h').itemsize)
+        self.assertEqual(bytes(memoryview(v)),
+            bytes(memoryview(array('h', [1, 2]))))
+
+    def testTypedcolumnWithNulls(self):
+        q = ("select 1::int as i, 2.5::float8 as f"
+            " union select null, null order by 1")
+        r = self.c.query(q)
+        self.assertRaises(ValueError, r.typedcolumn, 'i')
+        v, m = r.typedcolumn('i', nullmask=True)
+        self.assertEqual(v.tolist(), [1, 0])
+        self.assertEqual(m.typecode, 'B')
+        self.assertEqual(m.tolist(), [0, 1])
+        v = r.typedcolumn('f')
+        self.assertEqual(v[0], 2.5)
+        self.assertTrue(isnan(v[1]))
+        v, m = r.typedcolumn('f', nullmask=True)
+        self.assertEqual(v.tolist(), [2.5, 0.0])
+        self.assertEqual(m.tolist(), [0, 1])
+
+    def testTypedcolumnWithInvalidParameters(self):
+        r = self.c.query("select 300 as i, 1.5::float8 as f, 'x' as t")
+        self.assertRaises(TypeError, r.typedcolumn)
+        self.assertRaises(ValueError, r.typedcolumn, 'x')
+        self.assertRaises(TypeError, r.typedcolumn, 't')
+        self.assertRaises(ValueError, r.typedcolumn, 'i', 'u')
+        self.assertRaises(ValueError, r.typedcolumn, 'i', 'qq')
+        self.assertRaises(TypeError, r.typedcolumn, 'f', 'i')
+        self.assertRaises(OverflowError, r.typedcolumn, 'i', 'b')
+        self.assertEqual(r.typedcolumn('i', 'h').tolist(), [300])
+
     def testGet3Cols(self):
         q = "select 1,2,3"
         result = [(1, 2, 3)]
@@ -535,6 +702,257 @@ class TestSimpleQueries(unittest.TestCase):
         self.assertIsInstance(r, int)
         self.assertEqual(r, 6)
 
+    def testMemsize(self):
+        q = "select 1 where false"
+        r = self.c.query(q).memsize()
+        self.assertIsInstance(r, int)
+        small = r
+        q = "select repeat('x', 1000) from generate_series(1, 1000)"
+        r = self.c.query(q).memsize()
+        self.assertIsInstance(r, int)
+        self.assertGreater(r, small)
+        self.assertGreater(r, 1000000)
+        self.assertLess(r, 2000000)
+
+    def testGetMemoryLimit(self):
+        get_memory_limit = self.c.get_memory_limit
+        self.assertRaises(TypeError, get_memory_limit, None)
+        self.assertIsNone(get_memory_limit())
+        self.c.set_memory_limit(100000)
+        r = get_memory_limit()
+        self.assertIsInstance(r, int)
+        self.assertEqual(r, 100000)
+        self.c.set_memory_limit(None)
+        self.assertIsNone(get_memory_limit())
+        self.c.set_memory_limit(0)
+        self.assertIsNone(get_memory_limit())
+
+    def testSetMemoryLimit(self):
+        set_memory_limit = self.c.set_memory_limit
+        self.assertRaises(TypeError, set_memory_limit)
+        self.assertRaises(TypeError, set_memory_limit, '1000')
+        self.assertRaises(ValueError, set_memory_limit, -1)
+        query = self.c.query
+        q = "select repeat('x', 1000) from generate_series(1, %d)"
+        set_memory_limit(200000)
+        try:
+            r = query(q % 10).getresult()
+            self.assertEqual(len(r), 10)
+            self.assertEqual(r[-1][0], 'x' * 1000)
+            r = query("select 1 where false").getresult()
+            self.assertEqual(r, [])
+            self.assertIsNone(query("set datestyle to iso"))
+            self.assertRaises(pg.OperationalError, query, q % 1000000)
+            # the connection is still usable after the query was canceled
+            r = query(q % 20)
+            self.assertEqual(r.ntuples(), 20)
+            self.assertEqual(r.listfields(), ('repeat',))
+            self.assertEqual(r.getresult()[0][0], 'x' * 1000)
+            # errors are still reported as usual
+            self.assertRaises(pg.DataError, query,
+                "select 1/(50-n) from generate_series(1, 100) n")
+            # the conversion is limited as well
+            r = query(q % 120)
+            self.assertEqual(r.ntuples(), 120)
+            self.assertRaises(pg.OperationalError, r.getresult)
+            self.assertRaises(pg.OperationalError, r.dictresult)
+            self.assertEqual(len(r.lazyresult()), 120)
+        finally:
+            set_memory_limit(None)
+        self.assertEqual(len(query(q % 120).getresult()), 120)
+
+    def testCmdstatusAndCmdtuples(self):
+        query = self.c.query
+        r = query("select 1 union select 2")
+        self.assertEqual(r.cmdstatus(), 'SELECT 2')
+        r = r.cmdtuples()
+        self.assertIsInstance(r, int)
+        self.assertEqual(r, 2)
+        query("create temporary table test_table (n int)")
+        r = query("insert into test_table values (1), (2), (3)")
+        self.assertEqual(r, '3')
+        r = query("update test_table set n=n+1 where n>1 returning n")
+        self.assertEqual(r.cmdstatus(), 'UPDATE 2')
+        self.assertEqual(r.cmdtuples(), 2)
+        self.assertRaises(TypeError, r.cmdstatus, None)
+        self.assertRaises(TypeError, r.cmdtuples, None)
+
+    def testQueries(self):
+        queries = self.c.queries
+        self.assertRaises(TypeError, queries)
+        self.assertRaises(TypeError, queries, 42)
+        self.assertRaises(TypeError, queries, 'select 1', 'select 2')
+        r = queries("select 1")
+        self.assertIsInstance(r, list)
+        self.assertEqual(len(r), 1)
+        r = r[0]
+        self.assertEqual(r.__class__.__name__, 'Query')
+        self.assertEqual(r.getresult(), [(1,)])
+        r = queries("create temporary table test_table (n int);"
+            " insert into test_table values (1), (2), (3);"
+            " select n from test_table order by n;"
+            " delete from test_table where n<3;"
+            " set datestyle to iso; select count(*) from test_table")
+        self.assertEqual(len(r), 6)
+        self.assertEqual([q.cmdstatus() for q in r], [
+            'CREATE TABLE', 'INSERT 0 3', 'SELECT 3', 'DELETE 2',
+            'SET', 'SELECT 1'])
+        self.assertEqual([q.cmdtuples() for q in r],
+            [None, 3, 3, 2, None, 1])
+        self.assertEqual(r[0].getresult(), [])
+        self.assertEqual(r[2].getresult(), [(1,), (2,), (3,)])
+        self.assertEqual(r[5].getresult(), [(1,)])
+        self.assertEqual(self.c.date_format(), '%Y-%m-%d')
+
+    def testQueriesWithError(self):
+        queries = self.c.queries
+        queries("create temporary table test_table (n int)")
+        self.assertRaises(pg.DataError, queries,
+            "insert into test_table values (1); select 1/0;"
+            " insert into test_table values (2)")
+        # the commands are run in one implicit transaction
+        r = self.c.query("select count(*) from test_table").getresult()
+        self.assertEqual(r, [(0,)])
+        r = queries("select 1; select 2")
+        self.assertEqual([q.getresult() for q in r], [[(1,)], [(2,)]])
+
+    def testQueriesWithMemoryLimit(self):
+        queries = self.c.queries
+        q = "select repeat('x', 1000) from generate_series(1, %d)"
+        self.c.set_memory_limit(200000)
+        try:
+            r = queries('; '.join((q % 10, q % 20)))
+            self.assertEqual([s.ntuples() for s in r], [10, 20])
+            self.assertEqual(r[1].getresult()[-1][0], 'x' * 1000)
+            self.assertRaises(pg.OperationalError, queries,
+                '; '.join((q % 10, q % 1000000, q % 10)))
+            r = queries("select 1")
+            self.assertEqual(r[0].getresult(), [(1,)])
+        finally:
+            self.c.set_memory_limit(None)
+
+    def testToJson(self):
+        q = ("select 1 as i, E'a\"b\\\\c\\n' as t, true as b,"
+            " 'NaN'::float8 as f, 2.5::numeric as n, '{\"x\": [1]}'::json as j"
+            " union all select -2, null, false, 1.5, null, 'null'")
+        r = self.c.query(q).to_json()
+        self.assertIsInstance(r, str)
+        self.assertEqual(r, '[{"i":1,"t":"a\\"b\\\\c\\n","b":true,'
+            '"f":"NaN","n":2.5,"j":{"x": [1]}},'
+            '{"i":-2,"t":null,"b":false,"f":1.5,"n":null,"j":null}]')
+        self.assertEqual(json.loads(r), [
+            dict(i=1, t='a"b\\c\n', b=True, f='NaN', n=2.5, j=dict(x=[1])),
+            dict(i=-2, t=None, b=False, f=1.5, n=None, j=None)])
+        self.assertEqual(self.c.query("select 1 where false").to_json(), '[]')
+        self.assertRaises(TypeError, self.c.query("select 1").to_json, 1)
+
+    def testToCsv(self):
+        q = ("select 1 as i, 'a,\"b\"' as t, 'x' as \"s,t\""
+            " union all select 2, '', null")
+        r = self.c.query(q).to_csv()
+        self.assertIsInstance(r, str)
+        self.assertEqual(r, 'i,t,"s,t"\r\n1,"a,""b""",x\r\n2,"",\r\n')
+        self.assertEqual(list(csv.reader(r.splitlines())), [
+            ['i', 't', 's,t'], ['1', 'a,"b"', 'x'], ['2', '', '']])
+        r = self.c.query(q).to_csv(header=False)
+        self.assertEqual(r, '1,"a,""b""",x\r\n2,"",\r\n')
+        r = self.c.query("select 1 as n where false").to_csv()
+        self.assertEqual(r, 'n\r\n')
+
+    def testToMarkdown(self):
+        # values are truncated with an ellipsis only in UTF-8
+        self.c.query('set client_encoding=utf8')
+        q = ("select 1 as n, 'a|b' as t union all select 234, 'hello world'"
+            " union all select null, null")
+        r = self.c.query(q).to_markdown()
+        self.assertIsInstance(r, str)
+        self.assertEqual(r,
+            '| n   | t           |\n'
+            '|----:|-------------|\n'
+            '|   1 | a\\|b        |\n'
+            '| 234 | hello world |\n'
+            '|     |             |\n')
+        r = self.c.query(q).to_markdown(max_width=5)
+        if not isinstance(r, unicode):
+            r = r.decode('utf8')
+        self.assertEqual(r,
+            u'| n   | t     |\n'
+            u'|----:|-------|\n'
+            u'|   1 | a\\|b  |\n'
+            u'| 234 | hell… |\n'
+            u'|     |       |\n')
+        r = self.c.query(q).to_markdown(max_bytes=60)
+        self.assertEqual(r,
+            '| n   | t           |\n'
+            '|----:|-------------|\n'
+            '(3 more rows)\n')
+        r = self.c.query(q).to_markdown(max_bytes=80)
+        self.assertEqual(r,
+            '| n   | t           |\n'
+            '|----:|-------------|\n'
+            '|   1 | a\\|b        |\n'
+            '(2 more rows)\n')
+        self.assertRaises(ValueError, self.c.query(q).to_markdown,
+            max_bytes=50)
+        self.assertRaises(ValueError, self.c.query(q).to_markdown,
+            max_width=0)
+        self.assertRaises(TypeError, self.c.query(q).to_markdown,
+            max_width='5')
+
+    def testGetTypeCasts(self):
+        get_type_casts = self.c.get_type_casts
+        self.assertRaises(TypeError, get_type_casts, None)
+        r = get_type_casts()
+        self.assertIsInstance(r, dict)
+        self.assertEqual(r, {})
+        self.assertIs(get_type_casts(), r)
+        casts = {869: str}
+        self.c.set_type_casts(casts)
+        self.assertIs(get_type_casts(), casts)
+        self.c.set_type_casts(None)
+        r = get_type_casts()
+        self.assertEqual(r, {})
+        self.assertIsNot(r, casts)
+
+    def testSetTypeCasts(self):
+        set_type_casts = self.c.set_type_casts
+        self.assertRaises(TypeError, set_type_casts)
+        self.assertRaises(TypeError, set_type_casts, [])
+        calls = []
+        def cast_hook(value, typ):
+            calls.append(typ)
+            return 'hook: %s' % value
+        self.c.set_cast_hook(cast_hook)
+        self.addCleanup(self.c.set_cast_hook, None)
+        q = ("select '10.0.0.%d'::inet, int4range(1, %d), 'yes'::text"
+            " from generate_series(1, 3)")
+        r = self.c.query(q % (1, 2)).getresult()
+        self.assertEqual(r, [('hook: 10.0.0.1', 'hook: [1,2)', 'yes')] * 3)
+        self.assertEqual(calls, [869, 3904] * 3)
+        del calls[:]
+        casts = {869: lambda v: 'cast: %s' % v, 3904: None}
+        set_type_casts(casts)
+        r = self.c.query(q % (2, 3)).getresult()
+        self.assertEqual(r, [('cast: 10.0.0.2', '[1,3)', 'yes')] * 3)
+        self.assertEqual(calls, [])
+        # types registered while converting are used for the other values
+        del casts[869]
+        def cast_hook(value, typ):
+            calls.append(typ)
+            casts[typ] = None
+            return value
+        self.c.set_cast_hook(cast_hook)
+        r = self.c.query(q % (3, 4)).getresult()
+        self.assertEqual(r, [('10.0.0.3', '[1,4)', 'yes')] * 3)
+        self.assertEqual(calls, [869])
+        self.assertIn(869, casts)
+        casts[869] = 'not callable'
+        self.assertRaises(TypeError, self.c.query(q % (4, 5)).getresult)
+        set_type_casts(None)
+        r = self.c.query(q % (5, 6)).getresult()
+        self.assertEqual(r, [('10.0.0.5', '[1,6)', 'yes')] * 3)
+        self.assertEqual(calls, [869] + [869, 3904] * 3)
+
     def testQuery(self):
         query = self.c.query
         query("drop table if exists test_table")
@@ -903,6 +1321,68 @@ class TestParamQueries(unittest.TestCase):
             ).dictresult(), [{'garbage': garbage}])
 
 
+class TestPreparedQueries(unittest.TestCase):
+    """Test prepared statements via a basic pg connection."""
+
+    def setUp(self):
+        self.c = connect()
+        self.c.query('set client_encoding=utf8')
+
+    def tearDown(self):
+        self.c.close()
+
+    def testPrepareAndQuery(self):
+        prepare, query = self.c.prepare, self.c.query_prepared
+        self.assertIsNone(prepare('q1', "select 'hello'"))
+        self.assertIsNone(prepare('q2', "select $1::int + $2::int"))
+        self.assertEqual(query('q1').getresult(), [('hello',)])
+        self.assertEqual(query('q2', (1, 2)).getresult(), [(3,)])
+        self.assertEqual(query('q2', [3, 4]).getresult(), [(7,)])
+
+    def testPrepareUnnamed(self):
+        self.c.prepare('', "select $1::text || '!'")
+        self.assertEqual(self.c.query_prepared('', ['hello']).getresult(),
+            [('hello!',)])
+
+    def testPrepareWithCommand(self):
+        self.c.query("create temporary table test_prepared (n int)")
+        self.c.prepare('ins', "insert into test_prepared values ($1)")
+        self.assertEqual(self.c.query_prepared('ins', [1]), '1')
+        self.assertEqual(self.c.query("select n from test_prepared"
+            ).getresult(), [(1,)])
+
+    def testPrepareDuplicateName(self):
+        self.c.prepare('q', "select 1")
+        self.assertRaises(pg.ProgrammingError,
+            self.c.prepare, 'q', "select 2")
+
+    def testPrepareWithInvalidCommand(self):
+        self.assertRaises(pg.ProgrammingError,
+            self.c.prepare, 'q', "select something bad")
+
+    def testPrepareWithWrongArguments(self):
+        self.assertRaises(TypeError, self.c.prepare)
+        self.assertRaises(TypeError, self.c.prepare, 'q')
+        self.assertRaises(TypeError, self.c.prepare, 1, "select 1")
+        self.assertRaises(TypeError, self.c.prepare, 'q', 1)
+        self.assertRaises(TypeError, self.c.query_prepared)
+        self.assertRaises(TypeError, self.c.query_prepared, 1)
+
+    def testQueryNonExistingStatement(self):
+        try:
+            self.c.query_prepared('does-not-exist')
+        except pg.OperationalError as error:
+            self.assertEqual(error.sqlstate, '26000')
+        else:
+            self.fail('Statement should not exist')
+
+    def testQueryPreparedWithMemoryLimit(self):
+        self.c.prepare('q', "select generate_series(1, $1::int)")
+        self.c.set_memory_limit(1000000)
+        self.assertEqual(len(self.c.query_prepared('q', [10]).getresult()),
+            10)
+
+
 class TestQueryResultTypes(unittest.TestCase):
     """Test proper result types via a basic pg connection."""
 
@@ -1119,6 +1599,128 @@ class TestInserttable(unittest.TestCase):
         r = self.c.query("select count(*) from test").getresult()[0][0]
         self.assertEqual(r, num_rows)
 
+    def testInserttableReturnsNumberOfRows(self):
+        r = self.c.inserttable('test', self.data)
+        self.assertIsInstance(r, int)
+        self.assertEqual(r, len(self.data))
+        r = self.c.inserttable('test', [])
+        self.assertEqual(r, 0)
+
+    def testInserttableFromGenerator(self):
+        num_rows = 10000
+        data = self.data[2]
+        r = self.c.inserttable('test', (data for _i in range(num_rows)))
+        self.assertEqual(r, num_rows)
+        r = self.c.query("select count(*) from test").getresult()[0][0]
+        self.assertEqual(r, num_rows)
+
+    def testInserttableWithColumns(self):
+        data = [(1, 'a'), (2, None), (3, 'c\tab\t')]
+        r = self.c.inserttable('test', data, ['i4', 't'])
+        self.assertEqual(r, 3)
+        r = self.c.query("select i4, t, i2, v4 from test order by 1")
+        self.assertEqual(r.getresult(), [(1, 'a', None, None),
+            (2, None, None, None), (3, 'c\tab\t', None, None)])
+
+    def testInserttableBigRows(self):
+        data = [(1, 'x' * 100000), (2, 'y\n' * 50000)]
+        self.c.inserttable('test', data, ('i4', 't'))
+        r = self.c.query("select i4, t from test order by 1").getresult()
+        self.assertEqual(r, data)
+
+    def testInserttableWithInvalidParameters(self):
+        inserttable = self.c.inserttable
+        self.assertRaises(TypeError, inserttable, 'test', 'data')
+        self.assertRaises(TypeError, inserttable, 'test', 42)
+        self.assertRaises(TypeError, inserttable, 'test', ['data'])
+        self.assertRaises(TypeError, inserttable, 'test', [(1,), (1, 2)])
+        self.assertRaises(TypeError, inserttable, 'test', [(1,)], 'i4')
+        self.assertRaises(pg.ProgrammingError, inserttable,
+            'test', [(1,)], ['nocolumn'])
+        self.assertRaises(TypeError, inserttable,
+            'test', [(1, 'x')], ['i4'])
+        self.assertRaises(pg.ProgrammingError, inserttable,
+            'test_missing_table', [(1,)])
+        self.assertEqual(self.c.query("select count(*) from test")
+            .getresult()[0][0], 0)
+
+    def testInserttableWithErrorInIterable(self):
+        def rows():
+            yield self.data[0]
+            raise RuntimeError('no more rows')
+        self.assertRaises(RuntimeError, self.c.inserttable, 'test', rows())
+        r = self.c.query("select count(*) from test").getresult()[0][0]
+        self.assertEqual(r, 0)
+
+    def testInserttableBinary(self):
+        data = [(1, 2, long(3), True, date(2016, 3, 20), Time(8, 30),
+            Decimal('1.25'), 1.5, 2.5, None, 'x', 'abcd', 'efgh', 'ijk'),
+            (-1, -2, long(-3), False, date(1492, 10, 12), Time(23, 59, 59),
+            Decimal('-12345678.0001'), -1.5, -2.5, None,
+            ' ', '', 'a', 'mnop\nstux!'),
+            (None,) * 14]
+        r = self.c.inserttable('test', data, binary=True)
+        self.assertEqual(r, 3)
+        q = ("select i2, i4, i8, b, dt::text, ti::text, d, f4, f8, m,"
+            " c, v4, c4, t from test order by i2")
+        r = self.c.query(q).getresult()
+        self.assertEqual(r, [
+            (-1, -2, long(-3), False, '1492-10-12', '23:59:59',
+            Decimal('-12345678.0001'), -1.5, -2.5, None,
+            ' ', '', 'a   ', 'mnop\nstux!'),
+            (1, 2, long(3), True, '2016-03-20', '08:30:00',
+            Decimal('1.25'), 1.5, 2.5, None, 'x', 'abcd', 'efgh', 'ijk'),
+            (None,) * 14])
+
+    def testInserttableBinaryWithColumns(self):
+        data = [(1, 'a'), (2, None)]
+        r = self.c.inserttable('test', data, ('i4', 't'), True)
+        self.assertEqual(r, 2)
+        r = self.c.query("select i4, t, i2 from test order by 1").getresult()
+        self.assertEqual(r, [(1, 'a', None), (2, None, None)])
+
+    def testInserttableBinaryWithInvalidValues(self):
+        inserttable = self.c.inserttable
+        self.assertRaises(TypeError, inserttable,
+            'test', [('1',)], ['i4'], binary=True)
+        self.assertRaises(OverflowError, inserttable,
+            'test', [(2 ** 15,)], ['i2'], binary=True)
+        self.assertRaises(TypeError, inserttable,
+            'test', [('2016-03-20',)], ['dt'], binary=True)
+        self.assertRaises(TypeError, inserttable,
+            'test', [(1.5,)], ['m'], binary=True)
+        r = self.c.query("select count(*) from test").getresult()[0][0]
+        self.assertEqual(r, 0)
+
+    def testInserttableBinaryTimestamps(self):
+        query = self.c.query
+        query("drop table if exists test_binary")
+        query("create table test_binary (ts timestamp, tz timestamptz,"
+            " tt timetz, iv interval, u uuid, j jsonb, b bytea)")
+        try:
+            query("set timezone=UTC")
+            ts = datetime(2016, 3, 20, 12, 30, 15, 123456)
+            tz = pg._get_timezone('+0100')
+            tsz = ts.replace(hour=13, tzinfo=tz)
+            u = UUID('12345678-1234-5678-1234-567812345678')
+            data = [(ts, tsz, Time(13, 30, tzinfo=tz),
+                timedelta(days=2, seconds=3), u, '{"a": 1}', b'\x00\x01')]
+            r = self.c.inserttable('test_binary', data, binary=True)
+            self.assertEqual(r, 1)
+            r = query("select ts::text, tz::text, tt::text, iv::text,"
+                " u::text, j::text, b from test_binary").getresult()
+            self.assertEqual(r, [('2016-03-20 12:30:15.123456',
+                '2016-03-20 12:30:15.123456+00', '13:30:00+01',
+                '2 days 00:00:03', '12345678-1234-5678-1234-567812345678',
+                '{"a": 1}', b'\x00\x01')])
+            # naive values cannot be sent to columns with time zone
+            self.assertRaises(ValueError, self.c.inserttable, 'test_binary',
+                [(None, ts)], ['ts', 'tz'], binary=True)
+            self.assertRaises(ValueError, self.c.inserttable, 'test_binary',
+                [(None, Time(12, 30))], ['ts', 'tt'], binary=True)
+        finally:
+            query("drop table test_binary")
+
     def testInserttableNullValues(self):
         data = [(None,) * 14] * 100
         self.c.inserttable('test', data)
@@ -1377,6 +1979,36 @@ class TestNotificatons(unittest.TestCase):
         finally:
             query('unlisten test_notify')
 
+    def testGetNotifies(self):
+        getnotifies = self.c.getnotifies
+        query = self.c.query
+        self.assertEqual(getnotifies(), [])
+        self.assertRaises(TypeError, getnotifies, 'all')
+        self.assertRaises(ValueError, getnotifies, 0)
+        query('listen test_notify')
+        try:
+            self.assertEqual(getnotifies(), [])
+            for i in range(5):
+                query("notify test_notify, 'payload %d'" % i)
+            r = getnotifies(max=2)
+            self.assertIsInstance(r, list)
+            self.assertEqual(len(r), 2)
+            for n in r:
+                self.assertIsInstance(n, tuple)
+                self.assertEqual(len(n), 3)
+                self.assertIsInstance(n[0], str)
+                self.assertIsInstance(n[1], int)
+                self.assertIsInstance(n[2], str)
+                self.assertEqual(n[0], 'test_notify')
+            self.assertEqual([n[2] for n in r], ['payload 0', 'payload 1'])
+            r = getnotifies()
+            self.assertEqual([n[2] for n in r],
+                ['payload 2', 'payload 3', 'payload 4'])
+            self.assertEqual(getnotifies(), [])
+            self.assertIsNone(self.c.getnotify())
+        finally:
+            query('unlisten test_notify')
+
     def testGetNoticeReceiver(self):
         self.assertIsNone(self.c.get_notice_receiver())
 
@@ -1635,6 +2267,44 @@ class TestConfigFunctions(unittest.TestCase):
         self.assertIsInstance(r, int)
         self.assertEqual(r, int(3425))
 
+    def testGetNumericMode(self):
+        mode = pg.get_numeric_mode()
+        # error if a parameter is passed
+        self.assertRaises(TypeError, pg.get_numeric_mode, mode)
+        self.assertEqual(mode, 'decimal')  # the default setting
+
+    def testSetNumericMode(self):
+        decimal_class = pg.get_decimal()
+        mode = pg.get_numeric_mode()
+        self.assertRaises(TypeError, pg.set_numeric_mode)
+        self.assertRaises(TypeError, pg.set_numeric_mode, None)
+        self.assertRaises(ValueError, pg.set_numeric_mode, 'double')
+        query = self.c.query
+        q = ("select 3425.5::numeric(10, 2), (-1.25)::numeric(10, 3),"
+            " 12.5::numeric, 'NaN'::numeric(10, 2)")
+        try:
+            pg.set_numeric_mode('float')
+            r = query(q).getresult()[0]
+            self.assertEqual(r[:3], (3425.5, -1.25, 12.5))
+            for v in r:
+                self.assertIsInstance(v, float)
+            pg.set_numeric_mode('scaled')
+            r = query(q).getresult()[0]
+            self.assertEqual(r[:3], (342550, -1250, decimal_class('12.5')))
+            self.assertIsInstance(r[0], (int, long))
+            self.assertIsInstance(r[1], (int, long))
+            self.assertIsInstance(r[2], decimal_class)
+            self.assertIsInstance(r[3], decimal_class)
+            pg.set_numeric_mode('decimal')
+            r = query(q).getresult()[0]
+            self.assertEqual(r[:3], (decimal_class('3425.50'),
+                decimal_class('-1.250'), decimal_class('12.5')))
+            for v in r:
+                self.assertIsInstance(v, decimal_class)
+        finally:
+            pg.set_numeric_mode(mode)
+        self.assertEqual(pg.get_numeric_mode(), mode)
+
     def testGetBool(self):
         use_bool = pg.get_bool()
         # error if a parameter is passed
@@ -1763,6 +2433,157 @@ class TestConfigFunctions(unittest.TestCase):
         self.assertIsInstance(r, bytes)
         self.assertEqual(r, b'data')
 
+    def testGetTypedArray(self):
+        typed_array = pg.get_typed_array()
+        # error if a parameter is passed
+        self.assertRaises(TypeError, pg.get_typed_array, typed_array)
+        self.assertIsInstance(typed_array, bool)
+        self.assertIs(typed_array, False)  # the default setting
+        pg.set_typed_array(True)
+        try:
+            r = pg.get_typed_array()
+        finally:
+            pg.set_typed_array(typed_array)
+        self.assertIsInstance(r, bool)
+        self.assertIs(r, True)
+
+    def testSetTypedArray(self):
+        typed_array = pg.get_typed_array()
+        # error if no parameter is passed
+        self.assertRaises(TypeError, pg.set_typed_array)
+        query = self.c.query
+        r = query("select '{1.5,2.5,NaN}'::float8[], '{1,-2}'::int4[],"
+            " '{1}'::int2[], '{9223372036854775807}'::int8[],"
+            " '{0.25}'::float4[], '{}'::float8[]")
+        pg.set_typed_array(True)
+        try:
+            r = r.getresult()[0]
+        finally:
+            pg.set_typed_array(typed_array)
+        for v in r:
+            self.assertIsInstance(v, array)
+        self.assertEqual([v.typecode for v in r], list('dihqfd'))
+        self.assertEqual(r[0][:2].tolist(), [1.5, 2.5])
+        self.assertTrue(isnan(r[0][2]))
+        self.assertEqual(r[1].tolist(), [1, -2])
+        self.assertEqual(r[2].tolist(), [1])
+        self.assertEqual(r[3].tolist(), [9223372036854775807])
+        self.assertEqual(r[4].tolist(), [0.25])
+        self.assertEqual(len(r[5]), 0)
+        # arrays that cannot be typed are still returned as lists
+        r = query("select '{{1,2},{3,4}}'::float8[], '{1,null}'::int4[],"
+            " '{a,b}'::text[], '{1.5}'::numeric[]")
+        pg.set_typed_array(True)
+        try:
+            r = r.getresult()[0]
+        finally:
+            pg.set_typed_array(typed_array)
+        self.assertEqual(r, ([[1.0, 2.0], [3.0, 4.0]], [1, None],
+            ['a', 'b'], [Decimal('1.5')]))
+        r = query("select '{1.5,2.5}'::float8[]")
+        pg.set_typed_array(False)
+        try:
+            r = r.getresult()[0][0]
+        finally:
+            pg.set_typed_array(typed_array)
+        self.assertIsInstance(r, list)
+        self.assertEqual(r, [1.5, 2.5])
+
+    def testTypedArrayWithBinaryCursor(self):
+        typed_array = pg.get_typed_array()
+        query = self.c.query
+        query("begin")
+        try:
+            query("declare c binary scroll cursor for"
+                " select array[1.5, 2.5, -3]::float8[],"
+                " '{{1,2},{3,4}}'::int4[], '{5,null}'::int2[]")
+            q = query("fetch all from c")
+            pg.set_typed_array(True)
+            try:
+                r = q.getresult()[0]
+            finally:
+                pg.set_typed_array(typed_array)
+            q = query("fetch absolute 1 from c")
+            s = q.getresult()[0]
+        finally:
+            query("rollback")
+        self.assertIsInstance(r[0], array)
+        self.assertEqual(r[0].typecode, 'd')
+        self.assertEqual(r[0].tolist(), [1.5, 2.5, -3.0])
+        self.assertEqual(r[1:], ([[1, 2], [3, 4]], [5, None]))
+        self.assertEqual(s, ([1.5, 2.5, -3.0], [[1, 2], [3, 4]], [5, None]))
+
+    def testGetByteaView(self):
+        bytea_view = pg.get_bytea_view()
+        # error if a parameter is passed
+        self.assertRaises(TypeError, pg.get_bytea_view, bytea_view)
+        self.assertIsInstance(bytea_view, bool)
+        self.assertIs(bytea_view, False)  # the default setting
+        pg.set_bytea_view(True)
+        try:
+            r = pg.get_bytea_view()
+        finally:
+            pg.set_bytea_view(bytea_view)
+        self.assertIsInstance(r, bool)
+        self.assertIs(r, True)
+        pg.set_bytea_view(0)
+        try:
+            r = pg.get_bytea_view()
+        finally:
+            pg.set_bytea_view(bytea_view)
+        self.assertIsInstance(r, bool)
+        self.assertIs(r, False)
+
+    def testSetByteaView(self):
+        bytea_view = pg.get_bytea_view()
+        # error if no parameter is passed
+        self.assertRaises(TypeError, pg.set_bytea_view)
+        query = self.c.query
+        r = query("select 'data'::bytea, null::bytea")
+        pg.set_bytea_view(True)
+        try:
+            r = r.getresult()[0]
+        finally:
+            pg.set_bytea_view(bytea_view)
+        self.assertIsInstance(r[0], memoryview)
+        self.assertTrue(r[0].readonly)
+        self.assertEqual(bytes(r[0]), b'data')
+        self.assertIsNone(r[1])
+        r = query("select 'data'::bytea")
+        pg.set_bytea_view(False)
+        try:
+            r = r.getresult()[0][0]
+        finally:
+            pg.set_bytea_view(bytea_view)
+        self.assertIsInstance(r, bytes)
+        self.assertEqual(r, b'data')
+
+    def testByteaViewWithBinaryCursor(self):
+        bytea_view = pg.get_bytea_view()
+        query = self.c.query
+        data = b'\x00\x01binary\xfe\xff' * 1000
+        query("begin")
+        try:
+            query("declare c binary scroll cursor for select $1::bytea",
+                (pg.escape_bytea(data),))
+            q = query("fetch all from c")
+            pg.set_bytea_view(True)
+            try:
+                r = q.getresult()[0][0]
+            finally:
+                pg.set_bytea_view(bytea_view)
+            q = query("fetch absolute 1 from c")
+            s = q.getresult()[0][0]
+        finally:
+            query("rollback")
+        # the view keeps the result alive
+        del q
+        self.assertIsInstance(r, memoryview)
+        self.assertEqual(len(r), len(data))
+        self.assertEqual(bytes(r), data)
+        self.assertIsInstance(s, bytes)
+        self.assertEqual(s, data)
+
     def testGetNamedresult(self):
         namedresult = pg.get_namedresult()
         # error if a parameter is passed
@@ -183,31 +183,35 @@ class TestDBClassBasic(unittest.TestCase):
             'begin',
             'cancel', 'clear', 'close', 'commit',
             'date_format', 'db', 'dbname', 'dbtypes',
-            'debug', 'decode_json', 'delete',
+            'debug', 'decode_json', 'delete', 'delete_many',
             'encode_json', 'end', 'endcopy', 'error',
             'escape_bytea', 'escape_identifier',
             'escape_literal', 'escape_string',
             'fileno',
             'get', 'get_as_dict', 'get_as_list',
             'get_attnames', 'get_cast_hook',
-            'get_databases', 'get_notice_receiver',
-            'get_parameter', 'get_relations', 'get_tables',
-            'getline', 'getlo', 'getnotify',
+            'get_databases', 'get_many', 'get_memory_limit',
+            'get_notice_receiver',
+            'get_parameter', 'get_relations', 'get_statement_cache',
+            'get_tables', 'get_type_casts',
+            'getline', 'getlo', 'getnotifies', 'getnotify',
             'has_table_privilege', 'host',
-            'insert', 'inserttable',
+            'insert', 'insert_many', 'inserttable',
             'locreate', 'loimport',
             'notification_handler',
             'options',
-            'parameter', 'pkey', 'port',
+            'parameter', 'pkey', 'port', 'prepare',
             'protocol_version', 'putline',
-            'query', 'query_formatted',
+            'queries', 'query', 'query_formatted', 'query_prepared',
+            'quote_list', 'quote_rows',
             'release', 'reopen', 'reset', 'rollback',
             'savepoint', 'server_version',
-            'set_cast_hook', 'set_notice_receiver',
-            'set_parameter',
+            'set_cast_hook', 'set_memory_limit', 'set_notice_receiver',
+            'set_parameter', 'set_statement_cache', 'set_type_casts',
             'source', 'start', 'status',
             'transaction', 'truncate',
-            'unescape_bytea', 'update', 'upsert',
+            'unescape_bytea', 'update', 'update_many',
+            'upsert', 'upsert_many',
             'use_regtypes', 'user',
         ]
         # __dir__ is not called in Python 2.6 for old-style classes
@@ -517,6 +521,49 @@ class TestDBClass(unittest.TestCase):
         self.assertEqual(f(r"It's fine to have a \ inside."),
                          r"It''s fine to have a \ inside.")
 
+    def testQuoteList(self):
+        f = self.db.quote_list
+        self.assertEqual(f([]), '')
+        r = f([None, True, False, 1, 1.5, Decimal('2.50'), "it's"])
+        self.assertIsInstance(r, str)
+        self.assertEqual(r, "NULL,true,false,1,1.5,2.50,'it''s'")
+        self.assertEqual(f([float('inf'), float('-inf'), float('nan')]),
+            "'Infinity','-Infinity','NaN'")
+        self.assertEqual(f([date(2016, 1, 30), [1, 2], (1, 'a')]),
+            "'2016-01-30',ARRAY[1,2],(1,'a')")
+        self.assertEqual(f([pg.Literal('current_date'), pg.Bytea(b'\x00')]),
+            "current_date,'\\x00'")
+        self.assertEqual(f(x for x in 'ab'), "'a','b'")
+        self.assertRaises(TypeError, f, 'ab')
+        self.assertRaises(TypeError, f, None)
+        r = self.db.query("select %s" % f([u"that's käse"])).getresult()
+        self.assertEqual(r, [(u"that's käse" if str is unicode
+            else u"that's käse".encode('utf-8'),)])
+
+    def testQuoteListMatchesAdaptInline(self):
+        values = [None, True, 7, 7.5, Decimal('7.25'), 'hello', "it's",
+            date(2016, 1, 30), [1, 2], ['a', 'b'], (1, 'a')]
+        adapt = self.db.adapter.adapt_inline
+        self.assertEqual(self.db.quote_list(values),
+            ','.join(str(adapt(v)) for v in values))
+
+    def testQuoteRows(self):
+        f = self.db.quote_rows
+        self.assertEqual(f([]), '')
+        self.assertEqual(f([(1, 'a'), [2, None]]), "(1,'a'),(2,NULL)")
+        self.assertEqual(f([(date(2016, 1, 30), [1])]),
+            "('2016-01-30',ARRAY[1])")
+        self.assertRaises(TypeError, f, 'ab')
+        self.assertRaises(TypeError, f, [1])
+        self.assertRaises(TypeError, f, ['ab'])
+        query = self.db.query
+        r = query("select * from (values %s) as t(i, s) order by i"
+            % f([(2, "it's"), (1, None)])).getresult()
+        self.assertEqual(r, [(1, None), (2, "it's")])
+        r = query("select i from generate_series(1, 5) as i where i in (%s)"
+            % self.db.quote_list([2, 4, 6])).getresult()
+        self.assertEqual(r, [(2,), (4,)])
+
     def testEscapeBytea(self):
         f = self.db.escape_bytea
         # note that escape_byte always returns hex output since Pg 9.0,
@@ -898,6 +945,114 @@ class TestDBClass(unittest.TestCase):
             r = tuple(r)
         self.assertEqual(r, (3, 2.5, 'hello', t))
 
+    def testStatementCache(self):
+        db = self.db
+        self.assertIsNone(db.get_statement_cache())
+        db.set_statement_cache(2, uses=2)
+        cache = db.get_statement_cache()
+        self.assertEqual((cache.size, cache.uses), (2, 2))
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (0, 0, 0))
+        q = "select $1::int + 1"
+        self.assertEqual(db.query(q, 1).getresult(), [(2,)])
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (0, 1, 0))
+        self.assertEqual(db.query(q, 2).getresult(), [(3,)])
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (0, 2, 1))
+        self.assertIn(q, cache)
+        self.assertEqual(db.query(q, [3]).getresult(), [(4,)])
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (1, 2, 1))
+        self.assertEqual(db.query_formatted(
+            "select %s::int + 1", [4]).getresult(), [(5,)])
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (2, 2, 1))
+        # queries without parameters are not cached
+        db.query("select 1")
+        db.query("select 1")
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (2, 2, 1))
+        r = db.query("select count(*) from pg_prepared_statements"
+            " where not from_sql").getresult()[0][0]
+        self.assertEqual(r, 1)
+        # the least recently used statements are deallocated
+        for q in "select $1::int + 2", "select $1::int + 3":
+            db.query(q, 1)
+            db.query(q, 1)
+        self.assertEqual(len(cache), 2)
+        self.assertNotIn("select $1::int + 1", cache)
+        r = db.query("select count(*) from pg_prepared_statements"
+            " where not from_sql").getresult()[0][0]
+        self.assertEqual(r, 2)
+        db.set_statement_cache(None)
+        self.assertIsNone(db.get_statement_cache())
+        r = db.query("select count(*) from pg_prepared_statements"
+            " where not from_sql").getresult()[0][0]
+        self.assertEqual(r, 0)
+
+    def testStatementCacheAfterReset(self):
+        db = self.db
+        db.set_statement_cache(10, uses=1)
+        cache = db.get_statement_cache()
+        q = "select $1::text || '!'"
+        self.assertEqual(db.query(q, 'a').getresult(), [('a!',)])
+        self.assertEqual(len(cache), 1)
+        db.reset()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(db.query(q, 'b').getresult(), [('b!',)])
+        self.assertEqual(len(cache), 1)
+        # statements that have been removed behind our back
+        db.db.query("deallocate all")
+        self.assertEqual(db.query(q, 'c').getresult(), [('c!',)])
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.hits, 1)
+
+    def testStatementCacheAfterAlterTable(self):
+        db = self.db
+        self.createTable('test_table', 'n int, t text', values=[(1, 'a')])
+        db.set_statement_cache(10, uses=1)
+        cache = db.get_statement_cache()
+        q = "select * from test_table where n=$1"
+        self.assertEqual(db.query(q, 1).getresult(), [(1, 'a')])
+        db.query("alter table test_table add column b bool default true")
+        self.assertEqual(db.query(q, 1).getresult(), [(1, 'a', True)])
+        self.assertEqual(len(cache), 1)
+        r = db.query("select count(*) from pg_prepared_statements"
+            " where not from_sql").getresult()[0][0]
+        self.assertEqual(r, 1)
+        # inside a transaction, the error cannot be recovered from
+        db.query("alter table test_table drop column b")
+        db.begin()
+        try:
+            self.assertRaises(pg.NotSupportedError, db.query, q, 1)
+        finally:
+            db.rollback()
+        self.assertEqual(db.query(q, 1).getresult(), [(1, 'a')])
+        r = db.query("select count(*) from pg_prepared_statements"
+            " where not from_sql").getresult()[0][0]
+        self.assertEqual(r, 1)
+
+    def testStatementCacheInAbortedTransaction(self):
+        db = self.db
+        db.set_statement_cache(10, uses=1)
+        q = "select $1::int + 1"
+        self.assertEqual(db.query(q, 1).getresult(), [(2,)])
+        db.begin()
+        try:
+            self.assertRaises(pg.DataError, db.query, "select 1/0")
+            # the statements cannot be deallocated now
+            db.set_statement_cache(None)
+        finally:
+            db.rollback()
+        # but they are deallocated with the next query
+        r = db.query("select count(*) from pg_prepared_statements"
+            " where not from_sql").getresult()[0][0]
+        self.assertEqual(r, 0)
+
+    def testStatementCacheWithBadArgs(self):
+        f = self.db.set_statement_cache
+        self.assertRaises(TypeError, f)
+        self.assertRaises(TypeError, f, 'bad')
+        self.assertRaises(TypeError, f, 1, 'bad')
+        self.assertRaises(ValueError, f, -1)
+        self.assertRaises(ValueError, f, 1, 0)
+        self.assertIsNone(self.db.get_statement_cache())
+
     def testPkey(self):
         query = self.db.query
         pkey = self.db.pkey
@@ -1419,6 +1574,82 @@ class TestDBClass(unittest.TestCase):
         self.assertEqual(r['much space'], 1001)
         self.assertEqual(r['Questions?'], 'No!')
 
+    def testGetMany(self):
+        get_many = self.db.get_many
+        table = 'get_many_test_table'
+        self.createTable(table, 'n integer primary key, t text',
+                         values=enumerate('abcde', start=1))
+        r = get_many(table, [3, 1, 3, 5])
+        self.assertIsInstance(r, list)
+        self.assertEqual([row['t'] for row in r], ['c', 'a', 'c', 'e'])
+        self.assertEqual(r[0], dict(n=3, t='c'))
+        r = get_many(table, [(2,), dict(n=4, t='x')], chunk_size=1)
+        self.assertEqual(r, [dict(n=2, t='b'), dict(n=4, t='d')])
+        r = get_many(table, ['e', 'a'], 't')
+        self.assertEqual([row['n'] for row in r], [5, 1])
+        r = get_many(table, [5, 2, 5], as_dict=True)
+        self.assertIsInstance(r, OrderedDict)
+        self.assertEqual(list(r), [5, 2])
+        self.assertEqual(r[2], dict(n=2, t='b'))
+        self.assertEqual(get_many(table, []), [])
+        self.assertEqual(get_many(table, [], as_dict=True), {})
+        self.assertRaises(pg.DatabaseError, get_many, table, [1, 6, 7])
+        try:
+            get_many(table, [1, 6, 7])
+        except pg.DatabaseError as error:
+            self.assertIn('6, 7', str(error))
+        r = get_many(table, [1, 6, 2], ignore_missing=True)
+        self.assertEqual(r, [dict(n=1, t='a'), None, dict(n=2, t='b')])
+        r = get_many(table, [1, 6, 2], as_dict=True, ignore_missing=True)
+        self.assertEqual(list(r), [1, 2])
+
+    def testGetManyWithCompositeKey(self):
+        get_many = self.db.get_many
+        table = 'get_many_test_table'
+        self.createTable(table,
+                         'n integer, m integer, t text, primary key (n, m)',
+                         values=[(n + 1, m + 1, chr(ord('a') + 2 * n + m))
+                                 for n in range(3) for m in range(2)])
+        self.assertRaises(KeyError, get_many, table, [2])
+        self.assertRaises(KeyError, get_many, table, [dict(n=2)])
+        r = get_many(table, [(2, 1), (1, 2), dict(n=3, m=2)], chunk_size=2)
+        self.assertEqual([row['t'] for row in r], ['c', 'b', 'f'])
+        r = get_many(table, [(1, 2), (1, 3)], ('m', 'n'))
+        self.assertEqual([row['t'] for row in r], ['c', 'e'])
+        r = get_many(table, [(1, 1), (3, 3), (3, 1)],
+                     as_dict=True, ignore_missing=True)
+        self.assertEqual(list(r), [(1, 1), (3, 1)])
+        self.assertEqual(r[3, 1], dict(n=3, m=1, t='e'))
+        self.assertRaises(pg.DatabaseError, get_many, table, [(3, 3)])
+
+    def testGetManyWithConvertedKeys(self):
+        get_many = self.db.get_many
+        table = 'get_many_test_table'
+        self.createTable(table, 'n integer, d date, x numeric, c char(4),'
+                         ' t text, primary key (n, d)',
+                         values=[(1, '2020-01-01', 1.5, 'ab', 'a'),
+                                 (2, '2020-01-02', 2.5, 'cd', 'b')])
+        r = get_many(table, [(1, '2020-01-01'), (2, date(2020, 1, 2))])
+        self.assertEqual([row['t'] for row in r], ['a', 'b'])
+        r = get_many(table, [(2, '2020-01-02')], as_dict=True)
+        self.assertEqual(list(r), [(2, '2020-01-02')])
+        r = get_many(table, ['1.5', Decimal('2.5')], 'x')
+        self.assertEqual([row['t'] for row in r], ['a', 'b'])
+        r = get_many(table, ['cd', 'ab  '], 'c')
+        self.assertEqual([row['t'] for row in r], ['b', 'a'])
+
+    def testGetManyWithBadArgs(self):
+        get_many = self.db.get_many
+        table = 'get_many_test_table'
+        self.createTable(table, 't text')
+        self.assertRaises(pg.ProgrammingError, get_many, table, ['a'])
+        self.assertEqual(get_many(table, ['a'], 't', ignore_missing=True),
+                         [None])
+        self.assertRaises(TypeError, get_many, table, ['a'], 't',
+                          chunk_size='1')
+        self.assertRaises(ValueError, get_many, table, ['a'], 't',
+                          chunk_size=0)
+
     def testGetFromView(self):
         self.db.query('delete from test where i4=14')
         self.db.query('insert into test (i4, v4) values('
@@ -1678,6 +1909,71 @@ class TestDBClass(unittest.TestCase):
         r = query(q).getresult()
         self.assertEqual(r, [(1234, 'abcd'), (5678, 'efgh')])
 
+    def testInsertMany(self):
+        insert_many = self.db.insert_many
+        query = self.db.query
+        table = 'insert_many_test_table'
+        self.createTable(table, 'n serial primary key,'
+            ' t text, b boolean default true', oids=True)
+        oid_table = 'oid(%s)' % table
+        rows = [dict(t='row %d' % i) for i in range(10)]
+        rows[4]['b'] = False
+        rows[5]['b'] = None
+        r = insert_many(table, rows, chunk_size=3)
+        self.assertIs(r, rows)
+        self.assertEqual([row['n'] for row in rows], list(range(1, 11)))
+        self.assertEqual([row['t'] for row in rows],
+            ['row %d' % i for i in range(10)])
+        b = [row['b'] for row in rows]
+        if pg.get_bool():
+            self.assertEqual(b, [True] * 4 + [False, None] + [True] * 4)
+        else:
+            self.assertEqual(b, ['t'] * 4 + ['f', None] + ['t'] * 4)
+        self.assertEqual(len(set(row[oid_table] for row in rows)), 10)
+        r = query('select n, t from "%s" order by n' % table).getresult()
+        self.assertEqual(r, [(i, 'row %d' % (i - 1)) for i in range(1, 11)])
+        r = insert_many(table, iter([dict(t='a'), dict(t='b')]))
+        self.assertEqual([row['n'] for row in r], [11, 12])
+        self.assertEqual(insert_many(table, []), [])
+
+    def testInsertManyWithoutReturning(self):
+        insert_many = self.db.insert_many
+        query = self.db.query
+        table = 'insert_many_test_table'
+        self.createTable(table, 'n integer primary key,'
+            ' t text, a integer[], d date')
+        rows = [dict(n=i, t='row\t%d\n' % i, a=[i, i + 1])
+            for i in range(5)]
+        rows.append(dict(n=5, d=pg.Literal('current_date')))
+        rows.append(dict(n=6, t=None, a=None))
+        r = insert_many(table, rows, returning=False, chunk_size=2)
+        self.assertIs(r, rows)
+        self.assertEqual(rows[0], dict(n=0, t='row\t0\n', a=[0, 1]))
+        r = query('select n, t, a from "%s" where n < 5 order by n' % table)
+        if pg.get_array():
+            a = [[i, i + 1] for i in range(5)]
+        else:
+            a = ['{%d,%d}' % (i, i + 1) for i in range(5)]
+        self.assertEqual(r.getresult(), [(i, 'row\t%d\n' % i, a[i])
+            for i in range(5)])
+        r = query('select d = current_date from "%s" where n = 5' % table)
+        self.assertTrue(r.getresult()[0][0] in (True, 't'))
+        r = query('select t, a from "%s" where n = 6' % table).getresult()
+        self.assertEqual(r, [(None, None)])
+
+    def testInsertManyWithBadArgs(self):
+        insert_many = self.db.insert_many
+        table = 'insert_many_test_table'
+        self.createTable(table, 'n integer primary key, t text')
+        rows = [dict(n=1, t='a')]
+        self.assertRaises(TypeError, insert_many, table, rows, chunk_size='1')
+        self.assertRaises(ValueError, insert_many, table, rows, chunk_size=0)
+        self.assertRaises(TypeError, insert_many, table, [(1, 'a')])
+        self.assertRaises(pg.ProgrammingError, insert_many, table, [{}])
+        self.assertRaises(pg.IntegrityError, insert_many, table, rows * 2)
+        self.assertRaises(pg.IntegrityError, insert_many, table, rows * 2,
+            returning=False)
+
     def testUpdate(self):
         update = self.db.update
         query = self.db.query
@@ -1840,6 +2136,82 @@ class TestDBClass(unittest.TestCase):
         self.assertEqual(r['much space'], 7007)
         self.assertEqual(r['Questions?'], 'When?')
 
+    def testUpdateMany(self):
+        update_many = self.db.update_many
+        query = self.db.query
+        table = 'update_many_test_table'
+        self.createTable(table, 'n integer primary key, t text,'
+                         ' c char(4), u integer default 0', oids=True,
+                         values=[(i, 'x%d' % i, 'c%d' % i, 0)
+                                 for i in range(1, 6)])
+        oid_table = 'oid(%s)' % table
+        rows = [dict(n=i, t='y%d' % i) for i in (4, 2, 6)]
+        rows.append(dict(n=5, c='d5', u=pg.Literal('u + 5')))
+        rows.append(dict(n=1, c='d1'))
+        r = update_many(table, rows, chunk_size=2)
+        self.assertIs(r, rows)
+        self.assertEqual(rows[0], {'n': 4, 't': 'y4', 'c': 'c4  ', 'u': 0,
+                                   oid_table: rows[0][oid_table]})
+        self.assertEqual(rows[1]['t'], 'y2')
+        self.assertEqual(rows[2], dict(n=6, t='y6'))
+        self.assertEqual(rows[3]['u'], 5)
+        self.assertEqual(rows[3]['t'], 'x5')
+        self.assertEqual(rows[4]['c'], 'd1  ')
+        q = 'select n, t, c, u from "%s" order by n' % table
+        r = query(q).getresult()
+        self.assertEqual(r, [(1, 'x1', 'd1  ', 0), (2, 'y2', 'c2  ', 0),
+            (3, 'x3', 'c3  ', 0), (4, 'y4', 'c4  ', 0), (5, 'x5', 'd5  ', 5)])
+        rows = [dict(n=i, t='z%d' % i) for i in range(1, 4)]
+        r = update_many(table, rows, returning=False)
+        self.assertEqual(rows[0], dict(n=1, t='z1'))
+        r = query(q).getresult()
+        self.assertEqual([row[1] for row in r], ['z1', 'z2', 'z3', 'y4', 'x5'])
+
+    def testUpdateManyWithCompositeKey(self):
+        update_many = self.db.update_many
+        query = self.db.query
+        table = 'update_many_test_table'
+        self.createTable(table,
+                         'n integer, m integer, t text, primary key (n, m)',
+                         values=[(n + 1, m + 1, chr(ord('a') + 2 * n + m))
+                                 for n in range(3) for m in range(2)])
+        self.assertRaises(KeyError, update_many, table, [dict(n=2, t='x')])
+        rows = [dict(n=2, m=1, t='x'), dict(n=3, m=2, t='y')]
+        r = update_many(table, rows)
+        self.assertIs(r, rows)
+        q = 'select t from "%s" order by n, m' % table
+        r = query(q).getresult()
+        self.assertEqual([row[0] for row in r], list('abxdey'))
+
+    def testUpdateManyWithConvertedKeys(self):
+        update_many = self.db.update_many
+        table = 'update_many_test_table'
+        self.createTable(table, 'n integer, d date, t text,'
+                         ' primary key (n, d)',
+                         values=[(1, '2020-01-01', 'a'),
+                                 (2, '2020-01-02', 'b')])
+        rows = [dict(n='1', d='2020-01-01', t='x'),
+                dict(n=2, d=date(2020, 1, 2), t='y')]
+        r = update_many(table, rows)
+        self.assertIs(r, rows)
+        self.assertEqual(rows[0], dict(n=1, d=date(2020, 1, 1), t='x'))
+        self.assertEqual(rows[1], dict(n=2, d=date(2020, 1, 2), t='y'))
+
+    def testUpdateManyWithBadArgs(self):
+        update_many = self.db.update_many
+        table = 'update_many_test_table'
+        self.createTable(table, 'n integer, t text')
+        self.assertRaises(pg.ProgrammingError, update_many,
+                          table, [dict(n=1, t='a')])
+        table = 'update_many_test_table_2'
+        self.createTable(table, 'n integer primary key, t text')
+        rows = [dict(n=1, t='a')]
+        self.assertRaises(TypeError, update_many, table, rows,
+                          chunk_size='1')
+        self.assertRaises(ValueError, update_many, table, rows,
+                          chunk_size=0)
+        self.assertRaises(TypeError, update_many, table, [(1, 'a')])
+
     def testUpsert(self):
         upsert = self.db.upsert
         query = self.db.query
@@ -2092,6 +2464,98 @@ class TestDBClass(unittest.TestCase):
         r = query(q).getresult()
         self.assertEqual(r, [(31, 9009, 'No.')])
 
+    def testUpsertMany(self):
+        upsert_many = self.db.upsert_many
+        query = self.db.query
+        table = 'upsert_many_test_table'
+        self.createTable(table, 'n integer primary key,'
+            ' t text, c integer default 0', oids=True)
+        oid_table = 'oid(%s)' % table
+        rows = [dict(n=i, t='x%d' % i) for i in range(5)]
+        try:
+            r = upsert_many(table, rows, chunk_size=2)
+        except pg.ProgrammingError as error:
+            if self.db.server_version < 90500:
+                self.skipTest('database does not support upsert')
+            self.fail(str(error))
+        self.assertIs(r, rows)
+        self.assertEqual(rows[3], {'n': 3, 't': 'x3', 'c': 0,
+            oid_table: rows[3][oid_table]})
+        rows = [dict(n=i, t='y%d' % i) for i in range(3, 8)]
+        r = upsert_many(table, rows, c='included.c + 1')
+        self.assertIs(r, rows)
+        self.assertEqual([(row['n'], row['t'], row['c']) for row in rows],
+            [(3, 'y3', 1), (4, 'y4', 1), (5, 'y5', 0),
+             (6, 'y6', 0), (7, 'y7', 0)])
+        q = 'select n, t, c from "%s" order by n' % table
+        r = query(q).getresult()
+        self.assertEqual(r, [(0, 'x0', 0), (1, 'x1', 0), (2, 'x2', 0),
+            (3, 'y3', 1), (4, 'y4', 1), (5, 'y5', 0),
+            (6, 'y6', 0), (7, 'y7', 0)])
+        rows = [dict(n=i, t='z%d' % i) for i in range(6, 10)]
+        r = upsert_many(table, rows, chunk_size=3, t=False)
+        self.assertEqual([(row['n'], row['t']) for row in rows],
+            [(6, 'y6'), (7, 'y7'), (8, 'z8'), (9, 'z9')])
+        r = query(q).getresult()
+        self.assertEqual(len(r), 10)
+        self.assertEqual(r[6:], [(6, 'y6', 0), (7, 'y7', 0),
+            (8, 'z8', 0), (9, 'z9', 0)])
+
+    def testUpsertManyWithoutReturning(self):
+        upsert_many = self.db.upsert_many
+        query = self.db.query
+        table = 'upsert_many_test_table'
+        self.createTable(table, 'n integer primary key,'
+            ' t text, d date')
+        rows = [dict(n=i, t='x%d' % i) for i in range(5)]
+        try:
+            r = upsert_many(table, rows, returning=False)
+        except pg.ProgrammingError as error:
+            if self.db.server_version < 90500:
+                self.skipTest('database does not support upsert')
+            self.fail(str(error))
+        self.assertIs(r, rows)
+        self.assertEqual(rows[0], dict(n=0, t='x0'))
+        rows = [dict(n=i, t='y%d' % i) for i in range(3, 7)]
+        rows.append(dict(n=7, d=pg.Literal('current_date')))
+        rows.append(dict(n=2, t='y2', d=None))
+        upsert_many(table, rows, returning=False, chunk_size=2)
+        q = 'select n, t from "%s" order by n' % table
+        r = query(q).getresult()
+        self.assertEqual(r, [(0, 'x0'), (1, 'x1'), (2, 'y2'), (3, 'y3'),
+            (4, 'y4'), (5, 'y5'), (6, 'y6'), (7, None)])
+        r = query('select count(*) from "%s" where d = current_date' % table)
+        self.assertEqual(r.getresult()[0][0], 1)
+        r = query("select count(*) from pg_class"
+            " where relname = '_pg_upsert_many'").getresult()
+        self.assertEqual(r[0][0], 0)
+        # the same key may appear in different chunks
+        rows = [dict(n=1, t='z1'), dict(n=1, t='z2'), dict(n=1, t='z3')]
+        upsert_many(table, rows, returning=False, chunk_size=1)
+        r = query('select t from "%s" where n = 1' % table).getresult()
+        self.assertEqual(r, [('z3',)])
+
+    def testUpsertManyWithBadArgs(self):
+        upsert_many = self.db.upsert_many
+        self.assertRaises(pg.ProgrammingError, upsert_many,
+                          'test', [dict(i2=2, i4=4, i8=8)])
+        table = 'upsert_many_test_table'
+        self.createTable(table, 'n integer primary key, t text')
+        rows = [dict(n=1, t='a')]
+        self.assertRaises(TypeError, upsert_many, table, rows,
+                          chunk_size='1')
+        self.assertRaises(ValueError, upsert_many, table, rows,
+                          chunk_size=0)
+        self.assertRaises(TypeError, upsert_many, table, [(1, 'a')])
+        if self.db.server_version < 90500:
+            self.skipTest('database does not support upsert')
+        for returning in (True, False):
+            self.assertRaises(pg.ProgrammingError, upsert_many, table,
+                              rows * 2, returning=returning)
+            r = self.db.query("select count(*) from pg_class"
+                " where relname = '_pg_upsert_many'").getresult()
+            self.assertEqual(r[0][0], 0)
+
     def testClear(self):
         clear = self.db.clear
         f = False if pg.get_bool() else 'f'
@@ -2332,6 +2796,73 @@ class TestDBClass(unittest.TestCase):
         q = "select n from test_parent natural join test_child limit 2"
         self.assertEqual(query(q).getresult(), [(1,)])
 
+    def testDeleteMany(self):
+        delete_many = self.db.delete_many
+        query = self.db.query
+        table = 'delete_many_test_table'
+        self.createTable(table, 'n integer primary key, t text', oids=True,
+                         values=enumerate('abcdefgh', start=1))
+        oid_table = 'oid(%s)' % table
+        q = 'select n from "%s" order by n' % table
+        r = delete_many(table, [2, 4, 4, 9])
+        self.assertEqual(r, 2)
+        r = query(q).getresult()
+        self.assertEqual([row[0] for row in r], [1, 3, 5, 6, 7, 8])
+        r = delete_many(table, [(1,), dict(n=3)], chunk_size=1)
+        self.assertEqual(r, 2)
+        self.assertEqual(delete_many(table, []), 0)
+        s = dict(n=7, t='x')
+        r = delete_many(table, [6, 9, s], returning=True)
+        self.assertIsInstance(r, list)
+        self.assertEqual(len(r), 3)
+        self.assertEqual(r[0], {'n': 6, 't': 'f', oid_table: r[0][oid_table]})
+        self.assertIsNone(r[1])
+        self.assertIs(r[2], s)
+        self.assertEqual(s['t'], 'g')
+        r = query(q).getresult()
+        self.assertEqual([row[0] for row in r], [5, 8])
+
+    def testDeleteManyWithCompositeKey(self):
+        delete_many = self.db.delete_many
+        query = self.db.query
+        table = 'delete_many_test_table'
+        self.createTable(table,
+                         'n integer, m integer, t text, primary key (n, m)',
+                         values=[(n + 1, m + 1, chr(ord('a') + 2 * n + m))
+                                 for n in range(3) for m in range(2)])
+        self.assertRaises(KeyError, delete_many, table, [2])
+        self.assertRaises(KeyError, delete_many, table, [dict(n=2)])
+        r = delete_many(table, [(2, 1), (1, 2), (4, 4)])
+        self.assertEqual(r, 2)
+        r = delete_many(table, [dict(n=3, m=2)], returning=True)
+        self.assertEqual(r, [dict(n=3, m=2, t='f')])
+        q = 'select t from "%s" order by n, m' % table
+        r = query(q).getresult()
+        self.assertEqual([row[0] for row in r], list('ade'))
+
+    def testDeleteManyWithConvertedKeys(self):
+        delete_many = self.db.delete_many
+        table = 'delete_many_test_table'
+        self.createTable(table, 'n integer, d date, t text,'
+                         ' primary key (n, d)',
+                         values=[(1, '2020-01-01', 'a'),
+                                 (2, '2020-01-02', 'b')])
+        r = delete_many(table, [(2, '2020-01-02'), ('1', '2020-01-03')],
+                        returning=True)
+        self.assertEqual(r, [dict(n=2, d=date(2020, 1, 2), t='b'), None])
+        r = delete_many(table, [('1', '2020-01-01')])
+        self.assertEqual(r, 1)
+
+    def testDeleteManyWithBadArgs(self):
+        delete_many = self.db.delete_many
+        table = 'delete_many_test_table'
+        self.createTable(table, 'n integer, t text')
+        self.assertRaises(pg.ProgrammingError, delete_many, table, [1])
+        table = 'delete_many_test_table_2'
+        self.createTable(table, 'n integer primary key, t text')
+        self.assertRaises(TypeError, delete_many, table, [1], chunk_size='1')
+        self.assertRaises(ValueError, delete_many, table, [1], chunk_size=0)
+
     def testTempCrud(self):
         table = 'test_temp_table'
         self.createTable(table, "n int primary key, t varchar", temporary=True)
@@ -3825,6 +4356,37 @@ class TestDBClass(unittest.TestCase):
         dbtypes.reset_typecast('circle')
         self.assertIsNone(dbtypes.get_typecast('circle'))
 
+    def testDbTypesTypecastRegistry(self):
+        dbtypes = self.db.dbtypes
+        casts = self.db.get_type_casts()
+        self.assertEqual(casts, {})
+        squared_circle = lambda v: 'Squared Circle: %s' % v
+        dbtypes.set_typecast('circle', squared_circle)
+        r = self.db.query("select '0,0,1'::circle, '1.2.3.4'::inet"
+            " from generate_series(1, 3)").getresult()
+        self.assertEqual(r, [('Squared Circle: <(0,0),1>', '1.2.3.4')] * 3)
+        circle = dbtypes['circle'].oid
+        inet = dbtypes['inet'].oid
+        self.assertEqual(casts, {circle: squared_circle, inet: None})
+        dbtypes.reset_typecast('circle')
+        self.assertEqual(casts, {})
+        r = self.db.query("select '0,0,1'::circle").getresult()
+        self.assertEqual(r, [('<(0,0),1>',)])
+        self.assertEqual(casts, {circle: None})
+
+    def testDbTypesTypecastRegistryWithGlobalTypecast(self):
+        casts = self.db.get_type_casts()
+        r = self.db.query("select '1.2.3.4'::inet").getresult()
+        self.assertEqual(r, [('1.2.3.4',)])
+        inet = self.db.dbtypes['inet'].oid
+        self.assertEqual(casts, {inet: None})
+        cast_inet = pg.get_typecast('inet')
+        self.addCleanup(pg.set_typecast, 'inet', cast_inet)
+        pg.set_typecast('inet', lambda v: 'CAST:%s' % v)
+        self.assertEqual(casts, {})
+        r = self.db.query("select '1.2.3.4'::inet").getresult()
+        self.assertEqual(r, [('CAST:1.2.3.4',)])
+
     def testGetSetTypeCast(self):
         get_typecast = pg.get_typecast
         set_typecast = pg.set_typecast
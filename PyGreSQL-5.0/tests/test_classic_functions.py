@@ -20,7 +20,8 @@ import re
 
 import pg  # the module under test
 
-from datetime import timedelta
+from collections import namedtuple
+from datetime import date, time, datetime, timedelta
 
 try:
     long
@@ -78,6 +79,27 @@ class TestHasConnect(unittest.TestCase):
     def testhasUnescapeBytea(self):
         self.assertTrue(callable(pg.unescape_bytea))
 
+    def testHasConnectMany(self):
+        f = pg.connect_many
+        self.assertTrue(callable(f))
+        self.assertRaises(TypeError, f)
+        self.assertRaises(TypeError, f, None)
+        self.assertRaises(TypeError, f, 'dbname=test')
+        self.assertRaises(TypeError, f, [None])
+        self.assertRaises(TypeError, f, [{1: 'test'}])
+        self.assertRaises(ValueError, f, [], -1)
+        self.assertEqual(f([]), [])
+
+    def testhasDispatchNotifies(self):
+        f = pg.dispatch_notifies
+        self.assertTrue(callable(f))
+        self.assertRaises(TypeError, f)
+        self.assertRaises(TypeError, f, None)
+        self.assertRaises(TypeError, f, {'db': len})
+        self.assertRaises(ValueError, f, {}, -1)
+        self.assertRaises(ValueError, f, {}, 0, 0)
+        self.assertEqual(f({}), 0)
+
     def testDefHost(self):
         d0 = pg.get_defhost()
         d1 = 'pgtesthost'
@@ -666,6 +688,120 @@ class TestParseHStore(unittest.TestCase):
                 self.assertEqual(f(string), expected)
 
 
+class TestCastDateTime(unittest.TestCase):
+    """Test the date and time typecast functions."""
+
+    datestyles = {
+        '%Y-%m-%d': ('2016-03-14', '2016-03-14 15:09:26.535897'),
+        '%m-%d-%Y': ('03-14-2016', 'Mon Mar 14 15:09:26.535897 2016'),
+        '%d-%m-%Y': ('14-03-2016', 'Mon 14 Mar 15:09:26.535897 2016'),
+        '%m/%d/%Y': ('03/14/2016', '03/14/2016 15:09:26.535897'),
+        '%d/%m/%Y': ('14/03/2016', '14/03/2016 15:09:26.535897'),
+        '%d.%m.%Y': ('14.03.2016', '14.03.2016 15:09:26.535897')}
+
+    def testCastDate(self):
+        f = pg.cast_date
+        self.assertRaises(TypeError, f)
+        self.assertRaises(TypeError, f, None)
+        self.assertRaises(AttributeError, f, '2016-03-14', 42)
+        d = date(2016, 3, 14)
+        for fmt, (value, _value) in self.datestyles.items():
+            self.assertEqual(f(value, fmt), d)
+            self.assertEqual(f(value, connection=fmt), d)
+            self.assertEqual(f(value.encode('ascii'), fmt), d)
+        self.assertEqual(f('2016-03-14'), d)
+        self.assertEqual(f('03/14/2016'), d)
+        self.assertEqual(f('14.03.2016'), d)
+        self.assertEqual(f('infinity'), date.max)
+        self.assertEqual(f('-infinity'), date.min)
+        self.assertEqual(f('10000-08-01'), date.max)
+        self.assertEqual(f('0099-01-08 BC'), date.min)
+        self.assertRaises(ValueError, f, '')
+        self.assertRaises(ValueError, f, 'today')
+        self.assertRaises(ValueError, f, '2016-03')
+        self.assertRaises(ValueError, f, '2016-03-14x')
+        self.assertRaises(ValueError, f, '2016-13-14')
+
+    def testCastDateWithConnection(self):
+        f = pg.cast_date
+
+        class Connection:
+            def date_format(self):
+                return '%d/%m/%Y'
+
+        self.assertEqual(f('01/02/2016', Connection()), date(2016, 2, 1))
+        self.assertEqual(f('01/02/2016', None), date(2016, 1, 2))
+
+    def testCastTime(self):
+        f = pg.cast_time
+        self.assertRaises(TypeError, f)
+        self.assertRaises(TypeError, f, None)
+        self.assertEqual(f('15:09:26'), time(15, 9, 26))
+        self.assertEqual(f('15:09:26.5'), time(15, 9, 26, 500000))
+        self.assertEqual(f('15:09:26.535897'), time(15, 9, 26, 535897))
+        self.assertEqual(f('00:00:00'), time(0))
+        self.assertRaises(ValueError, f, '')
+        self.assertRaises(ValueError, f, '15:09')
+        self.assertRaises(ValueError, f, '15:09:26+01')
+        self.assertRaises(ValueError, f, '25:00:00')
+
+    def testCastTimestamp(self):
+        f = pg.cast_timestamp
+        self.assertRaises(TypeError, f)
+        self.assertRaises(TypeError, f, None)
+        d = datetime(2016, 3, 14, 15, 9, 26, 535897)
+        for fmt, (_value, value) in self.datestyles.items():
+            self.assertEqual(f(value, fmt), d)
+        self.assertEqual(f('2016-03-14 15:09:26'), d.replace(microsecond=0))
+        self.assertEqual(f('infinity'), datetime.max)
+        self.assertEqual(f('-infinity'), datetime.min)
+        self.assertEqual(f('10000-08-01 00:00:00'), datetime.max)
+        self.assertEqual(f('Tue Aug 01 00:00:00 10000'), datetime.max)
+        self.assertEqual(f('0099-01-08 00:00:00 BC'), datetime.min)
+        self.assertRaises(ValueError, f, '')
+        self.assertRaises(ValueError, f, '2016-03-14 15:09')
+        self.assertRaises(ValueError, f, 'Mon Foo 14 15:09:26 2016')
+
+    if hasattr(pg, '_has_timezone') and pg._has_timezone:
+
+        def testCastTimetz(self):
+            f = pg.cast_timetz
+            self.assertRaises(TypeError, f)
+            self.assertRaises(TypeError, f, None)
+            for value, hours, minutes in (
+                    ('15:09:26', 0, 0), ('15:09:26+01', 1, 0),
+                    ('15:09:26-05', -5, 0), ('15:09:26+05:30', 5, 30),
+                    ('15:09:26+0530', 5, 30)):
+                r = f(value)
+                self.assertIsInstance(r, time)
+                self.assertEqual(r.utcoffset(),
+                    timedelta(hours=hours, minutes=minutes))
+                self.assertEqual(r.replace(tzinfo=None), time(15, 9, 26))
+            self.assertRaises(ValueError, f, '15:09:26 foo')
+
+        def testCastTimestamptz(self):
+            f = pg.cast_timestamptz
+            d = datetime(2016, 3, 14, 15, 9, 26, 535897)
+            for fmt, (_value, value) in self.datestyles.items():
+                for tz, hours in (('CET', 1), ('EST', -5), ('UTC', 0)):
+                    if fmt.startswith('%Y'):
+                        v = '%s%+03d' % (value, hours)
+                    else:
+                        v = '%s %s' % (value, tz)
+                    r = f(v, fmt)
+                    self.assertIsInstance(r, datetime)
+                    self.assertEqual(r.utcoffset(), timedelta(hours=hours))
+                    self.assertEqual(r.replace(tzinfo=None), d)
+            r = f('2016-03-14 15:09:26.535897')
+            self.assertEqual(r.utcoffset(), timedelta(0))
+            r = f('14.03.2016 15:09:26 XYZ', '%d.%m.%Y')
+            self.assertEqual(r.utcoffset(), timedelta(0))
+            self.assertEqual(f('infinity'), datetime.max)
+            self.assertEqual(f('-infinity'), datetime.min)
+            self.assertEqual(f('10000-08-01 00:00:00+00'), datetime.max)
+            self.assertEqual(f('0099-01-08 00:00:00+00 BC'), datetime.min)
+
+
 class TestCastInterval(unittest.TestCase):
     """Test the interval typecast function."""
 
@@ -838,6 +974,17 @@ class TestCastInterval(unittest.TestCase):
             for value in values:
                 self.assertEqual(f(value), interval)
 
+    def testCastIntervalErrors(self):
+        f = pg.cast_interval
+        self.assertRaises(TypeError, f)
+        self.assertRaises(TypeError, f, None)
+        self.assertRaises(ValueError, f, '')
+        self.assertRaises(ValueError, f, 'foo')
+        self.assertRaises(ValueError, f, '1 foo')
+        self.assertRaises(ValueError, f, '1 day ago 2 hours')
+        self.assertRaises(ValueError, f, 'P1X')
+        self.assertRaises(OverflowError, f, '99999999999 years')
+
 
 class TestEscapeFunctions(unittest.TestCase):
     """Test pg escape and unescape functions.
@@ -957,6 +1104,71 @@ class TestConfigFunctions(unittest.TestCase):
         r = pg.get_decimal()
         self.assertIs(r, decimal_class)
 
+    def testGetNumericMode(self):
+        r = pg.get_numeric_mode()
+        self.assertIsInstance(r, str)
+        self.assertEqual(r, 'decimal')
+
+    def testSetNumericMode(self):
+        mode = pg.get_numeric_mode()
+        try:
+            for m in ('float', 'scaled', 'decimal'):
+                pg.set_numeric_mode(m)
+                r = pg.get_numeric_mode()
+                self.assertIsInstance(r, str)
+                self.assertEqual(r, m)
+            self.assertRaises(TypeError, pg.set_numeric_mode, None)
+            self.assertRaises(ValueError, pg.set_numeric_mode, 'int')
+        finally:
+            pg.set_numeric_mode(mode)
+        self.assertEqual(pg.get_numeric_mode(), mode)
+
+    def testCastNum(self):
+        f = pg.cast_num
+        self.assertRaises(TypeError, f)
+        self.assertRaises(TypeError, f, None)
+        r = f('3425.50')
+        self.assertIsInstance(r, pg.Decimal)
+        self.assertEqual(r, pg.Decimal('3425.50'))
+        self.assertEqual(f(b'-1.5'), pg.Decimal('-1.5'))
+        mode = pg.get_numeric_mode()
+        try:
+            pg.set_numeric_mode('float')
+            r = f('3425.50')
+            self.assertIsInstance(r, float)
+            self.assertEqual(r, 3425.5)
+        finally:
+            pg.set_numeric_mode(mode)
+
+    def testCastMoney(self):
+        f = pg.cast_money
+        self.assertRaises(TypeError, f)
+        self.assertRaises(TypeError, f, None)
+        r = f('$1,234.50')
+        self.assertIsInstance(r, pg.Decimal)
+        self.assertEqual(r, pg.Decimal('1234.50'))
+        self.assertEqual(f('($3.00)'), pg.Decimal('-3.00'))
+        self.assertEqual(f('-$3.00'), pg.Decimal('-3.00'))
+        mode = pg.get_numeric_mode()
+        point = pg.get_decimal_point()
+        try:
+            pg.set_numeric_mode('scaled')
+            r = f('$1,234.50')
+            self.assertIsInstance(r, (int, long))
+            self.assertEqual(r, 123450)
+            self.assertEqual(f('($3.00)'), -300)
+            pg.set_decimal_point(',')
+            self.assertEqual(f('1.234,50 EUR'), 123450)
+            pg.set_numeric_mode('float')
+            r = f('1.234,50 EUR')
+            self.assertIsInstance(r, float)
+            self.assertEqual(r, 1234.5)
+            pg.set_decimal_point(None)
+            self.assertEqual(f('1.234,50 EUR'), '1.234,50 EUR')
+        finally:
+            pg.set_numeric_mode(mode)
+            pg.set_decimal_point(point)
+
     def testGetBool(self):
         r = pg.get_bool()
         self.assertIsInstance(r, bool)
@@ -1003,6 +1215,52 @@ class TestConfigFunctions(unittest.TestCase):
         self.assertIsInstance(r, bool)
         self.assertIs(r, bytea_escaped)
 
+    def testGetTypedArray(self):
+        r = pg.get_typed_array()
+        self.assertIsInstance(r, bool)
+        self.assertIs(r, False)
+
+    def testSetTypedArray(self):
+        typed_array = pg.get_typed_array()
+        try:
+            pg.set_typed_array(True)
+            r = pg.get_typed_array()
+            pg.set_typed_array(typed_array)
+            self.assertIsInstance(r, bool)
+            self.assertIs(r, True)
+            pg.set_typed_array(False)
+            r = pg.get_typed_array()
+            self.assertIsInstance(r, bool)
+            self.assertIs(r, False)
+        finally:
+            pg.set_typed_array(typed_array)
+        r = pg.get_typed_array()
+        self.assertIsInstance(r, bool)
+        self.assertIs(r, typed_array)
+
+    def testGetByteaView(self):
+        r = pg.get_bytea_view()
+        self.assertIsInstance(r, bool)
+        self.assertIs(r, False)
+
+    def testSetByteaView(self):
+        bytea_view = pg.get_bytea_view()
+        try:
+            pg.set_bytea_view(True)
+            r = pg.get_bytea_view()
+            pg.set_bytea_view(bytea_view)
+            self.assertIsInstance(r, bool)
+            self.assertIs(r, True)
+            pg.set_bytea_view(False)
+            r = pg.get_bytea_view()
+            self.assertIsInstance(r, bool)
+            self.assertIs(r, False)
+        finally:
+            pg.set_bytea_view(bytea_view)
+        r = pg.get_bytea_view()
+        self.assertIsInstance(r, bool)
+        self.assertIs(r, bytea_view)
+
     def testGetNamedresult(self):
         r = pg.get_namedresult()
         self.assertTrue(callable(r))
@@ -1024,6 +1282,58 @@ class TestConfigFunctions(unittest.TestCase):
         r = pg.get_namedresult()
         self.assertIs(r, namedresult)
 
+    def testGetRowType(self):
+        get_row_type = pg.get_row_type
+        row = get_row_type(('a', 'b'))
+        self.assertTrue(issubclass(row, pg.Row))
+        self.assertTrue(issubclass(row, tuple))
+        self.assertEqual(row.__name__, 'Row')
+        self.assertEqual(row._fields, ('a', 'b'))
+        self.assertIs(get_row_type(['a', 'b']), row)
+        self.assertIsNot(get_row_type(('b', 'a')), row)
+        r = row((1, 2))
+        self.assertEqual(r, (1, 2))
+        self.assertEqual(r.a, 1)
+        self.assertEqual(r['b'], 2)
+        self.assertEqual(r._asdict(), {'a': 1, 'b': 2})
+        self.assertFalse(hasattr(r, '__dict__'))
+        self.assertRaises(TypeError, get_row_type, 'ab')
+        self.assertRaises(TypeError, get_row_type, 1)
+        self.assertRaises(TypeError, get_row_type, (1, 2))
+
+    def testRowLikeNamedTuple(self):
+        row = pg.get_row_type(('a', 'b'))
+        r = row((1, 'x'))
+        self.assertEqual(repr(r), "Row(a=1, b='x')")
+        self.assertEqual(str(r), "Row(a=1, b='x')")
+        s = r._replace(b='y')
+        self.assertIs(type(s), row)
+        self.assertEqual(s, (1, 'y'))
+        self.assertEqual(r, (1, 'x'))
+        self.assertRaises(ValueError, r._replace, c=3)
+        self.assertRaises(TypeError, r._replace, 3)
+        s = row._make(iter([2, 'z']))
+        self.assertIs(type(s), row)
+        self.assertEqual(s, (2, 'z'))
+        self.assertRaises(TypeError, row._make, [1])
+        self.assertEqual(r, namedtuple('Row', 'a b')(1, 'x'))
+
+    def testRowTypeCacheIsBounded(self):
+        get_row_type = pg.get_row_type
+        row = get_row_type(('a', 'b'))
+        for i in range(2000):
+            get_row_type(('f%d' % i,))
+        self.assertIs(get_row_type(('f1999',)), get_row_type(('f1999',)))
+        r = row((1, 2))
+        self.assertEqual(r.b, 2)
+
+    def testNamedresultInMemory(self):
+        q = pg._MemoryQuery([(1, 2), (3, 4)], ('a', 'b'))
+        r = pg._namedresult(q)
+        self.assertEqual(r, [(1, 2), (3, 4)])
+        self.assertIs(type(r[1]), pg.get_row_type(('a', 'b')))
+        self.assertEqual(r[1].b, 4)
+
     def testGetJsondecode(self):
         r = pg.get_jsondecode()
         self.assertTrue(callable(r))
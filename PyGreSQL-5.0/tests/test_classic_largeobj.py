@@ -14,7 +14,9 @@ try:
     import unittest2 as unittest  # for Python < 2.7
 except ImportError:
     import unittest
+import io
 import tempfile
+import threading
 import os
 
 import pg  # the module under test
@@ -253,6 +255,44 @@ class TestLargeObjects(unittest.TestCase):
         self.assertEqual(r, data[:8])
         self.obj.close()
 
+    def testReadinto(self):
+        readinto = self.obj.readinto
+        # testing with invalid parameters
+        self.assertRaises(TypeError, readinto)
+        self.assertRaises(TypeError, readinto, 80)
+        self.assertRaises(TypeError, readinto, b'read-only')
+        buffer = bytearray(80)
+        # reading when object is not yet open
+        self.assertRaises(IOError, readinto, buffer)
+        data = b'some data to be read'
+        self.obj.open(pg.INV_WRITE)
+        self.obj.write(data)
+        self.obj.close()
+        self.obj.open(pg.INV_READ)
+        r = readinto(buffer)
+        self.assertEqual(r, len(data))
+        self.assertEqual(buffer[:r], data)
+        self.assertEqual(readinto(buffer), 0)
+        self.obj.seek(0, pg.SEEK_SET)
+        view = memoryview(buffer)[:8]
+        r = readinto(view)
+        self.assertEqual(r, 8)
+        self.assertEqual(buffer[:8], data[:8])
+        self.assertEqual(readinto(bytearray()), 0)
+        self.assertEqual(self.obj.tell(), 8)
+        self.obj.close()
+
+    def testWriteBuffer(self):
+        data = bytearray(b'some data to be written')
+        self.obj.open(pg.INV_WRITE)
+        self.obj.write(data)
+        self.obj.write(memoryview(data)[:4])
+        self.obj.close()
+        self.obj.open(pg.INV_READ)
+        r = self.obj.read(80)
+        self.assertIsInstance(r, bytes)
+        self.assertEqual(r, bytes(data + data[:4]))
+
     def testWrite(self):
         write = self.obj.write
         # testing with invalid parameters
@@ -445,6 +485,138 @@ class TestLargeObjects(unittest.TestCase):
         self.assertIsInstance(r, bytes)
         self.assertEqual(r, data)
 
+    def testExportToFile(self):
+        export = self.obj.export
+        data = b'some data to be exported' * 100000
+        self.obj.open(pg.INV_WRITE)
+        self.obj.write(data)
+        f = tempfile.TemporaryFile()
+        try:
+            # exporting when object is not yet closed
+            self.assertRaises(IOError, export, f)
+            self.obj.close()
+            # data still buffered in the file object comes first
+            f.write(b'header')
+            r = export(f)
+            self.assertEqual(r, len(data))
+            f.seek(0)
+            r = f.read()
+        finally:
+            f.close()
+        self.assertIsInstance(r, bytes)
+        self.assertEqual(r, b'header' + data)
+        # exporting to a closed file
+        self.assertRaises((TypeError, ValueError), export, f)
+
+
+class TestLargeObjectStreams(unittest.TestCase):
+    """Test buffered streams for large objects."""
+
+    def setUp(self):
+        self.pgcnx = connect()
+        self.pgcnx.query('begin')
+        self.obj = self.pgcnx.locreate(pg.INV_READ | pg.INV_WRITE)
+
+    def tearDown(self):
+        self.pgcnx.query('rollback')
+        self.pgcnx.close()
+
+    def testInvalidMode(self):
+        self.assertRaises(ValueError, pg.open_large_object, self.obj, 'a')
+        self.assertRaises(ValueError, pg.LargeObjectIO, self.obj, 'x')
+
+    def testWriteAndRead(self):
+        data = b'0123456789' * 100000
+        f = pg.open_large_object(self.obj, 'wb', buffer_size=8192)
+        self.assertIsInstance(f, io.BufferedWriter)
+        self.assertEqual(f.raw.name, self.obj.oid)
+        for i in range(0, len(data), 10):
+            self.assertEqual(f.write(data[i:i + 10]), 10)
+        f.close()
+        self.assertTrue(f.closed)
+        self.assertRaises(ValueError, f.write, b'closed')
+        f = pg.open_large_object(self.obj)
+        self.assertIsInstance(f, io.BufferedReader)
+        self.assertEqual(f.read(5), b'01234')
+        self.assertEqual(f.tell(), 5)
+        self.assertEqual(f.read(10), b'5678901234')
+        self.assertEqual(f.read(), data[15:])
+        self.assertEqual(f.read(), b'')
+        f.seek(-10, io.SEEK_END)
+        self.assertEqual(f.read(), b'0123456789')
+        f.close()
+        self.assertRaises(ValueError, f.read)
+
+    def testReadinto(self):
+        data = b'some data to be read' * 1000
+        with pg.open_large_object(self.obj, 'wb') as f:
+            f.write(data)
+        buffer = bytearray(len(data) + 10)
+        with pg.open_large_object(self.obj, 'rb', buffer_size=0) as f:
+            self.assertIsInstance(f, pg.LargeObjectIO)
+            self.assertTrue(f.readable())
+            self.assertFalse(f.writable())
+            self.assertTrue(f.seekable())
+            self.assertEqual(f.readinto(buffer), len(data))
+            self.assertEqual(f.readinto(buffer), 0)
+        self.assertEqual(buffer[:len(data)], data)
+
+    def testReadAndWrite(self):
+        with pg.open_large_object(self.obj, 'r+b') as f:
+            self.assertIsInstance(f, io.BufferedRandom)
+            f.write(b'hello world')
+            f.seek(6)
+            self.assertEqual(f.read(5), b'world')
+            f.seek(0)
+            f.write(b'HELLO')
+            f.seek(0)
+            self.assertEqual(f.read(), b'HELLO world')
+
+    def testTextWrapper(self):
+        with pg.open_large_object(self.obj, 'wb') as f:
+            f = io.TextIOWrapper(f, encoding='utf8')
+            f.write(u'käse\nbrot\n')
+            f.flush()
+        with pg.open_large_object(self.obj) as f:
+            lines = list(io.TextIOWrapper(f, encoding='utf8'))
+        self.assertEqual(lines, [u'käse\n', u'brot\n'])
+
+
+class TestLargeObjectsInThreads(unittest.TestCase):
+    """Test large objects used concurrently in several threads."""
+
+    def transfer(self, n, results):
+        c = connect()
+        try:
+            c.query('begin')
+            obj = c.locreate(pg.INV_READ | pg.INV_WRITE)
+            data = ('data in thread %d ' % n).encode('ascii') * 10000
+            obj.open(pg.INV_WRITE)
+            obj.write(data)
+            obj.close()
+            obj.open(pg.INV_READ)
+            size = obj.size()
+            r = obj.read(size)
+            obj.seek(0, pg.SEEK_SET)
+            obj.close()
+            obj.unlink()
+            c.query('rollback')
+            results[n] = r == data and size == len(data)
+        finally:
+            c.close()
+
+    def testLargeObjectsInThreads(self):
+        num_threads = 4
+        results = [None] * num_threads
+        threads = [threading.Thread(target=self.transfer, args=(n, results))
+            for n in range(num_threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+            self.assertFalse(thread.is_alive())
+        self.assertEqual(results, [True] * num_threads)
+
 
 if __name__ == '__main__':
     unittest.main()
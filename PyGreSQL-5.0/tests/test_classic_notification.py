@@ -16,7 +16,7 @@ except ImportError:
     import unittest
 
 import warnings
-from time import sleep
+from time import sleep, time
 from threading import Thread
 
 import pg  # the module under test
@@ -443,5 +443,89 @@ class TestAsyncNotification(unittest.TestCase):
         self.assertTrue(self.timeout)
 
 
+class TestDispatchNotifies(unittest.TestCase):
+    """Test dispatching notifications from several connections."""
+
+    def setUp(self):
+        self.dbs = [DB() for _i in range(3)]
+        self.received = []
+
+    def tearDown(self):
+        for db in self.dbs:
+            db.close()
+
+    def handler(self, db):
+        def callback(notifies):
+            self.assertIsInstance(notifies, list)
+            self.received.append((db, notifies))
+        return callback
+
+    def testDispatchNotifiesArgs(self):
+        f = pg.dispatch_notifies
+        db = self.dbs[0]
+        self.assertRaises(TypeError, f)
+        self.assertRaises(TypeError, f, None)
+        self.assertRaises(TypeError, f, [db])
+        self.assertRaises(TypeError, f, {'db': self.handler(db)})
+        self.assertRaises(TypeError, f, {db: None})
+        self.assertRaises(ValueError, f, {db: self.handler(db)}, -1)
+        self.assertRaises(ValueError, f, {db: self.handler(db)}, 0, 0)
+        self.assertEqual(f({}), 0)
+        self.assertEqual(f({db: self.handler(db)}, 0), 0)
+        self.assertEqual(self.received, [])
+
+    def testDispatchNotifiesTimeout(self):
+        handlers = dict((db, self.handler(db)) for db in self.dbs)
+        for db in self.dbs:
+            db.query('listen test_dispatch')
+        t = time()
+        self.assertEqual(pg.dispatch_notifies(handlers, 0.2), 0)
+        self.assertGreaterEqual(time() - t, 0.15)
+        self.assertEqual(self.received, [])
+
+    def testDispatchNotifies(self):
+        sender = self.dbs[0]
+        listeners = self.dbs[1:]
+        handlers = dict((db, self.handler(db)) for db in listeners)
+        handlers[listeners[1].db] = handlers.pop(listeners[1])
+        for db in listeners:
+            db.query('listen test_dispatch')
+        for i in range(5):
+            sender.query("notify test_dispatch, 'payload %d'" % i)
+        n = 0
+        for _i in range(100):
+            n += pg.dispatch_notifies(handlers, 0.1)
+            if n >= 10:
+                break
+        self.assertEqual(n, 10)
+        payloads = dict((db, []) for db in listeners)
+        for db, notifies in self.received:
+            for event, pid, extra in notifies:
+                self.assertEqual(event, 'test_dispatch')
+                self.assertIsInstance(pid, int)
+                payloads[db].append(extra)
+        expected = ['payload %d' % i for i in range(5)]
+        for db in listeners:
+            self.assertEqual(payloads[db], expected)
+
+    def testDispatchNotifiesWithMax(self):
+        sender, listener = self.dbs[:2]
+        listener.query('listen test_dispatch')
+        for i in range(5):
+            sender.query("notify test_dispatch, 'payload %d'" % i)
+        handlers = {listener: self.handler(listener)}
+        n = 0
+        for _i in range(100):
+            n += pg.dispatch_notifies(handlers, 0.1, max=2)
+            if n >= 5:
+                break
+        self.assertEqual(n, 5)
+        self.assertTrue(all(len(notifies) <= 2
+            for db, notifies in self.received))
+        self.assertEqual([extra for db, notifies in self.received
+            for event, pid, extra in notifies],
+            ['payload %d' % i for i in range(5)])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -16,6 +16,7 @@ except ImportError:
     import unittest
 
 from collections import Iterable
+from io import BytesIO
 
 import pgdb  # the module under test
 
@@ -437,6 +438,10 @@ class TestCopyTo(TestCopy):
         self.assertRaises(TypeError, call, None, 'copytest', null=42)
         self.assertRaises(TypeError, call, None, 'copytest', decode='bad')
         self.assertRaises(TypeError, call, None, 'copytest', columns=42)
+        self.assertRaises(TypeError, call, None, 'copytest', size='bad')
+        self.assertRaises(ValueError, call, None, 'copytest', size=0)
+        self.assertRaises(ValueError, call, None, 'copytest',
+            decode=True, size=1024)
 
     def test_generator(self):
         ret = self.copy_to()
@@ -572,6 +577,30 @@ class TestCopyTo(TestCopy):
         self.assertEqual(stream.sizes, sizes)
         self.check_rowcount()
 
+    def test_file_with_size(self):
+        stream = BytesIO()
+        ret = self.copy_to(stream, size=1024)
+        self.assertIs(ret, self.cursor)
+        self.assertEqual(stream.getvalue(), self.data_text.encode('utf-8'))
+        self.check_rowcount()
+
+    def test_generator_with_size(self):
+        data = self.data_text.encode('utf-8')
+        rows = data.splitlines(True)
+        for size in 1024, len(rows[0]), 3:
+            ret = self.copy_to(size=size)
+            self.assertIsInstance(ret, Iterable)
+            chunks = list(ret)
+            for chunk in chunks:
+                self.assertIsInstance(chunk, bytes)
+                self.assertLessEqual(len(chunk), size)
+            self.assertEqual(b''.join(chunks), data)
+            if size >= max(len(row) for row in rows):
+                # the chunks contain only complete rows
+                self.assertTrue(all(chunk.endswith(b'\n')
+                    for chunk in chunks))
+            self.check_rowcount()
+
 
 class TestBinary(TestCopy):
     """Test the copy_from and copy_to methods with binary data."""